@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Builds the multi-record fixtures from the single record ones.
+
+Usage
+-----
+python benchmarks/fixtures/build_fixtures.py
+
+The single record fixtures (efetch_1.xml, medline_1.txt) follow the format
+of actual responses. They are in pubmed/_fixtures as they are also the
+templates of pubmed.mock_server. The larger fixtures are built from them
+with distinct PMIDs and some variation in the # of authors and references
+so that the records aren't all the same size. The single record esummary
+and esearch templates of the mock server are written there as well. The
+output is deterministic and is committed, so this only needs to be rerun
+if the templates change.
+
+The 10k article efetch fixture is not committed, it is built from
+efetch_100.xml.gz at load time. See benchmarks/run.py
+"""
+
+#Standard Library
+import os
+import gzip
+import json
+
+FIXTURES_PATH = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_PATH = os.path.join(FIXTURES_PATH,'..','..','pubmed','_fixtures')
+
+BASE_PMID = 30343668
+#PMIDs of the generated records
+PMIDS = [str(BASE_PMID + 1000*i) for i in range(100)]
+
+def _read(name):
+    with open(os.path.join(TEMPLATES_PATH,name),encoding='utf-8') as f:
+        return f.read()
+
+def _write(name,text,folder=FIXTURES_PATH):
+    path = os.path.join(folder,name)
+    data = text.encode('utf-8')
+    if name.endswith('.gz'):
+        #mtime=0 so that the output doesn't change between runs
+        with open(path,'wb') as f:
+            with gzip.GzipFile(fileobj=f,mode='wb',mtime=0) as g:
+                g.write(data)
+    else:
+        with open(path,'wb') as f:
+            f.write(data)
+    print('%s: %d bytes' % (name,os.path.getsize(path)))
+
+#---- efetch -----------------------------------
+def _split_article_set(xml):
+    head, rest = xml.split('<PubmedArticleSet>')
+    start = rest.index('<PubmedArticle>')
+    end = rest.index('</PubmedArticle>') + len('</PubmedArticle>')
+    return head, rest[start:end]
+
+def build_efetch():
+    head, article = _split_article_set(_read('efetch_1.xml'))
+
+    author_start = article.index('                <Author ValidYN="Y">\n'
+                                 '                    <LastName>Grill')
+    author_end = article.index('</Author>',author_start) + len('</Author>\n')
+    author = article[author_start:author_end]
+
+    ref_start = article.index('            <Reference>')
+    ref_end = article.index('</Reference>',ref_start) + len('</Reference>\n')
+    reference = article[ref_start:ref_end]
+
+    articles = []
+    for i, pmid in enumerate(PMIDS):
+        extra_authors = ''.join(author.replace('Grill','Grill%d' % j)
+                                for j in range(i % 8))
+        temp = article[:author_end] + extra_authors + article[author_end:]
+        temp = temp.replace(str(BASE_PMID),pmid)
+        temp = temp.replace('in the rat.','in the rat (%d).' % i)
+        extra_refs = ''.join(reference.replace('25589273',str(25589273 + j))
+                             for j in range(i % 20))
+        temp = temp.replace(reference,reference + extra_refs)
+        articles.append(temp)
+
+    _write('efetch_100.xml.gz',
+           head + '<PubmedArticleSet>\n' + '\n'.join(articles) +
+           '\n</PubmedArticleSet>\n')
+
+#---- esummary ---------------------------------
+def _get_summary(i,pmid):
+    authors = [{'name':'Smith JA','authtype':'Author','clusterid':''}]
+    authors.extend({'name':'Grill%d WM' % j,'authtype':'Author','clusterid':''}
+                   for j in range(i % 8))
+    return {
+        'uid': pmid,
+        'pubdate': '2019 Jan',
+        'epubdate': '2018 Oct 21',
+        'source': 'Neurourol Urodyn',
+        'authors': authors,
+        'lastauthor': authors[-1]['name'],
+        'title': 'Bladder afferent signaling in the rat (%d).' % i,
+        'sorttitle': 'bladder afferent signaling in the rat %d' % i,
+        'volume': '38',
+        'issue': '1',
+        'pages': '135-143',
+        'lang': ['eng'],
+        'nlmuniqueid': '8303326',
+        'issn': '0733-2467',
+        'essn': '1520-6777',
+        'pubtype': ['Journal Article'],
+        'recordstatus': 'PubMed - indexed for MEDLINE',
+        'pubstatus': '4',
+        'articleids': [{'idtype':'pubmed','idtypen':1,'value':pmid},
+                       {'idtype':'doi','idtypen':3,'value':'10.1002/nau.%s' % pmid},
+                       {'idtype':'rid','idtypen':8,'value':pmid},
+                       {'idtype':'eid','idtypen':8,'value':pmid}],
+        'history': [{'pubstatus':'received','date':'2018/06/11 00:00'},
+                    {'pubstatus':'entrez','date':'2018/10/23 06:00'}],
+        'references': [],
+        'attributes': ['Has Abstract'],
+        'pmcrefcount': i % 13,
+        'fulljournalname': 'Neurourology and urodynamics',
+        'elocationid': 'doi: 10.1002/nau.%s' % pmid,
+        'doctype': 'citation',
+        'srccontriblist': [],
+        'booktitle': '',
+        'medium': '',
+        'edition': '',
+        'publisherlocation': '',
+        'publishername': '',
+        'srcdate': '',
+        'reportnumber': '',
+        'availablefromurl': '',
+        'locationlabel': '',
+        'doccontriblist': [],
+        'docdate': '',
+        'bookname': '',
+        'chapter': '',
+        'sortpubdate': '2019/01/01 00:00',
+        'sortfirstauthor': 'Smith JA',
+        'vernaculartitle': ''}
+
+def _write_esummary(name,pmids,folder=FIXTURES_PATH):
+    result = {'uids':pmids}
+    for i, pmid in enumerate(pmids):
+        result[pmid] = _get_summary(i,pmid)
+    data = {'header':{'type':'esummary','version':'0.3'},'result':result}
+    _write(name,json.dumps(data),folder)
+
+def build_esummary():
+    _write_esummary('esummary_100.json',PMIDS)
+    _write_esummary('esummary_1.json',PMIDS[:1],TEMPLATES_PATH)
+
+#---- esearch ----------------------------------
+_ESEARCH_XML = """<?xml version="1.0" encoding="UTF-8" ?>
+<!DOCTYPE eSearchResult PUBLIC "-//NLM//DTD esearch 20060628//EN" "https://eutils.ncbi.nlm.nih.gov/eutils/dtd/20060628/esearch.dtd">
+<eSearchResult><Count>%d</Count><RetMax>%d</RetMax><RetStart>0</RetStart><IdList>
+%s
+</IdList><TranslationSet/><TranslationStack>   <TermSet>    <Term>grill wm[Author]</Term>    <Field>Author</Field>    <Count>150</Count>    <Explode>N</Explode>   </TermSet>   <TermSet>    <Term>bladder[All Fields]</Term>    <Field>All Fields</Field>    <Count>183652</Count>    <Explode>N</Explode>   </TermSet>   <OP>AND</OP>  </TranslationStack><QueryTranslation>grill wm[Author] AND bladder[All Fields]</QueryTranslation></eSearchResult>
+"""
+
+def _write_esearch(name,pmids,folder=FIXTURES_PATH):
+    count = 1234
+    _write(name + '.xml',_ESEARCH_XML % (count,len(pmids),
+                                        '\n'.join('<Id>%s</Id>' % x for x in pmids)),
+           folder)
+
+    data = {'header':{'type':'esearch','version':'0.3'},
+            'esearchresult':{
+                'count':str(count),
+                'retmax':str(len(pmids)),
+                'retstart':'0',
+                'idlist':pmids,
+                'translationset':[],
+                'translationstack':[
+                    {'term':'grill wm[Author]','field':'Author','count':'150',
+                     'explode':'N'},
+                    {'term':'bladder[All Fields]','field':'All Fields',
+                     'count':'183652','explode':'N'},
+                    'AND'],
+                'querytranslation':'grill wm[Author] AND bladder[All Fields]'}}
+    _write(name + '.json',json.dumps(data),folder)
+
+def build_esearch():
+    _write_esearch('esearch_100',PMIDS)
+    _write_esearch('esearch_1',PMIDS[:1],TEMPLATES_PATH)
+
+#---- MEDLINE ----------------------------------
+def build_medline():
+    record = _read('medline_1.txt').strip('\n')
+    records = []
+    for i, pmid in enumerate(PMIDS):
+        temp = record.replace(str(BASE_PMID),pmid)
+        temp = temp.replace('in the rat.','in the rat (%d).' % i)
+        extra = ''.join('\nFAU - Grill%d, Warren M\nAU  - Grill%d WM' % (j,j)
+                        for j in range(i % 8))
+        temp = temp.replace('AU  - Grill WM','AU  - Grill WM' + extra)
+        records.append(temp)
+    #Records are preceded by an empty line
+    _write('medline_100.txt','\n' + '\n\n'.join(records) + '\n')
+
+#---- idconv -----------------------------------
+def build_idconv():
+    records = []
+    for i, pmid in enumerate(PMIDS):
+        if i % 3 == 0:
+            #Not in PMC
+            records.append({'pmid':pmid,'live':'false','status':'error',
+                            'errmsg':'invalid article id'})
+        else:
+            records.append({'pmcid':'PMC%d' % (6000000 + i),'pmid':pmid,
+                            'doi':'10.1002/nau.%s' % pmid})
+    data = {'status':'ok','responseDate':'2020-02-05 10:39:10',
+            'request':'idtype=pmid;ids=...;versions=no;format=json',
+            'records':records}
+    _write('idconv_100.json',json.dumps(data,indent=1))
+
+#---- ecitmatch --------------------------------
+def build_ecitmatch():
+    lines = []
+    for i, pmid in enumerate(PMIDS):
+        request = 'neurourol urodyn|2019|38|%d|grill wm|key_%03d|' % (135 + i,i)
+        if i % 10 == 0:
+            result = 'NOT_FOUND;INVALID_JOURNAL'
+        elif i % 10 == 1:
+            result = 'AMBIGUOUS %s,%s' % (pmid,PMIDS[i-1])
+        elif i % 10 == 2:
+            result = 'AMBIGUOUS (%d citations)' % (i + 10)
+        else:
+            result = pmid
+        lines.append(request + result)
+    _write('ecitmatch_100.txt','\n'.join(lines) + '\n')
+
+def main():
+    build_efetch()
+    build_esummary()
+    build_esearch()
+    build_medline()
+    build_idconv()
+    build_ecitmatch()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Parse time of PubmedArticleSet for each XML backend (API(parser=...)).
+
+Usage
+-----
+python benchmarks/parser_backends.py [n_articles]
+
+Example output (1000 articles, 5 MB of XML):
+
+parser   lazy       time (s)     articles/s
+bs4      False         5.981            167
+lxml     False         0.514           1945
+bs4      True          3.492            286
+lxml     True          0.099          10089
+
+See Also
+--------
+pubmed.lxml_helpers
+"""
+
+#Standard Library
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+
+#Local
+from pubmed import models
+from pubmed.model_helpers import PARSERS
+from soup_memory import get_replicated_fixture
+
+def measure(xml:str,parser:str,options:dict,n_repeats=3)->float:
+    #Best of n_repeats
+    api = SimpleNamespace(parser=parser)
+    response = SimpleNamespace(text=xml)
+    times = []
+    for i in range(n_repeats):
+        start_time = time.perf_counter()
+        models.PubmedArticleSet(api,response,options)
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+def main(n_articles=1000):
+    xml = get_replicated_fixture(n_articles)
+    print('%d articles, %.1f MB of XML' % (n_articles,len(xml)/1e6))
+    print('%-8s %-8s %10s %14s' % ('parser','lazy','time (s)','articles/s'))
+    for lazy in (False,True):
+        for parser in PARSERS:
+            elapsed_time = measure(xml,parser,{'lazy':lazy})
+            print('%-8s %-8s %10.3f %14.0f' % (parser,lazy,elapsed_time,
+                                               n_articles/elapsed_time))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmarks of the response handlers.
+
+Usage
+-----
+python benchmarks/run.py                        #all cases, writes a report
+python benchmarks/run.py --parser lxml
+python benchmarks/run.py --cases efetch_100 esummary_100
+python benchmarks/run.py --compare results/abc123-bs4.json results/def456-bs4.json
+
+Each case calls a handler on a fake response built from a fixture in
+benchmarks/fixtures (see build_fixtures.py), so no network access is
+needed. For each case we report:
+
+    records_per_s : throughput, based on the best run
+    mb_per_s : throughput in response bytes
+    us_per_record : latency per record, based on the best run
+    peak_mb : peak memory while handling the response (tracemalloc, from a
+              separate run as tracing slows things down)
+
+The report is written as JSON, along with the git hash of the tree, to
+benchmarks/results/<hash>-<parser>.json. Reports from two commits can then
+be compared with --compare.
+"""
+
+#Standard Library
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+BENCHMARKS_PATH = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_PATH = os.path.join(BENCHMARKS_PATH,'fixtures')
+#Single record fixtures, shared with pubmed.mock_server
+TEMPLATES_PATH = os.path.join(BENCHMARKS_PATH,'..','pubmed','_fixtures')
+RESULTS_PATH = os.path.join(BENCHMARKS_PATH,'results')
+
+sys.path.insert(0,os.path.join(BENCHMARKS_PATH,'..'))
+
+#Third Party
+import requests
+
+#Local
+from pubmed import models
+from pubmed import esummary_models
+from pubmed import esearch_models
+from pubmed import elink_models
+from pubmed.api import CitationMatcherEntry
+
+#---- Fixtures ---------------------------------
+def load_fixture(name:str)->bytes:
+    """
+    Returns the bytes of a fixture. 'efetch_10k' is built from
+    efetch_100.xml.gz rather than being committed.
+    """
+    if name == 'efetch_10k':
+        return _replicate_efetch(load_fixture('efetch_100.xml.gz'),100)
+
+    path = os.path.join(FIXTURES_PATH,name)
+    if not os.path.exists(path):
+        path = os.path.join(TEMPLATES_PATH,name)
+    if name.endswith('.gz'):
+        with gzip.open(path,'rb') as f:
+            return f.read()
+    else:
+        with open(path,'rb') as f:
+            return f.read()
+
+_PMID_PATTERN = re.compile(rb'(<PMID Version="1">|<ArticleId IdType="pubmed">)(\d+)')
+
+def _replicate_efetch(data:bytes,n:int)->bytes:
+    #The articles are copied n times, each copy with its own PMIDs
+    head, rest = data.split(b'<PubmedArticleSet>\n',1)
+    body = rest.rsplit(b'</PubmedArticleSet>',1)[0]
+    copies = []
+    for i in range(n):
+        offset = i*100000000
+        copies.append(_PMID_PATTERN.sub(lambda m: b'%s%d' % (m.group(1),
+                                        int(m.group(2)) + offset),body))
+    return head + b'<PubmedArticleSet>\n' + b''.join(copies) + b'</PubmedArticleSet>\n'
+
+def make_response(data:bytes,content_type:str)->requests.models.Response:
+    response = requests.models.Response()
+    response.status_code = 200
+    response._content = data
+    response.encoding = 'utf-8'
+    response.headers['Content-Type'] = content_type
+    return response
+
+#---- Cases ------------------------------------
+class BenchmarkCase(object):
+
+    """
+    Attributes
+    ----------
+    name : str
+    fixture : str
+        Fixture file name, see load_fixture()
+    handler :
+        Called as handler(api,response) or handler(api,response,data)
+    content_type : str
+    get_data : function handle or None
+        Returns the data_for_response for the handler
+    count : function handle
+        Returns the # of records in the output of the handler
+    """
+
+    __slots__ = ['name','fixture','handler','content_type','get_data','count']
+
+    def __init__(self,name,fixture,handler,content_type,count,get_data=None):
+        self.name = name
+        self.fixture = fixture
+        self.handler = handler
+        self.content_type = content_type
+        self.count = count
+        self.get_data = get_data
+
+def _get_ecitmatch_data():
+    entries = [CitationMatcherEntry(journal='neurourol urodyn',year=2019,
+                                    volume=38,page1=135+i,author='grill wm')
+               for i in range(100)]
+    return {'query_lengths':None,'entries':entries,'is_single':False}
+
+def _get_idconv_data():
+    with open(os.path.join(FIXTURES_PATH,'idconv_100.json')) as f:
+        return [x['pmid'] for x in json.load(f)['records']]
+
+_count_docs = lambda x: len(x.docs)
+
+CASES = [
+    BenchmarkCase('efetch_1','efetch_1.xml',models.PubmedArticleSet,
+                  'text/xml',_count_docs),
+    BenchmarkCase('efetch_100','efetch_100.xml.gz',models.PubmedArticleSet,
+                  'text/xml',_count_docs),
+    BenchmarkCase('efetch_10k','efetch_10k',models.PubmedArticleSet,
+                  'text/xml',_count_docs),
+    BenchmarkCase('medline_100','medline_100.txt',models.get_medline,
+                  'text/plain',len),
+    BenchmarkCase('esummary_100','esummary_100.json',
+                  esummary_models.PubmedSummaryResult,'application/json',
+                  _count_docs),
+    BenchmarkCase('esearch_xml_100','esearch_100.xml',
+                  esearch_models.XMLSearchResult,'text/xml',
+                  lambda x: len(x.ids)),
+    BenchmarkCase('esearch_json_100','esearch_100.json',
+                  esearch_models.JSONSearchResult,'application/json',
+                  lambda x: len(x.ids)),
+    BenchmarkCase('ecitmatch_100','ecitmatch_100.txt',
+                  models.citation_match_parser,'text/plain',len,
+                  get_data=_get_ecitmatch_data),
+    BenchmarkCase('idconv_100','idconv_100.json',
+                  elink_models.pmid_to_pmc_results,'application/json',len,
+                  get_data=_get_idconv_data),
+    ]
+
+class _FakeAPI(object):
+    #The handlers only use the API for options
+    def __init__(self,parser):
+        self.parser = parser
+
+def _call(case,api,data,data_for_response):
+    #A new response each time as requests caches the decoded text
+    response = make_response(data,case.content_type)
+    if data_for_response is None:
+        return case.handler(api,response)
+    else:
+        return case.handler(api,response,data_for_response)
+
+def run_case(case:BenchmarkCase,parser='bs4',repeats=5,max_time=10.0)->dict:
+    """
+    Runs a case up to 'repeats' times, stopping early once max_time seconds
+    have been spent (after at least one run).
+    """
+    api = _FakeAPI(parser)
+    data = load_fixture(case.fixture)
+    data_for_response = case.get_data() if case.get_data else None
+
+    times = []
+    total_time = 0
+    n_records = 0
+    while len(times) < repeats and (len(times) == 0 or total_time < max_time):
+        start_time = time.perf_counter()
+        output = _call(case,api,data,data_for_response)
+        elapsed_time = time.perf_counter() - start_time
+        n_records = case.count(output)
+        del output
+        times.append(elapsed_time)
+        total_time += elapsed_time
+
+    tracemalloc.start()
+    output = _call(case,api,data,data_for_response)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del output
+
+    best = min(times)
+    return {'n_records':n_records,
+            'n_bytes':len(data),
+            'repeats':len(times),
+            'best_s':best,
+            'median_s':statistics.median(times),
+            'records_per_s':n_records/best,
+            'mb_per_s':len(data)/1e6/best,
+            'us_per_record':1e6*best/max(n_records,1),
+            'peak_mb':peak/1e6}
+
+#---- Reports ----------------------------------
+def get_git_hash():
+    """
+    Returns (hash,is_dirty), hash is None if not in a git repo
+    """
+    try:
+        git_hash = subprocess.check_output(['git','rev-parse','--short','HEAD'],
+                                           cwd=BENCHMARKS_PATH,
+                                           stderr=subprocess.DEVNULL)
+        status = subprocess.check_output(['git','status','--porcelain',
+                                          '--untracked-files=no'],
+                                         cwd=BENCHMARKS_PATH,
+                                         stderr=subprocess.DEVNULL)
+    except (OSError,subprocess.CalledProcessError):
+        return None, False
+    return git_hash.decode().strip(), len(status.strip()) > 0
+
+def run(case_names=None,parser='bs4',repeats=5,max_time=10.0)->dict:
+    git_hash, is_dirty = get_git_hash()
+    report = {'git_hash':git_hash,
+              'git_dirty':is_dirty,
+              'timestamp':datetime.now().isoformat(timespec='seconds'),
+              'python':platform.python_version(),
+              'platform':platform.platform(),
+              'parser':parser,
+              'results':{}}
+
+    print('%-18s %8s %12s %10s %12s %10s' % ('case','records','records/s',
+                                             'MB/s','us/record','peak MB'))
+    for case in CASES:
+        if case_names and case.name not in case_names:
+            continue
+        r = run_case(case,parser=parser,repeats=repeats,max_time=max_time)
+        report['results'][case.name] = r
+        print('%-18s %8d %12.0f %10.2f %12.1f %10.2f' % (case.name,
+              r['n_records'],r['records_per_s'],r['mb_per_s'],
+              r['us_per_record'],r['peak_mb']))
+
+    return report
+
+def save_report(report:dict,path=None)->str:
+    if path is None:
+        os.makedirs(RESULTS_PATH,exist_ok=True)
+        name = report['git_hash'] or 'unknown'
+        if report['git_dirty']:
+            name += '-dirty'
+        path = os.path.join(RESULTS_PATH,'%s-%s.json' % (name,report['parser']))
+    with open(path,'w') as f:
+        json.dump(report,f,indent=2)
+    return path
+
+def compare(base_path:str,new_path:str):
+    """
+    Prints the speedup (base time / new time) and memory ratio
+    (new peak / base peak) of each case in both reports.
+    """
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print('base: %s (%s)  new: %s (%s)' % (base['git_hash'],base['parser'],
+                                           new['git_hash'],new['parser']))
+    print('%-18s %12s %12s %9s %10s' % ('case','base us/rec','new us/rec',
+                                        'speedup','memory'))
+    for name, b in base['results'].items():
+        n = new['results'].get(name)
+        if n is None:
+            continue
+        if b['peak_mb'] > 0:
+            memory_ratio = n['peak_mb']/b['peak_mb']
+        else:
+            memory_ratio = float('nan')
+        print('%-18s %12.1f %12.1f %8.2fx %9.2fx' % (name,b['us_per_record'],
+              n['us_per_record'],b['best_s']/n['best_s'],memory_ratio))
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmarks the response handlers')
+    parser.add_argument('--cases',nargs='+',help='Names of the cases to run')
+    parser.add_argument('--parser',default='bs4',help="'bs4' or 'lxml'")
+    parser.add_argument('--repeats',type=int,default=5)
+    parser.add_argument('--max-time',type=float,default=10.0,
+                        help='Maximum time to spend repeating a case')
+    parser.add_argument('--output',help='Report path')
+    parser.add_argument('--compare',nargs=2,metavar=('BASE','NEW'),
+                        help='Compares two reports instead of running')
+    options = parser.parse_args(args)
+
+    if options.compare:
+        compare(*options.compare)
+        return
+
+    report = run(options.cases,parser=options.parser,repeats=options.repeats,
+                 max_time=options.max_time)
+    path = save_report(report,options.output)
+    print('Report written to %s' % path)
+
+if __name__ == '__main__':
+    main()
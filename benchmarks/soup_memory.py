@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Memory retained by a parsed PubmedArticleSet, with and without the parse
+tree being kept.
+
+Usage
+-----
+python benchmarks/soup_memory.py [n_articles]
+
+The fixture (a single article) is replicated n_articles times (default 1000)
+with distinct PMIDs. For each option set we report the memory still held
+once parsing has finished and the result is alive (retained) as well as the
+peak during parsing, both from tracemalloc.
+
+Options
+-------
+keep_soup : the previous behavior, every article references the tree
+default : tree released after parsing
+leave_raw : tree released, XML of each article kept as bytes
+lazy : tree kept as fields are parsed on demand
+
+Note that tracing allocations makes parsing several times slower.
+
+Example output (2000 articles, 10 MB of XML):
+
+option      retained (MB)      peak (MB)
+keep_soup           270.4          303.3
+default              33.9          303.3
+leave_raw            40.7          303.3
+lazy                263.5          303.3
+"""
+
+#Standard Library
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+
+#Local
+from pubmed import models
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            '..','pubmed','_fixtures','efetch_1.xml')
+
+OPTION_SETS = [('keep_soup',{'keep_soup':True}),
+               ('default',{}),
+               ('leave_raw',{'leave_raw':True}),
+               ('lazy',{'lazy':True})]
+
+def get_replicated_fixture(n_articles:int)->str:
+    """
+    Returns an efetch response with n_articles copies of the fixture article
+    """
+    with open(FIXTURE_PATH) as f:
+        xml = f.read()
+
+    head, rest = xml.split('<PubmedArticleSet>')
+    start = rest.index('<PubmedArticle>')
+    end = rest.index('</PubmedArticle>') + len('</PubmedArticle>')
+    article = rest[start:end]
+    pmid = article.split('<PMID Version="1">')[1].split('<')[0]
+
+    articles = [article.replace(pmid,str(10000000 + i)) for i in range(n_articles)]
+    return head + '<PubmedArticleSet>\n' + '\n'.join(articles) + '\n</PubmedArticleSet>'
+
+def measure(xml:str,options:dict):
+    response = SimpleNamespace(text=xml)
+
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = models.PubmedArticleSet(None,response,options)
+    elapsed_time = time.perf_counter() - start_time
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(result.docs) > 0
+    del result
+    return retained, peak, elapsed_time
+
+def main(n_articles=1000):
+    xml = get_replicated_fixture(n_articles)
+    print('%d articles, %.1f MB of XML' % (n_articles,len(xml)/1e6))
+    print('%-10s %14s %14s %10s' % ('option','retained (MB)','peak (MB)','time (s)'))
+
+    for name, options in OPTION_SETS:
+        retained, peak, elapsed_time = measure(xml,options)
+        print('%-10s %14.1f %14.1f %10.2f' % (name,retained/1e6,peak/1e6,
+                                             elapsed_time))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
@@ -2,4 +2,5 @@ from .config_interface import Config
 
 config = Config()
 
-from .api import API, CitationMatcherEntry
\ No newline at end of file
+from .api import API, CitationMatcherEntry
+from .async_api import AsyncAPI
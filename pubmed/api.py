@@ -63,8 +63,11 @@ ESummary
 
 #Standard Library
 from typing import Union, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 import re
 import time
+import warnings
 
 
 #Third Party
@@ -72,16 +75,27 @@ import requests
 
 #Local
 from . import models
+from . import model_helpers
 
 from . import einfo_models
 from . import esearch_models
 from . import elink_models
 from . import esummary_models
+from . import epost_models
 
 from .einfo_models import DbInfo
 CitationMatchResult = models.CitationMatchResult
 from . import config
 from . import utils
+from . import errors
+from . import rate_limiters
+from . import cache as cache_module
+from . import record_cache as record_cache_module
+from . import store as store_module
+from . import retry as retry_module
+from . import metrics as metrics_module
+from . import hooks as hooks_module
+from . import json_backend as json_backend_module
 from .utils import get_truncated_display_string as td
 from .utils import get_list_class_display as cld
 from .utils import quotes, display_class
@@ -294,18 +308,23 @@ class Pubmed(object):
                'info','TODO',
                'summary','TODO'])
 
-    def db_info(self)->'DbInfo':
+    def db_info(self,leave_raw=False)->'DbInfo':
         """
 
         Status: Done
 
+        Parameters
+        ----------
+        leave_raw : bool, default False
+            If True the XML is kept as bytes in DbInfo.raw_xml
+
         Example
         -------
         r = api.pubmed.info()
         df = r.fields_as_table()
         df.to_clipboard()
         """
-        return self.parent._db_info('pubmed')
+        return self.parent._db_info('pubmed',leave_raw=leave_raw)
 
     def pmcid(self, id_or_ids):
         """
@@ -420,16 +439,8 @@ class Pubmed(object):
         #DocumentSummary -block ArticleId -sep "\t" -tab "\n" -element
         #IdType,Value | grep -E '^pubmed|doi'
 
-        if isinstance(doi_or_dois,list):
-            is_list = True
-            temp = [x + '[DOI]' for x in doi_or_dois]
-            query = " OR ".join(temp)
-            # 10.1242/jeb.154609[DOI] OR 10.1038/s41467-018-03561-w[DOI]
-        else:
-            query = doi_or_dois + '[DOI]'
-            is_list = False
-
         # Find the relevant PMIDs
+        query, is_list = _get_doi_query(doi_or_dois)
         temp = self.search(query)
 
         if is_list:
@@ -453,16 +464,7 @@ class Pubmed(object):
             #   - just need to change return type, and change processing below
             s = self.summary(ids)
 
-            d = {}
-            for temp, temp_id in zip(s.docs, s.ids):
-                doi_field = temp.elocation_id
-                # 'doi: 10.1002/biot.201400046'
-                if doi_field.startswith('doi: '):
-                    doi = doi_field[5:]
-                    d[doi] = temp_id
-
-            output = [d.get(x) for x in doi_or_dois]
-            return output
+            return _map_dois_to_pmids(doi_or_dois,s)
 
         else:
             value = temp.ids
@@ -474,7 +476,30 @@ class Pubmed(object):
         # identifiers through the broken API
         # We can then followup with getting info but this requires extra work
 
-    def search(self,query,start=None,max=None,return_type='object'):
+    def post(self,id_or_ids,web_env=None)->'epost_models.EPostResult':
+        """
+        Uploads IDs to the Entrez history server.
+
+        The returned object can be passed in place of IDs to details() and
+        summary(), which can then page through the IDs using start and max
+        without the IDs being sent again.
+
+        Parameters
+        ----------
+        id_or_ids : Union[List[str],List[int],str,int]
+        web_env : str
+            If specified the IDs are added to this existing history session.
+
+        Examples
+        --------
+        post = api.pubmed.post(ids)
+        result = api.pubmed.details(post,start=0,max=500)
+        result = api.pubmed.details(post,start=500,max=500)
+        """
+        return self.parent._epost('pubmed',id_or_ids,web_env=web_env)
+
+    def search(self,query,start=None,max=None,return_type='object',
+               use_history=False):
         """
         
         ??? What gets returned?
@@ -486,6 +511,10 @@ class Pubmed(object):
         start : default 0
         max : default 20
             Max value is 100000
+        use_history : bool, default False
+            If true the matching IDs are kept on the Entrez history server.
+            The result (return_type 'object' or 'object-xml') can then be
+            passed to details() and summary() in place of IDs.
         return_type :
             - 'ids'
             - 'count' - NYI
@@ -509,6 +538,11 @@ class Pubmed(object):
         result = api.pubmed.search('Grill WM',max=400,return_type='object-xml')
         result = api.pubmed.search('Grill WM',max=400,return_type='object')
 
+        #History server
+        #---------------------------------------
+        result = api.pubmed.search('Grill WM',use_history=True)
+        details = api.pubmed.details(result,start=0,max=200)
+
         """
         if return_type == 'ids':
             fh = esearch_models.get_search_ids
@@ -533,9 +567,92 @@ class Pubmed(object):
             raise ValueError('Unrecognized return type')
 
 
-        return self.parent._esearch('pubmed',query,fh,start=start,max=max,mode=mode)
+        return self.parent._esearch('pubmed',query,fh,start=start,max=max,mode=mode,
+                                    use_history=use_history)
+
+    def iter_search(self,query,page_size=500,return_type='ids',
+                    min_date='1800/01/01',max_date='3000/12/31'):
+        """
+        Generator over all results of a search.
+
+        Pages are requested as needed, with the next page being requested
+        while the current one is being processed. ESearch only returns the
+        first 10000 results of a query, so queries with more results are
+        split into date ranges (on [PDAT]) with fewer results.
+
+        Parameters
+        ----------
+        page_size : int
+            # of IDs to request at once
+        return_type : str
+            - 'ids' - yields PMIDs
+            - 'summary' - yields PubmedSummary objects, see summary()
+            - 'details' - yields PubmedArticle objects, see details()
+        min_date : str
+        max_date : str
+            Dates to start the splitting with, 'YYYY/MM/DD'
+
+        Examples
+        --------
+        for pmid in api.pubmed.iter_search('Grill WM'):
+            print(pmid)
+
+        for doc in api.pubmed.iter_search('bladder',return_type='summary'):
+            print(doc.title)
+        """
+
+        get_ids = lambda q,start,max: self.search(q,start=start,max=max,
+                                                  return_type='ids')
+        if return_type == 'ids':
+            get_page = get_ids
+        elif return_type == 'summary':
+            get_page = lambda q,start,max: self.summary(get_ids(q,start,max)).docs
+        elif return_type == 'details':
+            get_page = lambda q,start,max: self.details(get_ids(q,start,max)).docs
+        else:
+            raise ValueError('Unrecognized return type')
+
+        count = self.search(query,max=0).count
+        if count <= ESEARCH_MAX_RESULTS:
+            sub_queries = [(query,count)]
+        else:
+            sub_queries = self._split_query(query,
+                                            _parse_pdat(min_date),
+                                            _parse_pdat(max_date))
+
+        for sub_query, count in sub_queries:
+            for page in _prefetch_pages(get_page,sub_query,count,page_size):
+                yield from page
+
+    def _split_query(self,query,min_date,max_date):
+        """
+        Yields (query,count) pairs that together cover all results of
+        the query but which each have fewer than ESEARCH_MAX_RESULTS
+        results.
+
+        If a single day has too many results the results beyond the
+        limit are not returned (with a warning).
+        """
+
+        sub_query = _get_pdat_query(query,min_date,max_date)
+        count = self.search(sub_query,max=0).count
+
+        if count == 0:
+            return
+
+        if count <= ESEARCH_MAX_RESULTS:
+            yield sub_query, count
+        elif min_date == max_date:
+            warnings.warn('%d results for %s, only the first %d will be returned'
+                          % (count,sub_query,ESEARCH_MAX_RESULTS))
+            yield sub_query, ESEARCH_MAX_RESULTS
+        else:
+            mid_date = min_date + (max_date - min_date)/2
+            yield from self._split_query(query,min_date,mid_date)
+            yield from self._split_query(query,mid_date + timedelta(days=1),max_date)
 
-    def details(self,id_or_ids,return_type='object',leave_raw=False):
+    def details(self,id_or_ids,return_type='object',leave_raw=False,lazy=False,
+                start=None,max=None,keep_soup=False,fields=None):
         """
         
         How does this compare to:
@@ -545,17 +662,49 @@ class Pubmed(object):
 
         Parameters
         ----------
-        id_or_ids : Union[List[str],List[int],str,int]
-            ID or list of IDs to process
+        id_or_ids : Union[List[str],List[int],str,int] or history result
+            ID or list of IDs to process. Alternatively the result of post()
+            or of search(...,use_history=True).
         return_type : str
             - 'object', default
+            - 'stream' - generator of PubmedArticle, parsed as downloaded.
+                         Book citations are skipped, see
+                         models.iter_pubmed_articles
+            - 'medline' - list of dicts, see models.get_medline
+            - 'medline-stream' - generator of the MEDLINE dicts, parsed as
+                                 downloaded
             - 'asn'
             - 'xml'
+        leave_raw : bool, default False
+            For 'object' and 'stream'. If True the XML of each article is
+            kept as bytes in PubmedArticle.raw_xml.
+        lazy : bool, default False
+            For 'object' and 'stream'. If True, fields of each article are
+            only parsed when first accessed. This is much faster when only a
+            couple of fields are needed. Lazy articles keep their tree.
+        keep_soup : bool, default False
+            For 'object' and 'stream'. By default the parse tree is discarded
+            once each article has been created. If True it is kept in
+            PubmedArticle.soup, which is mainly useful for debugging.
+        start : int
+            Only used with a history result, index of the first record
+        max : int
+            Only used with a history result, # of records to return
+        fields : List[str]
+            For 'medline' and 'medline-stream'. Only these MEDLINE fields
+            (e.g. 'PMID', 'TI', 'MH') are kept.
 
         Examples
         --------
         result = api.pubmed.details('30343668')
 
+        #Only the requested fields get parsed
+        result = api.pubmed.details(ids,lazy=True)
+        titles = [x.citation.article.title for x in result.docs]
+
+        for article in api.pubmed.details(ids,return_type='stream'):
+            print(article.citation.pmid)
+
         result = api.pubmed.details('30343668',return_type='asn')
 
         result = api.pubmed.details('30343668',return_type='medline')
@@ -563,6 +712,13 @@ class Pubmed(object):
 
         result = api.pubmed.details(['30343668','20516418'],return_type='medline')
 
+        #With API(store=path) stored articles are not requested
+        result = api.pubmed.details(ids)
+
+        for record in api.pubmed.details(ids,return_type='medline-stream',
+                                         fields=['PMID','TI','MH']):
+            print(record['TI'])
+
         """
 
         #https://www.ncbi.nlm.nih.gov/books/NBK25499/table/chapter4.T._valid_values_of__retmode_and/?report=objectonly
@@ -580,9 +736,14 @@ class Pubmed(object):
         """
 
         type = None
+        stream = False
         if return_type == 'object':
             fh = models.PubmedArticleSet
             mode = 'xml'
+        elif return_type == 'stream':
+            fh = models.iter_pubmed_articles
+            mode = 'xml'
+            stream = True
         elif return_type == 'asn':
             fh = models.pass_through
             mode = 'asn.1'
@@ -590,12 +751,46 @@ class Pubmed(object):
             fh = models.get_medline
             type = 'medline'
             mode = 'text'
+        elif return_type == 'medline-stream':
+            fh = models.iter_medline
+            type = 'medline'
+            mode = 'text'
+            stream = True
         else:
             fh = models.get_xml
 
-        return self.parent._efetch('pubmed',id_or_ids,fh,mode=mode,type=type)
+        if return_type in ('object','stream'):
+            data_for_response = {'lazy':lazy,'leave_raw':leave_raw,
+                                 'keep_soup':keep_soup}
+        elif return_type in ('medline','medline-stream'):
+            data_for_response = {'fields':fields}
+        else:
+            data_for_response = None
+
+        get_result = lambda ids: self.parent._efetch('pubmed',ids,fh,mode=mode,
+                                   type=type,stream=stream,
+                                   data_for_response=data_for_response,
+                                   start=start,max=max)
+
+        if return_type != 'object' or lazy or keep_soup or \
+                _is_history(id_or_ids):
+            return get_result(id_or_ids)
 
-    def summary(self,id_or_ids,return_type='object'):
+        store = self.parent.store
+        if store is not None:
+            get_result = self._get_store_result(store,leave_raw)
+
+        record_cache = self.parent.record_cache
+        if record_cache is None or leave_raw:
+            return get_result(id_or_ids)
+
+        return self._get_cached_records(id_or_ids,get_result,
+                                        record_cache.get_many,'details',
+                                        record_cache.put_articles,
+                                        models.PubmedArticleSet.from_docs,
+                                        record_cache_module.get_article_pmid)
+
+    def summary(self,id_or_ids,return_type='object',start=None,max=None):
         """
         
         ??? How is summary different than details?
@@ -603,27 +798,43 @@ class Pubmed(object):
 
         Parameters
         ----------
-        id_or_ids : Union[List[str],List[int],str,int]
-            ID or list of IDs to process
+        id_or_ids : Union[List[str],List[int],str,int] or history result
+            ID or list of IDs to process. Alternatively the result of post()
+            or of search(...,use_history=True).
         return_type : str
             - 'object', default
+            - 'table' - esummary_models.SummaryTable, a compact columnar
+                        version of 'object' for large numbers of IDs
             - 'text-xml'
             - 'text-json'
             - 'xml'
             - 'json'
+        start : int
+            Only used with a history result, index of the first record
+        max : int
+            Only used with a history result, # of records to return
 
 
         Examples
         --------
         result = api.pubmed.summary([32022941,31788552])
 
+        post = api.pubmed.post(ids)
+        result = api.pubmed.summary(post,start=0,max=500)
+
         result = api.pubmed.summary([32022941,31788552])
+
+        table = api.pubmed.summary(ids,return_type='table')
+        titles = table.get_column('title')
         """
 
         mode = 'xml'
         if return_type == 'object':
             fh = esummary_models.PubmedSummaryResult
             mode = 'json'
+        elif return_type == 'table':
+            fh = esummary_models.SummaryTable
+            mode = 'json'
         elif return_type == 'text-xml':
             fh = models.pass_through
         elif return_type == 'text-json':
@@ -637,7 +848,72 @@ class Pubmed(object):
         else:
             raise ValueError('Invalid return_type option')
 
-        return self.parent._esummary('pubmed',id_or_ids,fh,mode)
+        get_result = lambda ids: self.parent._esummary('pubmed',ids,fh,mode,
+                                                       start=start,max=max)
+
+        record_cache = self.parent.record_cache
+        if record_cache is None or return_type != 'object' or \
+                _is_history(id_or_ids):
+            return get_result(id_or_ids)
+
+        return self._get_cached_records(id_or_ids,get_result,
+                                        record_cache.get_many,'summary',
+                                        record_cache.put_summaries,
+                                        esummary_models.PubmedSummaryResult.from_docs,
+                                        record_cache_module.get_summary_pmid)
+
+    def _get_store_result(self,store,leave_raw):
+        """
+        Returns get_result for details() which reads articles from the
+        store and adds the requested ones to it.
+
+        The store keeps the XML so articles are always requested with
+        leave_raw, it is dropped once they have been stored.
+
+        See Also
+        --------
+        pubmed.store
+        """
+
+        data_for_response = {'lazy':False,'leave_raw':True,'keep_soup':False}
+        get_result = lambda ids: self.parent._efetch('pubmed',ids,
+                                   models.PubmedArticleSet,mode='xml',
+                                   type=None,data_for_response=data_for_response)
+
+        get_stored = lambda namespace,ids: store.get_many(ids,leave_raw=leave_raw)
+
+        def put_fh(docs):
+            store.put_articles(docs)
+            if not leave_raw:
+                for doc in docs:
+                    doc.raw_xml = None
+
+        return lambda ids: self._get_cached_records(ids,get_result,get_stored,
+                                       'details',put_fh,
+                                       models.PubmedArticleSet.from_docs,
+                                       record_cache_module.get_article_pmid)
+
+    def _get_cached_records(self,id_or_ids,get_result,get_cached,namespace,
+                            put_fh,from_docs,get_pmid):
+        """
+        Returns records from the record cache, only requesting the ones
+        that are missing. The output is in the order of the input IDs.
+
+        See Also
+        --------
+        pubmed.record_cache
+        """
+
+        ids = _get_id_list(id_or_ids)
+        cached = get_cached(namespace,ids)
+        missing = [x for x in dict.fromkeys(ids) if x not in cached]
+
+        if len(missing) == 0:
+            return from_docs([cached[x] for x in dict.fromkeys(ids)])
+
+        result = get_result(missing)
+        put_fh(result.docs)
+        return _combine_cached(ids,cached,result,from_docs,get_pmid)
 
 
 class API(object):
@@ -654,14 +930,37 @@ class API(object):
 
     authentication : 'Authentication'
     query_logger : 'QueryLogger'
+    cache : Optional['cache_module.ResponseCache']
+    record_cache : Optional['record_cache_module.RecordCache']
+    store : Optional['store_module.ArticleStore']
+    retry_policy : Optional['retry_module.RetryPolicy']
+    metrics : 'metrics_module.Metrics' or 'metrics_module.NullMetrics'
+    hooks : 'hooks_module.Hooks'
+    parser : str
+    json_backend : 'json_backend_module.JSONBackend'
     
-    _BASE_URL = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/'    
+    _BASE_URL = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/'
+    _IDCONV_URL = 'https://www.ncbi.nlm.nih.gov/pmc/utils/idconv/v1.0/'
     
     def __init__(self,verbose=False,
                  email:Optional[str]=None,
                  tool:Optional[str]=None,
                  api_key:Optional[str]=None,
-                 rate:Optional[int]=None):
+                 rate:Optional[int]=None,
+                 rate_limiter=None,
+                 adaptive_rate:bool=False,
+                 chunk_size:int=500,
+                 max_workers:Optional[int]=None,
+                 cache=None,
+                 record_cache=None,
+                 store=None,
+                 parser:str='bs4',
+                 json_backend=None,
+                 retry=None,
+                 metrics=None,
+                 hooks=None,
+                 base_url:Optional[str]=None,
+                 idconv_url:Optional[str]=None):
 
         """
 
@@ -673,11 +972,83 @@ class API(object):
         rate : int
             This should really only be passed in when you've negotiated a rate
             with NCBI
+        rate_limiter : str or limiter instance
+            - None or 'thread', shared by all API instances in this process
+            - 'process', shared by all processes on this machine (lock file)
+            See pubmed.rate_limiters
+        adaptive_rate : bool
+            If True the rate is lowered when NCBI throttles us or slows
+            down, and raised back up to 'rate' once things are going well.
+            See rate_limiters.AdaptiveRateController
+        chunk_size : int
+            Maximum # of IDs to send in a single efetch or esummary request.
+            Longer lists are split and requested concurrently.
+        max_workers : int
+            Maximum # of chunks to request at once. Defaults to the rate.
+        cache : bool, str or cache.ResponseCache
+            On-disk cache of responses. Pass True for the default location
+            or a path to the cache file. See pubmed.cache
+        record_cache : bool, str or record_cache.RecordCache
+            Cache of parsed articles and summaries, by PMID. Pass True for
+            an in-memory cache or a path to also keep records on disk.
+            See pubmed.record_cache
+        store : str or store.ArticleStore
+            Local SQLite store of articles, checked by details() after
+            the record cache and before the network. Articles that are
+            requested are added to it. See pubmed.store
+        parser : str
+            XML backend used by the models
+            - 'bs4' : BeautifulSoup, default
+            - 'lxml' : lxml elements wrapped to look like BeautifulSoup tags.
+                       This is much faster. See pubmed.lxml_helpers
+        json_backend : str or json_backend.JSONBackend
+            'orjson', 'msgspec' or 'json'. Defaults to the fastest one
+            installed, with esummary responses decoded by msgspec into
+            typed structs if it is installed. See pubmed.json_backend
+        retry : bool or retry.RetryPolicy
+            Retrying of requests that fail with a 429, a 5xx or a
+            connection error. Retries are on by default, pass False to
+            disable them. See pubmed.retry
+        metrics : bool or metrics.Metrics
+            Counters and timings of the requests, by endpoint. On by
+            default, pass False to disable. See pubmed.metrics
+        hooks : hooks.Hooks
+            Callbacks around each phase of a request, callbacks can also be
+            added later to api.hooks. See pubmed.hooks and pubmed.tracing
+        base_url : str
+            Replaces the E-utilities URL, e.g. to point at a local server.
+            See pubmed.mock_server
+        idconv_url : str
+            Replaces the PMC ID converter URL
         """
 
-        self.authentication = Authentication(email,tool,api_key,rate)
+        self.authentication = Authentication(email,tool,api_key,rate,
+                                             limiter=rate_limiter,
+                                             adaptive=adaptive_rate)
         self.query_logger = QueryLogger()
 
+        self.chunk_size = chunk_size
+        if max_workers is None:
+            max_workers = int(self.authentication.rate)
+        self.max_workers = max_workers
+
+        self.cache = cache_module.get_cache(cache)
+        self.record_cache = record_cache_module.get_record_cache(record_cache)
+        self.store = store_module.get_article_store(store)
+        self.retry_policy = retry_module.get_retry_policy(retry)
+        self.metrics = metrics_module.get_metrics(metrics)
+        self.hooks = hooks_module.get_hooks(hooks)
+
+        if parser not in model_helpers.PARSERS:
+            raise ValueError('Unrecognized parser option: %s' % parser)
+        self.parser = parser
+        self.json_backend = json_backend_module.get_json_backend(json_backend)
+
+        if base_url is not None:
+            self._BASE_URL = base_url
+        if idconv_url is not None:
+            self._IDCONV_URL = idconv_url
+
         self.verbose = verbose
 
         self.session = requests.session()
@@ -692,6 +1063,13 @@ class API(object):
         return display_class(self,
               ['authentication',cld(self.authentication),
               'query_logger',cld(self.query_logger),
+              'cache',cld(self.cache),
+              'record_cache',cld(self.record_cache),
+              'store',cld(self.store),
+              'metrics',cld(self.metrics),
+              'hooks',cld(self.hooks),
+              'parser',quotes(self.parser),
+              'json_backend',quotes(self.json_backend.name),
               'pubmed','Pubmed functions holder',
               'pmc','PMC functions holder',
               'mesh','MESH functions holder'])
@@ -703,7 +1081,8 @@ class API(object):
                       handler,
                       params,
                       data_for_response=None,
-                      key_ok=True):
+                      key_ok=True,
+                      stream=False):
         """
 
         Parameters
@@ -716,6 +1095,11 @@ class API(object):
             The handler gets called with the request passed in
         data : dict
             Parameters that will go into the body or url
+        stream : bool
+            If True the body is not downloaded up front. This is meant for
+            handlers that consume the response incrementally. Note that in
+            this case the logged parse time is not meaningful as the
+            handler returns a generator.
         
         """
         if params is None:
@@ -723,33 +1107,146 @@ class API(object):
 
         params = self.authentication.add_auth(params,key_ok)
 
-        self.authentication.limit_rate()
+        #The events of this request share the id, None if there are no hooks
+        hooks = self.hooks
+        request_id = None
+        if hooks:
+            request_id = hooks.new_request_id()
+            hooks.emit('pre_request',request_id,method,url,
+                       params_size=hooks_module.get_params_size(params))
 
-        #Making the request
+        #Cached response?
         #----------------------------------------------------
-        start_time = time.monotonic()
-        if method == 'POST':
-            response = self.session.request(method,url,data=params)
-        else:
-            response = self.session.request(method,url,params=params)
-        elapsed_time = time.monotonic() - start_time
+        response = None
+        use_cache = self.cache is not None and not stream
+        if use_cache:
+            start_time = time.monotonic()
+            response = self.cache.get(method,url,params)
+            elapsed_time = time.monotonic() - start_time
+            self.query_logger.log_cache_lookup(response is not None)
+            self.metrics.observe_cache(url,response is not None)
+            if request_id is not None:
+                hooks.emit('post_response',request_id,method,url,
+                           cache_hit=response is not None,
+                           elapsed_time=elapsed_time)
+
+        if response is None:
+            try:
+                response, elapsed_time = self._send(method,url,params,stream,
+                                                    request_id)
+            except Exception as e:
+                if request_id is not None:
+                    hooks.emit('post_parse',request_id,method,url,error=e)
+                raise
+
+            if use_cache:
+                self.cache.put(method,url,params,response)
+
         #Logging ...
         #----------------------------------------------------
         self.query_logger.log_query(method,url,params,response,elapsed_time)
 
         #Handle the response
         #--------------------------------------------------------
+        if request_id is not None:
+            hooks.emit('pre_parse',request_id,method,url)
+
         start_time = time.monotonic()
-        if data_for_response is None:
-            output =  handler(self,response)
-        else:
-            output =  handler(self,response,data_for_response)
+        try:
+            if data_for_response is None:
+                output =  handler(self,response)
+            else:
+                output =  handler(self,response,data_for_response)
+        except Exception as e:
+            elapsed_time = time.monotonic() - start_time
+            self.metrics.observe_parse(url,elapsed_time,e)
+            if request_id is not None:
+                hooks.emit('post_parse',request_id,method,url,
+                           elapsed_time=elapsed_time,error=e)
+            raise
         elapsed_time = time.monotonic() - start_time
         self.query_logger.log_parse_time(elapsed_time)
+        self.metrics.observe_parse(url,elapsed_time)
+        if request_id is not None:
+            hooks.emit('post_parse',request_id,method,url,
+                       elapsed_time=elapsed_time,
+                       n_records=hooks_module.get_n_records(output))
 
         return output
 
-    def _db_info(self, db_name=None) -> Union['DbInfo', List[str]]:
+    def _send(self,method,url,params,stream=False,request_id=None):
+        """
+        Makes the request, waiting on the rate limiter before each attempt
+        and retrying as allowed by self.retry_policy.
+
+        request_id is for the hook events, None if there are no hooks.
+
+        Returns
+        -------
+        response : requests.Response
+        elapsed_time : float
+            Duration of the last attempt
+
+        See Also
+        --------
+        pubmed.retry
+        """
+        policy = self.retry_policy
+        metrics = self.metrics
+        attempt = 1
+        while True:
+            wait_time = self.authentication.limit_rate()
+            metrics.observe_wait(url,wait_time)
+            if request_id is not None:
+                self.hooks.emit('rate_limit_wait',request_id,method,url,
+                                attempt=attempt,wait_time=wait_time)
+
+            response = None
+            error = None
+            start_time = time.monotonic()
+            try:
+                if method == 'POST':
+                    response = self.session.request(method,url,data=params,stream=stream)
+                else:
+                    response = self.session.request(method,url,params=params,stream=stream)
+            except requests.exceptions.RequestException as e:
+                error = e
+            elapsed_time = time.monotonic() - start_time
+            self.authentication.log_response(elapsed_time,response,error,
+                                             _get_latency_key(url,params))
+            metrics.observe_request(url,elapsed_time,response,error,stream)
+            if request_id is not None:
+                self.hooks.emit('post_response',request_id,method,url,
+                                attempt=attempt,elapsed_time=elapsed_time,
+                                status=getattr(response,'status_code',None),
+                                n_bytes=_get_n_bytes(response,stream),
+                                error=error)
+
+            if policy is None or not policy.is_retryable(method,url,response,error):
+                if error is not None:
+                    raise error
+                return response, elapsed_time
+
+            if attempt >= policy.get_max_attempts(url):
+                retry_error = errors.RetryError(url,attempt,response,error)
+                metrics.observe_error(url,retry_error)
+                raise retry_error from error
+
+            delay = policy.get_delay(attempt,response)
+            self.query_logger.log_retry(delay)
+            metrics.observe_retry(url)
+            if response is not None:
+                response.close()
+
+            if policy.should_penalize(response):
+                #limit_rate() then does the waiting, for all users of the limiter
+                self.authentication.limiter.penalize(delay)
+            else:
+                time.sleep(delay)
+
+            attempt += 1
+
+    def _db_info(self, db_name=None, leave_raw=False) -> Union['DbInfo', List[str]]:
         """
 
         List of databases with descriptions at:
@@ -764,6 +1261,8 @@ class API(object):
         ----------
         db_name : string
             Name of the DB to retrieve
+        leave_raw : bool
+            See einfo_models.parse_db_info
 
         Examples
         --------
@@ -773,19 +1272,19 @@ class API(object):
         -------
         Union['DbInfo', List[str]]
         """
-        url = self.parent._BASE_URL + 'einfo.fcgi'
+        url = self._BASE_URL + 'einfo.fcgi'
 
         if db_name is None:
             params = {'retmode': 'json'}
-            response = self.parent._make_request('GET', url, models.pass_through,
-                                          params=params)
-            return sorted(response['einforesult']['dblist'])
+            return self._make_request('GET', url, einfo_models.get_db_list,
+                                      params=params)
         else:
             params = {'retmode': 'xml', 'db': db_name}
 
-        return self.parent._make_request('GET', url,
-                                         einfo_models.parse_db_info,
-                                        params=params)
+        return self._make_request('GET', url,
+                                  einfo_models.parse_db_info,
+                                  params=params,
+                                  data_for_response={'leave_raw':leave_raw})
 
     #---- ELink ---------
     def _elink(self,function_handle,id_or_ids,db=None,cmd=None,dbfrom=None,mode='json'):
@@ -818,7 +1317,8 @@ class API(object):
                 function_handle,
                 mode='xml',
                 start=None,
-                max=None):
+                max=None,
+                use_history=False):
         """
         Function documentation at:
         http://www.ncbi.nlm.nih.gov/books/NBK25499/#chapter4.ESearch
@@ -836,6 +1336,8 @@ class API(object):
         mode :
             - 'xml'
             - 'json'
+        use_history : bool
+            If true the results are stored on the history server
 
 
 
@@ -855,19 +1357,49 @@ class API(object):
                   'retstart':start,
                   'retmax':max}
 
+        if use_history:
+            params['usehistory'] = 'y'
+
         return self._make_request('GET',url,function_handle,params=params)
     
     #---- EPost -------
-    
-    #https://www.ncbi.nlm.nih.gov/books/NBK25499/#chapter4.EPost
-    #Not yet implemented
+    def _epost(self,db_name,id_or_ids,web_env=None):
+        """
+        https://www.ncbi.nlm.nih.gov/books/NBK25499/#chapter4.EPost
+
+        Uploads a list of IDs to the history server.
+
+        Parameters
+        ----------
+        web_env : str
+            Existing history session to add the IDs to
+
+        See Also
+        --------
+        Pubmed.post
+        """
+
+        ids = _get_id_list(id_or_ids)
+
+        params = {'db':db_name,
+                  'id':','.join(ids)}
+
+        if web_env is not None:
+            params['WebEnv'] = web_env
+
+        url = self._BASE_URL + 'epost.fcgi'
+
+        return self._make_request('POST',url,epost_models.EPostResult,params,
+                                  data_for_response={'count':len(ids)})
 
     #---- ESummary ----------
     def _esummary(self,
                     db_name,
                     id_or_ids:Union[List[int],List[str],int,str],
                     function_handle,
-                    mode='xml')\
+                    mode='xml',
+                    start=None,
+                    max=None)\
         ->models.SummaryResult:
         """
         https://www.ncbi.nlm.nih.gov/books/NBK25499/#chapter4.ESummary
@@ -887,16 +1419,14 @@ class API(object):
         # unique to each Entrez database and that often contains
         # more data than the default DocSum XML.
 
-        ids = _get_id_str(id_or_ids)
-        
         params = {'retmode':'json',
                    'db':db_name,
-                   'id':ids,
                   'retmode':mode}
 
         url = self._BASE_URL + 'esummary.fcgi'
 
-        return self._make_request('POST',url,function_handle,params)
+        return self._request_ids('POST',url,function_handle,params,id_or_ids,
+                                 start=start,max=max)
 
 
     def _efetch(self,
@@ -904,7 +1434,11 @@ class API(object):
                  id_or_ids,
                  function_handle,
                  type='',
-                 mode='xml'):
+                 mode='xml',
+                 stream=False,
+                 data_for_response=None,
+                 start=None,
+                 max=None):
         """
         Function documentation at:
         http://www.ncbi.nlm.nih.gov/books/NBK25499/#chapter4.EFetch
@@ -921,19 +1455,94 @@ class API(object):
         #    https://www.ncbi.nlm.nih.gov/books/NBK25499/table/chapter4.T._valid_values_of__retmode_and/?report=objectonly
 
 
-        if isinstance(id_or_ids,list):
-            id_string = ','.join(id_or_ids)
-        else:
-            id_string = id_or_ids
-        
         params = {'db':db_name,
-                   'id':id_string,
                    'rettype':type,
                    'retmode':mode}
 
         url = self._BASE_URL + 'efetch.cgi'  
 
-        return self._make_request('POST',url,function_handle,params)
+        return self._request_ids('POST',url,function_handle,params,id_or_ids,
+                                 data_for_response=data_for_response,
+                                 stream=stream,
+                                 start=start,
+                                 max=max)
+
+    #---- ID chunking -------
+    def _request_ids(self,
+                     method,
+                     url,
+                     handler,
+                     params,
+                     id_or_ids,
+                     data_for_response=None,
+                     stream=False,
+                     start=None,
+                     max=None):
+        """
+        Makes a request for a set of IDs, splitting the IDs into chunks
+        of self.chunk_size when the handler's output can be merged.
+
+        If id_or_ids is a history result (has 'web_env' and 'query_key')
+        then the IDs are taken from the history server instead, with start
+        and max selecting which records to return.
+
+        Chunks are requested concurrently (subject to the rate limiter) and
+        merged back into a single result, in the original order. If some
+        of the chunks fail the merged result has a 'chunk_errors' attribute
+        listing the failed IDs. If every chunk fails the first error is
+        raised.
+
+        See Also
+        --------
+        _fan_out
+        """
+
+        if _is_history(id_or_ids):
+            params['WebEnv'] = id_or_ids.web_env
+            params['query_key'] = id_or_ids.query_key
+            params['retstart'] = start
+            params['retmax'] = max
+            return self._make_request(method,url,handler,params,
+                                      data_for_response=data_for_response,
+                                      stream=stream)
+
+        ids = _get_id_list(id_or_ids)
+        merge_fh = _MERGE_FUNCTIONS.get(handler)
+
+        if merge_fh is None or stream or len(ids) <= self.chunk_size:
+            params['id'] = ','.join(ids)
+            return self._make_request(method,url,handler,params,
+                                      data_for_response=data_for_response,
+                                      stream=stream)
+
+        n = self.chunk_size
+        chunks = [ids[i:i+n] for i in range(0,len(ids),n)]
+
+        return self._fan_out(method,url,handler,params,chunks,merge_fh,
+                             data_for_response)
+
+    def _fan_out(self,method,url,handler,params,chunks,merge_fh,
+                 data_for_response):
+
+        def get_chunk(chunk):
+            #Copy as params get modified in _make_request
+            chunk_params = dict(params)
+            chunk_params['id'] = ','.join(chunk)
+            return self._make_request(method,url,handler,chunk_params,
+                                      data_for_response=data_for_response)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(get_chunk,x) for x in chunks]
+
+            results = []
+            chunk_errors = []
+            for chunk, future in zip(chunks,futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    chunk_errors.append(errors.ChunkError(chunk,e))
+
+        return _merge_chunks(results,chunk_errors,merge_fh)
     
     #ID Convertor ---------------------------
     def _id_convertor(self,id_or_ids,function_handle,id_type='pmid'):
@@ -943,8 +1552,6 @@ class API(object):
 
         #todo: ask about api support
 
-        URL = ' https://www.ncbi.nlm.nih.gov/pmc/utils/idconv/v1.0/'
-
         #Validvaluesare "pmcid", "pmid", "mid", and "doi"
         #idtype = pmcid
 
@@ -957,7 +1564,7 @@ class API(object):
 
         ids2 = ids.split(',')
 
-        return self._make_request('POST', URL, function_handle,
+        return self._make_request('POST', self._IDCONV_URL, function_handle,
                                   params, key_ok=False, data_for_response=ids2)
 
 
@@ -1056,18 +1663,27 @@ class Authentication(object):
 
     """
     TODO: Link to authentication in docs
+
+    Attributes
+    ----------
+    rate : int
+        Requests per second
+    limiter : 
+        See pubmed.rate_limiters. If the rate is adaptive this is an
+        AdaptiveLimiter that wraps the shared limiter.
+    rate_controller : rate_limiters.AdaptiveRateController or None
+        Present if the rate is adaptive, 'rate' is then the maximum rate
     """
 
-    __slots__ = ['email','tool','api_key','rate','last_request_time']
+    __slots__ = ['email','tool','api_key','rate','limiter','rate_controller']
 
     email : Optional[str]
     tool : Optional[str]
     api_key : Optional[str]
     rate : int
-    last_request_time : float
 
 
-    def __init__(self,email,tool,api_key,rate):
+    def __init__(self,email,tool,api_key,rate,limiter=None,adaptive=False):
 
 
         self.email = email
@@ -1076,7 +1692,6 @@ class Authentication(object):
 
         #I'm putting these two in here for now :/
         self.rate = rate
-        self.last_request_time = 0.0
 
         if self.email is None:
             if config.email is not None:
@@ -1094,6 +1709,16 @@ class Authentication(object):
             else:
                 self.rate = 3
 
+        self.limiter = rate_limiters.get_limiter(limiter,self.rate,self.api_key)
+
+        if adaptive:
+            #The controller only sets the rate of this instance
+            self.limiter = rate_limiters.AdaptiveLimiter(self.limiter,self.rate)
+            self.rate_controller = rate_limiters.AdaptiveRateController(
+                                                self.limiter,self.rate)
+        else:
+            self.rate_controller = None
+
     def add_auth(self,params,key_ok):
         # Authentication
         # -------------------------------------------------
@@ -1105,28 +1730,48 @@ class Authentication(object):
 
         return params
 
-    def limit_rate(self):
-        dt = time.monotonic() - self.last_request_time
-        min_dt = 1/self.rate
-        if dt < min_dt:
-            wait_time = min_dt-dt
-            time.sleep(wait_time)
-        self.last_request_time = time.monotonic()
+    def limit_rate(self)->float:
+        """
+        Blocks until we are allowed to make another request.
+
+        Returns
+        -------
+        wait_time : float
+            Time spent waiting, in seconds
+        """
+        return self.limiter.acquire()
+
+    def log_response(self,elapsed_time,response,error=None,key=None):
+        """
+        Passes the outcome of a request to the rate controller, if any.
+
+        key : see _get_latency_key
+        """
+        if self.rate_controller is not None:
+            status = None if response is None else response.status_code
+            self.rate_controller.on_response(elapsed_time,status,error,key)
 
     def __repr__(self):
         return display_class(self,
                          ['email', quotes(self.email),
                           'tool', quotes(self.tool),
                           'api_key', quotes(self.api_key),
-                          'rate', self.rate])
+                          'rate', self.rate,
+                          'limiter', cld(self.limiter),
+                          'rate_controller', cld(self.rate_controller)])
 
 class QueryLogger(object):
 
     __slots__ = ['method','url','params','response','prepped_params',
-                 'request_duration','parse_time','next_index','request_count']
+                 'request_duration','parse_time','next_index','request_count',
+                 'cache_hits','cache_misses','retry_count','retry_wait']
 
     def __init__(self):
         self.request_count = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.retry_count = 0
+        self.retry_wait = 0
         self.next_index = 0
         self.parse_time = [0 for x in range(5)]
         self.request_duration = [0 for x in range(5)]
@@ -1146,14 +1791,23 @@ class QueryLogger(object):
             r = re.search('\?', partial_url)
             self.prepped_params = partial_url[r.start()+1:]
 
+    def log_cache_lookup(self,hit:bool):
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+    def log_retry(self,delay):
+        self.retry_count += 1
+        self.retry_wait += delay
+
     def log_parse_time(self,elapsed_time):
         #
         self.parse_time[self.next_index] = elapsed_time
 
-        #Could simplify ...
-        self.next_index += 1
-        if self.next_index == len(self.request_duration):
-            self.next_index = 0
+        #Note, with concurrent requests the index may be off but it
+        #always stays valid
+        self.next_index = (self.next_index + 1) % len(self.request_duration)
 
 
     def __repr__(self):
@@ -1164,7 +1818,11 @@ class QueryLogger(object):
                           'response', cld(self.response),
                           'prepped_params', td(self.prepped_params),
                           'request_duration',self.request_duration,
-                          'parse_time',self.parse_time])
+                          'parse_time',self.parse_time,
+                          'cache_hits',self.cache_hits,
+                          'cache_misses',self.cache_misses,
+                          'retry_count',self.retry_count,
+                          'retry_wait',self.retry_wait])
                 
 class Links(object):
     
@@ -1218,6 +1876,142 @@ class Links(object):
               'db_list','Return a list of available databases']
         return utils.property_values_to_string(pv)
 
+def _get_doi_query(doi_or_dois):
+    """
+    Returns
+    -------
+    query : str
+    is_list : bool
+    """
+    if isinstance(doi_or_dois,list):
+        is_list = True
+        temp = [x + '[DOI]' for x in doi_or_dois]
+        query = " OR ".join(temp)
+        # 10.1242/jeb.154609[DOI] OR 10.1038/s41467-018-03561-w[DOI]
+    else:
+        query = doi_or_dois + '[DOI]'
+        is_list = False
+
+    return query, is_list
+
+def _map_dois_to_pmids(dois,summary_result):
+    """
+    Parameters
+    ----------
+    dois : List[str]
+    summary_result : esummary_models.PubmedSummaryResult
+        Summary of the PMIDs returned from searching for the DOIs
+    """
+    d = {}
+    for temp, temp_id in zip(summary_result.docs, summary_result.ids):
+        doi_field = temp.elocation_id
+        # 'doi: 10.1002/biot.201400046'
+        if doi_field.startswith('doi: '):
+            doi = doi_field[5:]
+            d[doi] = temp_id
+
+    return [d.get(x) for x in dois]
+
+#Search results past this cannot be requested from ESearch
+ESEARCH_MAX_RESULTS = 9999
+
+def _parse_pdat(value:str)->date:
+    return datetime.strptime(value,'%Y/%m/%d').date()
+
+def _get_pdat_query(query,min_date:date,max_date:date)->str:
+    return '(%s) AND ("%s"[PDAT] : "%s"[PDAT])' % (query,
+                                                  min_date.strftime('%Y/%m/%d'),
+                                                  max_date.strftime('%Y/%m/%d'))
+
+def _prefetch_pages(get_page,query,count,page_size):
+    """
+    Yields each page of results while the next page is being requested.
+
+    Parameters
+    ----------
+    get_page : function handle
+        Called as get_page(query,start,max)
+    """
+
+    starts = list(range(0,count,page_size))
+    if len(starts) == 0:
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(get_page,query,0,min(page_size,count))
+        for i, start in enumerate(starts):
+            page = future.result()
+            if i + 1 < len(starts):
+                next_start = starts[i+1]
+                future = executor.submit(get_page,query,next_start,
+                                         min(page_size,count-next_start))
+            yield page
+
+def _get_latency_key(url,params)->str:
+    """
+    Groups requests that should take about as long for the adaptive rate
+    controller, by endpoint and by the # of IDs rounded to a power of 2,
+    e.g. 'efetch.fcgi/9' for 256 to 511 IDs
+    """
+    n_ids = 0
+    if params:
+        ids = params.get('id')
+        if ids:
+            n_ids = str(ids).count(',') + 1
+        elif params.get('retmax'):
+            #history requests
+            n_ids = int(params['retmax'])
+    return '%s/%d' % (cache_module.get_endpoint(url),n_ids.bit_length())
+
+def _get_n_bytes(response,stream)->Optional[int]:
+    if response is None or stream:
+        return None
+    return len(response.content)
+
+def _is_history(id_or_ids)->bool:
+    #e.g. EPostResult or a search result from search(...,use_history=True)
+    return getattr(id_or_ids,'web_env',None) is not None and \
+        getattr(id_or_ids,'query_key',None) is not None
+
+def _get_id_list(id_or_ids)->List[str]:
+
+    if isinstance(id_or_ids, list):
+        return [str(x) for x in id_or_ids]
+    elif isinstance(id_or_ids, int):
+        return [str(id_or_ids)]
+    else:
+        #Note, a comma separated string is allowed
+        return id_or_ids.split(',')
+
+def _combine_cached(ids,cached,result,from_docs,get_pmid):
+    #Puts cached and requested records in the order of the IDs
+    #
+    #   IDs that aren't in either (e.g. invalid) are skipped
+    requested = {get_pmid(x):x for x in result.docs}
+    docs = []
+    for pmid in dict.fromkeys(ids):
+        doc = cached.get(pmid)
+        if doc is None:
+            doc = requested.get(pmid)
+        if doc is not None:
+            docs.append(doc)
+    return from_docs(docs,result)
+
+def _merge_chunks(results,chunk_errors,merge_fh):
+
+    if len(results) == 0:
+        raise chunk_errors[0].error
+
+    return merge_fh(results,chunk_errors)
+
+#Handlers whose output can be merged across chunks of IDs
+#
+#   Only these handlers get split into multiple requests
+_MERGE_FUNCTIONS = {
+    models.PubmedArticleSet: models.PubmedArticleSet.merge,
+    esummary_models.PubmedSummaryResult: esummary_models.PubmedSummaryResult.merge,
+    esummary_models.SummaryTable: esummary_models.SummaryTable.merge}
+
 def _get_id_str(id_or_ids):
 
     if isinstance(id_or_ids, list):
@@ -0,0 +1,582 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar export of articles to Arrow record batches and Parquet files.
+
+Usage
+-----
+result = api.pubmed.details(ids)
+table = result.to_arrow()             #pyarrow.Table
+
+#Incremental, memory stays flat with a stream of articles
+articles = api.pubmed.details(ids,return_type='stream')
+n_rows = write_parquet(articles,'articles.parquet')
+
+#Appending the results of multiple requests to one file
+with ParquetArticleWriter('articles.parquet') as writer:
+    for chunk in chunks:
+        writer.write(api.pubmed.details(chunk,return_type='stream'))
+
+for batch in iter_record_batches(articles,batch_size=5000):
+    ...
+
+Values are appended to one Python list per column (and per nested field)
+and converted to Arrow arrays once per batch. The nested columns (authors,
+mesh_headings, keywords, grants, references, ...) are list<struct> arrays
+built from their child arrays and offsets, so no per row dicts are
+created. Lists that are missing from the XML are empty rather than null.
+
+Only PubmedArticle records are exported, PubmedBookArticle and
+DeleteCitation records in the input are skipped.
+
+The pyarrow package is required, it is imported when first needed.
+
+See Also
+--------
+get_schema : the columns
+"""
+
+#Standard Library
+from datetime import date
+from typing import Optional, Iterable, Union, List
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pyarrow
+    from .models import PubmedArticle, PubmedArticleSet
+
+#Local
+from .utils import display_class
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('pyarrow is required for exporting to Arrow/Parquet')
+    return pyarrow
+
+#Arrow type of each kind of scalar column
+_TYPES = {
+    'string': lambda pa: pa.string(),
+    'bool': lambda pa: pa.bool_(),
+    'int': lambda pa: pa.int32(),
+    'date': lambda pa: pa.date32(),
+    }
+
+#==========================================================
+#                   Column Builders
+#==========================================================
+
+class _StringListColumn(object):
+
+    """
+    list<string>
+    """
+
+    __slots__ = ['values','offsets']
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.values = []
+        self.offsets = [0]
+
+    def append(self, values:Optional[List[str]]):
+        if values:
+            self.values.extend(values)
+        self.offsets.append(len(self.values))
+
+    def get_type(self, pa):
+        return pa.list_(pa.string())
+
+    def to_array(self, pa):
+        return pa.ListArray.from_arrays(pa.array(self.offsets,pa.int32()),
+                                        pa.array(self.values,pa.string()))
+
+
+class _StructListColumn(object):
+
+    """
+    list<struct>, each field is a scalar kind (see _TYPES) or another column
+    builder.
+    """
+
+    __slots__ = ['names','kinds','values','offsets','n_items']
+
+    def __init__(self, fields):
+        """
+
+        Parameters
+        ----------
+        fields : list
+            [(name, kind)] where kind is a key of _TYPES, _StringListColumn
+            or _StructListColumn
+        """
+        self.names = [x[0] for x in fields]
+        self.kinds = [x[1] for x in fields]
+        self.reset()
+
+    def reset(self):
+        self.values = []
+        for kind in self.kinds:
+            if isinstance(kind,str):
+                self.values.append([])
+            else:
+                kind.reset()
+                self.values.append(kind)
+        self.offsets = [0]
+        self.n_items = 0
+
+    def append(self, items:Optional[List[tuple]]):
+        """
+
+        Parameters
+        ----------
+        items : list of tuples or None
+            One tuple per item, with a value for each field. For nested
+            columns the value is passed to its append()
+        """
+        if items:
+            #Lists for scalar fields, column builders otherwise
+            values = self.values
+            for item in items:
+                for field_values, value in zip(values,item):
+                    field_values.append(value)
+            self.n_items += len(items)
+        self.offsets.append(self.n_items)
+
+    def get_type(self, pa):
+        return pa.list_(pa.struct(self._get_fields(pa)))
+
+    def _get_fields(self, pa):
+        fields = []
+        for name, kind in zip(self.names,self.kinds):
+            if isinstance(kind,str):
+                fields.append(pa.field(name,_TYPES[kind](pa)))
+            else:
+                fields.append(pa.field(name,kind.get_type(pa)))
+        return fields
+
+    def to_array(self, pa):
+        arrays = []
+        for kind, values in zip(self.kinds,self.values):
+            if isinstance(kind,str):
+                arrays.append(pa.array(values,_TYPES[kind](pa)))
+            else:
+                arrays.append(values.to_array(pa))
+        struct = pa.StructArray.from_arrays(arrays,fields=self._get_fields(pa))
+        return pa.ListArray.from_arrays(pa.array(self.offsets,pa.int32()),struct)
+
+#==========================================================
+#                   Article Columns
+#==========================================================
+
+def _date(value)->Optional[date]:
+    #DateCompleted and DateRevised, the month is numeric
+    if value is None:
+        return None
+    try:
+        return date(int(value.year),int(value.month),int(value.day))
+    except (TypeError,ValueError):
+        return None
+
+def _int(value)->Optional[int]:
+    try:
+        return int(value)
+    except (TypeError,ValueError):
+        return None
+
+def _names(values)->Optional[List[str]]:
+    if values is None:
+        return None
+    return [x.value for x in values]
+
+def _get_authors(authors):
+    if not authors:
+        return None
+    return [(x.last_name,x.fore_name,x.initials,x.suffix,x.collective_name,
+             x.is_valid,x.equal_contrib,
+             [(y.source,y.value) for y in x.identifiers or ()],
+             _names(x.affiliations)) for x in authors]
+
+def _get_mesh_headings(mesh_headings):
+    if not mesh_headings:
+        return None
+    return [(x.name,x.ui,x.is_major == 'Y',
+             [(y.name,y.ui,y.is_major == 'Y') for y in x.qualifiers or ()])
+            for x in mesh_headings]
+
+def _get_keywords(keyword_lists):
+    if not keyword_lists:
+        return None
+    return [(x.value,x.is_major,keyword_list.owner)
+            for keyword_list in keyword_lists
+            for x in keyword_list.keywords or ()]
+
+def _get_grants(grants):
+    if not grants:
+        return None
+    return [(x.grant_id,x.acronym,x.agency,x.country) for x in grants]
+
+def _iter_references(ref_lists):
+    #Reference lists can be nested
+    for ref_list in ref_lists or ():
+        yield from ref_list.references or ()
+        yield from _iter_references(ref_list.ref_lists)
+
+def _get_references(pubmed_data):
+    if pubmed_data is None:
+        return None
+    output = []
+    for x in _iter_references(pubmed_data.ref_lists):
+        article_ids = x.article_ids or ()
+        pmid = None
+        for y in article_ids:
+            if y.type == 'pubmed':
+                pmid = y.value
+                break
+        output.append((x.citation,pmid,[(y.type,y.value) for y in article_ids]))
+    return output
+
+def _make_columns()->dict:
+    """
+    Column name => kind (see _TYPES) or column builder, in schema order
+    """
+    return {
+        'pmid': 'string',
+        'date_completed': 'date',
+        'date_revised': 'date',
+        'title': 'string',
+        'vernacular_title': 'string',
+        'abstracts': _StringListColumn(),
+        'abstract_copyright_info': 'string',
+        'journal_title': 'string',
+        'journal_iso_abbreviation': 'string',
+        'print_issn': 'string',
+        'electronic_issn': 'string',
+        'volume': 'string',
+        'issue': 'string',
+        'pub_year': 'string',
+        'pub_month': 'string',
+        'pub_day': 'string',
+        'pub_season': 'string',
+        'pub_medline_date': 'string',
+        'medline_pgn': 'string',
+        'medline_ta': 'string',
+        'nlm_unique_id': 'string',
+        'journal_country': 'string',
+        'languages': _StringListColumn(),
+        'pub_types': _StringListColumn(),
+        'citation_subsets': _StringListColumn(),
+        'n_references': 'int',
+        'coi_statement': 'string',
+        'doi': 'string',
+        'pii': 'string',
+        'pmc': 'string',
+        'publication_status': 'string',
+        'authors': _StructListColumn([
+            ('last_name','string'),
+            ('fore_name','string'),
+            ('initials','string'),
+            ('suffix','string'),
+            ('collective_name','string'),
+            ('is_valid','bool'),
+            ('equal_contrib','bool'),
+            ('identifiers',_StructListColumn([('source','string'),
+                                              ('value','string')])),
+            ('affiliations',_StringListColumn())]),
+        'mesh_headings': _StructListColumn([
+            ('name','string'),
+            ('ui','string'),
+            ('is_major','bool'),
+            ('qualifiers',_StructListColumn([('name','string'),
+                                             ('ui','string'),
+                                             ('is_major','bool')]))]),
+        'keywords': _StructListColumn([
+            ('value','string'),
+            ('is_major','bool'),
+            ('owner','string')]),
+        'chemicals': _StructListColumn([
+            ('registry_number','string'),
+            ('substance_name','string'),
+            ('ui','string')]),
+        'grants': _StructListColumn([
+            ('grant_id','string'),
+            ('acronym','string'),
+            ('agency','string'),
+            ('country','string')]),
+        'references': _StructListColumn([
+            ('citation','string'),
+            ('pmid','string'),
+            ('article_ids',_StructListColumn([('type','string'),
+                                              ('value','string')]))]),
+        }
+
+def _get_row(doc:'PubmedArticle')->tuple:
+    #Values in the order of _make_columns()
+    citation = doc.citation
+    article = citation.article
+    journal = article.journal
+    journal_issue = journal.issue
+    pub_date = journal_issue.pub_date
+    journal_info = citation.journal_info
+    pagination = article.pagination
+    pubmed_data = doc.pubmed_data
+
+    if pubmed_data is None:
+        doi = article.doi
+        pii = article.pii
+        pmc = None
+        publication_status = None
+    else:
+        doi = pubmed_data.doi or article.doi
+        pii = pubmed_data.pii or article.pii
+        pmc = pubmed_data.pmc
+        publication_status = pubmed_data.publication_status
+
+    return (citation.pmid,
+            _date(citation.date_completed),
+            _date(citation.date_revised),
+            article.title,
+            article.vernacular_title,
+            article.abstracts,
+            article.abstract_copyright_info,
+            journal.title,
+            journal.iso_abbreviation,
+            journal.print_issn,
+            journal.electronic_issn,
+            journal_issue.volume,
+            journal_issue.issue,
+            pub_date.year,
+            pub_date.month,
+            pub_date.day,
+            pub_date.season,
+            pub_date.date,
+            None if pagination is None else pagination.medline_pgn,
+            journal_info.medline_ta,
+            journal_info.nlm_unique_id,
+            journal_info.country,
+            article.languages,
+            _names(article.pub_types),
+            citation.citation_subsets,
+            _int(citation.n_references),
+            citation.coi_statement,
+            doi,
+            pii,
+            pmc,
+            publication_status,
+            _get_authors(article.authors),
+            _get_mesh_headings(citation.mesh_headings),
+            _get_keywords(citation.keyword_lists),
+            [(x.registry_number,x.substance_name,x.ui)
+             for x in citation.chemicals or ()],
+            _get_grants(article.grants),
+            _get_references(pubmed_data))
+
+#==========================================================
+#                   Builder
+#==========================================================
+
+class ArticleTableBuilder(object):
+
+    """
+    Accumulates articles column by column and converts them to a
+    pyarrow.RecordBatch.
+
+    Attributes
+    ----------
+    columns : dict
+        name => list of values (scalar columns) or column builder
+    n_rows : int
+        # of rows since the last flush()
+    """
+
+    __slots__ = ['columns','names','n_rows','pa','schema']
+
+    def __init__(self):
+        self.pa = _import_pyarrow()
+        columns = _make_columns()
+        self.names = list(columns)
+        self.columns = {}
+        for name, kind in columns.items():
+            self.columns[name] = [] if isinstance(kind,str) else kind
+        self.schema = _get_schema(self.pa,columns)
+        self.n_rows = 0
+
+    def append(self, doc:'PubmedArticle'):
+        columns = self.columns
+        for name, value in zip(self.names,_get_row(doc)):
+            columns[name].append(value)
+        self.n_rows += 1
+
+    def extend(self, docs:Iterable['PubmedArticle']):
+        for doc in _get_docs(docs):
+            self.append(doc)
+
+    def flush(self)->'pyarrow.RecordBatch':
+        """
+        Returns the rows appended so far as a record batch and clears the
+        builder.
+        """
+        pa = self.pa
+        arrays = []
+        for field in self.schema:
+            values = self.columns[field.name]
+            if isinstance(values,list):
+                arrays.append(pa.array(values,field.type))
+                self.columns[field.name] = []
+            else:
+                arrays.append(values.to_array(pa))
+                values.reset()
+        self.n_rows = 0
+        return pa.RecordBatch.from_arrays(arrays,schema=self.schema)
+
+    def __len__(self):
+        return self.n_rows
+
+    def __repr__(self):
+        return display_class(self,
+                             ['n_columns', len(self.names),
+                              'n_rows', self.n_rows,
+                              'methods', '-----------------------',
+                              'append', '(doc)',
+                              'extend', '(docs)',
+                              'flush', '() => pyarrow.RecordBatch'])
+
+def _get_schema(pa,columns:dict)->'pyarrow.Schema':
+    fields = []
+    for name, kind in columns.items():
+        if isinstance(kind,str):
+            fields.append(pa.field(name,_TYPES[kind](pa)))
+        else:
+            fields.append(pa.field(name,kind.get_type(pa)))
+    return pa.schema(fields)
+
+def get_schema()->'pyarrow.Schema':
+    """
+    Returns the schema of the record batches
+    """
+    return _get_schema(_import_pyarrow(),_make_columns())
+
+def _get_docs(articles):
+    #PubmedArticleSet or an iterable of records. Book articles and deletions
+    #(e.g. from the update files) don't fit the schema and are skipped
+    from .models import PubmedArticle
+    for doc in getattr(articles,'docs',articles):
+        if isinstance(doc,PubmedArticle):
+            yield doc
+
+def iter_record_batches(articles:Union['PubmedArticleSet',Iterable['PubmedArticle']],
+                        batch_size:int=10000):
+    """
+    Yields pyarrow.RecordBatch of up to batch_size rows.
+
+    Parameters
+    ----------
+    articles : PubmedArticleSet or iterable of PubmedArticle
+        e.g. the generator returned by details(ids,return_type='stream')
+    """
+    builder = ArticleTableBuilder()
+    for doc in _get_docs(articles):
+        builder.append(doc)
+        if builder.n_rows >= batch_size:
+            yield builder.flush()
+    if builder.n_rows:
+        yield builder.flush()
+
+def to_table(articles:Union['PubmedArticleSet',Iterable['PubmedArticle']],
+             batch_size:int=10000)->'pyarrow.Table':
+    """
+    Returns a pyarrow.Table of the articles
+    """
+    pa = _import_pyarrow()
+    return pa.Table.from_batches(list(iter_record_batches(articles,batch_size)),
+                                 schema=get_schema())
+
+class ParquetArticleWriter(object):
+
+    """
+    Writes articles to a Parquet file, one row group per batch.
+
+    Attributes
+    ----------
+    path : str
+    n_rows : int
+        # of rows written
+    """
+
+    __slots__ = ['path','writer','builder','batch_size','n_rows']
+
+    def __init__(self, path:str, batch_size:int=10000, compression='zstd',
+                 **kwargs):
+        """
+
+        Parameters
+        ----------
+        batch_size : int
+            # of rows in each row group
+        compression : str
+        kwargs :
+            Passed to pyarrow.parquet.ParquetWriter
+        """
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.batch_size = batch_size
+        self.builder = ArticleTableBuilder()
+        self.writer = pq.ParquetWriter(path,self.builder.schema,
+                                       compression=compression,**kwargs)
+        self.n_rows = 0
+
+    def write(self, articles:Union['PubmedArticleSet',Iterable['PubmedArticle']]):
+        builder = self.builder
+        for doc in _get_docs(articles):
+            builder.append(doc)
+            if builder.n_rows >= self.batch_size:
+                self._write_batch()
+
+    def _write_batch(self):
+        n_rows = self.builder.n_rows
+        self.writer.write_batch(self.builder.flush())
+        self.n_rows += n_rows
+
+    def close(self):
+        """
+        Writes any remaining rows and closes the file
+        """
+        if self.writer is None:
+            return
+        if self.builder.n_rows:
+            self._write_batch()
+        self.writer.close()
+        self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        return display_class(self,
+                             ['path', self.path,
+                              'batch_size', self.batch_size,
+                              'n_rows', self.n_rows,
+                              'methods', '-----------------------',
+                              'write', '(articles)',
+                              'close', '()'])
+
+def write_parquet(articles:Union['PubmedArticleSet',Iterable['PubmedArticle']],
+                  path:str, batch_size:int=10000, compression='zstd',
+                  **kwargs)->int:
+    """
+    Writes the articles to a Parquet file, batch by batch. Returns the # of
+    rows written.
+
+    See Also
+    --------
+    ParquetArticleWriter
+    """
+    with ParquetArticleWriter(path,batch_size,compression,**kwargs) as writer:
+        writer.write(articles)
+    return writer.n_rows
@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio version of the API.
+
+from pubmed import AsyncAPI
+
+async def main():
+    async with AsyncAPI() as api:
+        result = await api.pubmed.search('Grill WM',max=100)
+        summaries = await api.pubmed.summary(result.ids)
+
+The methods and handlers are shared with pubmed.api. The difference is that
+AsyncAPI._make_request is a coroutine, so methods such as Pubmed.search which
+return the result of _make_request become awaitable. Methods which do
+additional processing on the result of a request are overridden below.
+
+Requests and parsing are run in a thread pool so that multiple requests can
+be in flight while previous responses are being parsed. The rate limiter
+reserves a slot synchronously and then awaits the wait time.
+
+"""
+
+#Standard Library
+import asyncio
+import functools
+import time
+import warnings
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+#Third Party
+import requests
+
+#Local
+from . import errors
+from . import hooks as hooks_module
+from . import rate_limiters
+from .api import API, Pubmed, PMC, MESH
+from .api import _get_doi_query, _map_dois_to_pmids, _merge_chunks
+from .api import _get_id_list, _combine_cached, _get_n_bytes
+from .api import _get_latency_key
+from .api import ESEARCH_MAX_RESULTS, _parse_pdat, _get_pdat_query
+from .utils import display_class
+from .utils import get_list_class_display as cld
+
+
+class AsyncMESH(MESH):
+    pass
+
+class AsyncPMC(PMC):
+    pass
+
+class AsyncPubmed(Pubmed):
+
+    """
+    Accessible as: api.pubmed
+
+    All methods are awaitable.
+    """
+
+    async def doi_to_pmid(self, doi_or_dois):
+        """
+        See Pubmed.doi_to_pmid
+        """
+
+        query, is_list = _get_doi_query(doi_or_dois)
+        temp = await self.search(query)
+
+        if is_list:
+            ids = temp.ids
+            if len(ids) == 0:
+                return [None for x in doi_or_dois]
+
+            s = await self.summary(ids)
+            return _map_dois_to_pmids(doi_or_dois,s)
+        else:
+            value = temp.ids
+            if len(value) == 0:
+                return None
+            else:
+                return value[0]
+
+    async def _get_cached_records(self,id_or_ids,get_result,get_cached,
+                                  namespace,put_fh,from_docs,get_pmid):
+        """
+        See Pubmed._get_cached_records
+        """
+
+        ids = _get_id_list(id_or_ids)
+        cached = get_cached(namespace,ids)
+        missing = [x for x in dict.fromkeys(ids) if x not in cached]
+
+        if len(missing) == 0:
+            return from_docs([cached[x] for x in dict.fromkeys(ids)])
+
+        result = await get_result(missing)
+        put_fh(result.docs)
+        return _combine_cached(ids,cached,result,from_docs,get_pmid)
+
+    async def iter_search(self,query,page_size=500,return_type='ids',
+                          min_date='1800/01/01',max_date='3000/12/31'):
+        """
+        Async generator, see Pubmed.iter_search
+
+        Examples
+        --------
+        async for pmid in api.pubmed.iter_search('Grill WM'):
+            print(pmid)
+        """
+
+        async def get_ids(q,start,max):
+            return await self.search(q,start=start,max=max,return_type='ids')
+
+        if return_type == 'ids':
+            get_page = get_ids
+        elif return_type == 'summary':
+            async def get_page(q,start,max):
+                return (await self.summary(await get_ids(q,start,max))).docs
+        elif return_type == 'details':
+            async def get_page(q,start,max):
+                return (await self.details(await get_ids(q,start,max))).docs
+        else:
+            raise ValueError('Unrecognized return type')
+
+        count = (await self.search(query,max=0)).count
+        if count <= ESEARCH_MAX_RESULTS:
+            async for page in _prefetch_pages(get_page,query,count,page_size):
+                for x in page:
+                    yield x
+            return
+
+        async for sub_query, count in self._split_query(query,
+                                                         _parse_pdat(min_date),
+                                                         _parse_pdat(max_date)):
+            async for page in _prefetch_pages(get_page,sub_query,count,page_size):
+                for x in page:
+                    yield x
+
+    async def _split_query(self,query,min_date,max_date):
+        """
+        See Pubmed._split_query
+        """
+
+        sub_query = _get_pdat_query(query,min_date,max_date)
+        count = (await self.search(sub_query,max=0)).count
+
+        if count == 0:
+            return
+
+        if count <= ESEARCH_MAX_RESULTS:
+            yield sub_query, count
+        elif min_date == max_date:
+            warnings.warn('%d results for %s, only the first %d will be returned'
+                          % (count,sub_query,ESEARCH_MAX_RESULTS))
+            yield sub_query, ESEARCH_MAX_RESULTS
+        else:
+            mid_date = min_date + (max_date - min_date)/2
+            async for x in self._split_query(query,min_date,mid_date):
+                yield x
+            async for x in self._split_query(query,mid_date + timedelta(days=1),
+                                             max_date):
+                yield x
+
+
+class AsyncAPI(API):
+    """
+    Same as API except that requests are awaitable.
+
+    Attributes
+    ----------
+    executor : ThreadPoolExecutor
+        Used for making requests and parsing responses
+    async_limiter : rate_limiters.AsyncLimiter
+    """
+
+    def __init__(self,verbose=False,
+                 email:Optional[str]=None,
+                 tool:Optional[str]=None,
+                 api_key:Optional[str]=None,
+                 rate:Optional[int]=None,
+                 rate_limiter=None,
+                 adaptive_rate:bool=False,
+                 chunk_size:int=500,
+                 max_workers:Optional[int]=None,
+                 cache=None,
+                 record_cache=None,
+                 store=None,
+                 parser:str='bs4',
+                 json_backend=None,
+                 retry=None,
+                 metrics=None,
+                 hooks=None,
+                 base_url:Optional[str]=None,
+                 idconv_url:Optional[str]=None):
+        """
+
+        Parameters
+        ----------
+        max_workers : int
+            # of threads for requests and parsing. Defaults to twice the
+            rate so that a full second of requests can be in flight. Unlike
+            API this is not a limit on the # of chunks in flight.
+
+        See Also
+        --------
+        API
+        """
+
+        super().__init__(verbose=verbose,email=email,tool=tool,
+                         api_key=api_key,rate=rate,rate_limiter=rate_limiter,
+                         adaptive_rate=adaptive_rate,chunk_size=chunk_size,
+                         cache=cache,record_cache=record_cache,store=store,
+                         parser=parser,json_backend=json_backend,retry=retry,
+                         metrics=metrics,hooks=hooks,base_url=base_url,
+                         idconv_url=idconv_url)
+
+        if max_workers is None:
+            max_workers = 2*int(self.authentication.rate)
+
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.async_limiter = rate_limiters.AsyncLimiter(self.authentication.limiter)
+
+        #Method Links
+        #-----------------------------
+        self.pubmed = AsyncPubmed(self)
+        self.pmc = AsyncPMC(self)
+        self.mesh = AsyncMESH(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+    def __repr__(self):
+        return display_class(self,
+              ['authentication',cld(self.authentication),
+              'query_logger',cld(self.query_logger),
+              'metrics',cld(self.metrics),
+              'async_limiter',cld(self.async_limiter),
+              'pubmed','Pubmed functions holder (async)',
+              'pmc','PMC functions holder (async)',
+              'mesh','MESH functions holder (async)'])
+
+    async def _make_request(self,
+                      method,
+                      url,
+                      handler,
+                      params,
+                      data_for_response=None,
+                      key_ok=True,
+                      stream=False):
+        """
+        See API._make_request
+        """
+
+        if stream:
+            #The handler would do blocking reads on the event loop
+            raise ValueError('Streaming responses are not supported by AsyncAPI')
+
+        if params is None:
+            params = {}
+
+        params = self.authentication.add_auth(params,key_ok)
+
+        loop = asyncio.get_running_loop()
+
+        hooks = self.hooks
+        request_id = None
+        if hooks:
+            request_id = hooks.new_request_id()
+            hooks.emit('pre_request',request_id,method,url,
+                       params_size=hooks_module.get_params_size(params))
+
+        #Cached response?
+        #----------------------------------------------------
+        response = None
+        if self.cache is not None:
+            start_time = time.monotonic()
+            response = self.cache.get(method,url,params)
+            elapsed_time = time.monotonic() - start_time
+            self.query_logger.log_cache_lookup(response is not None)
+            self.metrics.observe_cache(url,response is not None)
+            if request_id is not None:
+                hooks.emit('post_response',request_id,method,url,
+                           cache_hit=response is not None,
+                           elapsed_time=elapsed_time)
+
+        if response is None:
+            try:
+                response, elapsed_time = await self._send(method,url,params,
+                                                          request_id)
+            except Exception as e:
+                if request_id is not None:
+                    hooks.emit('post_parse',request_id,method,url,error=e)
+                raise
+
+            if self.cache is not None:
+                self.cache.put(method,url,params,response)
+
+        #Logging ...
+        #----------------------------------------------------
+        self.query_logger.log_query(method,url,params,response,elapsed_time)
+
+        #Handle the response
+        #--------------------------------------------------------
+        if data_for_response is None:
+            fh = functools.partial(handler,self,response)
+        else:
+            fh = functools.partial(handler,self,response,data_for_response)
+
+        if request_id is not None:
+            hooks.emit('pre_parse',request_id,method,url)
+
+        start_time = time.monotonic()
+        try:
+            output = await loop.run_in_executor(self.executor,fh)
+        except Exception as e:
+            elapsed_time = time.monotonic() - start_time
+            self.metrics.observe_parse(url,elapsed_time,e)
+            if request_id is not None:
+                hooks.emit('post_parse',request_id,method,url,
+                           elapsed_time=elapsed_time,error=e)
+            raise
+        elapsed_time = time.monotonic() - start_time
+        self.query_logger.log_parse_time(elapsed_time)
+        self.metrics.observe_parse(url,elapsed_time)
+        if request_id is not None:
+            hooks.emit('post_parse',request_id,method,url,
+                       elapsed_time=elapsed_time,
+                       n_records=hooks_module.get_n_records(output))
+
+        return output
+
+    async def _send(self,method,url,params,request_id=None):
+        """
+        See API._send
+        """
+        loop = asyncio.get_running_loop()
+
+        if method == 'POST':
+            fh = functools.partial(self.session.request,method,url,data=params)
+        else:
+            fh = functools.partial(self.session.request,method,url,params=params)
+
+        policy = self.retry_policy
+        metrics = self.metrics
+        attempt = 1
+        while True:
+            wait_time = await self.async_limiter.acquire()
+            metrics.observe_wait(url,wait_time)
+            if request_id is not None:
+                self.hooks.emit('rate_limit_wait',request_id,method,url,
+                                attempt=attempt,wait_time=wait_time)
+
+            response = None
+            error = None
+            start_time = time.monotonic()
+            try:
+                response = await loop.run_in_executor(self.executor,fh)
+            except requests.exceptions.RequestException as e:
+                error = e
+            elapsed_time = time.monotonic() - start_time
+            self.authentication.log_response(elapsed_time,response,error,
+                                             _get_latency_key(url,params))
+            metrics.observe_request(url,elapsed_time,response,error)
+            if request_id is not None:
+                self.hooks.emit('post_response',request_id,method,url,
+                                attempt=attempt,elapsed_time=elapsed_time,
+                                status=getattr(response,'status_code',None),
+                                n_bytes=_get_n_bytes(response,False),
+                                error=error)
+
+            if policy is None or not policy.is_retryable(method,url,response,error):
+                if error is not None:
+                    raise error
+                return response, elapsed_time
+
+            if attempt >= policy.get_max_attempts(url):
+                retry_error = errors.RetryError(url,attempt,response,error)
+                metrics.observe_error(url,retry_error)
+                raise retry_error from error
+
+            delay = policy.get_delay(attempt,response)
+            self.query_logger.log_retry(delay)
+            metrics.observe_retry(url)
+            if response is not None:
+                response.close()
+
+            if policy.should_penalize(response):
+                self.authentication.limiter.penalize(delay)
+            else:
+                await asyncio.sleep(delay)
+
+            attempt += 1
+
+    async def _fan_out(self,method,url,handler,params,chunks,merge_fh,
+                       data_for_response):
+        """
+        See API._fan_out
+        """
+
+        async def get_chunk(chunk):
+            chunk_params = dict(params)
+            chunk_params['id'] = ','.join(chunk)
+            return await self._make_request(method,url,handler,chunk_params,
+                                            data_for_response=data_for_response)
+
+        outputs = await asyncio.gather(*[get_chunk(x) for x in chunks],
+                                       return_exceptions=True)
+
+        results = []
+        chunk_errors = []
+        for chunk, output in zip(chunks,outputs):
+            if isinstance(output,Exception):
+                chunk_errors.append(errors.ChunkError(chunk,output))
+            else:
+                results.append(output)
+
+        return _merge_chunks(results,chunk_errors,merge_fh)
+
+async def _prefetch_pages(get_page,query,count,page_size):
+    """
+    Async version of api._prefetch_pages, the next page is requested while
+    the current one is being processed.
+    """
+
+    starts = list(range(0,count,page_size))
+    if len(starts) == 0:
+        return
+
+    task = asyncio.ensure_future(get_page(query,0,min(page_size,count)))
+    try:
+        for i, start in enumerate(starts):
+            page = await task
+            if i + 1 < len(starts):
+                next_start = starts[i+1]
+                task = asyncio.ensure_future(get_page(query,next_start,
+                                              min(page_size,count-next_start)))
+            yield page
+    finally:
+        #e.g. the caller stopped iterating
+        if not task.done():
+            task.cancel()
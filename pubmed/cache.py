@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk cache of HTTP responses.
+
+Usage
+-----
+api = API(cache=True)                        #default location
+api = API(cache='/path/to/cache.sqlite')
+api = API(cache=ResponseCache(max_size=2e9,ttls={'esearch.fcgi':0}))
+
+Responses are keyed on the method, URL and parameters, excluding the
+authentication parameters (api_key, email, tool) so that the cache can be
+shared between users. Bodies are stored zlib compressed in a SQLite
+database. Each endpoint has its own time to live (see DEFAULT_TTLS) and
+once the cache exceeds its maximum size the least recently used entries
+are removed.
+
+Only successful (200) responses are cached. Streamed requests are not
+cached.
+
+History server sessions (WebEnv/query_key) expire on NCBI's side, so EPost
+responses are never cached and esearch responses with usehistory=y are
+only kept for history_ttl (by default they are not cached either).
+
+Hits and misses are counted in API.query_logger.
+"""
+
+#Standard Library
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, Dict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from requests import Response
+
+#Third Party
+import requests
+from requests.structures import CaseInsensitiveDict
+
+#Local
+from .utils import display_class
+
+_DAY = 24*60*60
+
+#Time to live of a cached response, in seconds, by endpoint
+#
+#   Keys are the last part of the URL, see get_endpoint()
+DEFAULT_TTLS = {
+    'einfo.fcgi': 7*_DAY,
+    'epost.fcgi': 0,
+    'esearch.fcgi': 60*60,
+    'esummary.fcgi': _DAY,
+    'efetch.cgi': _DAY,
+    'efetch.fcgi': _DAY,
+    'elink.fcgi': _DAY,
+    'ecitmatch.cgi': 7*_DAY,
+    'idconv': 7*_DAY,
+    }
+
+#For endpoints not in the TTL dict
+DEFAULT_TTL = _DAY
+
+#Maximum time to live of responses that create a history session
+#
+#   NCBI doesn't document how long an idle session is kept so by default
+#   these are not cached
+HISTORY_TTL = 0
+
+#These are not part of the key
+AUTH_PARAMS = ('api_key','email','tool')
+
+def get_default_path():
+    return os.path.join(os.path.expanduser('~'),'.cache','pubmed',
+                        'responses.sqlite')
+
+def get_endpoint(url:str)->str:
+    if 'idconv' in url:
+        return 'idconv'
+    else:
+        return url.rstrip('/').rsplit('/',1)[-1]
+
+def get_key(method:str,url:str,params:Optional[Dict])->str:
+    """
+    Returns a hash of the request, ignoring authentication parameters and
+    parameters that are None (which requests doesn't send).
+    """
+    if params is None:
+        params = {}
+
+    items = sorted((k,str(v)) for k,v in params.items()
+                   if v is not None and k not in AUTH_PARAMS)
+    temp = json.dumps([method.upper(),url.strip(),items])
+    return hashlib.sha256(temp.encode('utf-8')).hexdigest()
+
+
+class ResponseCache(object):
+
+    """
+    Attributes
+    ----------
+    path : str
+    max_size : int
+        Maximum # of compressed bytes to keep
+    ttls : dict
+        Time to live, in seconds, by endpoint
+    history_ttl : float
+        Maximum time to live of requests with usehistory=y
+    total_size : int
+        Current # of compressed bytes
+    """
+
+    def __init__(self,
+                 path:Optional[str]=None,
+                 max_size:int=500*1024*1024,
+                 ttls:Optional[Dict[str,float]]=None,
+                 compress_level:int=6,
+                 history_ttl:float=HISTORY_TTL):
+
+        if path is None:
+            path = get_default_path()
+
+        if path != ':memory:':
+            folder = os.path.dirname(os.path.abspath(path))
+            os.makedirs(folder,exist_ok=True)
+
+        self.path = path
+        self.max_size = max_size
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls is not None:
+            self.ttls.update(ttls)
+        self.history_ttl = history_ttl
+        self.compress_level = compress_level
+
+        #Requests may be made from multiple threads, see API._fan_out
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path,check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                            key TEXT PRIMARY KEY,
+                            endpoint TEXT,
+                            created REAL,
+                            last_access REAL,
+                            size INTEGER,
+                            status_code INTEGER,
+                            url TEXT,
+                            encoding TEXT,
+                            headers TEXT,
+                            body BLOB)""")
+        self.db.execute("""CREATE INDEX IF NOT EXISTS responses_last_access
+                            ON responses (last_access)""")
+        self.db.commit()
+
+        self.total_size = self.db.execute(
+            'SELECT COALESCE(SUM(size),0) FROM responses').fetchone()[0]
+
+    def get_ttl(self,endpoint:str,params:Optional[Dict])->float:
+        """
+        Returns the time to live, in seconds, of a request
+        """
+        ttl = self.ttls.get(endpoint,DEFAULT_TTL)
+        if params and params.get('usehistory') == 'y':
+            ttl = min(ttl,self.history_ttl)
+        return ttl
+
+    def get(self,method:str,url:str,params:Optional[Dict])->Optional['Response']:
+        """
+        Returns the cached response or None if there is no (valid) entry
+        """
+        key = get_key(method,url,params)
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("""SELECT endpoint, created, status_code, url,
+                                     encoding, headers, body FROM responses
+                                     WHERE key = ?""",(key,)).fetchone()
+            if row is None:
+                return None
+
+            endpoint, created, status_code, response_url, encoding, headers, body = row
+            if now - created > self.get_ttl(endpoint,params):
+                self._delete(key)
+                self.db.commit()
+                return None
+
+            self.db.execute('UPDATE responses SET last_access = ? WHERE key = ?',
+                            (now,key))
+            self.db.commit()
+
+        response = requests.models.Response()
+        response.status_code = status_code
+        response.reason = 'OK'
+        response.url = response_url
+        response.encoding = encoding
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response._content = zlib.decompress(body)
+        #The request is used by QueryLogger
+        if method == 'POST':
+            response.request = requests.Request(method,url,data=params).prepare()
+        else:
+            response.request = requests.Request(method,url,params=params).prepare()
+        return response
+
+    def put(self,method:str,url:str,params:Optional[Dict],response:'Response'):
+
+        if response.status_code != 200:
+            return
+
+        endpoint = get_endpoint(url)
+        if self.get_ttl(endpoint,params) <= 0:
+            return
+
+        key = get_key(method,url,params)
+        body = zlib.compress(response.content,self.compress_level)
+        #The body is stored decoded
+        headers = {k:v for k,v in response.headers.items()
+                   if k.lower() not in ('content-encoding','content-length',
+                                        'transfer-encoding')}
+        now = time.time()
+
+        with self.lock:
+            self._delete(key)
+            self.db.execute("""INSERT INTO responses VALUES
+                            (?,?,?,?,?,?,?,?,?,?)""",
+                            (key,endpoint,now,now,len(body),response.status_code,
+                             response.url,response.encoding,json.dumps(headers),
+                             body))
+            self.total_size += len(body)
+            self._evict()
+            self.db.commit()
+
+    def _delete(self,key):
+        row = self.db.execute('SELECT size FROM responses WHERE key = ?',
+                              (key,)).fetchone()
+        if row is not None:
+            self.db.execute('DELETE FROM responses WHERE key = ?',(key,))
+            self.total_size -= row[0]
+
+    def _evict(self):
+        #Removes least recently used entries until we are under the limit
+        while self.total_size > self.max_size:
+            rows = self.db.execute("""SELECT key, size FROM responses
+                                   ORDER BY last_access LIMIT 100""").fetchall()
+            if len(rows) == 0:
+                self.total_size = 0
+                break
+            for key, size in rows:
+                self.db.execute('DELETE FROM responses WHERE key = ?',(key,))
+                self.total_size -= size
+                if self.total_size <= self.max_size:
+                    break
+
+    def clear(self):
+        with self.lock:
+            self.db.execute('DELETE FROM responses')
+            self.db.commit()
+            self.total_size = 0
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def __repr__(self):
+        return display_class(self,
+                             ['path', self.path,
+                              'max_size', self.max_size,
+                              'total_size', self.total_size,
+                              'ttls', self.ttls,
+                              'history_ttl', self.history_ttl,
+                              'methods','-------------------------',
+                              'clear','Removes all entries'])
+
+
+def get_cache(cache)->Optional[ResponseCache]:
+    """
+    Resolves the 'cache' option of the API.
+
+    Parameters
+    ----------
+    cache :
+        - None or False : no caching
+        - True : cache at the default location
+        - str : path to the cache file
+        - ResponseCache instance
+    """
+    if cache is None or cache is False:
+        return None
+    elif cache is True:
+        return ResponseCache()
+    elif isinstance(cache,str):
+        return ResponseCache(cache)
+    else:
+        return cache
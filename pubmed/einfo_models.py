@@ -33,6 +33,10 @@ _get_opt_soup_string = model_helpers._get_opt_soup_string
 _get_opt_attr_value = model_helpers._get_opt_attr_value
 _get_opt_class = model_helpers._get_opt_class
 _get_opt_soup_int = model_helpers._get_opt_soup_int
+_release_soup = model_helpers._release_soup
+_get_parser = model_helpers._get_parser
+
+from . import json_backend
 
 class Link(object):
 
@@ -149,13 +153,36 @@ class Field(object):
                                   'is_rangeable',self.is_rangeable,
                                   'is_truncatable',self.is_truncatable])
 
-def parse_db_info(api,data):
+def get_db_list(api,response)->List[str]:
+    data = json_backend.loads(api,response)
+    return sorted(data['einforesult']['dblist'])
+
+def parse_db_info(api,response,options=None):
+    """
 
-    soup = _make_soup(data)
+    Parameters
+    ----------
+    options : dict
+        - leave_raw : bool, default False
+            If true the response body is kept in DbInfo.raw_xml
+    """
+
+    if options is None:
+        options = {}
+
+    soup = _make_soup(response.text,_get_parser(api))
 
     #TODO: Check for an error
 
-    return DbInfo(soup)
+    output = DbInfo(soup)
+    if options.get('leave_raw',False):
+        output.raw_xml = response.content
+
+    #The fields hold strings from the tree, see model_helpers._release_soup
+    output.soup = None
+    _release_soup(soup)
+
+    return output
 
 class DbInfo(object):
 
@@ -169,7 +196,7 @@ class DbInfo(object):
     menu_name
     """
 
-    __slots__ = ['soup','db_name','menu_name','description','db_build',
+    __slots__ = ['soup','raw_xml','db_name','menu_name','description','db_build',
                  'warning','count','last_update','field_list','link_list']
 
     def __init__(self,tag):
@@ -185,6 +212,7 @@ class DbInfo(object):
         # < !ELEMENT DbName	(# PCDATA)>	<!-- \S+ -->
 
         self.soup = tag
+        self.raw_xml = None
         self.db_name = tag.DbName.string
         self.menu_name = tag.MenuName.string
         self.description = tag.Description.string
@@ -33,9 +33,11 @@ _get_opt_attr_value = model_helpers._get_opt_attr_value
 _get_opt_class = model_helpers._get_opt_class
 _get_opt_soup_int = model_helpers._get_opt_soup_int
 
+from . import json_backend
+
 def pmc_to_pmid_results(api:'API', response:'Response', ids_in) -> List[str]:
 
-    data = response.json()
+    data = json_backend.loads(api,response)
 
     records = data['records']
 
@@ -49,7 +51,7 @@ def pmc_to_pmid_results(api:'API', response:'Response', ids_in) -> List[str]:
 
 def pmid_to_pmc_results(api:'API', response:'Response', ids_in) -> List[str]:
 
-    data = response.json()
+    data = json_backend.loads(api,response)
 
     records = data['records']
 
@@ -0,0 +1,65 @@
+"""
+This module holds objects that get returned from "epost" calls.
+
+https://www.ncbi.nlm.nih.gov/books/NBK25499/#chapter4.EPost
+
+"""
+
+#Standard Library
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .api import API
+    from requests import Response
+
+#Local Imports
+#--------------------
+from . import utils
+quotes = utils.quotes
+display_class = utils.display_class
+td = utils.get_truncated_display_string
+
+from . import model_helpers
+_make_soup = model_helpers._make_soup
+_get_opt_soup_string = model_helpers._get_opt_soup_string
+_get_parser = model_helpers._get_parser
+
+
+class EPostResult(object):
+
+    """
+    Pointer to a set of IDs stored on the Entrez history server.
+
+    This can be passed in place of IDs to Pubmed.details() and
+    Pubmed.summary().
+
+    Attributes
+    ----------
+    query_key : str
+    web_env : str
+    count : int
+        # of IDs that were posted
+    error : str or None
+
+    Examples
+    --------
+    post = api.pubmed.post(ids)
+    result = api.pubmed.details(post,start=0,max=500)
+    """
+
+    __slots__ = ['query_key','web_env','count','error']
+
+    def __init__(self, api:'API', response:'Response', data_for_response):
+        #<!ELEMENT	ePostResult	(QueryKey?, WebEnv?, ERROR?)>
+        soup = _make_soup(response.text,_get_parser(api))
+        self.query_key = _get_opt_soup_string(soup,'QueryKey')
+        self.web_env = _get_opt_soup_string(soup,'WebEnv')
+        self.error = _get_opt_soup_string(soup,'ERROR')
+        self.count = data_for_response['count']
+
+    def __repr__(self):
+        return display_class(self,
+                             ['query_key', quotes(self.query_key),
+                              'web_env', quotes(td(self.web_env)),
+                              'count', self.count,
+                              'error', quotes(self.error)])
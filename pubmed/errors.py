@@ -3,4 +3,66 @@
 """
 
 class InvalidConfig(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class ChunkError(Exception):
+    """
+    Failure of one chunk of a request that was split into chunks of IDs.
+
+    Attributes
+    ----------
+    ids : List[str]
+        IDs in the chunk that failed
+    error : Exception
+        What went wrong
+    """
+
+    def __init__(self, ids, error):
+        super().__init__('Request for %d IDs failed: %r' % (len(ids), error))
+        self.ids = ids
+        self.error = error
+
+class RetryError(Exception):
+    """
+    A request kept failing after all attempts allowed by the retry policy.
+
+    Attributes
+    ----------
+    url : str
+    attempts : int
+        # of attempts made
+    response : requests.Response or None
+        Response to the last attempt, None if it raised an error
+    error : Exception or None
+        Error raised by the last attempt
+    """
+
+    def __init__(self, url, attempts, response=None, error=None):
+        if response is not None:
+            reason = 'status %d' % response.status_code
+        else:
+            reason = repr(error)
+        super().__init__('Request to %s failed after %d attempts, %s'
+                         % (url, attempts, reason))
+        self.url = url
+        self.attempts = attempts
+        self.response = response
+        self.error = error
+
+class QueryError(Exception):
+    """
+    A query could not be parsed or evaluated, see pubmed.query_parser
+
+    Attributes
+    ----------
+    query : str
+    position : int or None
+        Index in the query of the problem
+    """
+
+    def __init__(self, message, query, position=None):
+        if position is not None:
+            message = '%s at position %d of %r' % (message, position, query)
+        super().__init__(message)
+        self.query = query
+        self.position = position
@@ -25,12 +25,15 @@ from .utils import get_list_class_display as cld
 from .utils import property_values_to_string as pv
 
 from .model_helpers import _make_soup, XMLInfo, _list_cld_or_empty, _get_opt_list
+from .model_helpers import _get_parser
+from . import json_backend
 from .model_helpers import _get_opt_soup_string, _get_opt_attr_value, _get_opt_class
 from .model_helpers import _get_opt_soup_int
+from .models import TermSet
 
 def get_search_ids(api:'API',response:'Response'):
 
-    data = response.json()
+    data = json_backend.loads(api,response)
     #TODO: How do we get an error????
     return data['esearchresult']['idlist']
 
@@ -59,7 +62,7 @@ class XMLSearchResult(object):
         #     WarningList?
         # ) >
         data = response.text
-        soup = _make_soup(data)
+        soup = _make_soup(data,_get_parser(api))
         self.xml_info = XMLInfo(soup)
 
         self.count = int(soup.Count.string)
@@ -149,8 +152,20 @@ translation_stack: [{'term': 'Amundsen[All Fields]', 'field': 'All Fields', 'cou
 
     def __init__(self, api:'API', response:'Response'):
 
-        data = response.json()
+        data = json_backend.loads(api,response)
+        self._set_data(api,data)
 
+    @classmethod
+    def from_data(cls, api:Optional['API'], data:dict)->'JSONSearchResult':
+        """
+        Creates the result from decoded esearch JSON, e.g. from
+        local_index.LocalSearch
+        """
+        output = cls.__new__(cls)
+        output._set_data(api,data)
+        return output
+
+    def _set_data(self, api, data):
         self.api = api
         self.raw = data
         self.version = data['header']['version']
@@ -161,10 +176,11 @@ translation_stack: [{'term': 'Amundsen[All Fields]', 'field': 'All Fields', 'cou
         self.ret_start = int(root['retstart'])
         self.ids = root['idlist']
         self.query_key = root.get('querykey')
+        self.web_env = root.get('webenv')
         self.query_translation = root['querytranslation']
         self.translation_set = root['translationset']
         
-        self.translation_stack = root.get("translation_stack")
+        self.translation_stack = root.get('translationstack')
 
 
         #TODO:
@@ -194,6 +210,7 @@ translation_stack: [{'term': 'Amundsen[All Fields]', 'field': 'All Fields', 'cou
                               'ret_start', self.ret_start,
                               'ret_max', self.ret_max,
                               'query_key', self.query_key,
+                              'web_env', td(self.web_env),
                               'methods', '----------------------',
                               'get_doc_info', '(self,indices)',
                               'get_next_page', '(self)'])
\ No newline at end of file
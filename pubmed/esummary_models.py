@@ -23,7 +23,9 @@ The ESummary is very generic ...
 import re
 import pprint
 import inspect
-from typing import Union, List, Optional
+import operator
+from array import array
+from typing import Union, List, Optional, Dict
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -49,8 +51,67 @@ from .utils import property_values_to_string as pv
 from .model_helpers import _make_soup, XMLInfo, _list_cld_or_empty, _get_opt_list
 from .model_helpers import _get_opt_soup_string, _get_opt_attr_value, _get_opt_class
 from .model_helpers import _get_opt_soup_int
+from . import json_backend
 
-class PubmedSummaryResult(object):
+class _LazyRaw(object):
+
+    """
+    Objects decoded by msgspec (see from_struct) keep the struct rather
+    than a dict, 'raw' is only created from it when accessed.
+    """
+
+    @property
+    def raw(self):
+        state = self.__dict__
+        if 'raw' not in state:
+            source = state.pop('_raw_source',None)
+            if source is None:
+                return None
+            import msgspec
+            state['raw'] = msgspec.to_builtins(source)
+        return state['raw']
+
+    @raw.setter
+    def raw(self, value):
+        self.__dict__['raw'] = value
+        self.__dict__.pop('_raw_source',None)
+
+    def _get_raw_source(self):
+        #The raw dict or the struct it would be created from
+        state = self.__dict__
+        if 'raw' in state:
+            return state['raw']
+        return state.get('_raw_source')
+
+    def _is_raw_lazy(self)->bool:
+        return '_raw_source' in self.__dict__
+
+    def __getstate__(self):
+        #Structs are not pickled
+        state = dict(self.__dict__)
+        if '_raw_source' in state:
+            del state['_raw_source']
+            state['raw'] = self.raw
+        return state
+
+def _set_raw(output:_LazyRaw, results:List[_LazyRaw]):
+    #'raw' of merged results is a list of the raw data of each, which is
+    #kept lazy if any of them are
+    sources = [x._get_raw_source() for x in results]
+    if any(x._is_raw_lazy() for x in results):
+        output.__dict__['_raw_source'] = sources
+    else:
+        output.raw = sources
+
+def _parse_sort_pub_date(value:str)->datetime:
+    #'2014/11/01 00:00', much faster than strptime
+    try:
+        return datetime(int(value[0:4]),int(value[5:7]),int(value[8:10]),
+                        int(value[11:13]),int(value[14:16]))
+    except ValueError:
+        return datetime.strptime(value,'%Y/%m/%d %H:%M')
+
+class PubmedSummaryResult(_LazyRaw):
     
     """
     type : 'esummary'
@@ -63,7 +124,18 @@ class PubmedSummaryResult(object):
         #TODO: in the result, each entry is a key
         #??? What if there is only 1, is this still the case
 
-        data = response.json()
+        if json_backend._get_backend(api).typed_summaries:
+            data = _get_msgspec_decoder().decode(response.content)
+            self.__dict__['_raw_source'] = data
+            self.type = data.header['type']
+            self.version = data.header['version']
+            result = data.result
+            self.ids = result['uids']
+            self.docs = [PubmedSummary.from_struct(result[x]) for x in self.ids]
+            self.chunk_errors = []
+            return
+
+        data = json_backend.loads(api,response)
         headers = data['header']
         result = data['result']
         
@@ -74,6 +146,58 @@ class PubmedSummaryResult(object):
         self.ids = result['uids']
         self.docs = [PubmedSummary(result[x]) for x in self.ids]
         #dict_keys(['uids', '25186301', '23467867'])
+
+        self.chunk_errors = []
+
+    @classmethod
+    def merge(cls, results:List['PubmedSummaryResult'], chunk_errors=None):
+        """
+        Combines the results of multiple requests into one. Note that 'raw'
+        becomes a list of the raw data from each request.
+
+        See Also
+        --------
+        pubmed.api.API._request_ids
+        """
+        output = cls.__new__(cls)
+        _set_raw(output,results)
+        output.type = results[0].type
+        output.version = results[0].version
+        output.ids = [id for x in results for id in x.ids]
+        output.docs = [doc for x in results for doc in x.docs]
+        output.chunk_errors = [x for r in results for x in r.chunk_errors]
+        if chunk_errors:
+            output.chunk_errors.extend(chunk_errors)
+        return output
+
+    @classmethod
+    def from_docs(cls, docs:List['PubmedSummary'], result=None):
+        """
+        Creates a result from summaries that were not (all) part of a
+        single response, e.g. from the record cache. 'raw' is None unless
+        a request result is passed in.
+
+        See Also
+        --------
+        pubmed.record_cache
+        """
+        output = cls.__new__(cls)
+        output.ids = [x.uid for x in docs]
+        output.docs = docs
+        if result is None:
+            output.raw = None
+            output.type = 'esummary'
+            output.version = None
+            output.chunk_errors = []
+        else:
+            if result._is_raw_lazy():
+                output.__dict__['_raw_source'] = result._get_raw_source()
+            else:
+                output.raw = result.raw
+            output.type = result.type
+            output.version = result.version
+            output.chunk_errors = result.chunk_errors
+        return output
         
     def __repr__(self):
         return display_class(self,
@@ -81,10 +205,11 @@ class PubmedSummaryResult(object):
                'type',self.type,
                'version',self.version,
                'ids',td(self.ids),
-               'docs',cld(self.docs)])
+               'docs',cld(self.docs),
+               'chunk_errors',cld(self.chunk_errors)])
         
 
-class PubmedSummary(object):
+class PubmedSummary(_LazyRaw):
     
     """
     TODO: Where is the DTD for this?
@@ -128,7 +253,7 @@ class PubmedSummary(object):
         self.pub_date = data['pubdate']
         
         
-        self.publisher_location = data.get('publisher_location')
+        self.publisher_location = data.get('publisherlocation')
 
         #empty how no publisher?
         self.publisher_name = data['publishername']
@@ -152,7 +277,7 @@ class PubmedSummary(object):
         #This is a nice date - TODO: Parse into datetime
         #'2014/11/01 00:00'
         temp_date = data['sortpubdate']
-        self.sort_pub_date = datetime.strptime(temp_date,'%Y/%m/%d %H:%M')
+        self.sort_pub_date = _parse_sort_pub_date(temp_date)
         self.sorttitle = data['sorttitle']
 
         #'source': 'Neurourol Urodyn',
@@ -165,9 +290,24 @@ class PubmedSummary(object):
         self.volume = data['volume']
         
         #TODO: Get attributes and display in loop
+
+    @classmethod
+    def from_struct(cls, doc):
+        """
+        Creates a summary from a document decoded by msgspec, whose fields
+        are named as the attributes. See _get_msgspec_decoder
+        """
+        output = cls.__new__(cls)
+        state = output.__dict__
+        state['_raw_source'] = doc
+        state.update(zip(_STRUCT_ATTRIBUTES,_get_struct_values(doc)))
+        output.article_ids = [PubmedArticleID.from_struct(x) for x in doc.article_ids]
+        output.authors = [PubmedAuthor.from_struct(x) for x in doc.authors]
+        output.sort_pub_date = _parse_sort_pub_date(doc.sortpubdate)
+        return output
         
 
-class PubmedAuthor(object):
+class PubmedAuthor(_LazyRaw):
 
     def __init__(self,data):
         self.raw = data
@@ -177,6 +317,16 @@ class PubmedAuthor(object):
         temp = self.name.split(" ")
         self.last = " ".join(temp[0:-1])
         #self.last = self.name.split(" ")[0]
+
+    @classmethod
+    def from_struct(cls, author):
+        output = cls.__new__(cls)
+        output.__dict__['_raw_source'] = author
+        output.type = author.type
+        output.cluster_id = author.cluster_id
+        output.name = author.name
+        output.last = " ".join(author.name.split(" ")[0:-1])
+        return output
         
     def __repr__(self):
         return display_class(self,
@@ -185,7 +335,7 @@ class PubmedAuthor(object):
                'name',self.name,
                'last',self.last])
 
-class PubmedArticleID(object):
+class PubmedArticleID(_LazyRaw):
 
     def __init__(self,data):
 
@@ -193,6 +343,15 @@ class PubmedArticleID(object):
         self.id_type = data['idtype']
         self.enumerated_id_type = data['idtypen']
         self.value = data['value']
+
+    @classmethod
+    def from_struct(cls, article_id):
+        output = cls.__new__(cls)
+        output.__dict__['_raw_source'] = article_id
+        output.id_type = article_id.id_type
+        output.enumerated_id_type = article_id.enumerated_id_type
+        output.value = article_id.value
+        return output
         
         
     def __repr__(self):
@@ -216,3 +375,421 @@ class PubmedArticleID(object):
                               'value': '32022941'}],
     
     """
+
+
+#==========================================================
+#                   Compact Table
+#==========================================================
+
+#Fields stored in SummaryTable, as (attribute, JSON key)
+#
+#   Attribute names match PubmedSummary
+_SCALAR_FIELDS = [
+    ('uid','uid'),
+    ('available_from_url','availablefromurl'),
+    ('book_name','bookname'),
+    ('book_title','booktitle'),
+    ('chapter','chapter'),
+    ('doc_date','docdate'),
+    ('doc_type','doctype'),
+    ('edition','edition'),
+    ('elocation_id','elocationid'),
+    ('epub_date','epubdate'),
+    ('essn','essn'),
+    ('full_journal_name','fulljournalname'),
+    ('issn','issn'),
+    ('issue','issue'),
+    ('last_author','lastauthor'),
+    ('location_label','locationlabel'),
+    ('medium','medium'),
+    ('nlm_unique_id','nlmuniqueid'),
+    ('pages','pages'),
+    ('pmc_ref_count','pmcrefcount'),
+    ('pub_date','pubdate'),
+    ('publisher_location','publisherlocation'),
+    ('publisher_name','publishername'),
+    ('pub_status','pubstatus'),
+    ('record_status','recordstatus'),
+    ('report_number','reportnumber'),
+    ('sort_first_author','sortfirstauthor'),
+    ('sortpubdate','sortpubdate'),
+    ('sorttitle','sorttitle'),
+    ('source','source'),
+    ('srcdate','srcdate'),
+    ('title','title'),
+    ('vernaculartitle','vernaculartitle'),
+    ('volume','volume'),
+    ]
+
+#Lists of strings
+_LIST_FIELDS = [
+    ('attributes','attributes'),
+    ('lang','lang'),
+    ('pub_type','pubtype'),
+    ]
+
+#Lists of dicts with known keys
+_RECORD_FIELDS = [
+    ('authors','authors',('authtype','clusterid','name')),
+    ('article_ids','articleids',('idtype','idtypen','value')),
+    ('history','history',('pubstatus','date')),
+    ]
+
+#Lists that are almost always empty, kept as decoded for the rows that
+#have them
+_OBJECT_FIELDS = [
+    ('doc_contrib_list','doccontriblist'),
+    ('references','references'),
+    ('src_contrib_list','srccontriblist'),
+    ]
+
+class SummaryTable(object):
+
+    """
+    Compact alternative to PubmedSummaryResult for large numbers of
+    summaries.
+
+    Rather than an object (and the raw dict) per document, each field is
+    stored as a column. Values are interned in a single list ('values') so
+    that repeated strings (journal names, dates, '' for the many empty
+    fields) are stored once and the columns are arrays of 4 byte indices
+    into it. List fields (authors, article_ids, ...) are stored as offsets
+    into flattened columns.
+
+    Rows are accessed as PubmedSummaryRow views, which have the attributes
+    of PubmedSummary (except 'raw', see PubmedSummaryRow.to_dict).
+
+    Usage
+    -----
+    table = api.pubmed.summary(ids,return_type='table')
+    row = table[0]
+    row.title
+    titles = table.get_column('title')
+    for row in table:
+        ...
+
+    Attributes
+    ----------
+    type : str
+    version : str
+    values : list
+        Unique values, the columns hold indices into this list
+    ids : List[str]
+    docs : List[PubmedSummaryRow]
+    n_rows : int
+    chunk_errors : List[pubmed.errors.ChunkError]
+    """
+
+    __slots__ = ['type','version','values','value_index','columns',
+                 'list_columns','record_columns','objects','n_rows',
+                 'chunk_errors']
+
+    def __init__(self, api:'API', response:'Response'):
+        data = json_backend.loads(api,response)
+        self._init_empty()
+        self.type = data['header']['type']
+        self.version = data['header']['version']
+        self.append_result(data['result'])
+        #Only needed while adding rows, rebuilt if more are added
+        self.value_index = None
+
+    def _init_empty(self):
+        self.type = 'esummary'
+        self.version = None
+        self.values = []
+        self.value_index = {}
+        self.columns = {key:array('I') for name, key in _SCALAR_FIELDS}
+        self.list_columns = {key:(array('I',[0]),array('I'))
+                             for name, key in _LIST_FIELDS}
+        self.record_columns = {key:(array('I',[0]),{x:array('I') for x in keys})
+                               for name, key, keys in _RECORD_FIELDS}
+        self.objects = {key:{} for name, key in _OBJECT_FIELDS}
+        self.n_rows = 0
+        self.chunk_errors = []
+
+    def _get_code(self, value)->int:
+        if self.value_index is None:
+            self.value_index = {x:i for i, x in enumerate(self.values)}
+        code = self.value_index.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.value_index[value] = code
+        return code
+
+    def append_result(self, result:dict):
+        """
+        Adds the documents of the 'result' part of the JSON response
+        """
+        get_code = self._get_code
+        for uid in result['uids']:
+            data = result[uid]
+            for key, column in self.columns.items():
+                column.append(get_code(data.get(key)))
+
+            for key, (offsets, codes) in self.list_columns.items():
+                codes.extend(get_code(x) for x in data.get(key) or ())
+                offsets.append(len(codes))
+
+            for key, (offsets, columns) in self.record_columns.items():
+                items = data.get(key) or ()
+                for sub_key, column in columns.items():
+                    column.extend(get_code(x.get(sub_key)) for x in items)
+                offsets.append(offsets[-1] + len(items))
+
+            for key, values in self.objects.items():
+                value = data.get(key)
+                if value:
+                    values[self.n_rows] = value
+
+            self.n_rows += 1
+
+    @classmethod
+    def merge(cls, results:List['SummaryTable'], chunk_errors=None):
+        """
+        Combines the results of multiple requests into one.
+
+        See Also
+        --------
+        pubmed.api.API._request_ids
+        """
+        output = cls.__new__(cls)
+        output._init_empty()
+        output.type = results[0].type
+        output.version = results[0].version
+        for result in results:
+            output._extend(result)
+            output.chunk_errors.extend(result.chunk_errors)
+        if chunk_errors:
+            output.chunk_errors.extend(chunk_errors)
+        output.value_index = None
+        return output
+
+    def _extend(self, other:'SummaryTable'):
+        #The values are re-interned so the codes of other are translated
+        remap = [self._get_code(x) for x in other.values]
+
+        for key, column in self.columns.items():
+            column.extend(remap[x] for x in other.columns[key])
+
+        for key, (offsets, codes) in self.list_columns.items():
+            other_offsets, other_codes = other.list_columns[key]
+            n = offsets[-1]
+            offsets.extend(n + x for x in other_offsets[1:])
+            codes.extend(remap[x] for x in other_codes)
+
+        for key, (offsets, columns) in self.record_columns.items():
+            other_offsets, other_columns = other.record_columns[key]
+            n = offsets[-1]
+            offsets.extend(n + x for x in other_offsets[1:])
+            for sub_key, column in columns.items():
+                column.extend(remap[x] for x in other_columns[sub_key])
+
+        for key, values in self.objects.items():
+            for index, value in other.objects[key].items():
+                values[self.n_rows + index] = value
+
+        self.n_rows += other.n_rows
+
+    @property
+    def ids(self)->List[str]:
+        return self.get_column('uid')
+
+    @property
+    def docs(self)->List['PubmedSummaryRow']:
+        return [PubmedSummaryRow(self,i) for i in range(self.n_rows)]
+
+    def get_column(self, name:str)->list:
+        """
+        Returns the values of a scalar field (see PubmedSummary) for all rows
+
+        Parameters
+        ----------
+        name : str
+            Attribute name, e.g. 'title' or 'pub_date'
+        """
+        values = self.values
+        return [values[x] for x in self.columns[_SCALAR_KEYS[name]]]
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, index:int)->'PubmedSummaryRow':
+        if index < 0:
+            index += self.n_rows
+        if index < 0 or index >= self.n_rows:
+            raise IndexError('SummaryTable index out of range')
+        return PubmedSummaryRow(self,index)
+
+    def __iter__(self):
+        for i in range(self.n_rows):
+            yield PubmedSummaryRow(self,i)
+
+    def __repr__(self):
+        return display_class(self,
+              ['type',self.type,
+               'version',self.version,
+               'n_rows',self.n_rows,
+               'values','[%d unique values]' % len(self.values),
+               'chunk_errors',cld(self.chunk_errors),
+               'methods', '-----------------------',
+               'get_column', '(name) => list',
+               '[index]', '=> PubmedSummaryRow'])
+
+_SCALAR_KEYS = dict(_SCALAR_FIELDS)
+
+class PubmedSummaryRow(object):
+
+    """
+    View of a row of a SummaryTable. The attributes are those of
+    PubmedSummary and are looked up in the table when accessed.
+    """
+
+    __slots__ = ['table','index']
+
+    def __init__(self, table:SummaryTable, index:int):
+        self.table = table
+        self.index = index
+
+    @property
+    def sort_pub_date(self)->datetime:
+        return datetime.strptime(self.sortpubdate,'%Y/%m/%d %H:%M')
+
+    def to_dict(self)->dict:
+        """
+        Returns the document in the form of the JSON response, the
+        equivalent of PubmedSummary.raw
+        """
+        output = {}
+        for name, key in _SCALAR_FIELDS:
+            output[key] = getattr(self,name)
+        for name, key in _LIST_FIELDS + _OBJECT_FIELDS:
+            output[key] = getattr(self,name)
+        for name, key, keys in _RECORD_FIELDS:
+            output[key] = self._get_records(key)
+        return output
+
+    def _get_records(self, key)->List[dict]:
+        table = self.table
+        values = table.values
+        offsets, columns = table.record_columns[key]
+        start = offsets[self.index]
+        end = offsets[self.index + 1]
+        return [{sub_key:values[column[i]] for sub_key, column in columns.items()}
+                for i in range(start,end)]
+
+    @property
+    def authors(self)->List['PubmedAuthor']:
+        return [PubmedAuthor(x) for x in self._get_records('authors')]
+
+    @property
+    def article_ids(self)->List['PubmedArticleID']:
+        return [PubmedArticleID(x) for x in self._get_records('articleids')]
+
+    @property
+    def history(self)->List[dict]:
+        return self._get_records('history')
+
+    def __repr__(self):
+        return display_class(self,
+              ['uid',self.uid,
+               'title',td(self.title),
+               'source',self.source,
+               'pub_date',self.pub_date,
+               'authors',td(', '.join(x.name for x in self.authors)),
+               'methods', '-----------------------',
+               'to_dict', '() => dict'])
+
+def _scalar_property(key):
+    def fget(self):
+        table = self.table
+        return table.values[table.columns[key][self.index]]
+    return property(fget)
+
+def _list_property(key):
+    def fget(self):
+        table = self.table
+        values = table.values
+        offsets, codes = table.list_columns[key]
+        return [values[x] for x in
+                codes[offsets[self.index]:offsets[self.index + 1]]]
+    return property(fget)
+
+def _object_property(key):
+    def fget(self):
+        return self.table.objects[key].get(self.index,[])
+    return property(fget)
+
+for _name, _key in _SCALAR_FIELDS:
+    setattr(PubmedSummaryRow,_name,_scalar_property(_key))
+for _name, _key in _LIST_FIELDS:
+    setattr(PubmedSummaryRow,_name,_list_property(_key))
+for _name, _key in _OBJECT_FIELDS:
+    setattr(PubmedSummaryRow,_name,_object_property(_key))
+
+#==========================================================
+#                   msgspec Decoding
+#==========================================================
+
+#Attributes of PubmedSummary that are copied as is from the struct
+_STRUCT_ATTRIBUTES = [name for name, key in _SCALAR_FIELDS
+                      if name not in ('last_author','sortpubdate')] + \
+                     [name for name, key in _LIST_FIELDS + _OBJECT_FIELDS] + \
+                     ['history']
+_get_struct_values = operator.attrgetter(*_STRUCT_ATTRIBUTES)
+
+_msgspec_decoder = None
+
+def _get_msgspec_decoder():
+    """
+    Returns a msgspec decoder of esummary responses, created on first use.
+
+    The documents are decoded into structs with the attribute names of
+    PubmedSummary (renamed from the JSON keys), so PubmedSummary.from_struct
+    only has to copy them. Fields missing from a document are None or
+    empty lists. The structs hold no cycles so they aren't tracked by the
+    garbage collector.
+    """
+    global _msgspec_decoder
+    if _msgspec_decoder is not None:
+        return _msgspec_decoder
+
+    import msgspec
+
+    def list_field(name,value_type):
+        return (name,List[value_type],msgspec.field(default_factory=list))
+
+    author = msgspec.defstruct('ESummaryAuthor',
+                               [('type',str,''),
+                                ('cluster_id',str,''),
+                                ('name',str,'')],
+                               rename={'type':'authtype',
+                                       'cluster_id':'clusterid'},
+                               gc=False)
+
+    article_id = msgspec.defstruct('ESummaryArticleID',
+                                   [('id_type',str,''),
+                                    ('enumerated_id_type',Union[int,str,None],None),
+                                    ('value',str,'')],
+                                   rename={'id_type':'idtype',
+                                           'enumerated_id_type':'idtypen'},
+                                   gc=False)
+
+    fields = [(name,Union[str,int,None],None) for name, key in _SCALAR_FIELDS]
+    fields += [list_field(name,str) for name, key in _LIST_FIELDS]
+    fields += [list_field('authors',author),
+               list_field('article_ids',article_id),
+               list_field('history',dict)]
+    fields += [list_field(name,object) for name, key in _OBJECT_FIELDS]
+
+    rename = {name:key for name, key in _SCALAR_FIELDS + _LIST_FIELDS + _OBJECT_FIELDS}
+    rename.update({name:key for name, key, keys in _RECORD_FIELDS})
+    document = msgspec.defstruct('ESummaryDocument',fields,rename=rename,gc=False)
+
+    #'result' holds the list of 'uids' along with each document by uid
+    response = msgspec.defstruct('ESummaryResponse',
+                                 [('header',dict),
+                                  ('result',Dict[str,Union[List[str],document]])])
+
+    _msgspec_decoder = msgspec.json.Decoder(response)
+    return _msgspec_decoder
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Callbacks around the phases of a request.
+
+Usage
+-----
+def print_slow(event):
+    if event.elapsed_time > 1:
+        print(event)
+
+api = API()
+api.hooks.add('post_response',print_slow)
+
+Events
+------
+Each callback is called with a HookEvent. The events of one call to
+API._make_request share a request_id and are, in order:
+
+pre_request : before the cache lookup, params_size is set
+rate_limit_wait : after waiting on the rate limiter, wait_time is set.
+                  Once per attempt.
+post_response : after each attempt (or the cache lookup, cache_hit is
+                True), with the status or error, elapsed_time and n_bytes
+pre_parse : before the handler is called
+post_parse : after the handler, with elapsed_time and n_records. This is
+             always the last event. If the request failed the handler is
+             not called and error is set.
+
+Timings are in seconds, 'time' is time.time() when the event was emitted.
+With no callbacks the events aren't created, so there's little overhead.
+
+Errors in callbacks are logged rather than raised.
+
+See Also
+--------
+pubmed.tracing : OpenTelemetry style spans built from the events
+"""
+
+#Standard Library
+import time
+import logging
+import itertools
+import threading
+from typing import Optional
+
+#Local
+from .utils import display_class
+from .cache import get_endpoint
+
+EVENTS = ('pre_request','rate_limit_wait','post_response','pre_parse','post_parse')
+
+_logger = logging.getLogger('pubmed.hooks')
+
+class HookEvent(object):
+
+    """
+    Attributes
+    ----------
+    name : str
+        One of EVENTS
+    request_id : int
+    endpoint : str
+        e.g. 'efetch'
+    method : str
+    url : str
+    time : float
+        time.time() when the event was emitted
+    params_size : int or None
+        Length of the encoded parameters
+    attempt : int or None
+        1 for the first attempt
+    status : int or None
+        HTTP status
+    cache_hit : bool or None
+    elapsed_time : float or None
+        Duration of the attempt (post_response) or of the handler
+        (post_parse)
+    wait_time : float or None
+    n_bytes : int or None
+        Size of the response body
+    n_records : int or None
+        # of records in the handler output, if known
+    error : Exception or None
+    """
+
+    __slots__ = ['name','request_id','endpoint','method','url','time',
+                 'params_size','attempt','status','cache_hit','elapsed_time',
+                 'wait_time','n_bytes','n_records','error']
+
+    def __init__(self, name, request_id, method, url, **kwargs):
+        self.name = name
+        self.request_id = request_id
+        self.method = method
+        self.url = url
+        self.endpoint = get_endpoint(url).split('.',1)[0]
+        self.time = time.time()
+        self.params_size = kwargs.get('params_size')
+        self.attempt = kwargs.get('attempt')
+        self.status = kwargs.get('status')
+        self.cache_hit = kwargs.get('cache_hit')
+        self.elapsed_time = kwargs.get('elapsed_time')
+        self.wait_time = kwargs.get('wait_time')
+        self.n_bytes = kwargs.get('n_bytes')
+        self.n_records = kwargs.get('n_records')
+        self.error = kwargs.get('error')
+
+    def __repr__(self):
+        return display_class(self,
+                             ['name', self.name,
+                              'request_id', self.request_id,
+                              'endpoint', self.endpoint,
+                              'method', self.method,
+                              'time', self.time,
+                              'params_size', self.params_size,
+                              'attempt', self.attempt,
+                              'status', self.status,
+                              'cache_hit', self.cache_hit,
+                              'elapsed_time', self.elapsed_time,
+                              'wait_time', self.wait_time,
+                              'n_bytes', self.n_bytes,
+                              'n_records', self.n_records,
+                              'error', repr(self.error)])
+
+
+class Hooks(object):
+
+    """
+    Registry of callbacks by event. Evaluates as False when there are no
+    callbacks.
+
+    Attributes
+    ----------
+    callbacks : dict
+        event name => list of callbacks
+    """
+
+    __slots__ = ['callbacks','n_callbacks','counter','lock']
+
+    def __init__(self):
+        self.callbacks = {x:[] for x in EVENTS}
+        self.n_callbacks = 0
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def add(self, event:str, fh):
+        """
+
+        Parameters
+        ----------
+        event : str
+            One of EVENTS
+        fh :
+            Called as fh(HookEvent)
+        """
+        if event not in self.callbacks:
+            raise ValueError('Unrecognized event: %s' % event)
+        with self.lock:
+            #Copied so emit() can iterate without the lock
+            self.callbacks[event] = self.callbacks[event] + [fh]
+            self.n_callbacks += 1
+
+    def remove(self, event:str, fh):
+        with self.lock:
+            temp = list(self.callbacks[event])
+            temp.remove(fh)
+            self.callbacks[event] = temp
+            self.n_callbacks -= 1
+
+    def clear(self):
+        with self.lock:
+            self.callbacks = {x:[] for x in EVENTS}
+            self.n_callbacks = 0
+
+    def new_request_id(self)->int:
+        return next(self.counter)
+
+    def emit(self, name:str, request_id:int, method:str, url:str, **kwargs):
+        callbacks = self.callbacks[name]
+        if not callbacks:
+            return
+        event = HookEvent(name,request_id,method,url,**kwargs)
+        for fh in callbacks:
+            try:
+                fh(event)
+            except Exception:
+                _logger.exception('Error in %s callback %r' % (name,fh))
+
+    def __bool__(self):
+        return self.n_callbacks > 0
+
+    def __repr__(self):
+        return display_class(self,
+                             ['callbacks', {k:len(v) for k,v in self.callbacks.items()},
+                              'methods', '-----------------------',
+                              'add', '(event,fh)',
+                              'remove', '(event,fh)',
+                              'clear', '()'])
+
+
+def get_params_size(params:Optional[dict])->int:
+    """
+    Approximate length of the encoded parameters
+    """
+    if not params:
+        return 0
+    return sum(len(str(k)) + len(str(v)) + 2 for k,v in params.items()
+               if v is not None)
+
+def get_n_records(output)->Optional[int]:
+    """
+    # of records in the output of a handler, None if unknown
+    """
+    docs = getattr(output,'docs',None)
+    if docs is not None:
+        return len(docs)
+    ids = getattr(output,'ids',None)
+    if ids is not None:
+        return len(ids)
+    if isinstance(output,list):
+        return len(output)
+    return None
+
+def get_hooks(hooks)->Hooks:
+    """
+    Resolves the 'hooks' option of the API, None gives an empty registry
+    """
+    if hooks is None:
+        return Hooks()
+    return hooks
@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+"""
+Ingestion of the PubMed baseline and update files from local disk.
+
+The files are downloaded separately, e.g. from
+https://ftp.ncbi.nlm.nih.gov/pubmed/baseline/ and
+https://ftp.ncbi.nlm.nih.gov/pubmed/updatefiles/
+
+Usage
+-----
+def count_journals(path,records):
+    #Runs in a worker process so must be a module level function.
+    #The return value is sent back in FileResult.output
+    counts = {}
+    for record in records:
+        if isinstance(record,PubmedArticle):
+            title = record.citation.article.journal.title
+            counts[title] = counts.get(title,0) + 1
+    return counts
+
+paths = get_files('/data/pubmed/baseline')
+report = ingest(paths,count_journals,checkpoint='baseline.checkpoint.json',
+                parser='lxml',verbose=True)
+
+Each file is streamed through models._iter_article_set in its own worker.
+Records are PubmedArticle, as from api.pubmed.details(ids,return_type='stream'),
+as well as the PubmedBookArticle and DeleteCitation records that the stream
+skips.
+
+Checkpoints
+-----------
+When a checkpoint path is given each file that finishes is recorded in it
+(by name, size and modification time) and skipped when ingest() is run
+again, so an interrupted run can be restarted. Files that failed are
+retried.
+
+Ordering
+--------
+Files finish in any order. The update files need to be applied after the
+baseline and in order (a record may be revised or deleted in a later file),
+so handlers that write to a store should either be run with max_workers=1
+or compare DateRevised before replacing a record, as store.ArticleStore
+does.
+
+See Also
+--------
+models.PubmedArticleSet
+"""
+
+#Standard Library
+import os
+import gzip
+import glob
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, List, Union, Callable
+
+#Local
+from .utils import display_class, quotes
+from . import models
+
+def get_files(directory:str, pattern='*.xml.gz')->List[str]:
+    """
+    Returns the paths of the files in a directory, sorted by name (which
+    is the release order, e.g. pubmed24n0001.xml.gz)
+    """
+    return sorted(glob.glob(os.path.join(directory,pattern)))
+
+def _open(path:str):
+    if path.endswith('.gz'):
+        return gzip.open(path,'rb')
+    else:
+        return open(path,'rb')
+
+class _CountedRecords(object):
+
+    """
+    Passes the records to the handler while counting them by type
+    """
+
+    __slots__ = ['records','n_articles','n_books','n_deleted']
+
+    def __init__(self, records):
+        self.records = records
+        self.n_articles = 0
+        self.n_books = 0
+        self.n_deleted = 0
+
+    def __iter__(self):
+        for record in self.records:
+            if isinstance(record,models.DeleteCitation):
+                self.n_deleted += len(record.pmids)
+            elif isinstance(record,models.PubmedBookArticle):
+                self.n_books += 1
+            else:
+                self.n_articles += 1
+            yield record
+
+
+class FileResult(object):
+
+    """
+    Attributes
+    ----------
+    path : str
+    size : int
+        Size of the file in bytes
+    mtime : float
+        Modification time of the file
+    n_articles : int
+        # of PubmedArticle
+    n_books : int
+        # of PubmedBookArticle
+    n_deleted : int
+        # of PMIDs in DeleteCitation
+    elapsed_time : float
+        Seconds spent on the file in the worker
+    output :
+        Return value of the handler
+    error : str or None
+        Traceback if the file failed
+    """
+
+    __slots__ = ['path','size','mtime','n_articles','n_books','n_deleted',
+                 'elapsed_time','output','error']
+
+    def __init__(self, path:str):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.n_articles = 0
+        self.n_books = 0
+        self.n_deleted = 0
+        self.elapsed_time = 0
+        self.output = None
+        self.error = None
+
+    @property
+    def name(self)->str:
+        return os.path.basename(self.path)
+
+    @property
+    def n_records(self)->int:
+        return self.n_articles + self.n_books + self.n_deleted
+
+    @property
+    def records_per_s(self)->float:
+        if self.elapsed_time == 0:
+            return 0
+        return self.n_records/self.elapsed_time
+
+    def __repr__(self):
+        return display_class(self,
+                             ['path', quotes(self.path),
+                              'size', self.size,
+                              'n_articles', self.n_articles,
+                              'n_books', self.n_books,
+                              'n_deleted', self.n_deleted,
+                              'elapsed_time', '%0.2f' % self.elapsed_time,
+                              'records_per_s', '%0.0f' % self.records_per_s,
+                              'output', type(self.output).__name__,
+                              'error', quotes(self.error)])
+
+def _consume(path, records):
+    #Default handler, only counts the records
+    for record in records:
+        pass
+
+def _ingest_file(path:str, handler:Callable, parser:str, lazy:bool,
+                 leave_raw:bool)->FileResult:
+    #Module level so that it can be run in a worker process
+    result = FileResult(path)
+    start_time = time.perf_counter()
+    records = _CountedRecords(None)
+    try:
+        with _open(path) as f:
+            records.records = models._iter_article_set(f,lazy=lazy,
+                                                      leave_raw=leave_raw,
+                                                      parser=parser)
+            result.output = handler(path,iter(records))
+    except Exception:
+        result.error = traceback.format_exc()
+    result.elapsed_time = time.perf_counter() - start_time
+    result.n_articles = records.n_articles
+    result.n_books = records.n_books
+    result.n_deleted = records.n_deleted
+    return result
+
+
+class IngestCheckpoint(object):
+
+    """
+    Record of the files that have been ingested, saved as JSON.
+
+    Files are identified by name, size and modification time, so a file
+    that has been downloaded again is ingested again.
+
+    Attributes
+    ----------
+    path : str
+    files : dict
+        name => {'size','mtime','n_articles','n_books','n_deleted','done'}
+    """
+
+    __slots__ = ['path','files']
+
+    def __init__(self, path:str):
+        self.path = path
+        if os.path.exists(path):
+            with open(path,'r',encoding='utf-8') as f:
+                self.files = json.load(f)
+        else:
+            self.files = {}
+
+    def is_done(self, path:str)->bool:
+        entry = self.files.get(os.path.basename(path))
+        if entry is None or not entry['done']:
+            return False
+        stat = os.stat(path)
+        return entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime
+
+    def mark_done(self, result:FileResult):
+        self._set(result,True)
+
+    def mark_failed(self, result:FileResult):
+        self._set(result,False)
+
+    def _set(self, result:FileResult, done:bool):
+        self.files[result.name] = {'size':result.size,
+                                   'mtime':result.mtime,
+                                   'n_articles':result.n_articles,
+                                   'n_books':result.n_books,
+                                   'n_deleted':result.n_deleted,
+                                   'done':done}
+        self.save()
+
+    def save(self):
+        #Written to a temporary file first so that an interrupted save
+        #doesn't lose the checkpoint
+        temp_path = self.path + '.tmp'
+        with open(temp_path,'w',encoding='utf-8') as f:
+            json.dump(self.files,f,indent=1,sort_keys=True)
+        os.replace(temp_path,self.path)
+
+    def __repr__(self):
+        n_done = sum(1 for x in self.files.values() if x['done'])
+        return display_class(self,
+                             ['path', quotes(self.path),
+                              'files', '{dict} len(%d)' % len(self.files),
+                              'n_done', n_done,
+                              'methods', '-----------------------',
+                              'is_done', '(path)',
+                              'mark_done', '(result)',
+                              'mark_failed', '(result)'])
+
+
+class IngestReport(object):
+
+    """
+    Attributes
+    ----------
+    files : List[FileResult]
+        In order of completion, excludes skipped files
+    n_skipped : int
+        # of files skipped as they were in the checkpoint
+    elapsed_time : float
+        Wall time of the run
+    """
+
+    __slots__ = ['files','n_skipped','elapsed_time']
+
+    def __init__(self):
+        self.files = []
+        self.n_skipped = 0
+        self.elapsed_time = 0
+
+    @property
+    def n_failed(self)->int:
+        return sum(1 for x in self.files if x.error is not None)
+
+    @property
+    def n_records(self)->int:
+        return sum(x.n_records for x in self.files)
+
+    @property
+    def records_per_s(self)->float:
+        if self.elapsed_time == 0:
+            return 0
+        return self.n_records/self.elapsed_time
+
+    def __repr__(self):
+        return display_class(self,
+                             ['files', '[FileResult] len(%d)' % len(self.files),
+                              'n_skipped', self.n_skipped,
+                              'n_failed', self.n_failed,
+                              'n_records', self.n_records,
+                              'elapsed_time', '%0.2f' % self.elapsed_time,
+                              'records_per_s', '%0.0f' % self.records_per_s])
+
+def ingest(paths:List[str],
+           handler:Optional[Callable]=None,
+           max_workers:Optional[int]=None,
+           checkpoint:Union[str,IngestCheckpoint,None]=None,
+           parser='lxml',
+           lazy=False,
+           leave_raw=False,
+           verbose=False)->IngestReport:
+    """
+    Parses each file in a separate process.
+
+    Parameters
+    ----------
+    paths : list of str
+        .xml.gz or .xml files, see get_files
+    handler : callable
+        Called as handler(path,records) in the worker, where records is an
+        iterator of PubmedArticle, PubmedBookArticle and DeleteCitation.
+        It must be a module level function so that it can be pickled. The
+        return value is kept in FileResult.output. By default the records
+        are only counted.
+    max_workers : int
+        # of processes, defaults to the # of CPUs. With 1 the files are
+        ingested in this process, in order.
+    checkpoint : str or IngestCheckpoint
+        Files already in the checkpoint are skipped and files that finish
+        are added to it.
+    parser : str
+        'lxml' (default) or 'bs4', see model_helpers._make_soup
+    lazy : bool
+        If true, articles are LazyPubmedArticle
+    leave_raw : bool
+        If true, the XML of each article is kept in raw_xml. This is needed
+        by store.ArticleStore
+    verbose : bool
+        If true, prints records/s for each file and for the run
+
+    Returns
+    -------
+    IngestReport
+        A file that fails doesn't stop the run, see FileResult.error
+    """
+
+    if handler is None:
+        handler = _consume
+
+    if isinstance(checkpoint,str):
+        checkpoint = IngestCheckpoint(checkpoint)
+
+    report = IngestReport()
+    todo = []
+    for path in paths:
+        if checkpoint is not None and checkpoint.is_done(path):
+            report.n_skipped += 1
+        else:
+            todo.append(path)
+
+    if verbose and report.n_skipped:
+        print('Skipping %d files already in the checkpoint' % report.n_skipped)
+
+    start_time = time.perf_counter()
+
+    def add_result(result:FileResult):
+        report.files.append(result)
+        if checkpoint is not None:
+            if result.error is None:
+                checkpoint.mark_done(result)
+            else:
+                checkpoint.mark_failed(result)
+        if verbose:
+            if result.error is None:
+                print('%s: %d records in %0.1f s (%0.0f records/s)' %
+                      (result.name,result.n_records,result.elapsed_time,
+                       result.records_per_s))
+            else:
+                print('%s: failed\n%s' % (result.name,result.error))
+
+    if max_workers == 1:
+        for path in todo:
+            add_result(_ingest_file(path,handler,parser,lazy,leave_raw))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_ingest_file,path,handler,parser,lazy,
+                                       leave_raw)
+                       for path in todo]
+            for future in as_completed(futures):
+                add_result(future.result())
+
+    report.elapsed_time = time.perf_counter() - start_time
+
+    if verbose:
+        print('%d files, %d records in %0.1f s (%0.0f records/s)' %
+              (len(report.files),report.n_records,report.elapsed_time,
+               report.records_per_s))
+
+    return report
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Decoding of JSON responses.
+
+Usage
+-----
+api = API()                         #fastest available backend
+api = API(json_backend='json')      #standard library only
+
+Backends
+--------
+orjson : fastest general purpose decoder
+msgspec : also decodes esummary documents with a typed schema, straight
+          into structs whose fields are those of PubmedSummary, skipping
+          the intermediate dicts. See esummary_models.PubmedSummary.from_struct
+json : the standard library
+
+orjson and msgspec are optional. By default the first one installed of
+BACKENDS is used, except that esummary responses are decoded with msgspec's
+typed schema when msgspec is installed, as that is faster than building
+the dicts with orjson. Naming a backend (e.g. json_backend='orjson') uses
+it for everything, with typed decoding only for 'msgspec'.
+
+Handlers call loads(api,response) rather than response.json(), which
+decodes with the standard library after guessing the encoding.
+
+See Also
+--------
+benchmarks/json_backends.py
+"""
+
+#Standard Library
+import json
+from typing import Optional
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .api import API
+    from requests import Response
+
+#Local
+from .utils import display_class
+
+#In order of preference
+BACKENDS = ('orjson','msgspec','json')
+
+class JSONBackend(object):
+
+    """
+    Attributes
+    ----------
+    name : str
+        One of BACKENDS
+    loads :
+        Called as loads(bytes or str)
+    typed_summaries : bool
+        If true esummary responses are decoded by msgspec into structs, see
+        esummary_models.PubmedSummaryResult
+    """
+
+    __slots__ = ['name','loads','typed_summaries']
+
+    def __init__(self, name:str, typed_summaries:Optional[bool]=None):
+        """
+
+        Parameters
+        ----------
+        name : str
+            One of BACKENDS
+        typed_summaries : bool
+            Defaults to True for msgspec only. msgspec must be installed.
+        """
+        if name == 'orjson':
+            import orjson
+            self.loads = orjson.loads
+        elif name == 'msgspec':
+            import msgspec
+            self.loads = msgspec.json.decode
+        elif name == 'json':
+            self.loads = json.loads
+        else:
+            raise ValueError('Unrecognized json_backend option: %s' % name)
+        self.name = name
+
+        if typed_summaries is None:
+            typed_summaries = name == 'msgspec'
+        elif typed_summaries:
+            #ImportError if not installed
+            import msgspec
+        self.typed_summaries = typed_summaries
+
+    def __repr__(self):
+        return display_class(self,['name', self.name,
+                                   'typed_summaries', self.typed_summaries])
+
+def get_available_backends():
+    """
+    Returns the names of the backends that can be imported, in order of
+    preference
+    """
+    output = []
+    for name in BACKENDS:
+        try:
+            JSONBackend(name)
+        except ImportError:
+            continue
+        output.append(name)
+    return output
+
+_default_backend = None
+
+def get_default_backend()->JSONBackend:
+    """
+    The first available of BACKENDS, created on first use. esummary
+    responses use msgspec if it is available.
+    """
+    global _default_backend
+    if _default_backend is None:
+        names = get_available_backends()
+        _default_backend = JSONBackend(names[0],
+                                       typed_summaries='msgspec' in names)
+    return _default_backend
+
+def get_json_backend(json_backend)->JSONBackend:
+    """
+    Resolves the 'json_backend' option of the API.
+
+    Parameters
+    ----------
+    json_backend :
+        - None or 'auto' : the first available of BACKENDS, with typed
+                           esummary decoding if msgspec is installed
+        - str : one of BACKENDS, raises ImportError if not installed
+        - JSONBackend instance
+    """
+    if json_backend is None or json_backend == 'auto':
+        return get_default_backend()
+    elif isinstance(json_backend,str):
+        return JSONBackend(json_backend)
+    else:
+        return json_backend
+
+def _get_backend(api:Optional['API'])->JSONBackend:
+    #The API is None when handlers are called directly, e.g. benchmarks
+    backend = getattr(api,'json_backend',None)
+    if backend is None:
+        return get_default_backend()
+    return backend
+
+def loads(api:Optional['API'], response:'Response'):
+    """
+    Decodes the body of a response with the backend of the API
+    """
+    return _get_backend(api).loads(response.content)
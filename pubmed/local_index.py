@@ -0,0 +1,632 @@
+# -*- coding: utf-8 -*-
+"""
+Inverted index of locally stored articles, for searching offline.
+
+Usage
+-----
+store = ArticleStore('/data/pubmed/articles.sqlite')
+index = build_index(store,'/data/pubmed/index.sqlite')
+
+search = LocalSearch(index)
+result = search.search('bladder afferent',max=100)   #JSONSearchResult
+ids = search.search('grill wm[au] AND bladder[ti]',return_type='ids')
+
+The index covers the title, abstract, MeSH headings, keywords, authors and
+journal of each article. Terms are prefixed by their field (see FIELDS),
+e.g. 'ti:bladder', 'mh:urinary bladder' or 'au:grill wm'. Queries use
+PubMed's syntax, see query_parser. Words without a field are matched
+against the fields in DEFAULT_FIELDS. Results are sorted by PMID, most
+recent first.
+
+Postings
+--------
+The PMIDs of each term are sorted and delta encoded as varints (7 bits
+per byte, the high bit set on all but the last byte of a value), so most
+postings take 1-2 bytes. They are encoded in blocks of SKIP_INTERVAL
+PMIDs, and the last PMID and byte offset of each block are kept as skip
+pointers so that a block can be decoded without the ones before it.
+
+Publication dates are kept as a sorted array of YYYYMMDD values (missing
+months and days are 0) with the matching PMIDs, for range lookups.
+
+The index is saved as a SQLite database with one row per term. Postings
+are loaded as needed, with the most recent ones cached.
+
+The index is built from scratch, IndexBuilder has no updates or deletes.
+"""
+
+#Standard Library
+import re
+import json
+import time
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from typing import Optional, List, Union, Iterable, Tuple
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .api import API
+    from .einfo_models import DbInfo
+    from .models import PubmedArticle
+    from .store import ArticleStore
+
+#Local
+from .utils import display_class, quotes
+from .esearch_models import JSONSearchResult
+
+#Field prefixes of the terms, and their names in PubMed's query translation
+FIELDS = {
+    'ti': 'Title',
+    'ab': 'Abstract',
+    'mh': 'MeSH Terms',
+    'kw': 'Other Term',
+    'au': 'Author',
+    'fa': 'Author - First',
+    'ta': 'Journal',
+    }
+
+#Fields searched by words without a field
+DEFAULT_FIELDS = ('ti','ab','mh','kw','au')
+
+#Term with the PMIDs of all articles
+ALL_TERM = '*'
+
+#PMIDs per block of postings
+SKIP_INTERVAL = 128
+
+_WORD = re.compile(r'\w+')
+
+_MONTHS = {'jan':1,'feb':2,'mar':3,'apr':4,'may':5,'jun':6,'jul':7,'aug':8,
+           'sep':9,'oct':10,'nov':11,'dec':12}
+
+def tokenize(text:Optional[str])->List[str]:
+    """
+    Returns the lower case words of the text
+    """
+    if not text:
+        return []
+    return _WORD.findall(text.lower())
+
+def normalize_phrase(text:str)->str:
+    """
+    Phrases such as MeSH headings and author names are indexed as their
+    words joined by spaces, e.g. 'Bladder, Neurogenic' => 'bladder neurogenic'
+    """
+    return ' '.join(tokenize(text))
+
+def get_date_value(year, month=None, day=None, medline_date=None)->Optional[int]:
+    """
+    Returns a publication date as YYYYMMDD, with 0 for a missing month or
+    day. Only the year is taken from a MedlineDate, e.g. '1998 Dec-1999 Jan'
+    """
+    if year is None:
+        if medline_date is None:
+            return None
+        match = re.search(r'\d{4}',medline_date)
+        if match is None:
+            return None
+        return int(match.group())*10000
+
+    if month is None:
+        month = 0
+    elif month.isdigit():
+        month = int(month)
+    else:
+        month = _MONTHS.get(month[:3].lower(),0)
+
+    if day is None or not day.isdigit():
+        day = 0
+    else:
+        day = int(day)
+
+    return int(year)*10000 + month*100 + day
+
+#==========================================================
+#                   Postings
+#==========================================================
+
+def encode_varints(values:Iterable[int], last:int=0)->bytearray:
+    """
+    Delta encodes sorted values, starting from last
+    """
+    output = bytearray()
+    for value in values:
+        delta = value - last
+        last = value
+        while delta > 0x7F:
+            output.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        output.append(delta)
+    return output
+
+def decode_varints(data, last:int=0, start:int=0, n:Optional[int]=None)->List[int]:
+    """
+    Inverse of encode_varints, decodes n values (default all) from byte
+    start of data
+    """
+    output = []
+    value = 0
+    shift = 0
+    for i in range(start,len(data)):
+        b = data[i]
+        if b & 0x80:
+            value |= (b & 0x7F) << shift
+            shift += 7
+        else:
+            last += value | (b << shift)
+            output.append(last)
+            if len(output) == n:
+                break
+            value = 0
+            shift = 0
+    return output
+
+
+class Postings(object):
+
+    """
+    Compressed sorted PMIDs of a term.
+
+    Attributes
+    ----------
+    n : int
+        # of PMIDs
+    data : bytes
+        Delta encoded varints, see encode_varints
+    skip_pmids : array('I')
+        The last PMID of each block of SKIP_INTERVAL PMIDs
+    skip_offsets : array('I')
+        Byte offset of the start of each block in data
+    """
+
+    __slots__ = ['n','data','skip_pmids','skip_offsets']
+
+    def __init__(self, n:int, data:bytes, skip_pmids:array, skip_offsets:array):
+        self.n = n
+        self.data = data
+        self.skip_pmids = skip_pmids
+        self.skip_offsets = skip_offsets
+
+    @classmethod
+    def from_pmids(cls, pmids:List[int])->'Postings':
+        """
+        pmids must be sorted and unique
+        """
+        data = bytearray()
+        skip_pmids = array('I')
+        skip_offsets = array('I')
+        last = 0
+        for i in range(0,len(pmids),SKIP_INTERVAL):
+            block = pmids[i:i+SKIP_INTERVAL]
+            skip_offsets.append(len(data))
+            data += encode_varints(block,last)
+            last = block[-1]
+            skip_pmids.append(last)
+        return cls(len(pmids),bytes(data),skip_pmids,skip_offsets)
+
+    @property
+    def n_blocks(self)->int:
+        return len(self.skip_offsets)
+
+    def decode_block(self, index:int)->List[int]:
+        if index == 0:
+            last = 0
+        else:
+            last = self.skip_pmids[index-1]
+        return decode_varints(self.data,last,self.skip_offsets[index],
+                              SKIP_INTERVAL)
+
+    def to_list(self)->List[int]:
+        return decode_varints(self.data)
+
+    def __len__(self):
+        return self.n
+
+    def __repr__(self):
+        return display_class(self,
+                             ['n', self.n,
+                              'data', '%d bytes' % len(self.data),
+                              'n_blocks', self.n_blocks,
+                              'methods', '-----------------------',
+                              'decode_block', '(index)',
+                              'to_list', '()'])
+
+#==========================================================
+#                   Building
+#==========================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT PRIMARY KEY,
+    n INTEGER,
+    data BLOB,
+    skip_pmids BLOB,
+    skip_offsets BLOB);
+CREATE TABLE IF NOT EXISTS dates (
+    name TEXT PRIMARY KEY,
+    dates BLOB,
+    pmids BLOB);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT);
+"""
+
+class IndexBuilder(object):
+
+    """
+    Collects the terms of each article, in memory, and writes the index.
+
+    Attributes
+    ----------
+    terms : dict
+        term => array('I') of PMIDs, in the order they were added
+    pub_dates : dict
+        PMID => YYYYMMDD
+    """
+
+    def __init__(self):
+        self.terms = defaultdict(lambda: array('I'))
+        self.pub_dates = {}
+
+    #---- Fields ----------------------------------
+    def _add_words(self, field:str, pmid:int, text:Optional[str]):
+        terms = self.terms
+        for word in set(tokenize(text)):
+            terms[field + ':' + word].append(pmid)
+
+    def _add_phrase(self, field:str, pmid:int, text:Optional[str], words=True):
+        #The whole phrase and, optionally, its words
+        tokens = tokenize(text)
+        if not tokens:
+            return
+        names = set(tokens) if words else set()
+        names.add(' '.join(tokens))
+        terms = self.terms
+        for name in names:
+            terms[field + ':' + name].append(pmid)
+
+    def _add_author(self, pmid:int, position:int, last_name:Optional[str],
+                    initials:Optional[str], collective_name:Optional[str]):
+        #e.g. Grill WM => 'grill wm', 'grill w' and 'grill'
+        if last_name is None:
+            names = [normalize_phrase(collective_name or '')]
+        else:
+            last_name = normalize_phrase(last_name)
+            names = [last_name]
+            if initials:
+                initials = initials.lower()
+                names.append(last_name + ' ' + initials)
+                if len(initials) > 1:
+                    names.append(last_name + ' ' + initials[0])
+
+        fields = ('au','fa') if position == 0 else ('au',)
+        terms = self.terms
+        for name in names:
+            if name:
+                for field in fields:
+                    terms[field + ':' + name].append(pmid)
+
+    def _add_article_row(self, pmid:int, title, abstract, journal_names,
+                         pub_date:Optional[int]):
+        self.terms[ALL_TERM].append(pmid)
+        self._add_words('ti',pmid,title)
+        self._add_words('ab',pmid,abstract)
+        for name in journal_names:
+            self._add_phrase('ta',pmid,name,words=False)
+        if pub_date is not None:
+            self.pub_dates[pmid] = pub_date
+
+    #---- Sources ---------------------------------
+    def add_article(self, doc:'PubmedArticle'):
+        citation = doc.citation
+        article = citation.article
+        journal = article.journal
+        pub_date = journal.issue.pub_date
+        pmid = int(citation.pmid)
+
+        self._add_article_row(pmid,article.title,
+                              ' '.join(x for x in article.abstracts or () if x),
+                              (journal.title,journal.iso_abbreviation,
+                               citation.journal_info.medline_ta),
+                              get_date_value(pub_date.year,pub_date.month,
+                                             pub_date.day,pub_date.date))
+        for i, x in enumerate(article.authors or ()):
+            self._add_author(pmid,i,x.last_name,x.initials,x.collective_name)
+        for x in citation.mesh_headings or ():
+            self._add_phrase('mh',pmid,x.name)
+        for keyword_list in citation.keyword_lists or ():
+            for x in keyword_list.keywords:
+                self._add_phrase('kw',pmid,x.value)
+
+    def add_articles(self, docs:Iterable['PubmedArticle']):
+        for doc in docs:
+            self.add_article(doc)
+
+    def add_store(self, store:'ArticleStore'):
+        """
+        Adds all articles of a store.ArticleStore, reading its tables
+        rather than rebuilding each article
+        """
+        db = store.db
+        for row in db.execute("""SELECT pmid, title, abstract, journal_title,
+                              iso_abbreviation, medline_ta, pub_year, pub_month,
+                              pub_day, pub_medline_date FROM articles"""):
+            self._add_article_row(int(row[0]),row[1],row[2],row[3:6],
+                                  get_date_value(*row[6:]))
+        for pmid, position, last_name, initials, collective_name in db.execute(
+                """SELECT pmid, position, last_name, initials, collective_name
+                FROM authors"""):
+            self._add_author(int(pmid),position,last_name,initials,
+                             collective_name)
+        for pmid, name in db.execute('SELECT pmid, name FROM mesh'):
+            self._add_phrase('mh',int(pmid),name)
+        for pmid, value in db.execute('SELECT pmid, value FROM keywords'):
+            self._add_phrase('kw',int(pmid),value)
+
+    #---- Writing ---------------------------------
+    def write(self, path:str)->'LocalIndex':
+        """
+        Writes the index, replacing any index at the path
+        """
+        db = sqlite3.connect(path)
+        db.executescript(_SCHEMA)
+        with db:
+            for name in ('postings','dates','meta'):
+                db.execute('DELETE FROM %s' % name)
+
+            rows = []
+            for term, pmids in self.terms.items():
+                postings = Postings.from_pmids(sorted(set(pmids)))
+                rows.append((term,postings.n,postings.data,
+                             postings.skip_pmids.tobytes(),
+                             postings.skip_offsets.tobytes()))
+                if len(rows) == 10000:
+                    db.executemany('INSERT INTO postings VALUES (?,?,?,?,?)',rows)
+                    rows = []
+            db.executemany('INSERT INTO postings VALUES (?,?,?,?,?)',rows)
+
+            items = sorted((date,pmid) for pmid, date in self.pub_dates.items())
+            db.execute('INSERT INTO dates VALUES (?,?,?)',
+                       ('pdat',array('I',[x[0] for x in items]).tobytes(),
+                        array('I',[x[1] for x in items]).tobytes()))
+
+            n_docs = len(set(self.terms[ALL_TERM]))
+            db.executemany('INSERT INTO meta VALUES (?,?)',
+                           [('n_docs',str(n_docs)),
+                            ('created',str(time.time()))])
+        db.close()
+        return LocalIndex(path)
+
+    def __repr__(self):
+        return display_class(self,
+                             ['terms', '{dict} len(%d)' % len(self.terms),
+                              'pub_dates', '{dict} len(%d)' % len(self.pub_dates),
+                              'methods', '-----------------------',
+                              'add_article', '(doc)',
+                              'add_articles', '(docs)',
+                              'add_store', '(store)',
+                              'write', '(path)'])
+
+def build_index(store:'ArticleStore', path:str)->'LocalIndex':
+    """
+    Builds the index of all articles in a store.ArticleStore
+    """
+    builder = IndexBuilder()
+    builder.add_store(store)
+    return builder.write(path)
+
+#==========================================================
+#                   Reading
+#==========================================================
+
+class LocalIndex(object):
+
+    """
+    Attributes
+    ----------
+    path : str
+    n_docs : int
+    max_cached : int
+        # of decoded Postings to keep in memory
+    """
+
+    def __init__(self, path:str, max_cached:int=1000):
+        self.path = path
+        self.max_cached = max_cached
+        self.db = sqlite3.connect(path,check_same_thread=False)
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.dates = {}
+        with self.lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'n_docs'").fetchone()
+        self.n_docs = 0 if row is None else int(row[0])
+
+    def get_postings(self, term:str)->Optional[Postings]:
+        """
+        Returns the Postings of a field prefixed term, e.g. 'ti:bladder',
+        or None if the term is not in the index
+        """
+        with self.lock:
+            postings = self.cache.get(term)
+            if postings is not None:
+                self.cache.move_to_end(term)
+                return postings
+
+            row = self.db.execute("""SELECT n, data, skip_pmids, skip_offsets
+                                  FROM postings WHERE term = ?""",(term,)).fetchone()
+            if row is None:
+                return None
+
+            n, data, skip_pmids, skip_offsets = row
+            postings = Postings(n,data,array('I',skip_pmids),
+                                array('I',skip_offsets))
+            self.cache[term] = postings
+            while len(self.cache) > self.max_cached:
+                self.cache.popitem(last=False)
+            return postings
+
+    def get_pmids(self, term:str)->List[int]:
+        postings = self.get_postings(term)
+        if postings is None:
+            return []
+        return postings.to_list()
+
+    def get_count(self, term:str)->int:
+        postings = self.get_postings(term)
+        return 0 if postings is None else postings.n
+
+    def get_terms(self, prefix:str)->List[str]:
+        """
+        Returns the terms starting with prefix, e.g. 'ti:bladd'
+        """
+        with self.lock:
+            return [x for x, in self.db.execute(
+                """SELECT term FROM postings WHERE term >= ? AND term < ?
+                ORDER BY term""",(prefix,prefix + '\U0010ffff'))]
+
+    def _get_dates(self, name:str)->Tuple[array,array]:
+        dates = self.dates.get(name)
+        if dates is None:
+            with self.lock:
+                row = self.db.execute('SELECT dates, pmids FROM dates WHERE name = ?',
+                                      (name,)).fetchone()
+            if row is None:
+                dates = (array('I'),array('I'))
+            else:
+                dates = (array('I',row[0]),array('I',row[1]))
+            self.dates[name] = dates
+        return dates
+
+    def get_date_range(self, min_date:int, max_date:int, name='pdat')->List[int]:
+        """
+        Returns the sorted PMIDs with a date (YYYYMMDD) from min_date to
+        max_date, inclusive
+        """
+        dates, pmids = self._get_dates(name)
+        i1 = bisect_left(dates,min_date)
+        i2 = bisect_right(dates,max_date)
+        return sorted(pmids[i1:i2])
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def __repr__(self):
+        return display_class(self,
+                             ['path', quotes(self.path),
+                              'n_docs', self.n_docs,
+                              'max_cached', self.max_cached,
+                              'methods', '-----------------------',
+                              'get_postings', '(term)',
+                              'get_pmids', '(term)',
+                              'get_count', '(term)',
+                              'get_terms', '(prefix)',
+                              'get_date_range', '(min_date,max_date)'])
+
+#==========================================================
+#                   Searching
+#==========================================================
+
+def make_search_data(ids:List[str], count:int, start:int,
+                     translation_stack:list, query_translation:str)->dict:
+    """
+    Returns a result in the format of esearch's JSON response
+    """
+    return {'header':{'type':'esearch','version':'0.3'},
+            'esearchresult':{'count':str(count),
+                             'retmax':str(len(ids)),
+                             'retstart':str(start),
+                             'idlist':ids,
+                             'translationset':[],
+                             'translationstack':translation_stack,
+                             'querytranslation':query_translation}}
+
+
+class LocalSearch(object):
+
+    """
+    Offline counterpart of Pubmed.search
+
+    Attributes
+    ----------
+    index : LocalIndex
+    api : API or None
+        Passed to JSONSearchResult
+    evaluator : query_parser.QueryEvaluator
+    """
+
+    def __init__(self, index:Union[str,LocalIndex], api:Optional['API']=None,
+                 db_info:Optional['DbInfo']=None):
+        """
+
+        Parameters
+        ----------
+        db_info : einfo_models.DbInfo
+            Field names for queries, see query_parser.QueryParser
+        """
+        #query_parser imports this module
+        from .query_parser import QueryParser, QueryEvaluator
+
+        if isinstance(index,str):
+            index = LocalIndex(index)
+        self.index = index
+        self.api = api
+        self.evaluator = QueryEvaluator(index,QueryParser(db_info))
+
+    def evaluate(self, query:str)->Tuple[List[int],list,str]:
+        """
+        Returns the sorted PMIDs matching the query, along with the
+        translation stack and query translation
+        """
+        return self.evaluator.search(query)
+
+    def search(self, query:str, start:Optional[int]=None, max:Optional[int]=None,
+               return_type='object'):
+        """
+        Parameters
+        ----------
+        start : default 0
+        max : default 20
+        return_type :
+            - 'ids'
+            - 'object' - esearch_models.JSONSearchResult
+            - 'json' - dict in the format of esearch's JSON
+            - 'text-json'
+
+        See Also
+        --------
+        Pubmed.search
+        """
+        if start is None:
+            start = 0
+        if max is None:
+            max = 20
+
+        pmids, stack, translation = self.evaluate(query)
+        #Most recent first
+        pmids.reverse()
+        ids = [str(x) for x in pmids[start:start+max]]
+
+        if return_type == 'ids':
+            return ids
+
+        data = make_search_data(ids,len(pmids),start,stack,translation)
+        if return_type == 'object':
+            return JSONSearchResult.from_data(self.api,data)
+        elif return_type == 'json':
+            return data
+        elif return_type == 'text-json':
+            return json.dumps(data)
+        else:
+            raise ValueError('Unrecognized return type')
+
+    def __repr__(self):
+        return display_class(self,
+                             ['index', self.index.path,
+                              'n_docs', self.index.n_docs,
+                              'methods', '-----------------------',
+                              'search', '(query,start,max,return_type)',
+                              'evaluate', '(query)'])
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+lxml backend for the XML models.
+
+The models were written against BeautifulSoup tags. Rather than duplicating
+every model, the classes below wrap lxml elements with the subset of the
+BeautifulSoup API that the models use:
+
+    tag.Name            first descendant with that name, or None
+    tag.string          bs4 semantics, see LxmlTag.string
+    tag['attr']
+    tag.attrs
+    tag.name
+    tag.contents
+    tag.find(name,recursive=True)
+    tag.find_all(name,recursive=True)
+    tag.encode()
+
+Lookups go through lxml's C-level tag filters (iterchildren/iterdescendants)
+and values are plain Python strings, so nothing references the tree once a
+model has been built.
+
+Usage
+-----
+api = API(parser='lxml')
+
+See Also
+--------
+model_helpers._make_soup
+"""
+
+#Standard Library
+import threading
+
+#Third Party
+from lxml import etree
+
+#Parsers can't be shared between threads, see API._fan_out
+_local = threading.local()
+
+def _get_parser():
+    parser = getattr(_local,'parser',None)
+    if parser is None:
+        parser = etree.XMLParser(load_dtd=False,
+                                 no_network=True,
+                                 resolve_entities=False,
+                                 huge_tree=True)
+        _local.parser = parser
+    return parser
+
+class LxmlString(str):
+
+    """
+    Text in LxmlTag.contents. Like bs4's NavigableString it has a name of
+    None, which the models use to skip whitespace between tags.
+    """
+
+    __slots__ = []
+
+    name = None
+
+    @property
+    def string(self):
+        return self
+
+
+class LxmlTag(object):
+
+    """
+    Wrapper of an lxml element that looks like a bs4 Tag.
+    """
+
+    __slots__ = ['elem']
+
+    def __init__(self, elem):
+        self.elem = elem
+
+    def __getattr__(self, name):
+        #Only called for names that aren't attributes of the class, i.e.
+        #child lookups like tag.PMID
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        #Like bs4 this returns the first descendant with the name, in
+        #document order, so a nested match can come before a direct child
+        for child in self.elem.iterdescendants(name):
+            return LxmlTag(child)
+        return None
+
+    @property
+    def name(self):
+        return _get_name(self.elem)
+
+    @property
+    def string(self):
+        """
+        Same as bs4, the text if the tag only holds text, the string of the
+        only child if it only has one child, and None otherwise.
+        """
+        elem = self.elem
+        while True:
+            n_children = len(elem)
+            if n_children == 0:
+                return elem.text
+            elif n_children == 1 and not elem.text and not elem[0].tail:
+                elem = elem[0]
+            else:
+                return None
+
+    @property
+    def attrs(self):
+        #A copy, the attrib proxy would keep the whole tree alive
+        return dict(self.elem.attrib)
+
+    @property
+    def contents(self):
+        elem = self.elem
+        output = []
+        if elem.text:
+            output.append(LxmlString(elem.text))
+        for child in elem:
+            output.append(LxmlTag(child))
+            if child.tail:
+                output.append(LxmlString(child.tail))
+        return output
+
+    def find(self, name, recursive=True):
+        if recursive:
+            children = self.elem.iterdescendants(name)
+        else:
+            children = self.elem.iterchildren(name)
+        for child in children:
+            return LxmlTag(child)
+        return None
+
+    def find_all(self, name, recursive=True):
+        if recursive:
+            children = self.elem.iterdescendants(name)
+        else:
+            children = self.elem.iterchildren(name)
+        return [LxmlTag(x) for x in children]
+
+    def encode(self)->bytes:
+        return etree.tostring(self.elem,with_tail=False)
+
+    def __getitem__(self, key):
+        return self.elem.attrib[key]
+
+    def __iter__(self):
+        return iter(self.contents)
+
+    def __len__(self):
+        return len(self.contents)
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return '<LxmlTag %s>' % self.name
+
+
+class LxmlDocument(object):
+
+    """
+    Equivalent of the BeautifulSoup object. The first entry in contents is
+    the doctype (without '<!DOCTYPE' and '>'), as expected by
+    model_helpers.XMLInfo.
+    """
+
+    __slots__ = ['tree','root']
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.root = LxmlTag(tree.getroot())
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self.root.name == name:
+            return self.root
+        return getattr(self.root,name)
+
+    @property
+    def name(self):
+        return '[document]'
+
+    @property
+    def contents(self):
+        doctype = self.tree.docinfo.doctype
+        if doctype:
+            return [LxmlString(doctype[len('<!DOCTYPE '):-1]), self.root]
+        else:
+            return [self.root]
+
+    def find(self, name, recursive=True):
+        if self.root.name == name:
+            return self.root
+        elif recursive:
+            return self.root.find(name)
+        else:
+            return None
+
+    def find_all(self, name, recursive=True):
+        output = []
+        if self.root.name == name:
+            output.append(self.root)
+        if recursive:
+            output.extend(self.root.find_all(name))
+        return output
+
+
+def make_document(data)->LxmlDocument:
+    """
+
+    Parameters
+    ----------
+    data : str or bytes
+    """
+    if isinstance(data,str):
+        #lxml won't parse str that has an encoding declaration
+        data = data.encode('utf-8')
+    root = etree.fromstring(data,_get_parser())
+    return LxmlDocument(root.getroottree())
+
+def _get_name(elem):
+    tag = elem.tag
+    if not isinstance(tag,str):
+        #Comments and processing instructions
+        return None
+    if tag[0] == '{':
+        #e.g. mml:math
+        qname = etree.QName(elem)
+        if elem.prefix:
+            return elem.prefix + ':' + qname.localname
+        return qname.localname
+    return tag
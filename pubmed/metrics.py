@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""
+Counters and histograms of the requests made by an API instance.
+
+Usage
+-----
+api = API()                 #metrics are collected by default
+api = API(metrics=False)    #NullMetrics, nothing is recorded
+
+api.pubmed.details(ids)
+api.metrics.snapshot()      #dict
+api.metrics.to_prometheus() #Prometheus text exposition format
+api.metrics.log()           #one JSON log line per endpoint
+
+Everything is broken down by endpoint (the last part of the URL without
+its extension, e.g. 'efetch'):
+
+requests : by status, one per attempt so retried requests count twice
+network_seconds : time from sending the request to receiving the response
+                  (only the headers for streamed requests)
+wait_seconds : time spent waiting on the rate limiter
+parse_seconds : time spent in the response handler
+bytes_received, bytes_sent : bodies, and the URL for GET requests
+cache_hits, cache_misses : response cache lookups
+retries
+errors : by class, for requests that raised and handlers that failed
+
+QueryLogger still holds the last request, for debugging.
+"""
+
+#Standard Library
+import json
+import time
+import bisect
+import logging
+import threading
+from typing import Optional, List
+
+#Local
+from .utils import display_class
+from .cache import get_endpoint
+
+#Upper bounds of the histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0,30.0,60.0)
+
+_logger = logging.getLogger('pubmed.metrics')
+
+def get_endpoint_name(url:str)->str:
+    return get_endpoint(url).split('.',1)[0]
+
+class Histogram(object):
+
+    """
+    Attributes
+    ----------
+    buckets : tuple
+        Upper bounds, the last (implicit) bucket is +Inf
+    counts : list
+        # of observations per bucket, not cumulative
+    count : int
+    sum : float
+    max : float
+    """
+
+    __slots__ = ['buckets','counts','count','sum','max']
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0]*(len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value:float):
+        self.counts[bisect.bisect_left(self.buckets,value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def get_quantile(self, q:float)->float:
+        """
+        Upper bound of the bucket holding the q-th quantile. For the last
+        bucket the maximum is returned.
+        """
+        if self.count == 0:
+            return 0.0
+        target = q*self.count
+        total = 0
+        for bound, n in zip(self.buckets,self.counts):
+            total += n
+            if total >= target:
+                return min(bound,self.max)
+        return self.max
+
+    def to_dict(self)->dict:
+        return {'count':self.count,
+                'sum':self.sum,
+                'mean':self.sum/self.count if self.count else 0.0,
+                'p50':self.get_quantile(0.5),
+                'p95':self.get_quantile(0.95),
+                'max':self.max}
+
+    def __repr__(self):
+        return display_class(self,
+                             ['count', self.count,
+                              'sum', self.sum,
+                              'max', self.max,
+                              'p50', self.get_quantile(0.5),
+                              'p95', self.get_quantile(0.95)])
+
+
+class EndpointMetrics(object):
+
+    """
+    Metrics of one endpoint, see the module documentation.
+
+    Attributes
+    ----------
+    requests : dict
+        status => count, the status is 'error' if the request raised
+    network_seconds : Histogram
+    wait_seconds : Histogram
+    parse_seconds : Histogram
+    bytes_received : int
+    bytes_sent : int
+    cache_hits : int
+    cache_misses : int
+    retries : int
+    errors : dict
+        error class name => count
+    """
+
+    __slots__ = ['requests','network_seconds','wait_seconds','parse_seconds',
+                 'bytes_received','bytes_sent','cache_hits','cache_misses',
+                 'retries','errors']
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.requests = {}
+        self.network_seconds = Histogram(buckets)
+        self.wait_seconds = Histogram(buckets)
+        self.parse_seconds = Histogram(buckets)
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.retries = 0
+        self.errors = {}
+
+    def to_dict(self)->dict:
+        return {'requests':dict(self.requests),
+                'n_requests':sum(self.requests.values()),
+                'network_seconds':self.network_seconds.to_dict(),
+                'wait_seconds':self.wait_seconds.to_dict(),
+                'parse_seconds':self.parse_seconds.to_dict(),
+                'bytes_received':self.bytes_received,
+                'bytes_sent':self.bytes_sent,
+                'cache_hits':self.cache_hits,
+                'cache_misses':self.cache_misses,
+                'retries':self.retries,
+                'errors':dict(self.errors)}
+
+    def __repr__(self):
+        return display_class(self,
+                             ['requests', self.requests,
+                              'network_seconds', self.network_seconds.to_dict(),
+                              'wait_seconds', self.wait_seconds.to_dict(),
+                              'parse_seconds', self.parse_seconds.to_dict(),
+                              'bytes_received', self.bytes_received,
+                              'bytes_sent', self.bytes_sent,
+                              'cache_hits', self.cache_hits,
+                              'cache_misses', self.cache_misses,
+                              'retries', self.retries,
+                              'errors', self.errors])
+
+
+class Metrics(object):
+
+    """
+    Attributes
+    ----------
+    endpoints : dict
+        endpoint name => EndpointMetrics
+    start_time : float
+        time.time() of creation or of the last reset
+    """
+
+    __slots__ = ['endpoints','buckets','start_time','lock']
+
+    enabled = True
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.endpoints = {}
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+
+    def _get(self, url)->EndpointMetrics:
+        #Call with the lock held
+        name = get_endpoint_name(url)
+        output = self.endpoints.get(name)
+        if output is None:
+            output = EndpointMetrics(self.buckets)
+            self.endpoints[name] = output
+        return output
+
+    #---- Recording --------------------------------
+    def observe_request(self, url:str, elapsed_time:float, response=None,
+                        error:Optional[Exception]=None, stream=False):
+        """
+        Records one attempt at a request, which either returned a response
+        or raised an error.
+        """
+        if response is not None:
+            status = str(response.status_code)
+            n_in = _get_n_bytes_received(response,stream)
+            request = response.request
+            if request is None:
+                n_out = 0
+            elif request.body is not None:
+                n_out = len(request.body)
+            else:
+                n_out = len(request.url)
+        else:
+            status = 'error'
+            n_in = n_out = 0
+
+        with self.lock:
+            m = self._get(url)
+            m.requests[status] = m.requests.get(status,0) + 1
+            m.network_seconds.observe(elapsed_time)
+            m.bytes_received += n_in
+            m.bytes_sent += n_out
+            if error is not None:
+                name = error.__class__.__name__
+                m.errors[name] = m.errors.get(name,0) + 1
+
+    def observe_wait(self, url:str, wait_time:float):
+        with self.lock:
+            self._get(url).wait_seconds.observe(wait_time)
+
+    def observe_parse(self, url:str, elapsed_time:float,
+                      error:Optional[Exception]=None):
+        with self.lock:
+            m = self._get(url)
+            m.parse_seconds.observe(elapsed_time)
+            if error is not None:
+                name = error.__class__.__name__
+                m.errors[name] = m.errors.get(name,0) + 1
+
+    def observe_cache(self, url:str, hit:bool):
+        with self.lock:
+            m = self._get(url)
+            if hit:
+                m.cache_hits += 1
+            else:
+                m.cache_misses += 1
+
+    def observe_retry(self, url:str):
+        with self.lock:
+            self._get(url).retries += 1
+
+    def observe_error(self, url:str, error:Exception):
+        with self.lock:
+            m = self._get(url)
+            name = error.__class__.__name__
+            m.errors[name] = m.errors.get(name,0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+            self.start_time = time.time()
+
+    #---- Output -----------------------------------
+    def snapshot(self)->dict:
+        """
+        Returns the metrics as a dict (JSON serializable)
+        """
+        with self.lock:
+            return {'start_time':self.start_time,
+                    'elapsed_time':time.time() - self.start_time,
+                    'endpoints':{k:v.to_dict() for k,v in self.endpoints.items()}}
+
+    def to_prometheus(self, prefix='pubmed')->str:
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def add_header(name,kind,text):
+            lines.append('# HELP %s_%s %s' % (prefix,name,text))
+            lines.append('# TYPE %s_%s %s' % (prefix,name,kind))
+
+        with self.lock:
+            items = sorted(self.endpoints.items())
+
+            add_header('requests_total','counter','Requests made, including retries')
+            for endpoint, m in items:
+                for status, n in sorted(m.requests.items()):
+                    lines.append('%s_requests_total{endpoint="%s",status="%s"} %d'
+                                 % (prefix,endpoint,status,n))
+
+            for name, text in (('network_seconds','Time waiting on the server'),
+                               ('wait_seconds','Time waiting on the rate limiter'),
+                               ('parse_seconds','Time spent in the response handler')):
+                add_header(name,'histogram',text)
+                for endpoint, m in items:
+                    h = getattr(m,name)
+                    total = 0
+                    for bound, n in zip(h.buckets,h.counts):
+                        total += n
+                        lines.append('%s_%s_bucket{endpoint="%s",le="%g"} %d'
+                                     % (prefix,name,endpoint,bound,total))
+                    lines.append('%s_%s_bucket{endpoint="%s",le="+Inf"} %d'
+                                 % (prefix,name,endpoint,h.count))
+                    lines.append('%s_%s_sum{endpoint="%s"} %r'
+                                 % (prefix,name,endpoint,h.sum))
+                    lines.append('%s_%s_count{endpoint="%s"} %d'
+                                 % (prefix,name,endpoint,h.count))
+
+            for name, text in (('bytes_received','Bytes of response bodies'),
+                               ('bytes_sent','Bytes of request bodies or URLs'),
+                               ('cache_hits','Response cache hits'),
+                               ('cache_misses','Response cache misses'),
+                               ('retries','Retried requests')):
+                add_header(name + '_total','counter',text)
+                for endpoint, m in items:
+                    lines.append('%s_%s_total{endpoint="%s"} %d'
+                                 % (prefix,name,endpoint,getattr(m,name)))
+
+            add_header('errors_total','counter','Errors by class')
+            for endpoint, m in items:
+                for error, n in sorted(m.errors.items()):
+                    lines.append('%s_errors_total{endpoint="%s",error="%s"} %d'
+                                 % (prefix,endpoint,error,n))
+
+        return '\n'.join(lines) + '\n'
+
+    def to_log_lines(self)->List[str]:
+        """
+        Returns one JSON object per endpoint, flattened for log processors.
+        """
+        output = []
+        for endpoint, m in self.snapshot()['endpoints'].items():
+            entry = {'endpoint':endpoint,
+                     'n_requests':m['n_requests'],
+                     'requests':m['requests']}
+            for name in ('network_seconds','wait_seconds','parse_seconds'):
+                for key, value in m[name].items():
+                    entry['%s_%s' % (name,key)] = value
+            for name in ('bytes_received','bytes_sent','cache_hits',
+                         'cache_misses','retries','errors'):
+                entry[name] = m[name]
+            output.append(json.dumps(entry,sort_keys=True))
+        return output
+
+    def log(self, logger:Optional[logging.Logger]=None, level=logging.INFO):
+        if logger is None:
+            logger = _logger
+        for line in self.to_log_lines():
+            logger.log(level,line)
+
+    def __repr__(self):
+        return display_class(self,
+                             ['endpoints', {k:'%d requests' % sum(v.requests.values())
+                                            for k,v in self.endpoints.items()},
+                              'methods', '-----------------------',
+                              'snapshot', '()',
+                              'to_prometheus', '()',
+                              'to_log_lines', '()',
+                              'log', '(logger=None,level=logging.INFO)',
+                              'reset', '()'])
+
+
+class NullMetrics(object):
+
+    """
+    Same interface as Metrics but nothing is recorded.
+    """
+
+    __slots__ = []
+
+    enabled = False
+
+    def observe_request(self, url, elapsed_time, response=None, error=None,
+                        stream=False):
+        pass
+
+    def observe_wait(self, url, wait_time):
+        pass
+
+    def observe_parse(self, url, elapsed_time, error=None):
+        pass
+
+    def observe_cache(self, url, hit):
+        pass
+
+    def observe_retry(self, url):
+        pass
+
+    def observe_error(self, url, error):
+        pass
+
+    def reset(self):
+        pass
+
+    def snapshot(self)->dict:
+        return {'start_time':None,'elapsed_time':None,'endpoints':{}}
+
+    def to_prometheus(self, prefix='pubmed')->str:
+        return ''
+
+    def to_log_lines(self)->List[str]:
+        return []
+
+    def log(self, logger=None, level=logging.INFO):
+        pass
+
+    def __repr__(self):
+        return '<NullMetrics, metrics are disabled>'
+
+
+def _get_n_bytes_received(response, stream)->int:
+    if stream:
+        #Reading the content would consume the stream
+        try:
+            return int(response.headers.get('Content-Length',0))
+        except ValueError:
+            return 0
+    return len(response.content)
+
+def get_metrics(metrics):
+    """
+    Resolves the 'metrics' option of the API.
+
+    Parameters
+    ----------
+    metrics :
+        - None or True : new Metrics instance
+        - False : NullMetrics
+        - Metrics instance, e.g. to share it between API instances
+    """
+    if metrics is None or metrics is True:
+        return Metrics()
+    elif metrics is False:
+        return NullMetrics()
+    else:
+        return metrics
@@ -0,0 +1,665 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the E-utilities, for load and latency testing offline.
+
+Usage
+-----
+with MockServer(latency=0.05,jitter=0.02,error_rate=0.05) as server:
+    api = API(**server.api_options)
+    result = api.pubmed.details(ids)
+    print(server.stats)
+
+python -m pubmed.mock_server --port 8080 --max-rate 10
+
+Endpoints
+---------
+einfo, esearch, esummary, efetch, elink, epost, ecitmatch and the PMC ID
+converter. Responses are built from the single record templates in
+pubmed/_fixtures with the requested IDs substituted in, so any set of IDs can be requested
+(e.g. to exercise chunking). esearch returns search_count IDs for every
+query, and usehistory/epost results can be passed to efetch and esummary.
+
+With search_dates=(first,last) the results of a query are spread evenly
+over those days, and a query restricted to a date range (as sent by
+Pubmed.iter_search) only returns the results of that range.
+
+Faults
+------
+latency, jitter : seconds added to every response, latency +/- jitter
+error_rate : probability of a 5xx response (one of server_errors)
+rate_limit_rate : probability of a 429 response
+max_rate : requests per second (over the last second) above which a 429
+           is returned, like NCBI does when the rate is exceeded
+retry_after : if not None, sent as the Retry-After header of 429 and 503
+              responses
+max_bytes_per_second : cap on the speed at which each body is sent
+
+The options are attributes of the server and can be changed while it is
+running. Faults are drawn from a random.Random seeded with 'seed' so that
+runs can be repeated.
+
+See Also
+--------
+API : base_url and idconv_url options
+"""
+
+#Standard Library
+import os
+import re
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+import traceback
+from datetime import datetime
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+PACKAGE_PATH = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_PATH = os.path.join(PACKAGE_PATH,'_fixtures')
+
+#PMID of the single record fixtures
+_FIXTURE_PMID = '30343668'
+#First PMID returned by esearch
+_SEARCH_PMID = 20000000
+
+#See api._get_pdat_query
+_PDAT_QUERY = re.compile(r'^\((.*)\) AND \("(\d{4}/\d{2}/\d{2})"\[PDAT\] : '
+                         r'"(\d{4}/\d{2}/\d{2})"\[PDAT\]\)$')
+
+_ESUMMARY_XML_DOC = """<DocSum>
+	<Id>%s</Id>
+	<Item Name="PubDate" Type="Date">2019 Jan</Item>
+	<Item Name="Source" Type="String">Neurourol Urodyn</Item>
+	<Item Name="Title" Type="String">Bladder afferent signaling in the rat.</Item>
+	<Item Name="Volume" Type="String">38</Item>
+	<Item Name="Pages" Type="String">135-143</Item>
+</DocSum>
+"""
+
+class MockFixtures(object):
+
+    """
+    Templates of the responses, see benchmarks/fixtures/build_fixtures.py
+    """
+
+    __slots__ = ['efetch_head','efetch_article','medline_record',
+                 'esummary_doc','esearch_xml','esearch_json','einfo_xml']
+
+    def __init__(self,path=None):
+        if path is None:
+            path = FIXTURES_PATH
+
+        if not os.path.isdir(path):
+            raise FileNotFoundError('Mock server fixtures not found at: %s' % path)
+
+        def read(name):
+            with open(os.path.join(path,name),encoding='utf-8') as f:
+                return f.read()
+
+        xml = read('efetch_1.xml')
+        head, rest = xml.split('<PubmedArticleSet>',1)
+        start = rest.index('<PubmedArticle>')
+        end = rest.index('</PubmedArticle>') + len('</PubmedArticle>')
+        self.efetch_head = head
+        self.efetch_article = rest[start:end]
+
+        self.medline_record = read('medline_1.txt').strip('\n')
+
+        data = json.loads(read('esummary_1.json'))
+        self.esummary_doc = json.dumps(data['result'][_FIXTURE_PMID])
+
+        self.esearch_xml = read('esearch_1.xml')
+        self.esearch_json = json.loads(read('esearch_1.json'))
+        self.einfo_xml = read('einfo_pubmed.xml')
+
+
+class MockStats(object):
+
+    """
+    Attributes
+    ----------
+    n_requests : int
+    n_429 : int
+    n_5xx : int
+    n_bytes : int
+        Total size of the bodies sent
+    max_concurrent : int
+        Largest # of requests that were being handled at once
+    endpoint_counts : dict
+        Endpoint name => # of requests
+    log : list
+        (time.monotonic(),endpoint,status,# of IDs) for each request
+    """
+
+    __slots__ = ['n_requests','n_429','n_5xx','n_bytes','max_concurrent',
+                 'endpoint_counts','log','n_active','lock']
+
+    def __init__(self):
+        self.n_requests = 0
+        self.n_429 = 0
+        self.n_5xx = 0
+        self.n_bytes = 0
+        self.max_concurrent = 0
+        self.endpoint_counts = {}
+        self.log = []
+        self.n_active = 0
+        self.lock = threading.Lock()
+
+    def start_request(self,endpoint):
+        with self.lock:
+            self.n_requests += 1
+            self.endpoint_counts[endpoint] = self.endpoint_counts.get(endpoint,0) + 1
+            self.n_active += 1
+            self.max_concurrent = max(self.max_concurrent,self.n_active)
+
+    def add_response(self,endpoint,status,n_ids,n_bytes):
+        #Called before the body is sent, so the stats are complete once the
+        #client has the response
+        with self.lock:
+            self.n_bytes += n_bytes
+            if status == 429:
+                self.n_429 += 1
+            elif status >= 500:
+                self.n_5xx += 1
+            self.log.append((time.monotonic(),endpoint,status,n_ids))
+
+    def end_request(self):
+        with self.lock:
+            self.n_active -= 1
+
+    def get_max_observed_rate(self,window=1.0)->int:
+        """
+        Largest # of requests received within 'window' seconds
+        """
+        times = sorted(x[0] for x in self.log)
+        output = 0
+        j = 0
+        for i, t in enumerate(times):
+            while t - times[j] >= window:
+                j += 1
+            output = max(output,i - j + 1)
+        return output
+
+    def __repr__(self):
+        return ('<MockStats requests=%d 429=%d 5xx=%d bytes=%d '
+                'max_concurrent=%d endpoints=%s>' % (self.n_requests,
+                self.n_429,self.n_5xx,self.n_bytes,self.max_concurrent,
+                self.endpoint_counts))
+
+
+class MockServer(object):
+
+    """
+    Attributes
+    ----------
+    base_url : str
+        Replacement for API._BASE_URL
+    idconv_url : str
+    api_options : dict
+        base_url and idconv_url, for API(**server.api_options)
+    stats : MockStats
+    """
+
+    def __init__(self,
+                 port:int=0,
+                 host:str='127.0.0.1',
+                 latency:float=0.0,
+                 jitter:float=0.0,
+                 error_rate:float=0.0,
+                 rate_limit_rate:float=0.0,
+                 max_rate:Optional[float]=None,
+                 retry_after:Optional[float]=None,
+                 max_bytes_per_second:Optional[float]=None,
+                 server_errors=(500,502,503),
+                 search_count:int=1234,
+                 search_dates=None,
+                 seed=None,
+                 fixtures_path=None,
+                 verbose=False):
+        """
+
+        Parameters
+        ----------
+        port : int
+            0 picks a free port
+        search_count : int
+            Count returned by esearch
+        search_dates : (str,str)
+            'YYYY/MM/DD' of the first and last day of the results, see the
+            module documentation
+        seed :
+            For the random # generator of the faults and jitter
+
+        See the module documentation for the fault options.
+        """
+
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_rate = max_rate
+        self.retry_after = retry_after
+        self.max_bytes_per_second = max_bytes_per_second
+        self.server_errors = server_errors
+        self.search_count = search_count
+        self.search_dates = search_dates
+        self.verbose = verbose
+
+        self.fixtures = MockFixtures(fixtures_path)
+        self.stats = MockStats()
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+        #web_env => list of lists of IDs, indexed by query_key - 1
+        self._history = {}
+        self._n_web_envs = 0
+
+        self._server = ThreadingHTTPServer((host,port),_make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+        host, port = self._server.server_address[:2]
+        self.base_url = 'http://%s:%d/entrez/eutils/' % (host,port)
+        self.idconv_url = 'http://%s:%d/pmc/utils/idconv/v1.0/' % (host,port)
+
+    @property
+    def api_options(self)->dict:
+        return {'base_url':self.base_url,'idconv_url':self.idconv_url}
+
+    def start(self):
+        """
+        Serves requests on a background thread
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever,
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def reset_stats(self):
+        self.stats = MockStats()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __repr__(self):
+        return ('<MockServer %s latency=%g jitter=%g error_rate=%g '
+                'rate_limit_rate=%g max_rate=%s>' % (self.base_url,self.latency,
+                self.jitter,self.error_rate,self.rate_limit_rate,self.max_rate))
+
+    #---- Faults -----------------------------------
+    def _get_fault(self):
+        """
+        Returns the status of an injected error, or None
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._recent.append(now)
+            while now - self._recent[0] >= 1:
+                self._recent.popleft()
+
+            if self.max_rate is not None and len(self._recent) > self.max_rate:
+                return 429
+
+            r = self._random.random()
+            if r < self.rate_limit_rate:
+                return 429
+            elif r < self.rate_limit_rate + self.error_rate:
+                return self._random.choice(self.server_errors)
+
+        return None
+
+    def _get_delay(self)->float:
+        with self._lock:
+            delay = self.latency + self._random.uniform(-self.jitter,self.jitter)
+        return max(delay,0)
+
+    def _get_error_response(self,status):
+        if status == 429:
+            #Same as NCBI's response
+            data = {'error':'API rate limit exceeded',
+                    'count':str(len(self._recent))}
+            if self.max_rate is not None:
+                data['limit'] = str(self.max_rate)
+            return status, 'application/json', json.dumps(data)
+        else:
+            return status, 'text/html', '<html><body>%d Error</body></html>' % status
+
+    #---- History ----------------------------------
+    def _add_history(self,ids,web_env=None):
+        with self._lock:
+            if web_env not in self._history:
+                self._n_web_envs += 1
+                web_env = 'MCID_mock_%d' % self._n_web_envs
+                self._history[web_env] = []
+            self._history[web_env].append(ids)
+            return web_env, len(self._history[web_env])
+
+    def _get_history(self,params):
+        web_env = params.get('WebEnv')
+        query_key = params.get('query_key')
+        with self._lock:
+            queries = self._history.get(web_env)
+            if queries is None or not query_key or int(query_key) > len(queries):
+                return None
+            ids = queries[int(query_key) - 1]
+
+        start = int(params.get('retstart') or 0)
+        n = int(params.get('retmax') or 20)
+        return ids[start:start+n]
+
+    def _get_ids(self,params):
+        if 'WebEnv' in params and 'query_key' in params:
+            return self._get_history(params)
+        return [x.strip() for x in params.get('id','').split(',') if x.strip()]
+
+    #---- Endpoints --------------------------------
+    def handle(self,endpoint,params):
+        """
+        Returns (status,content type,body,# of IDs)
+        """
+        fh = getattr(self,'_' + endpoint,None)
+        if fh is None:
+            return 404, 'text/plain', 'Unknown endpoint', 0
+
+        fault = self._get_fault()
+        if fault is not None:
+            return self._get_error_response(fault) + (0,)
+
+        return fh(params)
+
+    def _einfo(self,params):
+        db = params.get('db')
+        if not db:
+            data = {'header':{'type':'einfo','version':'0.3'},
+                    'einforesult':{'dblist':['pubmed','pmc','mesh','nlmcatalog',
+                                             'gene','protein']}}
+            return 200, 'application/json', json.dumps(data), 0
+        xml = self.fixtures.einfo_xml.replace('<DbName>pubmed</DbName>',
+                                              '<DbName>%s</DbName>' % db)
+        return 200, 'text/xml', xml, 0
+
+    def _get_date_slice(self,min_date,max_date):
+        """
+        Returns (index of the first result,# of results) between two dates.
+        Result i is on day i*n_days//search_count of search_dates.
+        """
+        first_day, last_day = [_get_day(x) for x in self.search_dates]
+        n_days = last_day - first_day + 1
+        count = self.search_count
+        a = max(_get_day(min_date) - first_day,0)
+        b = min(_get_day(max_date) - first_day,n_days - 1)
+        if b < a:
+            return 0, 0
+        start = -(-a*count//n_days)
+        end = -(-(b + 1)*count//n_days)
+        return start, end - start
+
+    def _esearch(self,params):
+        term = params.get('term','')
+        start = int(params.get('retstart') or 0)
+        n = int(params.get('retmax') or 20)
+        first = 0
+        count = self.search_count
+
+        match = _PDAT_QUERY.match(term)
+        if match is not None and self.search_dates is not None:
+            term = match.group(1)
+            first, count = self._get_date_slice(match.group(2),match.group(3))
+
+        #Different queries give different (but repeatable) IDs
+        offset = _SEARCH_PMID + 1000*(zlib.crc32(term.encode()) % 10000) + first
+        ids = [str(offset + i) for i in range(start,min(start+n,count))]
+
+        web_env = query_key = None
+        if params.get('usehistory') == 'y':
+            web_env, query_key = self._add_history(
+                [str(offset + i) for i in range(count)],params.get('WebEnv'))
+
+        if params.get('retmode') == 'json':
+            data = json.loads(json.dumps(self.fixtures.esearch_json))
+            result = data['esearchresult']
+            result['count'] = str(count)
+            result['retmax'] = str(len(ids))
+            result['retstart'] = str(start)
+            result['idlist'] = ids
+            if web_env is not None:
+                result['querykey'] = str(query_key)
+                result['webenv'] = web_env
+            return 200, 'application/json', json.dumps(data), len(ids)
+
+        history = ''
+        if web_env is not None:
+            history = '<QueryKey>%d</QueryKey><WebEnv>%s</WebEnv>' % (query_key,web_env)
+        xml = re.sub(r'<Count>.*</IdList>',
+                     '<Count>%d</Count><RetMax>%d</RetMax><RetStart>%d</RetStart>'
+                     '%s<IdList>\n%s\n</IdList>' % (count,len(ids),start,history,
+                     '\n'.join('<Id>%s</Id>' % x for x in ids)),
+                     self.fixtures.esearch_xml,flags=re.DOTALL)
+        return 200, 'text/xml', xml, len(ids)
+
+    def _epost(self,params):
+        ids = self._get_ids(params)
+        web_env, query_key = self._add_history(ids,params.get('WebEnv'))
+        xml = ('<?xml version="1.0" encoding="UTF-8" ?>\n'
+               '<!DOCTYPE ePostResult PUBLIC "-//NLM//DTD epost 20090526//EN" '
+               '"https://eutils.ncbi.nlm.nih.gov/eutils/dtd/20090526/epost.dtd">\n'
+               '<ePostResult>\n\t<QueryKey>%d</QueryKey>\n\t<WebEnv>%s</WebEnv>\n'
+               '</ePostResult>\n' % (query_key,web_env))
+        return 200, 'text/xml', xml, len(ids)
+
+    def _esummary(self,params):
+        ids = self._get_ids(params)
+        if ids is None:
+            return self._invalid_history()
+
+        template = self.fixtures.esummary_doc
+        if params.get('retmode') == 'json':
+            body = ('{"header":{"type":"esummary","version":"0.3"},'
+                    '"result":{"uids":%s,%s}}' % (json.dumps(ids),
+                    ','.join('"%s":%s' % (x,template.replace(_FIXTURE_PMID,x))
+                             for x in ids)))
+            return 200, 'application/json', body, len(ids)
+
+        xml = ('<?xml version="1.0" encoding="UTF-8" ?>\n'
+               '<!DOCTYPE eSummaryResult PUBLIC "-//NLM//DTD esummary v1 20041029//EN" '
+               '"https://eutils.ncbi.nlm.nih.gov/eutils/dtd/20041029/esummary-v1.dtd">\n'
+               '<eSummaryResult>\n%s</eSummaryResult>\n' %
+               ''.join(_ESUMMARY_XML_DOC % x for x in ids))
+        return 200, 'text/xml', xml, len(ids)
+
+    def _efetch(self,params):
+        ids = self._get_ids(params)
+        if ids is None:
+            return self._invalid_history()
+
+        if params.get('rettype') == 'medline':
+            record = self.fixtures.medline_record
+            text = ''.join('\n' + record.replace(_FIXTURE_PMID,x) + '\n' for x in ids)
+            return 200, 'text/plain', text, len(ids)
+
+        article = self.fixtures.efetch_article
+        xml = (self.fixtures.efetch_head + '<PubmedArticleSet>\n' +
+               '\n'.join(article.replace(_FIXTURE_PMID,x) for x in ids) +
+               '\n</PubmedArticleSet>\n')
+        return 200, 'text/xml', xml, len(ids)
+
+    def _elink(self,params):
+        ids = self._get_ids(params) or []
+        dbfrom = params.get('dbfrom') or 'pubmed'
+        db = params.get('db') or 'pubmed'
+        linkname = '%s_%s' % (dbfrom,db)
+        linksets = [{'dbfrom':dbfrom,
+                     'ids':[x],
+                     'linksetdbs':[{'dbto':db,
+                                    'linkname':linkname,
+                                    'links':[str(int(x) + j + 1) for j in range(5)]}]}
+                    for x in ids if x.isdigit()]
+        data = {'header':{'type':'elink','version':'0.3'},'linksets':linksets}
+        return 200, 'application/json', json.dumps(data), len(ids)
+
+    def _idconv(self,params):
+        ids = [x.strip() for x in params.get('ids','').split(',') if x.strip()]
+        id_type = params.get('idtype','pmid')
+        records = []
+        for x in ids:
+            if id_type == 'pmcid':
+                pmid = x[3:]
+                records.append({'pmcid':x,'pmid':pmid,'doi':'10.1002/nau.%s' % pmid})
+            elif not x.isdigit() or int(x) % 3 == 0:
+                #Same as a record that isn't in PMC
+                records.append({'pmid':x,'live':'false','status':'error',
+                                'errmsg':'invalid article id'})
+            else:
+                records.append({'pmcid':'PMC' + x,'pmid':x,
+                                'doi':'10.1002/nau.%s' % x})
+        data = {'status':'ok','responseDate':time.strftime('%Y-%m-%d %H:%M:%S'),
+                'request':'idtype=%s;ids=%s;versions=no;format=json' %
+                          (id_type,','.join(ids)),
+                'records':records}
+        return 200, 'application/json', json.dumps(data,indent=1), len(ids)
+
+    def _ecitmatch(self,params):
+        lines = [x for x in params.get('bdata','').splitlines() if x]
+        output = []
+        for line in lines:
+            crc = zlib.crc32(line.encode())
+            if crc % 10 == 0:
+                result = 'NOT_FOUND;INVALID_JOURNAL'
+            else:
+                result = str(_SEARCH_PMID + crc % 10000000)
+            output.append(line + result)
+        return 200, 'text/plain', '\n'.join(output) + '\n', len(lines)
+
+    def _invalid_history(self):
+        return 400, 'text/plain', 'Unable to obtain query #1', 0
+
+
+def _get_day(value):
+    return datetime.strptime(value,'%Y/%m/%d').toordinal()
+
+def _get_endpoint(path):
+    if 'idconv' in path:
+        return 'idconv'
+    name = path.rstrip('/').rsplit('/',1)[-1]
+    return name.split('.',1)[0]
+
+def _make_handler(server:MockServer):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self._respond(urlsplit(self.path).query)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length).decode('utf-8')
+            query = urlsplit(self.path).query
+            self._respond(query + '&' + body if query else body)
+
+        def _respond(self,query):
+            params = {k:v[-1] for k,v in parse_qs(query,keep_blank_values=True).items()}
+            endpoint = _get_endpoint(urlsplit(self.path).path)
+            server.stats.start_request(endpoint)
+            n_ids = 0
+            try:
+                try:
+                    status, content_type, body, n_ids = server.handle(endpoint,params)
+                except ValueError as ex:
+                    #Bad parameters, e.g. retstart=abc
+                    status, content_type, body = 400, 'text/plain', 'Invalid parameter: %s' % ex
+                except Exception:
+                    #Errors of the mock itself still get a response, otherwise
+                    #the client sees the connection being closed
+                    status, content_type, body = 500, 'text/plain', traceback.format_exc()
+                data = body.encode('utf-8')
+                time.sleep(server._get_delay())
+                server.stats.add_response(endpoint,status,n_ids,len(data))
+
+                self.send_response(status)
+                self.send_header('Content-Type',content_type + '; charset=UTF-8')
+                self.send_header('Content-Length',str(len(data)))
+                if server.retry_after is not None and status in (429,503):
+                    self.send_header('Retry-After','%g' % server.retry_after)
+                self.end_headers()
+                self._write(data)
+            finally:
+                server.stats.end_request()
+
+        def _write(self,data):
+            rate = server.max_bytes_per_second
+            if not rate:
+                self.wfile.write(data)
+                return
+            chunk_size = max(int(rate/20),1)
+            for i in range(0,len(data),chunk_size):
+                self.wfile.write(data[i:i+chunk_size])
+                self.wfile.flush()
+                time.sleep(chunk_size/rate)
+
+        def log_message(self,format,*args):
+            if server.verbose:
+                BaseHTTPRequestHandler.log_message(self,format,*args)
+
+    return Handler
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Local stand-in for the E-utilities')
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=8080)
+    parser.add_argument('--latency',type=float,default=0.0)
+    parser.add_argument('--jitter',type=float,default=0.0)
+    parser.add_argument('--error-rate',type=float,default=0.0)
+    parser.add_argument('--rate-limit-rate',type=float,default=0.0)
+    parser.add_argument('--max-rate',type=float)
+    parser.add_argument('--retry-after',type=float)
+    parser.add_argument('--max-bytes-per-second',type=float)
+    parser.add_argument('--search-count',type=int,default=1234)
+    parser.add_argument('--search-dates',nargs=2,metavar=('FIRST','LAST'))
+    parser.add_argument('--seed',type=int)
+    parser.add_argument('--fixtures')
+    options = parser.parse_args(args)
+
+    server = MockServer(port=options.port,host=options.host,
+                        latency=options.latency,jitter=options.jitter,
+                        error_rate=options.error_rate,
+                        rate_limit_rate=options.rate_limit_rate,
+                        max_rate=options.max_rate,
+                        retry_after=options.retry_after,
+                        max_bytes_per_second=options.max_bytes_per_second,
+                        search_count=options.search_count,
+                        search_dates=options.search_dates,seed=options.seed,
+                        fixtures_path=options.fixtures,verbose=True)
+    print('Serving at %s' % server.base_url)
+    print('api = API(base_url=%r,idconv_url=%r)' % (server.base_url,server.idconv_url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,63 @@
 import shlex
 
 from bs4 import BeautifulSoup
+from bs4.element import Tag
 
 
 
 
 from . import utils
+from . import lxml_helpers
 quotes = utils.quotes
 display_class = utils.display_class
 td = utils.get_truncated_display_string
 cld = utils.get_list_class_display
 pv = utils.property_values_to_string
 
-def _make_soup(data):
+PARSERS = ('bs4','lxml')
+
+def _make_soup(data,parser='bs4'):
+    """
+
+    Parameters
+    ----------
+    data : str or bytes
+    parser : str
+        - 'bs4' : BeautifulSoup tree
+        - 'lxml' : lxml tree wrapped to look like BeautifulSoup, this is
+                   much faster. See pubmed.lxml_helpers
+    """
+    if parser == 'lxml':
+        return lxml_helpers.make_document(data)
     #TODO: Is there a fallback if lxml is not installed?
     return BeautifulSoup(data,'lxml-xml')
 
+def _get_parser(api)->str:
+    #The API is None when handlers are called directly, e.g. benchmarks
+    return getattr(api,'parser','bs4')
+
+def _release_soup(soup):
+    """
+    Breaks up a parse tree so that it can be freed.
+
+    Strings taken from the tree (i.e., tag.string) are NavigableStrings
+    which reference their parent tag, and thus keep the whole tree alive as
+    long as any of them are held by a model. After this call those strings
+    are detached and behave as plain strings, but the tags should no longer
+    be used.
+
+    lxml trees (see _make_soup) don't need this as their strings are plain
+    strings.
+    """
+    if not isinstance(soup,BeautifulSoup):
+        return
+
+    for x in list(soup.contents):
+        if isinstance(x,Tag):
+            x.decompose()
+        else:
+            x.extract()
+
 class XMLInfo(object):
 
     def __init__(self,soup):
@@ -77,6 +119,33 @@ def _get_opt_list(list_or_None,child_tag_name,function_handle):
         temp = list_or_None.find_all(child_tag_name,recursive=False)
         return [function_handle(x) for x in temp]
 
+class _LazyFields(object):
+
+    """
+    Mixin for classes whose attributes are only parsed when first requested.
+
+    The class needs to provide 'object_fields', a dict mapping each attribute
+    name to a function handle that takes the tag and returns the value, as
+    well as a 'soup' attribute holding the tag. Once parsed the value is
+    stored on the instance so that __getattr__ is not called again.
+
+    This is similar in spirit to models.ResponseObject but for XML.
+    """
+
+    __slots__ = []
+
+    def __getattr__(self, name):
+        #Only called when the attribute has not yet been set
+        try:
+            fh = self.object_fields[name]
+        except KeyError:
+            raise AttributeError("'%s' object has no attribute '%s'" %
+                                 (self.__class__.__name__, name))
+
+        value = fh(self.soup)
+        setattr(self,name,value)
+        return value
+
 def _list_cld_or_empty(value):
     if len(value) > 0:
         return cld(value)
@@ -9,6 +9,7 @@ https://numpydoc.readthedocs.io/en/latest/format.html#documenting-classes
 import re
 import pprint
 import inspect
+from copy import deepcopy
 from typing import Union, List, Optional
 from typing import TYPE_CHECKING
 
@@ -21,6 +22,7 @@ if TYPE_CHECKING:
 #------------------------------
 #from lxml import objectify
 from bs4.element import Tag
+from lxml import etree
 
 # Local Imports
 from .utils import quotes, display_class
@@ -30,7 +32,10 @@ from .utils import property_values_to_string as pv
 
 from .model_helpers import _make_soup, XMLInfo, _list_cld_or_empty, _get_opt_list
 from .model_helpers import _get_opt_soup_string, _get_opt_attr_value, _get_opt_class
-from .model_helpers import _get_opt_soup_int
+from .model_helpers import _get_opt_soup_int, _LazyFields, _release_soup
+from .model_helpers import _get_parser
+from .lxml_helpers import LxmlTag
+from . import json_backend
 
 #==========================================================
 #                   Entry Points
@@ -44,14 +49,46 @@ class PubmedArticleSet(object):
     pubmed.api.API.fetch
     """
 
-    __slots__ = ['xml_info', 'docs']
+    __slots__ = ['xml_info', 'docs', 'book_docs', 'deleted_pmids', 'chunk_errors']
 
     xml_info: 'XMLInfo'
     docs: List['PubmedArticle']
+    book_docs: List['PubmedBookArticle']
+    deleted_pmids: List[str]
+    chunk_errors: List['ChunkError']
+
+    def __init__(self, api:'API',response:'Response',options=None):
+        """
+
+        Parameters
+        ----------
+        options : dict
+            - lazy : bool, default False
+                If true each article is only parsed as its fields are accessed.
+                See LazyPubmedArticle
+            - leave_raw : bool, default False
+                If true the XML of each article is kept as bytes in
+                PubmedArticle.raw_xml
+            - keep_soup : bool, default False
+                If true the parse tree is kept (PubmedArticle.soup). This
+                keeps the entire document in memory. Otherwise the tree is
+                released once the articles have been created (see
+                PubmedArticle.release_soup). Lazy articles always keep it.
+        """
+        if options is None:
+            options = {}
+
+        lazy = options.get('lazy',False)
+        leave_raw = options.get('leave_raw',False)
+        keep_soup = lazy or options.get('keep_soup',False)
+
+        if lazy:
+            article_fh = LazyPubmedArticle
+        else:
+            article_fh = PubmedArticle
 
-    def __init__(self, api:'API',response:'Response'):
         data = response.text
-        soup = _make_soup(data)
+        soup = _make_soup(data,_get_parser(api))
         self.xml_info = XMLInfo(soup)
 
         # Hierarchy:
@@ -63,32 +100,250 @@ class PubmedArticleSet(object):
 
         # articles = soup.find_all('pubmedarticle')
 
-        # TODO: DTD says PubmedArticleSet ((PubmedArticle | PubmedBookArticle)+, DeleteCitation?) >
-        #   Book and Delete not handled ...
+        # <!ELEMENT PubmedArticleSet ((PubmedArticle | PubmedBookArticle)+, DeleteCitation?) >
+        #
+        #   Book articles are kept separate from docs as they don't have
+        #   a MedlineCitation. DeleteCitation is only found in the update
+        #   files, see pubmed.ingest
         # TODO: find PubmedArticleSet,re
         pub_article_set = soup.find('PubmedArticleSet', recursive=False)
         docs = []
+        book_docs = []
+        deleted_pmids = []
         for x in pub_article_set.contents:
             if x.name is None:
                 # newline?
                 pass
             elif x.name == 'PubmedArticle':
-                docs.append(PubmedArticle(x))
+                doc = article_fh(x)
+                if leave_raw:
+                    doc.raw_xml = x.encode()
+                docs.append(doc)
             elif x.name == 'PubmedBookArticle':
-                raise Exception('PubmedBookArticle not yet handled')
+                doc = PubmedBookArticle(x)
+                if leave_raw:
+                    doc.raw_xml = x.encode()
+                book_docs.append(doc)
             elif x.name == 'DeleteCitation':
-                raise Exception('DeleteCitation not yet handled')
+                deleted_pmids.extend(DeleteCitation(x).pmids)
+
+        if not keep_soup:
+            for doc in docs:
+                doc.release_soup()
+            for doc in book_docs:
+                doc.release_soup()
+            _release_soup(soup)
 
         self.docs = docs
+        self.book_docs = book_docs
+        self.deleted_pmids = deleted_pmids
+        self.chunk_errors = []
+
+    @classmethod
+    def merge(cls, results:List['PubmedArticleSet'], chunk_errors=None):
+        """
+        Combines the results of multiple requests into one.
+
+        Parameters
+        ----------
+        chunk_errors : List[pubmed.errors.ChunkError]
+            Requests that failed
+
+        See Also
+        --------
+        pubmed.api.API._request_ids
+        """
+        output = cls.__new__(cls)
+        output.xml_info = results[0].xml_info
+        output.docs = [doc for x in results for doc in x.docs]
+        output.book_docs = [doc for x in results for doc in x.book_docs]
+        output.deleted_pmids = [pmid for x in results for pmid in x.deleted_pmids]
+        output.chunk_errors = [x for r in results for x in r.chunk_errors]
+        if chunk_errors:
+            output.chunk_errors.extend(chunk_errors)
+        return output
+
+    @classmethod
+    def from_docs(cls, docs:List['PubmedArticle'], result=None):
+        """
+        Creates a set from articles that were not (all) part of a single
+        response, e.g. from the record cache.
+
+        Parameters
+        ----------
+        result : PubmedArticleSet or None
+            Request result that xml_info and chunk_errors are taken from.
+
+        See Also
+        --------
+        pubmed.record_cache
+        """
+        output = cls.__new__(cls)
+        output.docs = docs
+        if result is None:
+            output.xml_info = None
+            output.book_docs = []
+            output.deleted_pmids = []
+            output.chunk_errors = []
+        else:
+            output.xml_info = result.xml_info
+            output.book_docs = result.book_docs
+            output.deleted_pmids = result.deleted_pmids
+            output.chunk_errors = result.chunk_errors
+        return output
+
+    def to_arrow(self, batch_size=10000):
+        """
+        Returns the articles as a pyarrow.Table, see pubmed.arrow_export
+        """
+        from .arrow_export import to_table
+        return to_table(self.docs,batch_size)
+
+    def to_parquet(self, path, batch_size=10000, **kwargs):
+        """
+        Writes the articles to a Parquet file, see pubmed.arrow_export
+        """
+        from .arrow_export import write_parquet
+        return write_parquet(self.docs,path,batch_size,**kwargs)
 
     def __repr__(self):
         return display_class(self,
                              [
                                  'xml_info', cld(self.xml_info),
-                                 'docs', _list_cld_or_empty(self.docs)])
+                                 'docs', _list_cld_or_empty(self.docs),
+                                 'book_docs', _list_cld_or_empty(self.book_docs),
+                                 'deleted_pmids', td(str(self.deleted_pmids)),
+                                 'chunk_errors', _list_cld_or_empty(self.chunk_errors),
+                                 'methods', '-----------------------',
+                                 'to_arrow', '() => pyarrow.Table',
+                                 'to_parquet', '(path)'])
+
+
+def iter_pubmed_articles(api:'API',response:'Response',options=None):
+    """
+    Streaming alternative to PubmedArticleSet.
+
+    Rather than building a tree of the entire response this consumes the
+    raw response incrementally and yields a PubmedArticle as soon as its
+    closing tag has been parsed. Each element is cleared after use so that
+    memory usage stays flat regardless of the # of articles requested.
+
+    Note, the request must have been made with stream=True, otherwise
+    the body has already been downloaded and we only save on the tree.
+
+    Only PubmedArticle records are yielded. Book citations (which are in
+    PubmedArticleSet.book_docs when not streaming) are skipped, use
+    _iter_article_set or pubmed.ingest for all records.
 
+    Parameters
+    ----------
+    options : dict
+        See PubmedArticleSet
+
+    Examples
+    --------
+    for article in api.pubmed.details(ids,return_type='stream'):
+        print(article.citation.pmid)
+
+    See Also
+    --------
+    PubmedArticleSet
+    """
 
+    if options is None:
+        options = {}
+
+    #Without this gzip encoded responses are passed through as is
+    response.raw.decode_content = True
+    for record in _iter_article_set(response.raw,
+                                    lazy=options.get('lazy',False),
+                                    leave_raw=options.get('leave_raw',False),
+                                    keep_soup=options.get('keep_soup',False),
+                                    parser=_get_parser(api)):
+        if isinstance(record,PubmedArticle):
+            yield record
+
+def _iter_article_set(source,lazy=False,leave_raw=False,keep_soup=False,
+                      parser='bs4'):
+    """
+
+    Parameters
+    ----------
+    source : file-like or str
+        Anything that lxml's iterparse accepts
+    lazy : bool
+        If true, yields LazyPubmedArticle
+    leave_raw : bool
+        If true, the XML of each article is kept in raw_xml
+    keep_soup : bool
+        If true, the (per article) tree is kept in soup
+    parser : str
+        'bs4' or 'lxml', see model_helpers._make_soup
+
+    Yields
+    ------
+    PubmedArticle, PubmedBookArticle or DeleteCitation
+        Book articles and deletions are never lazy
+    """
 
+    keep_soup = lazy or keep_soup
+
+    if lazy:
+        article_fh = LazyPubmedArticle
+    else:
+        article_fh = PubmedArticle
+
+    #<!ELEMENT PubmedArticleSet ((PubmedArticle | PubmedBookArticle)+, DeleteCitation?) >
+    context = etree.iterparse(source,
+                              events=('end',),
+                              tag=('PubmedArticle','PubmedBookArticle','DeleteCitation'),
+                              load_dtd=False,
+                              resolve_entities=False,
+                              no_network=True,
+                              huge_tree=True)
+
+    for event, elem in context:
+        if elem.tag == 'DeleteCitation':
+            yield DeleteCitation(LxmlTag(elem))
+        else:
+            if elem.tag == 'PubmedArticle':
+                fh = article_fh
+                keep_article_soup = keep_soup
+            else:
+                fh = PubmedBookArticle
+                keep_article_soup = False
+
+            if leave_raw:
+                data = etree.tostring(elem)
+
+            if parser == 'lxml':
+                #The element is cleared below so it gets copied if the
+                #article needs to keep it
+                if keep_article_soup:
+                    soup = LxmlTag(deepcopy(elem))
+                else:
+                    soup = LxmlTag(elem)
+                article = fh(soup)
+            else:
+                #The per article soup is small and is released along with
+                #the article
+                if not leave_raw:
+                    data = etree.tostring(elem)
+                soup = _make_soup(data)
+                article = fh(soup.find(elem.tag))
+
+            if leave_raw:
+                article.raw_xml = data
+            if not keep_article_soup:
+                article.release_soup()
+                _release_soup(soup)
+            yield article
+
+        #Release the element as well as any preceeding siblings that are
+        #still attached to the root
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
 
 def pass_through(api:'API',response:'Response'):
     #This can be used to just pass the raw result back to the user
@@ -162,70 +417,119 @@ class PMID_MESH_Summary(object):
 
         pass
 
-def get_medline(api:'API',response:'Response'):
-    text = response.text
+def get_medline(api:'API',response:'Response',options=None)->List[dict]:
+    """
+    Parses a MEDLINE format response into a list of records.
 
-    #Note: Entries start with an empty line
+    Each record is a dict of field (e.g. 'PMID', 'TI', 'MH') to a list of
+    values, as fields like authors can repeat.
 
-    #Parsing something like:
-    #PMID- 30343668
-    #OWN - NLM
-    #STAT- MEDLINE
+    Parameters
+    ----------
+    options : dict
+        - fields : collection of str, optional
+            Only these fields are kept
 
-    #General format
-    #- 2-4 character key
-    #- value always starts at specific position
-    #- some values wrap, start at same location
+    See Also
+    --------
+    iter_medline
+    """
+    fields = None if options is None else options.get('fields')
+    return list(_iter_medline_records(response.text.splitlines(),fields))
 
+def iter_medline(api:'API',response:'Response',options=None):
+    """
+    Streaming alternative to get_medline.
 
-    output_list = []
+    Records are parsed from the response as it is downloaded, with each
+    record yielded once the blank line that ends it arrives.
 
-    temp_dict = {}
-    last_key = ''
-    last_value = None
+    Note, the request must have been made with stream=True, otherwise
+    the body has already been downloaded.
 
-    #TODO: We could set the first key
-    #then omit the last_key check
-    lines = text.splitlines()
-    #I've found the first line to be empty ...
-    if lines[0]:
-        I = 0
-    else:
-        I = 1
-    for line in lines[I:]:
-        if line:
-            key = line[0:4].rstrip()
-            response = line[6:]
-
-            #We could do a second loop after we get
-            #the first key ...
-            if key:
-                if last_key:
-                    if last_key in temp_dict:
-                        temp_dict[last_key].append(last_value)
-                    else:
-                        temp_dict[last_key] = [last_value]
-                last_value = response
-                last_key = key
-            else:
-                last_value += response
-        else:
-            if last_key in temp_dict:
-                temp_dict[last_key].append(last_value)
-            else:
-                temp_dict[last_key] = [last_value]
+    Parameters
+    ----------
+    options : dict
+        See get_medline
 
-            output_list.append(temp_dict)
-            temp_dict = {}
+    Examples
+    --------
+    for record in api.pubmed.details(ids,return_type='medline-stream',
+                                     fields=['PMID','TI','MH']):
+        print(record['PMID'][0])
+    """
+    fields = None if options is None else options.get('fields')
+    #Bytes are decoded here as requests would assume latin-1 for text/plain
+    #without a charset
+    lines = (x.decode('utf-8') for x in response.iter_lines())
+    yield from _iter_medline_records(lines,fields)
 
-    if last_key in temp_dict:
-        temp_dict[last_key].append(last_value)
-    else:
-        temp_dict[last_key] = [last_value]
+def _iter_medline_records(lines,fields=None):
+    """
 
-    output_list.append(temp_dict)
+    Parameters
+    ----------
+    lines : iterable of str
+    fields : collection of str, optional
+        Fields to keep, None for all
+
+    Format
+    ------
+    #Records are preceded by an empty line
+    PMID- 30343668
+    OWN - NLM
+    AB  - AIMS: To characterize bladder afferents. METHODS: Recordings were made in
+          anesthetized rats.
+
+    - the key is up to 4 characters, padded to 4, followed by '- '
+    - values start at character 6, wrapped lines are indented to it
+    """
 
-    return output_list
+    if fields is not None:
+        fields = frozenset(fields)
+
+    record = {}
+    in_record = False
+    #Key of the current field, None if it is being skipped
+    key = None
+    value = None
+
+    for line in lines:
+        if not line:
+            if key is not None:
+                _add_medline_value(record,key,value)
+                key = None
+            if in_record:
+                yield record
+                record = {}
+                in_record = False
+            continue
+
+        in_record = True
+        new_key = line[0:4].rstrip()
+        if new_key:
+            if key is not None:
+                _add_medline_value(record,key,value)
+            if fields is None or new_key in fields:
+                key = new_key
+                value = line[6:]
+            else:
+                key = None
+        elif key is not None:
+            #Wrapped lines are split at spaces
+            value += ' ' + line[6:]
+
+    if key is not None:
+        _add_medline_value(record,key,value)
+    if in_record:
+        yield record
+
+def _add_medline_value(record,key,value):
+    values = record.get(key)
+    if values is None:
+        record[key] = [value]
+    else:
+        values.append(value)
 
 def get_text(api:'API',response:'Response'):
     return response.text
@@ -234,7 +538,7 @@ def get_xml(api:'API',response:'Response'):
     return _make_soup(response.text)
 
 def get_json(api:'API',response:'Response'):
-    return response.json()
+    return json_backend.loads(api,response)
 
 
 class TermSet(object):
@@ -446,12 +750,12 @@ class CitationMatchResult(object):
                                 'invalid_journal',self.invalid_journal,
                                 'id',self.id])
 
-def citation_match_parser(api, response_text, data_for_response):
+def citation_match_parser(api, response, data_for_response):
 
     """
         :param api: Instance of the API (not currently used)
         :type api: API
-        :param response_text:
+        :param response:
         :param data_for_response:
 
 
@@ -460,13 +764,13 @@ def citation_match_parser(api, response_text, data_for_response):
     """
 
     #api : 'API'
-    #response_text : str
+    #response : Response
     #data_for_response : dict
 
     d = data_for_response
 
     output = []
-    lines = response_text.splitlines()  # split('\n')
+    lines = response.text.splitlines()  # split('\n')
     for line_text, cur_entry in zip(lines, d['entries']):
         output.append(CitationMatchResult(api, line_text, cur_entry))
         
@@ -773,7 +1077,7 @@ class Author(object):
         self.equal_contrib = _get_opt_attr_value(tag, 'EqualContrib',
                                                  default='N') == 'Y'
 
-        last_name_tag = author_tag.LastName
+        last_name_tag = tag.LastName
         if last_name_tag is None:
             self.collective_name = tag.CollectiveName.string
             self.last_name = None
@@ -964,109 +1268,11 @@ class Article(object):
         #                X PublicationTypeList,
         #                X VernacularTitle?,
         #                X ArticleDate*) >
-
-        self.journal = Journal(soup.Journal)
-
-        #ArticleTitle
-        #-----------------------------------------------------
-        #<!ELEMENT ArticleTitle( % text; | mml: math) * >
-        #<!ATTLIST ArticleTitle % booklinkatts; >
-        #<!ENTITY % text     "#PCDATA | b | i | sup | sub | u" >
-        #<!ENTITY % booklinkatts
-		#	 "book		CDATA			#IMPLIED
-		#	  part		CDATA			#IMPLIED
-		#	 sec		CDATA			#IMPLIED"  >
-        self.title = soup.ArticleTitle.string
-
-        #((Pagination, ELocationID*) | ELocationID+)
-        #--------------------------------------------
-        self.pagination = _get_opt_class(soup,'Pagination',Pagination)
-
-        # <!ELEMENT	ELocationID (#PCDATA) >
-        # <!ATTLIST	ELocationID
-        #    EIdType (doi | pii) #REQUIRED
-        #    ValidYN  (Y | N) "Y">
-
-        self.doi = None
-        self.pii = None
-        elocation_ids = soup.find_all('ELocationID',recursive=False)
-        for elocation in elocation_ids:
-            type = elocation['EIdType']
-            #Note, I like having doi and pii as attributes
-            #unfortunately we don't support logging these values
-            #when they are invalid if we only record the value directly
-            #
-            #would need to add additional attributes ('is_valid_doi') or
-            #make structure more complicated
-            if _get_opt_attr_value(elocation,'ValidYN','Y') == 'Y':
-                if type == 'doi':
-                    self.doi = elocation.string
-                elif type == 'pii':
-                    self.pii = elocation.string
-
-        #----------------------------------------------------------------------
-        #                               Abstract?
-        #----------------------------------------------------------------------
-        #<!ELEMENT Abstract(AbstractText+, CopyrightInformation?) >
-        #<!ELEMENT AbstractText( % text; | mml: math | DispFormula) * >
-        #<!ATTLIST AbstractText
-        #       Label CDATA  # IMPLIED
-        #       NlmCategory(BACKGROUND | OBJECTIVE | METHODS | RESULTS | CONCLUSIONS | UNASSIGNED)  # IMPLIED >
         #
-        #<!ELEMENT	CopyrightInformation (#PCDATA) >
-
-        abstract_tag = soup.Abstract
-
-        self.abstract_copyright_info = None
-        self.abstracts = None
-        if abstract_tag is not None:
-            abstract_text_tags = abstract_tag.find_all('AbstractText')
-            self.abstracts = [x.string for x in abstract_text_tags]
-
-            copy_tag = abstract_tag.CopyrightInformation
-            if copy_tag is not None:
-                self.abstract_copyright_info = copy_tag.string
-
-
-        # AuthorList?
-        #----------------------------------------------------------------------
-        self.authors = _get_opt_list(soup.authorlist,'author',Author)
+        # See object_fields (below the class) for the parsing of each field
 
-        # Language+
-        #----------------------------------------------------------------------
-        #<!ELEMENT	Language (#PCDATA) >
-        lang_tag = soup.find_all('Language',recursive=False)
-        self.languages = [x.string for x in lang_tag]
-
-        # DataBankList?
-        #----------------------------------------------------------------------
-        #<!ELEMENT DataBankList(DataBank+)>
-        #<!ATTLIST DataBankList
-        #   CompleteYN(Y | N) "Y" >
-
-        #Note, CompleteYN is not handled currently ...
-        self.databanks = _get_opt_list(soup.DataBankList,'DataBank',DataBank)
-
-        # GrantList?
-        #----------------------------------------------------------------------
-        #<!ELEMENT GrantList(Grant+) >
-        #<!ATTLIST GrantList
-        #       CompleteYN(Y | N) "Y" >
-        self.grants = _get_opt_list(soup.GrantList,'grant',Grant)
-
-        # PublicationTypeList
-        #----------------------------------------------------------------------
-        #<!ELEMENT PublicationTypeList (PublicationType+) >
-        self.pub_types = _get_opt_list(soup.PublicationTypeList,'PublicationType',PublicationType)
-
-        # VernacularTitle?
-        #----------------------------------------------------------------------
-        #< !ELEMENT VernacularTitle( % text; | mml: math) * >
-        self.vernacular_title = _get_opt_soup_string(soup,'VernacularTitle')
-
-        # ArticleDate*
-        #----------------------------------------------------------------------
-        self.dates = _get_opt_list(soup,'ArticleDate',ArticleDate)
+        for name, fh in self.object_fields.items():
+            setattr(self,name,fh(soup))
 
     def __repr__(self):
         return display_class(self,
@@ -1076,7 +1282,7 @@ class Article(object):
                                   'abstracts',cld(self.abstracts),
                                   'pagination',cld(self.pagination),
                                   'doi',quotes(self.doi),
-                                  'pii',quotse(self.pii),
+                                  'pii',quotes(self.pii),
                                   'authors',_list_cld_or_empty(self.authors),
                                   'languages',td(self.languages),
                                   'databanks',_list_cld_or_empty(self.databanks),
@@ -1085,6 +1291,127 @@ class Article(object):
                                   'grants',_list_cld_or_empty(self.grants),
                                   'dates',_list_cld_or_empty(self.dates)])
 
+def _get_elocation_id(soup,id_type):
+    # <!ELEMENT	ELocationID (#PCDATA) >
+    # <!ATTLIST	ELocationID
+    #    EIdType (doi | pii) #REQUIRED
+    #    ValidYN  (Y | N) "Y">
+
+    #Note, I like having doi and pii as attributes
+    #unfortunately we don't support logging these values
+    #when they are invalid if we only record the value directly
+    #
+    #would need to add additional attributes ('is_valid_doi') or
+    #make structure more complicated
+    elocation_ids = soup.find_all('ELocationID',recursive=False)
+    value = None
+    for elocation in elocation_ids:
+        if elocation['EIdType'] == id_type and \
+                _get_opt_attr_value(elocation,'ValidYN','Y') == 'Y':
+            value = elocation.string
+    return value
+
+def _get_abstracts(soup):
+    #<!ELEMENT Abstract(AbstractText+, CopyrightInformation?) >
+    #<!ELEMENT AbstractText( % text; | mml: math | DispFormula) * >
+    #<!ATTLIST AbstractText
+    #       Label CDATA  # IMPLIED
+    #       NlmCategory(BACKGROUND | OBJECTIVE | METHODS | RESULTS | CONCLUSIONS | UNASSIGNED)  # IMPLIED >
+    abstract_tag = soup.Abstract
+    if abstract_tag is None:
+        return None
+    else:
+        abstract_text_tags = abstract_tag.find_all('AbstractText')
+        return [x.string for x in abstract_text_tags]
+
+def _get_abstract_copyright(soup):
+    #<!ELEMENT	CopyrightInformation (#PCDATA) >
+    abstract_tag = soup.Abstract
+    if abstract_tag is None:
+        return None
+    else:
+        return _get_opt_soup_string(abstract_tag,'CopyrightInformation')
+
+#Function handles for each attribute of Article, called with the Article tag
+#
+#   This is shared by the eager (Article) and lazy (LazyArticle) versions.
+Article.object_fields = {
+    'journal': lambda soup: Journal(soup.Journal),
+
+    #ArticleTitle
+    #-----------------------------------------------------
+    #<!ELEMENT ArticleTitle( % text; | mml: math) * >
+    #<!ATTLIST ArticleTitle % booklinkatts; >
+    #<!ENTITY % text     "#PCDATA | b | i | sup | sub | u" >
+    'title': lambda soup: soup.ArticleTitle.string,
+
+    #((Pagination, ELocationID*) | ELocationID+)
+    #--------------------------------------------
+    'pagination': lambda soup: _get_opt_class(soup,'Pagination',Pagination),
+    'doi': lambda soup: _get_elocation_id(soup,'doi'),
+    'pii': lambda soup: _get_elocation_id(soup,'pii'),
+
+    #Abstract?
+    #--------------------------------------------
+    'abstract_copyright_info': _get_abstract_copyright,
+    'abstracts': _get_abstracts,
+
+    # AuthorList?
+    #--------------------------------------------
+    'authors': lambda soup: _get_opt_list(soup.AuthorList,'Author',Author),
+
+    # Language+
+    #--------------------------------------------
+    #<!ELEMENT	Language (#PCDATA) >
+    'languages': lambda soup: [x.string for x in
+                               soup.find_all('Language',recursive=False)],
+
+    # DataBankList?
+    #--------------------------------------------
+    #<!ELEMENT DataBankList(DataBank+)>
+    #<!ATTLIST DataBankList
+    #   CompleteYN(Y | N) "Y" >
+    #Note, CompleteYN is not handled currently ...
+    'databanks': lambda soup: _get_opt_list(soup.DataBankList,'DataBank',DataBank),
+
+    # GrantList?
+    #--------------------------------------------
+    #<!ELEMENT GrantList(Grant+) >
+    #<!ATTLIST GrantList
+    #       CompleteYN(Y | N) "Y" >
+    'grants': lambda soup: _get_opt_list(soup.GrantList,'Grant',Grant),
+
+    # PublicationTypeList
+    #--------------------------------------------
+    #<!ELEMENT PublicationTypeList (PublicationType+) >
+    'pub_types': lambda soup: _get_opt_list(soup.PublicationTypeList,
+                                            'PublicationType',PublicationType),
+
+    # VernacularTitle?
+    #--------------------------------------------
+    #< !ELEMENT VernacularTitle( % text; | mml: math) * >
+    'vernacular_title': lambda soup: _get_opt_soup_string(soup,'VernacularTitle'),
+
+    # ArticleDate*
+    #--------------------------------------------
+    'dates': lambda soup: _get_opt_list(soup,'ArticleDate',ArticleDate),
+    }
+
+class LazyArticle(_LazyFields, Article):
+
+    """
+    Version of Article where each attribute is only parsed on first access.
+
+    See Also
+    --------
+    LazyMedlineCitation
+    """
+
+    __slots__ = ['soup']
+
+    def __init__(self, soup):
+        self.soup = soup
+
 class PubmedArticle(object):
 
     """
@@ -1093,10 +1420,11 @@ class PubmedArticle(object):
 
     """
 
-    __slots__ = ['soup','citation','pubmed_data']
+    __slots__ = ['soup','citation','pubmed_data','raw_xml']
 
     citation: 'MedlineCitation'
     pubmed_data: Optional['PubmedData']
+    raw_xml: Optional[bytes]
 
     def __init__(self,soup):
         #<!ELEMENT	PubmedArticle (MedlineCitation, PubmedData?)>
@@ -1104,6 +1432,8 @@ class PubmedArticle(object):
 
         #For debugging ...
         self.soup = soup
+        #See the 'leave_raw' option of PubmedArticleSet
+        self.raw_xml = None
 
         self.citation = MedlineCitation(soup.MedlineCitation)
         pubmed_data = soup.PubmedData
@@ -1112,6 +1442,24 @@ class PubmedArticle(object):
         else:
             self.pubmed_data = PubmedData(pubmed_data)
 
+    def release_soup(self):
+        """
+        Drops references to the parse tree. This is done by default for
+        everything but lazy articles. See model_helpers._release_soup
+        """
+        self.soup = None
+        if self.pubmed_data is not None:
+            self.pubmed_data.soup = None
+
+    def __getstate__(self):
+        #The soup is not pickled, see pubmed.record_cache
+        return {x:getattr(self,x) for x in ('citation','pubmed_data','raw_xml')}
+
+    def __setstate__(self,state):
+        self.soup = None
+        for key, value in state.items():
+            setattr(self,key,value)
+
     def __repr__(self):
         return display_class(self,
                              ['citation', cld(self.citation),
@@ -1241,7 +1589,7 @@ class Reference(object):
         #<!ELEMENT	Citation       (%text; | mml:math)*>
 
         self.citation = tag.Citation.string
-        self.article_ids = _get_opt_list(tag.ArticleIdList,'articleid',ArticleID)
+        self.article_ids = _get_opt_list(tag.ArticleIdList,'ArticleId',ArticleID)
 
     def __repr__(self):
         return display_class(self,
@@ -1367,16 +1715,22 @@ class PubmedData(object):
         #<!ELEMENT	Param  (%text;)*>
         #<!ATTLIST	Param
         #       Name CDATA #REQUIRED >
-        object_list_tag = tag.objectlist
-        if object_list_tag is not None:
-            #TODO: Fix this ...
-            import pdb
-            pdb.set_trace()
+        #
+        #   Not yet handled
 
         #ReferenceList*
         #--------------------------------------------------
         self.ref_lists = _get_opt_list(tag,'ReferenceList',ReferenceList)
 
+    def __getstate__(self):
+        #The soup is not pickled, see pubmed.record_cache
+        return {x:getattr(self,x) for x in self.__slots__ if x != 'soup'}
+
+    def __setstate__(self,state):
+        self.soup = None
+        for key, value in state.items():
+            setattr(self,key,value)
+
     def __repr__(self):
         return display_class(self,
                              ['history', _list_cld_or_empty(self.history),
@@ -1550,8 +1904,13 @@ class CommentsCorrections(object):
         self.note = _get_opt_soup_string(tag,'Note')
         self.type = tag['RefType']
         self.source = tag.RefSource.string
-        self.pmid = tag.PMID.string
-        self.pmid_version = tag.pmid['Version']
+        pmid_tag = tag.PMID
+        if pmid_tag is None:
+            self.pmid = None
+            self.pmid_version = None
+        else:
+            self.pmid = pmid_tag.string
+            self.pmid_version = _get_opt_attr_value(pmid_tag,'Version')
 
     def __repr__(self):
         return display_class(self,
@@ -1824,121 +2183,9 @@ class MedlineCitation(object):
 
         #TODO: Attritbutes ...
 
-        #PMID
-        #------------------------------
-        self.pmid = soup.PMID.string
-
-        #DateCompleted?
-        #----------------------------------------------------------------------
-        self.date_completed = _get_opt_class(soup,'DateCompleted',DateCompleted)
-
-        #DateRevised?
-        #----------------------------------------------------------------------
-        self.date_revised = _get_opt_class(soup, 'DateRevised', DateRevised)
-
-        #Article
-        #----------------------------------------------------------------------
-        self.article = Article(soup.Article)
-
-        #MedlineJournalInfo
-        #----------------------------------------------------------------------
-        self.journal_info = MedlineJournalInfo(soup.MedlineJournalInfo)
-
-        #ChemicalList?,
-        #----------------------------------------------------------------------
-        self.chemicals = _get_opt_list(soup.ChemicalList,'Chemical',Chemical)
-
-        #SupplMeshList?
-        #----------------------------------------------------------------------
-        #<!ELEMENT	SupplMeshList (SupplMeshName+)>
-        self.suppl_mesh_list = _get_opt_list(soup.SupplMeshList,'SupplMeshName',SupplMeshName)
-
-        #CitationSubset*
-        #----------------------------------------------------------------------
-        #<!ELEMENT	CitationSubset (#PCDATA) >
-        #https: // www.nlm.nih.gov / bsd / licensee / elements_descriptions.html  # citationsubset
-        tags = soup.find_all('CitationSubset',recursive=False)
-        self.citation_subsets = [x.string for x in tags]
-
-        #https://www.nlm.nih.gov/bsd/licensee/elements_descriptions.html#citationsubset
-
-        #CommentsCorrectionsList?
-        #----------------------------------------------------------------------
-        # <!ELEMENT CommentsCorrectionsList(CommentsCorrections +) >
-        self.comments_corrections = _get_opt_list(soup.CommentsCorrectionsList,
-                                                  'CommentsCorrections',
-                                                  CommentsCorrections)
-
-        #GeneSymbolList?
-        #----------------------------------------------------------------------
-        #<!ELEMENT GeneSymbolList(GeneSymbol +) >
-        #<!ELEMENT	GeneSymbol (#PCDATA) >
-        gene_symbols = soup.find_all('GeneSymbol',recursive=False)
-        if len(gene_symbols) == 0:
-            self.gene_symbols = []
-        else:
-            self.gene_symbols = [x.string for x in gene_symbols]
-
-
-        #MeshHeadingList?
-        #----------------------------------------------------------------------
-        #<!ELEMENT MeshHeadingList(MeshHeading +) >
-        self.mesh_headings = _get_opt_list(soup.MeshHeadingList,'MeshHeading',MeshHeading)
-
-        #NumberOfReferences?,
-        #----------------------------------------------------------------------
-        #<!ELEMENT	NumberOfReferences (#PCDATA) >
-        self.n_references = _get_opt_soup_string(soup,'NumberOfReferences')
-
-        #PersonalNameSubjectList?,
-        #----------------------------------------------------------------------
-        #<!ELEMENT	PersonalNameSubjectList (PersonalNameSubject+) >
-        self.personal_names = _get_opt_list(soup.PersonalNameSubjectList,
-                                            'PersonalNameSubject',PersonalNameSubject)
-
-        #OtherID *,
-        #----------------------------------------------------------------------
-        self.other_ids = _get_opt_list(soup,'OtherID',OtherID)
-
-        #OtherAbstract *,
-        #----------------------------------------------------------------------
-        #<!ELEMENT	OtherAbstract (AbstractText+, CopyrightInformation?) >
-        #<!ATTLIST OtherAbstract
-        #Type(AAMC | AIDS | KIE | PIP | NASA | Publisher |
-        #     plain - language - summary)  # REQUIRED
-        #Language CDATA "eng" >
-
-        #KeywordList *,
-        #----------------------------------------------------------------------
-        self.keyword_lists = _get_opt_list(soup,'KeywordList',KeywordList)
-
-        #CoiStatement?,
-        #----------------------------------------------------------------------
-        #<!ELEMENT   CoiStatement   (%text;)*>
-        #https://www.nlm.nih.gov/bsd/licensee/elements_descriptions.html#coistatement
-        self.coi_statement = _get_opt_soup_string(soup,'CoiStatement')
-
-        #SpaceFlightMission *,
-        #----------------------------------------------------------------------
-        #<!ELEMENT	SpaceFlightMission (#PCDATA) >
-        space_missions = soup.find_all('SpaceFlightMission',recursive=False)
-        if len(space_missions) == 0:
-            self.space_missions = []
-        else:
-            self.space_missions = [x.string for x in space_missions]
-
-        #InvestigatorList?,
-        #----------------------------------------------------------------------
-        #<!ELEMENT	InvestigatorList (Investigator+) >
-        self.investigators = _get_opt_list(soup.InvestigatorList,
-                                           'Investigator',
-                                           Investigator)
-
-        #GeneralNote *
-        #----------------------------------------------------------------------
-        self.general_notes = _get_opt_list(soup,'GeneralNote',GeneralNote)
-
-
+        #See object_fields (below the class) for the parsing of each field
+        for name, fh in self.object_fields.items():
+            setattr(self,name,fh(soup))
 
     def __repr__(self):
         return display_class(self,
@@ -1965,6 +2212,366 @@ class MedlineCitation(object):
                             #'keywords',td(str(self.keywords)),
                             #'mesh_headings',td(str(self.mesh_headings))])
 
+def _get_opt_string_list(soup,name):
+    #For repeated #PCDATA elements
+    return [x.string for x in soup.find_all(name,recursive=False)]
+
+#Function handles for each attribute of MedlineCitation, called with the
+#MedlineCitation tag
+#
+#   This is shared by the eager (MedlineCitation) and lazy
+#   (LazyMedlineCitation) versions.
+MedlineCitation.object_fields = {
+    #PMID
+    #--------------------------------------------
+    'pmid': lambda soup: soup.PMID.string,
+
+    #DateCompleted?
+    #--------------------------------------------
+    'date_completed': lambda soup: _get_opt_class(soup,'DateCompleted',DateCompleted),
+
+    #DateRevised?
+    #--------------------------------------------
+    'date_revised': lambda soup: _get_opt_class(soup,'DateRevised',DateRevised),
+
+    #Article
+    #--------------------------------------------
+    'article': lambda soup: Article(soup.Article),
+
+    #MedlineJournalInfo
+    #--------------------------------------------
+    'journal_info': lambda soup: MedlineJournalInfo(soup.MedlineJournalInfo),
+
+    #ChemicalList?,
+    #--------------------------------------------
+    'chemicals': lambda soup: _get_opt_list(soup.ChemicalList,'Chemical',Chemical),
+
+    #SupplMeshList?
+    #--------------------------------------------
+    #<!ELEMENT	SupplMeshList (SupplMeshName+)>
+    'suppl_mesh_list': lambda soup: _get_opt_list(soup.SupplMeshList,
+                                                  'SupplMeshName',SupplMeshName),
+
+    #CitationSubset*
+    #--------------------------------------------
+    #<!ELEMENT	CitationSubset (#PCDATA) >
+    #https://www.nlm.nih.gov/bsd/licensee/elements_descriptions.html#citationsubset
+    'citation_subsets': lambda soup: _get_opt_string_list(soup,'CitationSubset'),
+
+    #CommentsCorrectionsList?
+    #--------------------------------------------
+    # <!ELEMENT CommentsCorrectionsList(CommentsCorrections +) >
+    'comments_corrections': lambda soup: _get_opt_list(soup.CommentsCorrectionsList,
+                                                       'CommentsCorrections',
+                                                       CommentsCorrections),
+
+    #GeneSymbolList?
+    #--------------------------------------------
+    #<!ELEMENT GeneSymbolList(GeneSymbol +) >
+    #<!ELEMENT	GeneSymbol (#PCDATA) >
+    'gene_symbols': lambda soup: _get_opt_string_list(soup,'GeneSymbol'),
+
+    #MeshHeadingList?
+    #--------------------------------------------
+    #<!ELEMENT MeshHeadingList(MeshHeading +) >
+    'mesh_headings': lambda soup: _get_opt_list(soup.MeshHeadingList,
+                                                'MeshHeading',MeshHeading),
+
+    #NumberOfReferences?,
+    #--------------------------------------------
+    #<!ELEMENT	NumberOfReferences (#PCDATA) >
+    'n_references': lambda soup: _get_opt_soup_string(soup,'NumberOfReferences'),
+
+    #PersonalNameSubjectList?,
+    #--------------------------------------------
+    #<!ELEMENT	PersonalNameSubjectList (PersonalNameSubject+) >
+    'personal_names': lambda soup: _get_opt_list(soup.PersonalNameSubjectList,
+                                                 'PersonalNameSubject',
+                                                 PersonalNameSubject),
+
+    #OtherID *,
+    #--------------------------------------------
+    'other_ids': lambda soup: _get_opt_list(soup,'OtherID',OtherID),
+
+    #OtherAbstract *,
+    #--------------------------------------------
+    #<!ELEMENT	OtherAbstract (AbstractText+, CopyrightInformation?) >
+    #<!ATTLIST OtherAbstract
+    #Type(AAMC | AIDS | KIE | PIP | NASA | Publisher |
+    #     plain - language - summary)  # REQUIRED
+    #Language CDATA "eng" >
+    #
+    #   Not yet handled
+
+    #KeywordList *,
+    #--------------------------------------------
+    'keyword_lists': lambda soup: _get_opt_list(soup,'KeywordList',KeywordList),
+
+    #CoiStatement?,
+    #--------------------------------------------
+    #<!ELEMENT   CoiStatement   (%text;)*>
+    #https://www.nlm.nih.gov/bsd/licensee/elements_descriptions.html#coistatement
+    'coi_statement': lambda soup: _get_opt_soup_string(soup,'CoiStatement'),
+
+    #SpaceFlightMission *,
+    #--------------------------------------------
+    #<!ELEMENT	SpaceFlightMission (#PCDATA) >
+    'space_missions': lambda soup: _get_opt_string_list(soup,'SpaceFlightMission'),
+
+    #InvestigatorList?,
+    #--------------------------------------------
+    #<!ELEMENT	InvestigatorList (Investigator+) >
+    'investigators': lambda soup: _get_opt_list(soup.InvestigatorList,
+                                                'Investigator',Investigator),
+
+    #GeneralNote *
+    #--------------------------------------------
+    'general_notes': lambda soup: _get_opt_list(soup,'GeneralNote',GeneralNote),
+    }
+
+class LazyMedlineCitation(_LazyFields, MedlineCitation):
+
+    """
+    Version of MedlineCitation where each attribute is only parsed on first
+    access. This is useful when only a couple of fields are needed from a
+    large # of documents, e.g.:
+
+        result = api.pubmed.details(ids,lazy=True)
+        titles = [x.citation.article.title for x in result.docs]
+
+    Note that the tag is kept around for as long as this object exists.
+    """
+
+    __slots__ = ['soup']
+
+    object_fields = dict(MedlineCitation.object_fields,
+                         article=lambda soup: LazyArticle(soup.Article))
+
+    def __init__(self, soup):
+        self.soup = soup
+
+class LazyPubmedArticle(_LazyFields, PubmedArticle):
+
+    """
+    Version of PubmedArticle where the citation and pubmed data are only
+    parsed on first access.
+
+    See Also
+    --------
+    LazyMedlineCitation
+    """
+
+    __slots__ = []
+
+    object_fields = {
+        'citation': lambda soup: LazyMedlineCitation(soup.MedlineCitation),
+        'pubmed_data': lambda soup: _get_opt_class(soup,'PubmedData',PubmedData)}
+
+    def __init__(self, soup):
+        self.soup = soup
+        self.raw_xml = None
+
+#==========================================================
+#               Book Articles and Deletions
+#==========================================================
+
+class Book(object):
+
+    """
+    Parent: BookDocument
+    """
+
+    __slots__ = ['publisher_name','publisher_location','title','pub_date',
+                 'authors','volume','edition','collection_title','isbns',
+                 'medium','report_number']
+
+    publisher_name: str
+    publisher_location: Optional[str]
+    title: str
+    pub_date: PubDate
+    authors: List['Author']
+    isbns: List[str]
+
+    def __init__(self,tag):
+        #<!ELEMENT	Book (Publisher, BookTitle, PubDate, BeginningDate?,
+        #                 EndingDate?, AuthorList*, InvestigatorList?, Volume?,
+        #                 VolumeTitle*, Edition?, CollectionTitle?, Isbn*,
+        #                 ELocationID*, Medium?, ReportNumber?) >
+        #<!ELEMENT	Publisher (PublisherName, PublisherLocation?) >
+        publisher = tag.Publisher
+        self.publisher_name = publisher.PublisherName.string
+        self.publisher_location = _get_opt_soup_string(publisher,'PublisherLocation')
+        self.title = tag.BookTitle.string
+        self.pub_date = PubDate(tag.PubDate)
+        self.authors = _get_author_lists(tag)
+        self.volume = _get_opt_soup_string(tag,'Volume')
+        self.edition = _get_opt_soup_string(tag,'Edition')
+        self.collection_title = _get_opt_soup_string(tag,'CollectionTitle')
+        self.isbns = _get_opt_string_list(tag,'Isbn')
+        self.medium = _get_opt_soup_string(tag,'Medium')
+        self.report_number = _get_opt_soup_string(tag,'ReportNumber')
+
+    def __repr__(self):
+        return display_class(self,
+                             ['publisher_name', quotes(self.publisher_name),
+                              'publisher_location', quotes(self.publisher_location),
+                              'title', quotes(td(self.title)),
+                              'pub_date', cld(self.pub_date),
+                              'authors', _list_cld_or_empty(self.authors),
+                              'volume', quotes(self.volume),
+                              'edition', quotes(self.edition),
+                              'collection_title', quotes(self.collection_title),
+                              'isbns', self.isbns,
+                              'medium', quotes(self.medium),
+                              'report_number', quotes(self.report_number)])
+
+def _get_author_lists(tag):
+    #AuthorList* - there may be separate lists of authors and editors
+    return [Author(x) for author_list in tag.find_all('AuthorList',recursive=False)
+            for x in author_list.find_all('Author',recursive=False)]
+
+class BookDocument(object):
+
+    """
+    Parent: PubmedBookArticle
+
+    Citation of a book or book chapter, e.g. from the NCBI Bookshelf.
+    """
+
+    __slots__ = ['pmid','article_ids','book','location_labels','title',
+                 'vernacular_title','pagination','languages','authors',
+                 'investigators','pub_types','abstracts',
+                 'abstract_copyright_info','keyword_lists','contribution_date',
+                 'date_revised','grants','ref_lists']
+
+    pmid: str
+    article_ids: List['ArticleID']
+    book: Book
+    title: Optional[str]
+    authors: List['Author']
+    date_revised: Optional['DateRevised']
+
+    def __init__(self,tag):
+        #<!ELEMENT	BookDocument (PMID, ArticleIdList, Book, LocationLabel*,
+        #                         ArticleTitle?, VernacularTitle?, Pagination?,
+        #                         Language*, AuthorList*, InvestigatorList?,
+        #                         PublicationType*, Abstract?, Sections?,
+        #                         KeywordList*, ContributionDate?, DateRevised?,
+        #                         CitationString?, GrantList?, ItemList*,
+        #                         ReferenceList*) >
+        #
+        #   Sections, CitationString and ItemList are not yet handled
+        self.pmid = tag.PMID.string
+        self.article_ids = _get_opt_list(tag.ArticleIdList,'ArticleId',ArticleID)
+        self.book = Book(tag.Book)
+        self.location_labels = _get_opt_string_list(tag,'LocationLabel')
+        self.title = _get_opt_soup_string(tag,'ArticleTitle')
+        self.vernacular_title = _get_opt_soup_string(tag,'VernacularTitle')
+        self.pagination = _get_opt_class(tag,'Pagination',Pagination)
+        self.languages = _get_opt_string_list(tag,'Language')
+        self.authors = _get_author_lists(tag)
+        self.investigators = _get_opt_list(tag.InvestigatorList,'Investigator',
+                                           Investigator)
+        self.pub_types = _get_opt_list(tag,'PublicationType',PublicationType)
+        self.abstracts = _get_abstracts(tag)
+        self.abstract_copyright_info = _get_abstract_copyright(tag)
+        self.keyword_lists = _get_opt_list(tag,'KeywordList',KeywordList)
+        self.contribution_date = _get_opt_class(tag,'ContributionDate',PubDate)
+        self.date_revised = _get_opt_class(tag,'DateRevised',DateRevised)
+        self.grants = _get_opt_list(tag.GrantList,'Grant',Grant)
+        self.ref_lists = _get_opt_list(tag,'ReferenceList',ReferenceList)
+
+    def __repr__(self):
+        return display_class(self,
+                             ['pmid', quotes(self.pmid),
+                              'article_ids', _list_cld_or_empty(self.article_ids),
+                              'book', cld(self.book),
+                              'location_labels', self.location_labels,
+                              'title', quotes(td(self.title)),
+                              'vernacular_title', quotes(td(self.vernacular_title)),
+                              'pagination', cld(self.pagination),
+                              'languages', self.languages,
+                              'authors', _list_cld_or_empty(self.authors),
+                              'investigators', _list_cld_or_empty(self.investigators),
+                              'pub_types', _list_cld_or_empty(self.pub_types),
+                              'abstracts', cld(self.abstracts),
+                              'abstract_copyright_info', quotes(td(self.abstract_copyright_info)),
+                              'keyword_lists', _list_cld_or_empty(self.keyword_lists),
+                              'contribution_date', cld(self.contribution_date),
+                              'date_revised', cld(self.date_revised),
+                              'grants', _list_cld_or_empty(self.grants),
+                              'ref_lists', _list_cld_or_empty(self.ref_lists)])
+
+class PubmedBookArticle(object):
+
+    """
+    Citation of a book, the counterpart of PubmedArticle.
+
+    Parent: PubmedArticleSet
+
+    See Also
+    --------
+    PubmedArticleSet.book_docs
+    """
+
+    __slots__ = ['soup','document','pubmed_data','raw_xml']
+
+    document: BookDocument
+    pubmed_data: Optional['PubmedData']
+    raw_xml: Optional[bytes]
+
+    def __init__(self,soup):
+        #<!ELEMENT	PubmedBookArticle (BookDocument, PubmedBookData?)>
+        #<!ELEMENT	PubmedBookData (History?, PublicationStatus, ArticleIdList, ObjectList?)>
+        #
+        #   PubmedBookData is a subset of PubmedData
+        self.soup = soup
+        self.raw_xml = None
+        self.document = BookDocument(soup.BookDocument)
+        self.pubmed_data = _get_opt_class(soup,'PubmedBookData',PubmedData)
+
+    @property
+    def pmid(self)->str:
+        return self.document.pmid
+
+    def release_soup(self):
+        self.soup = None
+        if self.pubmed_data is not None:
+            self.pubmed_data.soup = None
+
+    def __getstate__(self):
+        return {x:getattr(self,x) for x in ('document','pubmed_data','raw_xml')}
+
+    def __setstate__(self,state):
+        self.soup = None
+        for key, value in state.items():
+            setattr(self,key,value)
+
+    def __repr__(self):
+        return display_class(self,
+                             ['document', cld(self.document),
+                              'pubmed_data', cld(self.pubmed_data)])
+
+class DeleteCitation(object):
+
+    """
+    PMIDs of records that have been deleted. Found at the end of the
+    update files, see pubmed.ingest
+
+    Parent: PubmedArticleSet
+    """
+
+    __slots__ = ['pmids']
+
+    pmids: List[str]
+
+    def __init__(self,tag):
+        #<!ELEMENT	DeleteCitation (PMID+) >
+        self.pmids = _get_opt_string_list(tag,'PMID')
+
+    def __repr__(self):
+        return display_class(self,['pmids', td(str(self.pmids))])
+
 def __link_section():
     pass
 
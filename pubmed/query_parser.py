@@ -0,0 +1,663 @@
+# -*- coding: utf-8 -*-
+"""
+Parsing and evaluation of PubMed queries against a local_index.LocalIndex.
+
+Usage
+-----
+search = LocalSearch(index,db_info=api.pubmed.db_info())
+result = search.search('grill wm[au] AND (bladder[ti] OR urethra[ti])')
+result = search.search('bladder[mh] AND "2012"[PDAT] : "2017"[PDAT]')
+
+#Or directly
+parser = QueryParser()
+node = parser.parse('bladder[ti] NOT rat*[tiab]')
+pmids = QueryEvaluator(index,parser).evaluate(node)
+
+Syntax
+------
+term                word or "quoted phrase", * at the end for truncation
+term[field]         field is a name or full name from einfo (e.g. TITL,
+                    Title), or a common tag (ti, tiab, au, 1au, mh, ta, dp)
+a AND b, a OR b, a NOT b
+(a OR b) AND c
+"2012"[PDAT] : "2017/06"[PDAT]     dates are YYYY, YYYY/MM or YYYY/MM/DD
+
+As in PubMed, operators are evaluated left to right, so use parentheses
+to group them. Words that are next to each other are ANDed, unless they
+are followed by a field, e.g. 'grill wm[au]' is a single author.
+
+Only the fields that are in the local index are supported (see
+LOCAL_FIELDS), others raise errors.QueryError. Passing the DbInfo of
+pubmed (api.pubmed.db_info()) allows any name or full name listed by
+einfo to be used for those fields. There are no positions in the index so
+a phrase in a word field (title, abstract) matches all of its words.
+
+Evaluation
+----------
+The PMIDs of a term are left compressed (local_index.Postings) until they
+are needed. When ANDing, the shorter side is decoded and each of its PMIDs
+is looked up in the skip pointers of the other side, so only the blocks
+of the longer posting list that may hold matches are decoded. Date ranges
+use the sorted date array of the index.
+"""
+
+#Standard Library
+import re
+import heapq
+import calendar
+from bisect import bisect_left
+from typing import Optional, List, Union, Tuple
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .einfo_models import DbInfo
+
+#Local
+from .utils import display_class, quotes
+from .errors import QueryError
+from .local_index import LocalIndex, Postings, DEFAULT_FIELDS, ALL_TERM
+from .local_index import tokenize
+
+#einfo field name => prefixes of the local index, or 'date' / 'uid'
+LOCAL_FIELDS = {
+    'ALL': DEFAULT_FIELDS,
+    'WORD': ('ti','ab','mh','kw'),
+    'TITL': ('ti',),
+    'TIAB': ('ti','ab'),
+    'AUTH': ('au',),
+    'FAUT': ('fa',),
+    'MESH': ('mh',),
+    'OTRM': ('kw',),
+    'JOUR': ('ta',),
+    'PDAT': 'date',
+    'UID': 'uid',
+    }
+
+#einfo full names of LOCAL_FIELDS, from docs/db_info/pubmed_fields_list__2020_02.txt
+FULL_NAMES = {
+    'ALL': 'All Fields',
+    'WORD': 'Text Word',
+    'TITL': 'Title',
+    'TIAB': 'Title/Abstract',
+    'AUTH': 'Author',
+    'FAUT': 'Author - First',
+    'MESH': 'MeSH Terms',
+    'OTRM': 'Other Term',
+    'JOUR': 'Journal',
+    'PDAT': 'Date - Publication',
+    'UID': 'UID',
+    }
+
+#Tags used on the PubMed website
+TAGS = {
+    'all': 'ALL',
+    'tw': 'WORD',
+    'ti': 'TITL',
+    'tiab': 'TIAB',
+    'au': 'AUTH',
+    '1au': 'FAUT',
+    'mh': 'MESH',
+    'ot': 'OTRM',
+    'ta': 'JOUR',
+    'dp': 'PDAT',
+    'pmid': 'UID',
+    }
+
+#Local fields that hold whole phrases (see local_index.IndexBuilder)
+_PHRASE_FIELDS = ('mh','kw','au','fa','ta')
+
+_DATE = re.compile(r'^(\d{4})(?:[/-](\d{1,2})(?:[/-](\d{1,2}))?)?$')
+
+#==========================================================
+#                   Tokenizer
+#==========================================================
+
+_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<colon>:)
+  | (?P<field>\[[^\]]*\])
+  | (?P<phrase>"[^"]*")
+  | (?P<word>[^\s()\[\]":]+)
+    ''',re.VERBOSE)
+
+_OPERATORS = ('AND','OR','NOT')
+
+class Token(object):
+
+    """
+    Attributes
+    ----------
+    kind : str
+        'lparen', 'rparen', 'colon', 'field', 'phrase', 'word' or 'op'
+    value : str
+        Without the quotes of a phrase or the brackets of a field
+    position : int
+    end : int
+        Position after the token
+    """
+
+    __slots__ = ['kind','value','position','end']
+
+    def __init__(self, kind:str, value:str, position:int, end:int):
+        self.kind = kind
+        self.value = value
+        self.position = position
+        self.end = end
+
+    def __repr__(self):
+        return 'Token(%s,%r,%d)' % (self.kind,self.value,self.position)
+
+def tokenize_query(query:str)->List[Token]:
+    output = []
+    position = 0
+    while position < len(query):
+        match = _TOKEN.match(query,position)
+        if match is None:
+            raise QueryError('Unmatched "' if query[position] == '"' else
+                             'Unmatched [',query,position)
+        kind = match.lastgroup
+        text = match.group()
+        end = match.end()
+        if kind == 'phrase' or kind == 'field':
+            output.append(Token(kind,text[1:-1].strip(),position,end))
+        elif kind == 'word' and text in _OPERATORS:
+            output.append(Token('op',text,position,end))
+        elif kind != 'space':
+            output.append(Token(kind,text,position,end))
+        position = end
+    return output
+
+#==========================================================
+#                   Nodes
+#==========================================================
+
+class Term(object):
+
+    """
+    Attributes
+    ----------
+    text : str
+    field : str
+        einfo name, e.g. 'TITL'
+    quoted : bool
+    truncated : bool
+        The text ended with *
+    """
+
+    __slots__ = ['text','field','quoted','truncated']
+
+    def __init__(self, text:str, field:str, quoted=False):
+        self.truncated = text.endswith('*')
+        self.text = text.rstrip('*') if self.truncated else text
+        self.field = field
+        self.quoted = quoted
+
+    def to_string(self)->str:
+        text = self.text + ('*' if self.truncated else '')
+        if self.quoted:
+            text = '"%s"' % text
+        return '%s[%s]' % (text,FULL_NAMES[self.field])
+
+    def __repr__(self):
+        return 'Term(%s)' % self.to_string()
+
+
+class DateRange(object):
+
+    """
+    Attributes
+    ----------
+    field : str
+    min_date : int
+        YYYYMMDD
+    max_date : int
+    text : str
+        As written in the query
+    """
+
+    __slots__ = ['field','min_date','max_date','text']
+
+    def __init__(self, field:str, min_date:int, max_date:int, text:str):
+        self.field = field
+        self.min_date = min_date
+        self.max_date = max_date
+        self.text = text
+
+    def to_string(self)->str:
+        #As in esearch's query translation
+        full_name = FULL_NAMES[self.field]
+        return '"%s"[%s] : "%s"[%s]' % (_format_date(self.min_date),full_name,
+                                        _format_date(self.max_date),full_name)
+
+    def __repr__(self):
+        return 'DateRange(%s)' % self.to_string()
+
+
+class BoolOp(object):
+
+    """
+    Attributes
+    ----------
+    op : str
+        'AND', 'OR' or 'NOT'
+    left :
+    right :
+    """
+
+    __slots__ = ['op','left','right']
+
+    def __init__(self, op:str, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def to_string(self)->str:
+        return '%s %s %s' % (self.left.to_string(),self.op,self.right.to_string())
+
+    def __repr__(self):
+        return 'BoolOp(%s)' % self.to_string()
+
+
+class Group(object):
+
+    """
+    Parentheses in the query
+    """
+
+    __slots__ = ['node']
+
+    def __init__(self, node):
+        self.node = node
+
+    def to_string(self)->str:
+        return '(%s)' % self.node.to_string()
+
+    def __repr__(self):
+        return 'Group(%s)' % self.to_string()
+
+#==========================================================
+#                   Parser
+#==========================================================
+
+def _format_date(value:int)->str:
+    #20120000 => '2012/01/01', 20129999 => '2012/12/31'
+    year, month, day = value//10000, value//100 % 100, value % 100
+    month = min(max(month,1),12)
+    day = min(max(day,1),calendar.monthrange(year,month)[1])
+    return '%04d/%02d/%02d' % (year,month,day)
+
+def _get_date_bounds(text:str, query:str, position:int)->Tuple[int,int]:
+    #'2012' => 20120000, 20129999
+    match = _DATE.match(text.strip())
+    if match is None:
+        raise QueryError('Invalid date %r' % text,query,position)
+    year, month, day = match.groups()
+    value = int(year)*10000
+    if month is None:
+        return value, value + 9999
+    month = int(month)
+    if not 1 <= month <= 12:
+        raise QueryError('Invalid date %r' % text,query,position)
+    value += month*100
+    if day is None:
+        return value, value + 99
+    day = int(day)
+    if not 1 <= day <= calendar.monthrange(int(year),month)[1]:
+        raise QueryError('Invalid date %r' % text,query,position)
+    value += day
+    return value, value
+
+
+class QueryParser(object):
+
+    """
+    Attributes
+    ----------
+    field_names : dict
+        Lower case field name, full name or tag => einfo name
+    """
+
+    def __init__(self, db_info:Optional['DbInfo']=None):
+        """
+
+        Parameters
+        ----------
+        db_info : einfo_models.DbInfo
+            Adds the names and full names of the fields listed by einfo
+        """
+        field_names = {}
+        for name, full_name in FULL_NAMES.items():
+            field_names[name.lower()] = name
+            field_names[full_name.lower()] = name
+        if db_info is not None:
+            for x in db_info.field_list:
+                field_names[x.name.lower()] = x.name
+                field_names[x.full_name.lower()] = x.name
+        field_names.update(TAGS)
+        self.field_names = field_names
+
+    def get_field(self, text:str, query:str, position:int)->str:
+        name = self.field_names.get(text.strip().lower())
+        if name is None:
+            raise QueryError('Unknown field [%s]' % text,query,position)
+        if name not in LOCAL_FIELDS:
+            raise QueryError('Field [%s] is not in the local index' % text,
+                             query,position)
+        return name
+
+    def parse(self, query:str):
+        """
+        Returns the root node (Term, DateRange, BoolOp or Group)
+        """
+        tokens = tokenize_query(query)
+        if len(tokens) == 0:
+            raise QueryError('Empty query',query)
+        state = _ParserState(self,query,tokens)
+        node = state.parse_query()
+        token = state.peek()
+        if token is not None:
+            raise QueryError('Unexpected %s' % quotes(token.value),query,
+                             token.position)
+        return node
+
+    def __repr__(self):
+        return display_class(self,
+                             ['field_names', '{dict} len(%d)' % len(self.field_names),
+                              'methods', '-----------------------',
+                              'parse', '(query)'])
+
+
+class _ParserState(object):
+
+    #Recursive descent over the tokens of one query
+    #
+    #   query   := operand ((AND | OR | NOT)? operand)*
+    #   operand := '(' query ')' | terms (':' terms)?
+    #   terms   := (phrase | word+) field?
+
+    __slots__ = ['parser','query','tokens','index']
+
+    def __init__(self, parser:QueryParser, query:str, tokens:List[Token]):
+        self.parser = parser
+        self.query = query
+        self.tokens = tokens
+        self.index = 0
+
+    def peek(self)->Optional[Token]:
+        if self.index < len(self.tokens):
+            return self.tokens[self.index]
+        return None
+
+    def next(self)->Token:
+        token = self.peek()
+        if token is None:
+            raise QueryError('Unexpected end of query',self.query,len(self.query))
+        self.index += 1
+        return token
+
+    def parse_query(self):
+        node = self.parse_operand()
+        while True:
+            token = self.peek()
+            if token is None or token.kind == 'rparen':
+                return node
+            if token.kind == 'op':
+                self.index += 1
+                op = token.value
+            else:
+                #Implicit AND
+                op = 'AND'
+            node = BoolOp(op,node,self.parse_operand())
+
+    def parse_operand(self):
+        token = self.next()
+        if token.kind == 'lparen':
+            node = self.parse_query()
+            token = self.next()
+            if token.kind != 'rparen':
+                raise QueryError('Expected )',self.query,token.position)
+            return Group(node)
+        elif token.kind in ('phrase','word'):
+            self.index -= 1
+            return self.parse_terms()
+        else:
+            raise QueryError('Unexpected %s' % quotes(token.value),self.query,
+                             token.position)
+
+    def _parse_words(self)->Tuple[List[Token],Optional[str],Optional[Token]]:
+        #The words (or a phrase) and the field that follows them
+        tokens = [self.next()]
+        if tokens[0].kind == 'word':
+            while True:
+                token = self.peek()
+                if token is None or token.kind != 'word':
+                    break
+                tokens.append(token)
+                self.index += 1
+
+        token = self.peek()
+        if token is not None and token.kind == 'field':
+            self.index += 1
+            field = self.parser.get_field(token.value,self.query,token.position)
+            return tokens, field, token
+        return tokens, None, None
+
+    def parse_terms(self):
+        position = self.peek().position
+        tokens, field, field_token = self._parse_words()
+        quoted = tokens[0].kind == 'phrase'
+
+        token = self.peek()
+        if token is not None and token.kind == 'colon':
+            self.index += 1
+            return self._parse_range(tokens,field,position)
+
+        if field is None:
+            #Each word on its own, ANDed
+            nodes = [Term(x.value,'ALL',quoted=quoted) for x in tokens]
+            node = nodes[0]
+            for x in nodes[1:]:
+                node = BoolOp('AND',node,x)
+            return node
+
+        text = ' '.join(x.value for x in tokens)
+        if LOCAL_FIELDS[field] == 'date':
+            min_date, max_date = _get_date_bounds(text,self.query,position)
+            return DateRange(field,min_date,max_date,
+                             self.query[position:field_token.end])
+        return Term(text,field,quoted=quoted)
+
+    def _parse_range(self, tokens, field, position):
+        #e.g. "2012"[PDAT] : "2017"[PDAT]
+        if field is None or LOCAL_FIELDS[field] != 'date':
+            raise QueryError('Ranges are only supported for dates',
+                             self.query,position)
+        start_text = ' '.join(x.value for x in tokens)
+        end_position = self.peek().position if self.peek() else len(self.query)
+        end_tokens, end_field, end_field_token = self._parse_words()
+        if end_field is not None and end_field != field:
+            raise QueryError('Range of different fields',self.query,end_position)
+        end_text = ' '.join(x.value for x in end_tokens)
+
+        min_date = _get_date_bounds(start_text,self.query,position)[0]
+        max_date = _get_date_bounds(end_text,self.query,end_position)[1]
+        if end_field_token is None:
+            end = end_tokens[-1].end
+        else:
+            end = end_field_token.end
+        return DateRange(field,min_date,max_date,self.query[position:end])
+
+#==========================================================
+#                   Evaluation
+#==========================================================
+
+def _to_list(pmids:Union[Postings,List[int]])->List[int]:
+    if isinstance(pmids,Postings):
+        return pmids.to_list()
+    return pmids
+
+def probe_postings(candidates:List[int], postings:Postings)->List[int]:
+    """
+    Returns the candidates (sorted) that are in the postings, only decoding
+    the blocks that may hold them
+    """
+    skip_pmids = postings.skip_pmids
+    n_blocks = len(skip_pmids)
+    output = []
+    block_index = -1
+    block = None
+    for pmid in candidates:
+        i = bisect_left(skip_pmids,pmid,max(block_index,0))
+        if i == n_blocks:
+            break
+        if i != block_index:
+            block = set(postings.decode_block(i))
+            block_index = i
+        if pmid in block:
+            output.append(pmid)
+    return output
+
+def intersect(a:Union[Postings,List[int]], b:Union[Postings,List[int]])->List[int]:
+    #The shorter side is decoded, the other is probed if it is still
+    #compressed
+    if len(a) > len(b):
+        a, b = b, a
+    a = _to_list(a)
+    if isinstance(b,Postings):
+        return probe_postings(a,b)
+    b = set(b)
+    return [x for x in a if x in b]
+
+def union(a:Union[Postings,List[int]], b:Union[Postings,List[int]])->List[int]:
+    return union_all([a,b])
+
+def union_all(lists:List[Union[Postings,List[int]]])->List[int]:
+    """
+    Returns the sorted union of any # of sorted PMID lists, with a single
+    k-way merge
+    """
+    lists = [_to_list(x) for x in lists if x is not None and len(x) > 0]
+    if len(lists) == 0:
+        return []
+    elif len(lists) == 1:
+        return lists[0]
+    output = []
+    last = None
+    for pmid in heapq.merge(*lists):
+        if pmid != last:
+            output.append(pmid)
+            last = pmid
+    return output
+
+def difference(a:Union[Postings,List[int]], b:Union[Postings,List[int]])->List[int]:
+    a = _to_list(a)
+    if isinstance(b,Postings) and len(a) < len(b):
+        b = probe_postings(a,b)
+    b = set(_to_list(b))
+    return [x for x in a if x not in b]
+
+
+class QueryEvaluator(object):
+
+    """
+    Attributes
+    ----------
+    index : local_index.LocalIndex
+    parser : QueryParser
+    """
+
+    def __init__(self, index:LocalIndex, parser:Optional[QueryParser]=None):
+        if parser is None:
+            parser = QueryParser()
+        self.index = index
+        self.parser = parser
+
+    def _get_field_pmids(self, prefix:str, term:Term)->Union[Postings,List[int]]:
+        index = self.index
+        if prefix in _PHRASE_FIELDS:
+            words = [' '.join(tokenize(term.text))]
+        else:
+            words = tokenize(term.text)
+        if len(words) == 0 or not words[0]:
+            return []
+
+        results = []
+        for i, word in enumerate(words):
+            if term.truncated and i == len(words) - 1:
+                terms = index.get_terms(prefix + ':' + word)
+                pmids = union_all([index.get_postings(x) for x in terms])
+            else:
+                pmids = index.get_postings(prefix + ':' + word)
+                if pmids is None:
+                    return []
+            results.append(pmids)
+
+        #A phrase in a word field matches all of its words
+        output = results[0]
+        for x in results[1:]:
+            output = intersect(output,x)
+        return output
+
+    def get_term_pmids(self, term:Term)->Union[Postings,List[int]]:
+        prefixes = LOCAL_FIELDS[term.field]
+        if prefixes == 'uid':
+            pmids = [int(x) for x in tokenize(term.text) if x.isdigit()]
+            return intersect(sorted(set(pmids)),self.index.get_postings(ALL_TERM) or [])
+
+        if len(prefixes) == 1:
+            return self._get_field_pmids(prefixes[0],term)
+        return union_all([self._get_field_pmids(x,term) for x in prefixes])
+
+    def evaluate(self, node, stack:Optional[list]=None)->Union[Postings,List[int]]:
+        """
+        Returns the PMIDs matching a parsed query, as Postings or a sorted
+        list. If stack is a list it gets the translation stack, as in
+        esearch's JSON (terms with their counts and operators in RPN).
+        """
+        if isinstance(node,Term):
+            pmids = self.get_term_pmids(node)
+        elif isinstance(node,DateRange):
+            pmids = self.index.get_date_range(node.min_date,node.max_date)
+        elif isinstance(node,Group):
+            pmids = self.evaluate(node.node,stack)
+            if stack is not None:
+                stack.append('GROUP')
+            return pmids
+        else:
+            left = self.evaluate(node.left,stack)
+            right = self.evaluate(node.right,stack)
+            if stack is not None:
+                stack.append(node.op)
+            if node.op == 'AND':
+                return intersect(left,right)
+            elif node.op == 'OR':
+                return union(left,right)
+            else:
+                return difference(left,right)
+
+        if stack is not None:
+            stack.append({'term':node.to_string(),
+                          'field':FULL_NAMES[node.field],
+                          'count':str(len(pmids)),
+                          'explode':'N'})
+        return pmids
+
+    def search(self, query:str)->Tuple[List[int],list,str]:
+        """
+        Returns the sorted PMIDs matching the query, along with the
+        translation stack and query translation
+        """
+        node = self.parser.parse(query)
+        stack = []
+        pmids = _to_list(self.evaluate(node,stack))
+        return list(pmids), stack, node.to_string()
+
+    def __repr__(self):
+        return display_class(self,
+                             ['index', self.index.path,
+                              'parser', self.parser.__class__.__name__,
+                              'methods', '-----------------------',
+                              'evaluate', '(node,stack=None)',
+                              'search', '(query)'])
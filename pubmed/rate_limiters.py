@@ -0,0 +1,589 @@
+# -*- coding: utf-8 -*-
+"""
+Rate limiting of requests to NCBI.
+
+https://www.ncbi.nlm.nih.gov/books/NBK25497/#_chapter2_Usage_Guidelines_and_Requiremen_
+
+NCBI limits requests to 3 per second without an API key and 10 per second
+with one. The limit applies to the key (or IP), not to a particular API
+instance, so by default all API instances in a process that use the same key
+share a single limiter.
+
+Backends
+--------
+TokenBucketLimiter : thread-safe, in-process
+FileLockLimiter : shared between processes on the same machine via a lock file
+
+Both limiters work by reservation. A caller takes a token (possibly driving
+the # of tokens negative) and then sleeps outside of the lock for however
+long it takes for that token to become available. This means that waiting
+callers don't block each other and that the full budget gets used.
+
+With adaptive_rate the API wraps the shared limiter in an AdaptiveLimiter,
+so the controller only changes the rate of that API instance. The shared
+budget stays at the configured rate for everyone else, including other
+processes using a FileLockLimiter. Each process (and API instance) adapts
+on its own.
+
+Usage
+-----
+api = API(rate_limiter='process')
+api = API(adaptive_rate=True)      #see AdaptiveRateController
+"""
+
+#Standard Library
+import os
+import asyncio
+import sys
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Optional, Union
+
+#Local
+from .utils import display_class
+
+
+class TokenBucketLimiter(object):
+
+    """
+    In-process token bucket, guarded by a lock.
+
+    Attributes
+    ----------
+    rate : float
+        Tokens (requests) added per second
+    burst : int
+        Maximum # of tokens that can accumulate. With a burst of 1 requests
+        are evenly spaced at 1/rate.
+    """
+
+    __slots__ = ['rate','burst','tokens','last_update','lock']
+
+    def __init__(self, rate:float, burst:int=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last_update = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate:float):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def _refill(self, now):
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.last_update)*self.rate)
+        self.last_update = now
+
+    def reserve(self)->float:
+        """
+        Takes a token and returns how long to wait before it can be used.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            else:
+                return -self.tokens/self.rate
+
+    def penalize(self, wait_time:float):
+        """
+        Prevents any tokens from being available for the next 'wait_time'
+        seconds, e.g. when the server asks us to slow down.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, -wait_time*self.rate)
+
+    def acquire(self)->float:
+        """
+        Blocks until a request can be made.
+
+        Returns
+        -------
+        wait_time : float
+            Time spent waiting in seconds
+        """
+        wait_time = self.reserve()
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+    def __repr__(self):
+        return display_class(self,
+                             ['rate', self.rate,
+                              'burst', self.burst,
+                              'tokens', self.tokens])
+
+
+class FileLockLimiter(object):
+
+    """
+    Token bucket whose state lives in a small file so that all processes
+    on a machine using the same key share the request budget.
+
+    The state file holds "<tokens> <last_update>" using wall clock time,
+    and is only read or written while holding an exclusive lock on it.
+
+    The rate is not in the file, each process refills the tokens at its own
+    rate when it updates the file, so all processes sharing the file should
+    use the same rate. set_rate only changes the rate of this process.
+
+    Attributes
+    ----------
+    path : str
+        Location of the state file.
+    rate : float
+    burst : int
+    """
+
+    __slots__ = ['path','rate','burst','thread_lock']
+
+    def __init__(self, rate:float, burst:int=1, path:Optional[str]=None,
+                 key:Optional[str]=None):
+        """
+
+        Parameters
+        ----------
+        path : str
+            If not specified a file in the temp directory is used that is
+            specific to the key.
+        key : str
+            API key (or None). Only used to pick the default path.
+        """
+        self.rate = rate
+        self.burst = burst
+        if path is None:
+            path = _get_default_lock_path(key)
+        self.path = path
+        #Serializes threads within this process, the file lock is per
+        #process on some platforms
+        self.thread_lock = threading.Lock()
+
+    def set_rate(self, rate:float):
+        #Only for this process, see the class documentation
+        self.rate = rate
+
+    def _update(self, fh):
+        #fh : function handle that takes (tokens,now) and returns
+        #(new_tokens,return_value)
+        with self.thread_lock:
+            with open(self.path,'a+b') as f:
+                _lock_file(f)
+                try:
+                    f.seek(0)
+                    data = f.read().split()
+                    now = time.time()
+                    if len(data) == 2:
+                        tokens = float(data[0])
+                        last_update = float(data[1])
+                        tokens = min(self.burst,
+                                     tokens + (now - last_update)*self.rate)
+                    else:
+                        tokens = self.burst
+
+                    tokens, output = fh(tokens,now)
+
+                    f.seek(0)
+                    f.truncate()
+                    f.write(b'%r %r' % (tokens, now))
+                    f.flush()
+                finally:
+                    _unlock_file(f)
+
+        return output
+
+    def reserve(self)->float:
+        def fh(tokens,now):
+            tokens -= 1
+            if tokens >= 0:
+                return tokens, 0.0
+            else:
+                return tokens, -tokens/self.rate
+
+        return self._update(fh)
+
+    def penalize(self, wait_time:float):
+        def fh(tokens,now):
+            return min(tokens, -wait_time*self.rate), None
+
+        self._update(fh)
+
+    def acquire(self)->float:
+        wait_time = self.reserve()
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+    def __repr__(self):
+        return display_class(self,
+                             ['path', self.path,
+                              'rate', self.rate,
+                              'burst', self.burst])
+
+
+class AdaptiveLimiter(object):
+
+    """
+    Limiter of a single API instance whose rate is set by an
+    AdaptiveRateController, on top of a shared limiter.
+
+    A request needs a token from both limiters. The controller only sets
+    the rate of the local limiter, so lowering it doesn't slow down the
+    other users of the shared limiter, and the shared limiter being
+    configured again (see get_limiter) doesn't undo the lowered rate.
+    Penalties, e.g. from Retry-After, apply to the shared limiter so that
+    every user waits.
+
+    Attributes
+    ----------
+    shared :
+        Limiter from get_limiter
+    local : TokenBucketLimiter
+    """
+
+    __slots__ = ['shared','local']
+
+    def __init__(self, shared, rate:float):
+        self.shared = shared
+        self.local = TokenBucketLimiter(rate)
+
+    @property
+    def rate(self)->float:
+        return self.local.rate
+
+    def set_rate(self, rate:float):
+        self.local.set_rate(rate)
+
+    def reserve(self)->float:
+        return max(self.shared.reserve(),self.local.reserve())
+
+    def penalize(self, wait_time:float):
+        self.shared.penalize(wait_time)
+
+    def acquire(self)->float:
+        wait_time = self.reserve()
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+    def __repr__(self):
+        return display_class(self,
+                             ['shared', self.shared.__class__.__name__,
+                              'local', self.local.__class__.__name__,
+                              'rate', self.rate])
+
+
+class AsyncLimiter(object):
+
+    """
+    Awaitable wrapper around one of the limiters above.
+
+    The token is reserved with the wrapped limiter, so the budget is shared
+    with any synchronous API instances, but the wait is done with
+    asyncio.sleep so that other requests (and parsing) can proceed.
+
+    See Also
+    --------
+    pubmed.async_api.AsyncAPI
+    """
+
+    __slots__ = ['limiter']
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    async def acquire(self)->float:
+        wait_time = self.limiter.reserve()
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+        return wait_time
+
+    def __repr__(self):
+        return display_class(self,['limiter', self.limiter.__class__.__name__])
+
+
+class LatencyStats(object):
+
+    """
+    Latency of one kind of request, see AdaptiveRateController
+
+    Attributes
+    ----------
+    latency : float
+        EWMA of request durations, in seconds
+    baseline_latency : float
+    n_samples : int
+    """
+
+    __slots__ = ['latency','baseline_latency','n_samples']
+
+    def __init__(self, elapsed_time:float):
+        self.latency = elapsed_time
+        self.baseline_latency = elapsed_time
+        self.n_samples = 1
+
+    def update(self, elapsed_time:float, alpha:float):
+        self.n_samples += 1
+        self.latency += alpha*(elapsed_time - self.latency)
+        if self.latency < self.baseline_latency:
+            self.baseline_latency = self.latency
+        else:
+            self.baseline_latency += 0.01*(self.latency - self.baseline_latency)
+
+    def get_state(self)->dict:
+        return {'latency':self.latency,
+                'baseline_latency':self.baseline_latency,
+                'n_samples':self.n_samples}
+
+    def __repr__(self):
+        return display_class(self,
+                             ['latency', self.latency,
+                              'baseline_latency', self.baseline_latency,
+                              'n_samples', self.n_samples])
+
+
+class AdaptiveRateController(object):
+
+    """
+    Adjusts the rate of a limiter based on how requests are going, using
+    additive increase / multiplicative decrease (AIMD) like TCP.
+
+    The limiter should only be used by one API instance, see AdaptiveLimiter.
+
+    Each fast, successful response raises the rate by increase/rate, i.e.
+    by about 'increase' requests per second every second, up to max_rate.
+    The rate is multiplied by 'decrease' (down to min_rate) after a 429,
+    a 5xx, a connection error or timeout, or when the latency (an EWMA of
+    the request durations) rises above latency_factor times the baseline
+    latency. The baseline follows the lowest latency seen, drifting up
+    slowly so that a lasting change in latency is eventually accepted.
+
+    Latency is tracked separately for each 'key' passed to on_response,
+    since a 500 ID efetch normally takes much longer than a small esearch.
+    The API uses the endpoint and the # of IDs (rounded to a power of 2),
+    see api._get_latency_key.
+    Decreases are at most once per 'cooldown' seconds since the requests in
+    flight when things go wrong tend to fail together.
+
+    The controller starts at max_rate, the configured rate, and so only
+    ever lowers the rate below it and recovers.
+
+    Attributes
+    ----------
+    limiter : AdaptiveLimiter
+        Limiter whose rate is set
+    rate : float
+        Current rate, requests per second
+    max_rate : float
+    min_rate : float
+    increase : float
+    decrease : float
+    latency_factor : float
+    alpha : float
+        Weight of the newest duration in the latency EWMA
+    cooldown : float
+    min_samples : int
+        # of responses for a key before its latency can cause a decrease
+    latencies : dict
+        key => LatencyStats
+    n_increases : int
+    n_decreases : int
+    last_decrease_reason : str or None
+        - 'rate_limited' : 429
+        - 'server_error' : 5xx
+        - 'error' : connection error or timeout
+        - 'latency'
+    """
+
+    __slots__ = ['limiter','rate','max_rate','min_rate','increase','decrease',
+                 'latency_factor','alpha','cooldown','min_samples','latencies',
+                 'n_increases','n_decreases',
+                 'last_decrease_time','last_decrease_reason','lock']
+
+    def __init__(self, limiter, max_rate:float, min_rate:float=0.5,
+                 increase:float=0.5, decrease:float=0.5,
+                 latency_factor:float=3.0, alpha:float=0.2,
+                 cooldown:float=1.0, min_samples:int=5):
+        self.limiter = limiter
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate,max_rate)
+        self.rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.alpha = alpha
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.latencies = {}
+        self.n_increases = 0
+        self.n_decreases = 0
+        self.last_decrease_time = None
+        self.last_decrease_reason = None
+        self.lock = threading.Lock()
+
+    def on_response(self, elapsed_time:float, status:Optional[int]=None,
+                    error:Optional[Exception]=None, key=None):
+        """
+        Updates the rate given the outcome of a request.
+
+        Parameters
+        ----------
+        elapsed_time : float
+            Duration of the request in seconds
+        status : int
+            HTTP status, None if the request raised an error
+        error : Exception
+        key :
+            Requests with the same key are expected to take about as long,
+            e.g. the endpoint
+        """
+        with self.lock:
+            if error is not None:
+                self._decrease('error')
+                return
+            elif status == 429:
+                self._decrease('rate_limited')
+                return
+            elif status is not None and status >= 500:
+                self._decrease('server_error')
+                return
+
+            stats = self.latencies.get(key)
+            if stats is None:
+                stats = LatencyStats(elapsed_time)
+                self.latencies[key] = stats
+            else:
+                stats.update(elapsed_time,self.alpha)
+
+            if stats.n_samples >= self.min_samples and \
+                    stats.latency > self.latency_factor*stats.baseline_latency:
+                self._decrease('latency')
+            elif self.rate < self.max_rate:
+                self.rate = min(self.max_rate,self.rate + self.increase/self.rate)
+                self.n_increases += 1
+                self.limiter.set_rate(self.rate)
+
+    def _decrease(self, reason):
+        now = time.monotonic()
+        if self.last_decrease_time is not None and \
+                now - self.last_decrease_time < self.cooldown:
+            return
+        self.last_decrease_time = now
+        self.last_decrease_reason = reason
+        self.n_decreases += 1
+        self.rate = max(self.min_rate,self.rate*self.decrease)
+        self.limiter.set_rate(self.rate)
+
+    def reset(self):
+        """
+        Returns to max_rate and forgets the latency history
+        """
+        with self.lock:
+            self.rate = self.max_rate
+            self.latencies = {}
+            self.limiter.set_rate(self.rate)
+
+    def get_state(self)->dict:
+        with self.lock:
+            return {'rate':self.rate,
+                    'max_rate':self.max_rate,
+                    'min_rate':self.min_rate,
+                    'latencies':{k:v.get_state() for k,v in self.latencies.items()},
+                    'n_increases':self.n_increases,
+                    'n_decreases':self.n_decreases,
+                    'last_decrease_reason':self.last_decrease_reason}
+
+    def __repr__(self):
+        return display_class(self,
+                             ['rate', self.rate,
+                              'max_rate', self.max_rate,
+                              'min_rate', self.min_rate,
+                              'latencies', '{dict} len(%d)' % len(self.latencies),
+                              'n_increases', self.n_increases,
+                              'n_decreases', self.n_decreases,
+                              'last_decrease_reason', self.last_decrease_reason])
+
+
+#Limiters shared within the process, keyed by (backend,key)
+_shared_limiters = {}
+_shared_lock = threading.Lock()
+
+def get_limiter(limiter:Union[str,object,None], rate:float,
+                key:Optional[str]=None):
+    """
+    Resolves the 'rate_limiter' option of the API.
+
+    Parameters
+    ----------
+    limiter :
+        - None or 'thread' : TokenBucketLimiter shared by all API instances in
+                             this process with the same key
+        - 'process' : FileLockLimiter shared by all processes on this machine
+                      with the same key
+        - an instance with acquire(), reserve() and penalize() methods
+    rate : float
+        Requests per second
+    key : str
+        API key, used to determine which limiters should be shared
+    """
+
+    if limiter is None:
+        limiter = 'thread'
+
+    if limiter == 'thread':
+        cls = TokenBucketLimiter
+    elif limiter == 'process':
+        cls = FileLockLimiter
+    elif isinstance(limiter,str):
+        raise ValueError('Unrecognized rate_limiter option: %s' % limiter)
+    else:
+        return limiter
+
+    with _shared_lock:
+        shared_key = (limiter,key)
+        instance = _shared_limiters.get(shared_key)
+        if instance is None:
+            if cls is FileLockLimiter:
+                instance = cls(rate,key=key)
+            else:
+                instance = cls(rate)
+            _shared_limiters[shared_key] = instance
+        elif instance.rate != rate:
+            #The rate goes with the most recent API instance. This doesn't
+            #affect adaptive rates, see AdaptiveLimiter
+            instance.set_rate(rate)
+
+    return instance
+
+def _get_default_lock_path(key):
+    #The key itself is not put in the file name
+    if key is None:
+        key = 'no_key'
+    name = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(),'pubmed_rate_%s.lock' % name)
+
+if sys.platform == 'win32':
+    import msvcrt
+
+    def _lock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(),msvcrt.LK_LOCK,1)
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(),msvcrt.LK_UNLCK,1)
+else:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(),fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(),fcntl.LOCK_UN)
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of parsed records, keyed by PMID.
+
+Usage
+-----
+api = API(record_cache=True)                     #in memory only
+api = API(record_cache='/path/to/records.sqlite') #plus an on-disk tier
+api = API(record_cache=RecordCache(max_items=50000,summary_ttl=3600))
+
+result = api.pubmed.details(ids)    #only uncached PMIDs are requested
+
+Unlike pubmed.cache, which stores raw responses, this stores the parsed
+PubmedArticle and PubmedSummary objects so that cached records don't need
+to be parsed again. It is consulted by Pubmed.details() and
+Pubmed.summary() for lists of IDs with return_type='object' (and not lazy).
+
+Records are kept in an in-memory LRU. If a path is given they are also
+pickled to a SQLite database, which is checked on a memory miss.
+
+Invalidation
+------------
+Articles are versioned by their DateRevised. A put() never replaces a
+record with an older revision, and putting a newer revision of an article
+also drops the cached summary of that PMID. To drop records that are known
+to be stale use invalidate(pmid,date_revised).
+
+Summaries don't include a revision date so they expire after summary_ttl
+seconds. Articles only expire if details_ttl is set.
+"""
+
+#Standard Library
+import io
+import os
+import time
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, List, Union, Iterable
+
+#Third Party
+from bs4.element import NavigableString
+
+#Local
+from .utils import display_class
+
+_DAY = 24*60*60
+
+NAMESPACES = ('details','summary')
+
+class _Entry(object):
+
+    __slots__ = ['revision','created','value']
+
+    def __init__(self,revision,created,value):
+        self.revision = revision
+        self.created = created
+        self.value = value
+
+
+class _RecordPickler(pickle.Pickler):
+
+    #Strings from the soup (i.e., tag.string) are NavigableStrings which
+    #hold a reference to their parent, and thus to the whole document.
+    #These get pickled as plain strings.
+    def reducer_override(self,obj):
+        if isinstance(obj,NavigableString):
+            return str, (str(obj),)
+        return NotImplemented
+
+def _dumps(value)->bytes:
+    f = io.BytesIO()
+    _RecordPickler(f,pickle.HIGHEST_PROTOCOL).dump(value)
+    return f.getvalue()
+
+
+def get_article_revision(article)->Optional[str]:
+    """
+    Returns the DateRevised of a PubmedArticle as 'YYYYMMDD', or None
+    """
+    date = article.citation.date_revised
+    if date is None:
+        return None
+    return '%s%02d%02d' % (date.year,int(date.month),int(date.day))
+
+def get_article_pmid(article)->str:
+    return str(article.citation.pmid)
+
+def get_summary_pmid(summary)->str:
+    return summary.uid
+
+
+class RecordCache(object):
+
+    """
+    Attributes
+    ----------
+    max_items : int
+        Maximum # of records per namespace to keep in memory
+    path : str or None
+        Location of the on-disk tier, if any
+    details_ttl : float or None
+        Time to live of articles, in seconds. None means no expiration.
+    summary_ttl : float or None
+        Time to live of summaries, in seconds
+    hits : int
+    misses : int
+    """
+
+    def __init__(self,
+                 max_items:int=10000,
+                 path:Optional[str]=None,
+                 details_ttl:Optional[float]=None,
+                 summary_ttl:Optional[float]=_DAY):
+
+        self.max_items = max_items
+        self.path = path
+        self.details_ttl = details_ttl
+        self.summary_ttl = summary_ttl
+        self.hits = 0
+        self.misses = 0
+
+        self.memory = {x:OrderedDict() for x in NAMESPACES}
+        self.lock = threading.Lock()
+
+        if path is None:
+            self.db = None
+        else:
+            if path != ':memory:':
+                folder = os.path.dirname(os.path.abspath(path))
+                os.makedirs(folder,exist_ok=True)
+            self.db = sqlite3.connect(path,check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute("""CREATE TABLE IF NOT EXISTS records (
+                                namespace TEXT,
+                                pmid TEXT,
+                                revision TEXT,
+                                created REAL,
+                                value BLOB,
+                                PRIMARY KEY (namespace, pmid))""")
+            self.db.commit()
+
+    def _get_ttl(self,namespace):
+        if namespace == 'details':
+            return self.details_ttl
+        else:
+            return self.summary_ttl
+
+    def _is_expired(self,namespace,entry,now):
+        ttl = self._get_ttl(namespace)
+        return ttl is not None and now - entry.created > ttl
+
+    #---- Reading ---------------------------------
+    def get(self,namespace:str,pmid:Union[str,int]):
+        """
+        Returns the cached record or None
+        """
+        return self.get_many(namespace,[pmid]).get(str(pmid))
+
+    def get_many(self,namespace:str,pmids:Iterable[Union[str,int]])->Dict[str,object]:
+        """
+        Returns a dict of the cached records, by PMID. PMIDs that are not
+        cached are not in the output.
+        """
+        pmids = [str(x) for x in pmids]
+        memory = self.memory[namespace]
+        now = time.time()
+        output = {}
+        with self.lock:
+            missing = []
+            for pmid in pmids:
+                entry = memory.get(pmid)
+                if entry is None:
+                    missing.append(pmid)
+                elif self._is_expired(namespace,entry,now):
+                    del memory[pmid]
+                    missing.append(pmid)
+                else:
+                    memory.move_to_end(pmid)
+                    output[pmid] = entry.value
+
+            if self.db is not None and len(missing) > 0:
+                for pmid, entry in self._db_get(namespace,missing):
+                    if self._is_expired(namespace,entry,now):
+                        continue
+                    self._memory_put(namespace,pmid,entry)
+                    output[pmid] = entry.value
+
+            self.hits += len(output)
+            self.misses += len(pmids) - len(output)
+
+        return output
+
+    def _db_get(self,namespace,pmids):
+        #SQLite limits the # of parameters per statement
+        n = 500
+        for i in range(0,len(pmids),n):
+            chunk = pmids[i:i+n]
+            rows = self.db.execute("""SELECT pmid, revision, created, value
+                                   FROM records WHERE namespace = ? AND
+                                   pmid IN (%s)""" % ','.join('?'*len(chunk)),
+                                   [namespace] + chunk).fetchall()
+            for pmid, revision, created, value in rows:
+                yield pmid, _Entry(revision,created,pickle.loads(value))
+
+    #---- Writing ---------------------------------
+    def put_articles(self,articles:List['PubmedArticle']):
+        """
+        Caches PubmedArticle objects, keeping whichever revision is newer.
+        """
+        records = [(get_article_pmid(x),get_article_revision(x),x)
+                   for x in articles]
+        self._put_many('details',records)
+
+    def put_summaries(self,summaries:List['PubmedSummary']):
+        records = [(get_summary_pmid(x),None,x) for x in summaries]
+        self._put_many('summary',records)
+
+    def _put_many(self,namespace,records):
+        memory = self.memory[namespace]
+        now = time.time()
+        rows = []
+        with self.lock:
+            for pmid, revision, value in records:
+                old = memory.get(pmid)
+                if old is not None and _is_older(revision,old.revision):
+                    continue
+                if namespace == 'details' and old is not None and \
+                        _is_older(old.revision,revision):
+                    #The article changed so the summary is stale too
+                    self._delete('summary',pmid)
+
+                entry = _Entry(revision,now,value)
+                self._memory_put(namespace,pmid,entry)
+                if self.db is not None:
+                    rows.append((namespace,pmid,revision,now,
+                                 _dumps(value)))
+
+            if len(rows) > 0:
+                #Note that the check against the revision on disk
+                #is done in SQL
+                self.db.executemany("""INSERT INTO records VALUES (?,?,?,?,?)
+                    ON CONFLICT (namespace, pmid) DO UPDATE SET
+                    revision = excluded.revision, created = excluded.created,
+                    value = excluded.value
+                    WHERE records.revision IS NULL OR excluded.revision IS NULL
+                    OR excluded.revision >= records.revision""",rows)
+                self.db.commit()
+
+    def _memory_put(self,namespace,pmid,entry):
+        memory = self.memory[namespace]
+        memory[pmid] = entry
+        memory.move_to_end(pmid)
+        while len(memory) > self.max_items:
+            memory.popitem(last=False)
+
+    #---- Invalidation ----------------------------
+    def invalidate(self,pmid:Union[str,int],date_revised:Optional[str]=None):
+        """
+        Removes cached records of a PMID.
+
+        Parameters
+        ----------
+        date_revised : str, 'YYYYMMDD' or 'YYYY/MM/DD'
+            If specified only articles revised before this date are removed.
+            The summary is always removed.
+        """
+        pmid = str(pmid)
+        if date_revised is not None:
+            date_revised = date_revised.replace('/','')
+
+        with self.lock:
+            entry = self.memory['details'].get(pmid)
+            if entry is not None and (date_revised is None or
+                                      _is_older(entry.revision,date_revised)):
+                del self.memory['details'][pmid]
+
+            if self.db is not None:
+                if date_revised is None:
+                    self.db.execute("""DELETE FROM records WHERE
+                                    namespace = 'details' AND pmid = ?""",(pmid,))
+                else:
+                    self.db.execute("""DELETE FROM records WHERE
+                                    namespace = 'details' AND pmid = ? AND
+                                    (revision IS NULL OR revision < ?)""",
+                                    (pmid,date_revised))
+
+            self._delete('summary',pmid)
+            if self.db is not None:
+                self.db.commit()
+
+    def _delete(self,namespace,pmid):
+        self.memory[namespace].pop(pmid,None)
+        if self.db is not None:
+            self.db.execute('DELETE FROM records WHERE namespace = ? AND pmid = ?',
+                            (namespace,pmid))
+
+    def clear(self):
+        with self.lock:
+            for x in self.memory.values():
+                x.clear()
+            if self.db is not None:
+                self.db.execute('DELETE FROM records')
+                self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            with self.lock:
+                self.db.close()
+
+    def __len__(self):
+        return sum(len(x) for x in self.memory.values())
+
+    def __repr__(self):
+        return display_class(self,
+                             ['max_items', self.max_items,
+                              'path', self.path,
+                              'details_ttl', self.details_ttl,
+                              'summary_ttl', self.summary_ttl,
+                              'n_details', len(self.memory['details']),
+                              'n_summary', len(self.memory['summary']),
+                              'hits', self.hits,
+                              'misses', self.misses,
+                              'methods','-------------------------',
+                              'invalidate','Removes records of a PMID',
+                              'clear','Removes all records'])
+
+
+def _is_older(revision,other)->bool:
+    #A missing revision is not considered older (or newer) than anything
+    if revision is None or other is None:
+        return False
+    return revision < other
+
+def get_record_cache(record_cache)->Optional[RecordCache]:
+    """
+    Resolves the 'record_cache' option of the API.
+
+    Parameters
+    ----------
+    record_cache :
+        - None or False : no caching
+        - True : in-memory cache
+        - str : in-memory cache backed by a file at this path
+        - RecordCache instance
+    """
+    if record_cache is None or record_cache is False:
+        return None
+    elif record_cache is True:
+        return RecordCache()
+    elif isinstance(record_cache,str):
+        return RecordCache(path=record_cache)
+    else:
+        return record_cache
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Retrying of failed requests.
+
+Usage
+-----
+api = API()                                    #default policy
+api = API(retry=False)                         #no retries
+api = API(retry=RetryPolicy(max_attempts=10,backoff=2))
+
+A request is retried when the server responds with one of the retry
+statuses (429 and 5xx by default) or the connection fails. The wait before
+attempt n+1 is backoff*2**(n-1) seconds (capped at max_backoff) with up to
+'jitter' of it randomly removed so that concurrent requests don't retry in
+lockstep. If the server sends a Retry-After header we wait at least that
+long.
+
+429 and 503 responses mean that NCBI wants us to slow down, so rather than
+only delaying the failed request the wait is applied to the rate limiter
+(limiter.penalize), which delays every request sharing the limiter.
+
+GET requests and the POSTs that only send IDs to read from (efetch,
+esummary, ...) can safely be repeated. POSTs to non_idempotent endpoints
+(epost, which adds to the history server) are only retried on a 429 or if
+the connection couldn't be made, as in both cases the request was not
+processed.
+
+Once the attempts for an endpoint are used up an errors.RetryError is
+raised. Responses with other statuses (e.g. 400) are passed on to the
+handler as before.
+"""
+
+#Standard Library
+import random
+import email.utils
+from datetime import datetime, timezone
+from typing import Optional, Dict
+
+#Third Party
+import requests
+
+#Local
+from .utils import display_class
+from .cache import get_endpoint
+
+#Maximum # of attempts (including the first), by endpoint
+#
+#   Keys are the last part of the URL, see cache.get_endpoint()
+DEFAULT_MAX_ATTEMPTS = {
+    'epost.fcgi': 3,
+    }
+
+RETRY_STATUSES = (429,500,502,503,504)
+
+#Statuses for which the rate limiter is penalized
+SLOW_DOWN_STATUSES = (429,503)
+
+NON_IDEMPOTENT = ('epost.fcgi',)
+
+class RetryPolicy(object):
+
+    """
+    Attributes
+    ----------
+    max_attempts : int
+        Maximum # of attempts for endpoints not in endpoint_attempts
+    endpoint_attempts : dict
+        Endpoint => maximum # of attempts
+    backoff : float
+        Wait before the first retry, in seconds
+    max_backoff : float
+    jitter : float
+        Fraction of the wait that may be randomly removed, 0 to 1
+    max_retry_after : float
+        Limit on the wait requested by a Retry-After header
+    retry_statuses : tuple
+    non_idempotent : tuple
+        Endpoints whose POSTs are not retried after being processed
+    """
+
+    __slots__ = ['max_attempts','endpoint_attempts','backoff','max_backoff',
+                 'jitter','max_retry_after','retry_statuses','non_idempotent',
+                 'random']
+
+    def __init__(self,
+                 max_attempts:int=5,
+                 endpoint_attempts:Optional[Dict[str,int]]=None,
+                 backoff:float=1.0,
+                 max_backoff:float=60.0,
+                 jitter:float=0.5,
+                 max_retry_after:float=300.0,
+                 retry_statuses=RETRY_STATUSES,
+                 non_idempotent=NON_IDEMPOTENT,
+                 seed=None):
+        """
+
+        Parameters
+        ----------
+        endpoint_attempts : dict
+            Updates DEFAULT_MAX_ATTEMPTS
+        seed :
+            For the jitter
+        """
+        self.max_attempts = max_attempts
+        self.endpoint_attempts = dict(DEFAULT_MAX_ATTEMPTS)
+        if endpoint_attempts is not None:
+            self.endpoint_attempts.update(endpoint_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.max_retry_after = max_retry_after
+        self.retry_statuses = retry_statuses
+        self.non_idempotent = non_idempotent
+        self.random = random.Random(seed)
+
+    def get_max_attempts(self, url:str)->int:
+        return self.endpoint_attempts.get(get_endpoint(url),self.max_attempts)
+
+    def is_retryable(self, method:str, url:str,
+                     response:Optional['requests.Response'],
+                     error:Optional[Exception])->bool:
+        """
+        Whether the outcome of a request (a response or an error) calls for
+        another attempt, ignoring the # of attempts made so far.
+        """
+        if error is not None:
+            if not isinstance(error,(requests.exceptions.ConnectionError,
+                                     requests.exceptions.Timeout)):
+                return False
+            if method == 'POST' and get_endpoint(url) in self.non_idempotent:
+                return isinstance(error,requests.exceptions.ConnectTimeout)
+            return True
+
+        status = response.status_code
+        if status not in self.retry_statuses:
+            return False
+        if method == 'POST' and get_endpoint(url) in self.non_idempotent:
+            return status == 429
+        return True
+
+    def get_delay(self, attempt:int,
+                  response:Optional['requests.Response'])->float:
+        """
+        Seconds to wait after a failed attempt (1 for the first).
+        """
+        delay = min(self.backoff*2**(attempt - 1),self.max_backoff)
+        delay *= 1 - self.jitter*self.random.random()
+
+        if response is not None:
+            retry_after = get_retry_after(response)
+            if retry_after is not None:
+                delay = max(delay,min(retry_after,self.max_retry_after))
+
+        return delay
+
+    def should_penalize(self, response:Optional['requests.Response'])->bool:
+        """
+        Whether the wait should be applied to the rate limiter rather than
+        only to the failed request.
+        """
+        return response is not None and response.status_code in SLOW_DOWN_STATUSES
+
+    def __repr__(self):
+        return display_class(self,
+                             ['max_attempts', self.max_attempts,
+                              'endpoint_attempts', self.endpoint_attempts,
+                              'backoff', self.backoff,
+                              'max_backoff', self.max_backoff,
+                              'jitter', self.jitter,
+                              'max_retry_after', self.max_retry_after,
+                              'retry_statuses', self.retry_statuses,
+                              'non_idempotent', self.non_idempotent])
+
+def get_retry_after(response:'requests.Response')->Optional[float]:
+    """
+    Returns the wait in seconds requested by the Retry-After header, which
+    may be a # of seconds or an HTTP date. None if missing or invalid.
+    """
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+
+    try:
+        return max(float(value),0.0)
+    except ValueError:
+        pass
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError,ValueError):
+        return None
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max((date - datetime.now(timezone.utc)).total_seconds(),0.0)
+
+def get_retry_policy(retry)->Optional[RetryPolicy]:
+    """
+    Resolves the 'retry' option of the API.
+
+    Parameters
+    ----------
+    retry :
+        - None or True : RetryPolicy with the default settings
+        - False : no retries
+        - RetryPolicy instance
+    """
+    if retry is None or retry is True:
+        return RetryPolicy()
+    elif retry is False:
+        return None
+    else:
+        return retry
@@ -0,0 +1,591 @@
+# -*- coding: utf-8 -*-
+"""
+Local SQLite store of articles.
+
+Usage
+-----
+store = ArticleStore('/data/pubmed/articles.sqlite')
+
+#From the baseline and update files, see pubmed.ingest
+ingest(get_files('/data/pubmed/baseline'),store.get_ingest_handler(),
+       leave_raw=True)
+ingest(get_files('/data/pubmed/updatefiles'),store.get_ingest_handler(),
+       leave_raw=True,max_workers=1)
+
+#details() only requests the PMIDs that aren't in the store
+api = API(store=store)
+result = api.pubmed.details(ids)
+
+#Or directly
+articles = store.get_many(['30343668','20516418'])
+rows = store.db.execute('SELECT pmid, title FROM articles WHERE pub_year = ?',
+                        ('2018',)).fetchall()
+
+The fields of each article are split into tables (see _SCHEMA) for
+querying: articles, authors, mesh, mesh_qualifiers, keywords, chemicals,
+refs (references) and article_ids. The XML of each article is also kept
+(zlib compressed) so that the PubmedArticle can be rebuilt, which requires
+the articles to have been parsed with leave_raw=True. Articles without
+their XML are stored, but get_many() doesn't return them.
+
+Updates
+-------
+Applying records is idempotent. An article is only replaced by one with a
+newer DateRevised, and a DeleteCitation removes the article and leaves a
+tombstone (the deleted table) so that it isn't added back by an older
+file. This means update files can be applied more than once and, other
+than for records without a DateRevised, in any order.
+
+Book articles (PubmedBookArticle) are not stored.
+"""
+
+#Standard Library
+import os
+import time
+import zlib
+import sqlite3
+import threading
+import functools
+from typing import Optional, Dict, List, Union, Iterable
+
+#Local
+from .utils import display_class, quotes
+from . import models
+from .lxml_helpers import make_document
+from .record_cache import get_article_revision, _is_older
+
+#SQLite limits the # of parameters per statement
+_MAX_PARAMS = 500
+
+#Rows of the other tables are deleted and added again when an article is
+#replaced, so only 'articles' has a primary key
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    pmid TEXT PRIMARY KEY,
+    date_revised TEXT,
+    date_completed TEXT,
+    title TEXT,
+    vernacular_title TEXT,
+    abstract TEXT,
+    journal_title TEXT,
+    iso_abbreviation TEXT,
+    medline_ta TEXT,
+    nlm_unique_id TEXT,
+    issn TEXT,
+    volume TEXT,
+    issue TEXT,
+    pub_year TEXT,
+    pub_month TEXT,
+    pub_day TEXT,
+    pub_medline_date TEXT,
+    medline_pgn TEXT,
+    languages TEXT,
+    pub_types TEXT,
+    n_references INTEGER,
+    publication_status TEXT,
+    doi TEXT,
+    pmc TEXT,
+    xml BLOB,
+    updated REAL);
+CREATE TABLE IF NOT EXISTS authors (
+    pmid TEXT,
+    position INTEGER,
+    last_name TEXT,
+    fore_name TEXT,
+    initials TEXT,
+    suffix TEXT,
+    collective_name TEXT,
+    affiliation TEXT);
+CREATE TABLE IF NOT EXISTS mesh (
+    pmid TEXT,
+    position INTEGER,
+    ui TEXT,
+    name TEXT,
+    is_major INTEGER);
+CREATE TABLE IF NOT EXISTS mesh_qualifiers (
+    pmid TEXT,
+    position INTEGER,
+    ui TEXT,
+    name TEXT,
+    is_major INTEGER);
+CREATE TABLE IF NOT EXISTS keywords (
+    pmid TEXT,
+    value TEXT,
+    is_major INTEGER,
+    owner TEXT);
+CREATE TABLE IF NOT EXISTS chemicals (
+    pmid TEXT,
+    registry_number TEXT,
+    substance_name TEXT,
+    ui TEXT);
+CREATE TABLE IF NOT EXISTS refs (
+    pmid TEXT,
+    position INTEGER,
+    citation TEXT,
+    ref_pmid TEXT,
+    ref_doi TEXT);
+CREATE TABLE IF NOT EXISTS article_ids (
+    pmid TEXT,
+    type TEXT,
+    value TEXT);
+CREATE TABLE IF NOT EXISTS deleted (
+    pmid TEXT PRIMARY KEY,
+    deleted REAL);
+CREATE INDEX IF NOT EXISTS authors_pmid ON authors (pmid);
+CREATE INDEX IF NOT EXISTS mesh_pmid ON mesh (pmid);
+CREATE INDEX IF NOT EXISTS mesh_ui ON mesh (ui);
+CREATE INDEX IF NOT EXISTS mesh_qualifiers_pmid ON mesh_qualifiers (pmid);
+CREATE INDEX IF NOT EXISTS keywords_pmid ON keywords (pmid);
+CREATE INDEX IF NOT EXISTS chemicals_pmid ON chemicals (pmid);
+CREATE INDEX IF NOT EXISTS refs_pmid ON refs (pmid);
+CREATE INDEX IF NOT EXISTS article_ids_pmid ON article_ids (pmid);
+CREATE INDEX IF NOT EXISTS article_ids_value ON article_ids (value, type);
+"""
+
+#Tables with rows for each article, in addition to 'articles'
+_CHILD_TABLES = ('authors','mesh','mesh_qualifiers','keywords','chemicals',
+                 'refs','article_ids')
+
+#ArticleId types, see PubmedData
+_ARTICLE_ID_TYPES = ('doi','pii','pmcpid','pmpid','pmc','mid','sici','pubmed',
+                     'medline','pmcid','pmcbook','bookaccession')
+
+def _date(date)->Optional[str]:
+    #DateCompleted and DateRevised as 'YYYYMMDD'
+    if date is None:
+        return None
+    return '%s%02d%02d' % (date.year,int(date.month),int(date.day))
+
+def _int(value)->Optional[int]:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+def _join(values)->Optional[str]:
+    if not values:
+        return None
+    return '; '.join(x for x in values if x is not None)
+
+def _get_rows(doc:'models.PubmedArticle', revision:Optional[str],
+              now:float, compress_level:int)->Dict[str,list]:
+    """
+    Returns the rows of each table for an article
+    """
+    pmid = str(doc.citation.pmid)
+    citation = doc.citation
+    article = citation.article
+    journal = article.journal
+    journal_issue = journal.issue
+    pub_date = journal_issue.pub_date
+    journal_info = citation.journal_info
+    pagination = article.pagination
+    pubmed_data = doc.pubmed_data
+
+    if doc.raw_xml is None:
+        xml = None
+    else:
+        xml = zlib.compress(doc.raw_xml,compress_level)
+
+    if pubmed_data is None:
+        doi = article.doi
+        pmc = None
+        publication_status = None
+    else:
+        doi = pubmed_data.doi or article.doi
+        pmc = pubmed_data.pmc
+        publication_status = pubmed_data.publication_status
+
+    output = {}
+    output['articles'] = [(
+        pmid,
+        revision,
+        _date(citation.date_completed),
+        article.title,
+        article.vernacular_title,
+        '\n'.join(x for x in article.abstracts if x) if article.abstracts else None,
+        journal.title,
+        journal.iso_abbreviation,
+        journal_info.medline_ta,
+        journal_info.nlm_unique_id,
+        journal.print_issn or journal.electronic_issn,
+        journal_issue.volume,
+        journal_issue.issue,
+        pub_date.year,
+        pub_date.month,
+        pub_date.day,
+        pub_date.date,
+        None if pagination is None else pagination.medline_pgn,
+        _join(article.languages),
+        _join([x.value for x in article.pub_types]),
+        _int(citation.n_references),
+        publication_status,
+        doi,
+        pmc,
+        xml,
+        now)]
+
+    output['authors'] = [(pmid,i,x.last_name,x.fore_name,x.initials,x.suffix,
+                          x.collective_name,
+                          _join([y.value for y in x.affiliations or ()]))
+                         for i, x in enumerate(article.authors or ())]
+
+    mesh = []
+    qualifiers = []
+    for i, heading in enumerate(citation.mesh_headings or ()):
+        #'Y' or 'N' in the XML
+        mesh.append((pmid,i,heading.ui,heading.name,heading.is_major == 'Y'))
+        for x in heading.qualifiers or ():
+            qualifiers.append((pmid,i,x.ui,x.name,x.is_major == 'Y'))
+    output['mesh'] = mesh
+    output['mesh_qualifiers'] = qualifiers
+
+    output['keywords'] = [(pmid,x.value,x.is_major,keyword_list.owner)
+                          for keyword_list in citation.keyword_lists or ()
+                          for x in keyword_list.keywords]
+
+    output['chemicals'] = [(pmid,x.registry_number,x.substance_name,x.ui)
+                           for x in citation.chemicals or ()]
+
+    refs = []
+    article_ids = []
+    if pubmed_data is not None:
+        for ref_list in pubmed_data.ref_lists or ():
+            for x in ref_list.references:
+                ids = {y.type:y.value for y in x.article_ids or ()}
+                refs.append((pmid,len(refs),x.citation,ids.get('pubmed'),
+                             ids.get('doi')))
+        for id_type in _ARTICLE_ID_TYPES:
+            value = getattr(pubmed_data,id_type)
+            if value is not None:
+                article_ids.append((pmid,id_type,value))
+    output['refs'] = refs
+    output['article_ids'] = article_ids
+
+    return output
+
+def _chunks(values:list):
+    for i in range(0,len(values),_MAX_PARAMS):
+        yield values[i:i+_MAX_PARAMS]
+
+
+class StoreUpdate(object):
+
+    """
+    Result of ArticleStore.apply()
+
+    Attributes
+    ----------
+    n_written : int
+        # of articles added or replaced
+    n_skipped : int
+        # of articles not written as the store has the same or a newer
+        revision, or the PMID has been deleted
+    n_deleted : int
+        # of PMIDs in DeleteCitation
+    n_books : int
+        # of PubmedBookArticle, which are not stored
+    """
+
+    __slots__ = ['n_written','n_skipped','n_deleted','n_books']
+
+    def __init__(self):
+        self.n_written = 0
+        self.n_skipped = 0
+        self.n_deleted = 0
+        self.n_books = 0
+
+    def __repr__(self):
+        return display_class(self,
+                             ['n_written', self.n_written,
+                              'n_skipped', self.n_skipped,
+                              'n_deleted', self.n_deleted,
+                              'n_books', self.n_books])
+
+
+class ArticleStore(object):
+
+    """
+    Attributes
+    ----------
+    path : str
+    db : sqlite3.Connection
+        Can be used for queries, see _SCHEMA for the tables
+    compress_level : int
+        zlib level for the XML
+    batch_size : int
+        # of articles written per transaction by apply()
+    """
+
+    def __init__(self,
+                 path:str,
+                 compress_level:int=6,
+                 batch_size:int=1000,
+                 timeout:float=60):
+        """
+
+        Parameters
+        ----------
+        timeout : float
+            Seconds to wait for another connection (e.g. another ingest
+            worker) to finish writing
+        """
+        self.path = path
+        self.compress_level = compress_level
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+
+        if path != ':memory:':
+            folder = os.path.dirname(os.path.abspath(path))
+            os.makedirs(folder,exist_ok=True)
+        self.db = sqlite3.connect(path,timeout=timeout,check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(_SCHEMA)
+        self.db.commit()
+
+    #---- Reading ---------------------------------
+    def get(self, pmid:Union[str,int], leave_raw=False)->Optional['models.PubmedArticle']:
+        """
+        Returns the stored article or None
+        """
+        return self.get_many([pmid],leave_raw=leave_raw).get(str(pmid))
+
+    def get_many(self, pmids:Iterable[Union[str,int]],
+                 leave_raw=False)->Dict[str,'models.PubmedArticle']:
+        """
+        Returns a dict of PubmedArticle, by PMID, rebuilt from the stored
+        XML. PMIDs that are not stored are not in the output.
+
+        Parameters
+        ----------
+        leave_raw : bool
+            If true the XML is kept in PubmedArticle.raw_xml
+        """
+        pmids = list(dict.fromkeys(str(x) for x in pmids))
+        rows = []
+        with self.lock:
+            for chunk in _chunks(pmids):
+                rows.extend(self.db.execute(
+                    """SELECT pmid, xml FROM articles WHERE xml IS NOT NULL
+                    AND pmid IN (%s)""" % ','.join('?'*len(chunk)),chunk))
+
+        output = {}
+        for pmid, xml in rows:
+            xml = zlib.decompress(xml)
+            article = models.PubmedArticle(make_document(xml).PubmedArticle)
+            article.release_soup()
+            if leave_raw:
+                article.raw_xml = xml
+            output[pmid] = article
+        return output
+
+    def get_revisions(self, pmids:Iterable[Union[str,int]])->Dict[str,Optional[str]]:
+        """
+        Returns the DateRevised ('YYYYMMDD') of stored articles, by PMID
+        """
+        return self._get_revisions([str(x) for x in pmids])
+
+    def _get_revisions(self, pmids:List[str]):
+        output = {}
+        for chunk in _chunks(pmids):
+            output.update(self.db.execute(
+                'SELECT pmid, date_revised FROM articles WHERE pmid IN (%s)'
+                % ','.join('?'*len(chunk)),chunk))
+        return output
+
+    def _get_deleted(self, pmids:List[str]):
+        output = set()
+        for chunk in _chunks(pmids):
+            output.update(x for x, in self.db.execute(
+                'SELECT pmid FROM deleted WHERE pmid IN (%s)'
+                % ','.join('?'*len(chunk)),chunk))
+        return output
+
+    #---- Writing ---------------------------------
+    def put_articles(self, articles:List['models.PubmedArticle'])->int:
+        """
+        Adds or replaces articles in a single transaction. Articles are
+        only replaced by newer revisions (DateRevised) and deleted PMIDs
+        are not added back.
+
+        Returns
+        -------
+        int
+            # of articles written
+        """
+        now = time.time()
+
+        #The last of any duplicates, e.g. the same PMID in a file twice
+        latest = {}
+        for doc in articles:
+            revision = get_article_revision(doc)
+            pmid = str(doc.citation.pmid)
+            old = latest.get(pmid)
+            if old is None or not _is_older(revision,old[0]):
+                latest[pmid] = (revision,doc)
+
+        with self.lock:
+            #The revisions are checked in the same transaction as the
+            #writes, as other processes may be writing the same PMIDs
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._put_latest(latest,now)
+                self.db.commit()
+            except BaseException:
+                self.db.rollback()
+                raise
+
+        return len(rows['articles'])
+
+    def _put_latest(self, latest:dict, now:float)->Dict[str,list]:
+        pmids = list(latest)
+        stored = self._get_revisions(pmids)
+        deleted = self._get_deleted(pmids)
+
+        rows = {x:[] for x in ('articles',) + _CHILD_TABLES}
+        replaced = []
+        for pmid, (revision, doc) in latest.items():
+            if pmid in deleted:
+                continue
+            if pmid in stored:
+                old = stored[pmid]
+                #Same revision, or older, is skipped
+                if revision is not None and old is not None and \
+                        revision <= old:
+                    continue
+                replaced.append((pmid,))
+            for name, values in _get_rows(doc,revision,now,
+                                          self.compress_level).items():
+                rows[name].extend(values)
+
+        for name in _CHILD_TABLES:
+            self.db.executemany('DELETE FROM %s WHERE pmid = ?' % name,
+                                replaced)
+        self.db.executemany('INSERT OR REPLACE INTO articles VALUES (%s)'
+                            % ','.join('?'*26),rows['articles'])
+        for name in _CHILD_TABLES:
+            if len(rows[name]) > 0:
+                n = len(rows[name][0])
+                self.db.executemany('INSERT INTO %s VALUES (%s)'
+                                    % (name,','.join('?'*n)),rows[name])
+        return rows
+
+    def delete(self, pmids:Iterable[Union[str,int]]):
+        """
+        Removes articles and records a tombstone for each PMID
+        """
+        pmids = [(str(x),) for x in pmids]
+        now = time.time()
+        with self.lock, self.db:
+            for name in ('articles',) + _CHILD_TABLES:
+                self.db.executemany('DELETE FROM %s WHERE pmid = ?' % name,pmids)
+            self.db.executemany('INSERT OR REPLACE INTO deleted VALUES (?,?)',
+                                [x + (now,) for x in pmids])
+
+    def apply(self, records:Iterable)->StoreUpdate:
+        """
+        Applies a baseline or update file.
+
+        Parameters
+        ----------
+        records :
+            PubmedArticle, PubmedBookArticle and DeleteCitation, e.g. from
+            pubmed.ingest or details(...,return_type='stream',leave_raw=True)
+        """
+        result = StoreUpdate()
+        batch = []
+        deleted = []
+
+        def flush():
+            n_written = self.put_articles(batch)
+            result.n_written += n_written
+            result.n_skipped += len(batch) - n_written
+            batch.clear()
+
+        for record in records:
+            if isinstance(record,models.DeleteCitation):
+                deleted.extend(record.pmids)
+            elif isinstance(record,models.PubmedBookArticle):
+                result.n_books += 1
+            else:
+                batch.append(record)
+                if len(batch) == self.batch_size:
+                    flush()
+
+        #Deletions are applied last as they come at the end of the file
+        if len(batch) > 0:
+            flush()
+        if len(deleted) > 0:
+            self.delete(deleted)
+            result.n_deleted = len(deleted)
+
+        return result
+
+    def get_ingest_handler(self):
+        """
+        Returns a handler for pubmed.ingest.ingest() that applies each file
+        to this store. Each worker process opens its own connection.
+        """
+        return functools.partial(_apply_file,self.path,self.compress_level,
+                                 self.batch_size)
+
+    #---- Other -----------------------------------
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def __contains__(self, pmid):
+        with self.lock:
+            return self.db.execute('SELECT 1 FROM articles WHERE pmid = ?',
+                                   (str(pmid),)).fetchone() is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+
+    def __repr__(self):
+        return display_class(self,
+                             ['path', quotes(self.path),
+                              'n_articles', len(self),
+                              'compress_level', self.compress_level,
+                              'batch_size', self.batch_size,
+                              'methods', '-----------------------',
+                              'get', '(pmid,leave_raw=False)',
+                              'get_many', '(pmids,leave_raw=False)',
+                              'get_revisions', '(pmids)',
+                              'put_articles', '(articles)',
+                              'delete', '(pmids)',
+                              'apply', '(records)',
+                              'get_ingest_handler', '()'])
+
+
+def _apply_file(path:str, compress_level:int, batch_size:int, file_path:str,
+                records:Iterable)->StoreUpdate:
+    #See ArticleStore.get_ingest_handler
+    store = ArticleStore(path,compress_level=compress_level,
+                         batch_size=batch_size)
+    try:
+        return store.apply(records)
+    finally:
+        store.close()
+
+def get_article_store(store)->Optional[ArticleStore]:
+    """
+    Resolves the 'store' option of the API.
+
+    Parameters
+    ----------
+    store :
+        - None : no store
+        - str : path of the store
+        - ArticleStore instance
+    """
+    if store is None:
+        return None
+    elif isinstance(store,str):
+        return ArticleStore(store)
+    else:
+        return store
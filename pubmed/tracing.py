@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+OpenTelemetry style spans of the requests, built from the hook events.
+
+Usage
+-----
+exporter = JSONLinesExporter('spans.jsonl')
+tracer = SpanAdapter(exporter)
+tracer.attach(api.hooks)
+
+with tracer.batch('details'):
+    api.pubmed.details(ids)
+
+exporter.close()
+
+Each call to API._make_request is a span named 'pubmed.<endpoint>' with
+child spans for each rate limiter wait ('rate_limit_wait'), each attempt
+('http POST', or 'cache' for a cache hit) and the handler ('parse'). Inside
+batch() the request spans share a trace and are children of the batch
+span, so the chunks of a details() call can be seen together.
+
+Spans are written in the JSON format of the OpenTelemetry SDK's
+ConsoleSpanExporter (span.to_json()), one per line, with the attributes
+following the OpenTelemetry semantic conventions where there is one
+(http.request.method, http.response.status_code, url.full). They can be
+loaded into tools that read that format, or passed to an OpenTelemetry
+exporter by a custom exporter class with an export(spans) method.
+
+The opentelemetry package is not needed.
+"""
+
+#Standard Library
+import json
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from typing import Optional, List
+
+#Local
+from .utils import display_class
+from . import hooks as hooks_module
+
+def _format_time(t:float)->str:
+    return datetime.fromtimestamp(t,timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+def _new_trace_id()->str:
+    return '0x%032x' % random.getrandbits(128)
+
+def _new_span_id()->str:
+    return '0x%016x' % random.getrandbits(64)
+
+def make_span(name:str, trace_id:str, parent_id:Optional[str],
+              start_time:float, end_time:float, attributes:dict,
+              error:Optional[Exception]=None, kind='SpanKind.INTERNAL',
+              span_id=None)->dict:
+    """
+    Returns a span in the format of the OpenTelemetry SDK's span.to_json()
+    """
+    if error is None:
+        status = {'status_code':'UNSET'}
+    elif isinstance(error,str):
+        status = {'status_code':'ERROR','description':error}
+    else:
+        status = {'status_code':'ERROR','description':repr(error)}
+    return {'name':name,
+            'context':{'trace_id':trace_id,
+                       'span_id':span_id or _new_span_id(),
+                       'trace_state':'[]'},
+            'kind':kind,
+            'parent_id':parent_id,
+            'start_time':_format_time(start_time),
+            'end_time':_format_time(end_time),
+            'status':status,
+            'attributes':attributes,
+            'events':[],
+            'links':[],
+            'resource':{'attributes':{'service.name':'pubmed'},
+                        'schema_url':''}}
+
+
+class JSONLinesExporter(object):
+
+    """
+    Writes spans to a file, one JSON object per line.
+
+    Attributes
+    ----------
+    path : str
+    n_spans : int
+    """
+
+    __slots__ = ['path','file','n_spans','lock']
+
+    def __init__(self, path:str, append=True):
+        self.path = path
+        self.file = open(path,'a' if append else 'w',encoding='utf-8')
+        self.n_spans = 0
+        self.lock = threading.Lock()
+
+    def export(self, spans:List[dict]):
+        text = ''.join(json.dumps(x) + '\n' for x in spans)
+        with self.lock:
+            self.file.write(text)
+            self.file.flush()
+            self.n_spans += len(spans)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def __repr__(self):
+        return display_class(self,['path', self.path,'n_spans', self.n_spans])
+
+
+class InMemoryExporter(object):
+
+    """
+    Keeps the spans in a list, for inspection.
+
+    Attributes
+    ----------
+    spans : list
+    """
+
+    __slots__ = ['spans','lock']
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def export(self, spans:List[dict]):
+        with self.lock:
+            self.spans.extend(spans)
+
+    def close(self):
+        pass
+
+    def __repr__(self):
+        return display_class(self,['spans', '[dict] len(%d)' % len(self.spans)])
+
+
+class _OpenRequest(object):
+
+    __slots__ = ['trace_id','span_id','parent_id','start_time','attributes',
+                 'children','parse_start','n_attempts']
+
+    def __init__(self, trace_id, parent_id, start_time, attributes):
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.start_time = start_time
+        self.attributes = attributes
+        self.children = []
+        self.parse_start = None
+        self.n_attempts = 0
+
+
+class SpanAdapter(object):
+
+    """
+    Builds spans from the hook events and passes them to an exporter once
+    each request has finished.
+
+    Attributes
+    ----------
+    exporter :
+        Has an export(spans) method
+    """
+
+    __slots__ = ['exporter','open_requests','batch_trace_id','batch_span_id',
+                 'hooks','lock']
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+        self.open_requests = {}
+        self.batch_trace_id = None
+        self.batch_span_id = None
+        self.hooks = None
+        self.lock = threading.Lock()
+
+    def attach(self, hooks:'hooks_module.Hooks'):
+        """
+        Registers the adapter's callbacks, e.g. attach(api.hooks)
+        """
+        for event in hooks_module.EVENTS:
+            hooks.add(event,getattr(self,'on_' + event))
+        self.hooks = hooks
+        return self
+
+    def detach(self):
+        if self.hooks is not None:
+            for event in hooks_module.EVENTS:
+                self.hooks.remove(event,getattr(self,'on_' + event))
+            self.hooks = None
+
+    @contextmanager
+    def batch(self, name:str, **attributes):
+        """
+        Groups the requests made in the block under a single span. This
+        applies to requests from all threads.
+        """
+        trace_id = _new_trace_id()
+        span_id = _new_span_id()
+        with self.lock:
+            previous = (self.batch_trace_id,self.batch_span_id)
+            parent_id = previous[1]
+            if previous[0] is not None:
+                trace_id = previous[0]
+            self.batch_trace_id = trace_id
+            self.batch_span_id = span_id
+
+        start_time = time.time()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self.lock:
+                self.batch_trace_id, self.batch_span_id = previous
+            end_time = time.time()
+            self.exporter.export([make_span(name,trace_id,parent_id,start_time,
+                                            end_time,attributes,error,
+                                            span_id=span_id)])
+
+    #---- Callbacks --------------------------------
+    def on_pre_request(self, event):
+        attributes = {'http.request.method':event.method,
+                      'url.full':event.url,
+                      'pubmed.endpoint':event.endpoint,
+                      'pubmed.params_size':event.params_size}
+        with self.lock:
+            trace_id = self.batch_trace_id or _new_trace_id()
+            request = _OpenRequest(trace_id,self.batch_span_id,event.time,
+                                   attributes)
+            self.open_requests[event.request_id] = request
+
+    def _get(self, event)->Optional[_OpenRequest]:
+        with self.lock:
+            return self.open_requests.get(event.request_id)
+
+    def on_rate_limit_wait(self, event):
+        request = self._get(event)
+        if request is None:
+            return
+        request.children.append(('rate_limit_wait',event.time - event.wait_time,
+                                 event.time,{'pubmed.wait_time':event.wait_time},
+                                 None))
+
+    def on_post_response(self, event):
+        request = self._get(event)
+        if request is None:
+            return
+        if event.cache_hit is not None:
+            request.attributes['pubmed.cache_hit'] = event.cache_hit
+            if event.cache_hit:
+                request.children.append(('cache',event.time - event.elapsed_time,
+                                         event.time,{},None))
+            return
+
+        request.n_attempts += 1
+        attributes = {'pubmed.attempt':event.attempt}
+        if event.status is not None:
+            attributes['http.response.status_code'] = event.status
+        if event.n_bytes is not None:
+            attributes['http.response.body.size'] = event.n_bytes
+        error = event.error
+        if error is None and event.status is not None and event.status >= 400:
+            error = 'HTTP %d' % event.status
+        request.children.append(('http %s' % event.method,
+                                 event.time - event.elapsed_time,event.time,
+                                 attributes,error))
+
+    def on_pre_parse(self, event):
+        request = self._get(event)
+        if request is not None:
+            request.parse_start = event.time
+
+    def on_post_parse(self, event):
+        with self.lock:
+            request = self.open_requests.pop(event.request_id,None)
+        if request is None:
+            return
+
+        trace_id = request.trace_id
+        spans = []
+        for name, start_time, end_time, attributes, error in request.children:
+            spans.append(make_span(name,trace_id,request.span_id,start_time,
+                                   end_time,attributes,error,
+                                   kind='SpanKind.CLIENT' if name.startswith('http')
+                                   else 'SpanKind.INTERNAL'))
+        if request.parse_start is not None:
+            spans.append(make_span('parse',trace_id,request.span_id,
+                                   request.parse_start,event.time,
+                                   {'pubmed.n_records':event.n_records},
+                                   event.error))
+
+        attributes = request.attributes
+        attributes['pubmed.attempts'] = request.n_attempts
+        if event.n_records is not None:
+            attributes['pubmed.n_records'] = event.n_records
+        spans.append(make_span('pubmed.' + attributes['pubmed.endpoint'],
+                               trace_id,request.parent_id,request.start_time,
+                               event.time,attributes,event.error,
+                               span_id=request.span_id))
+        self.exporter.export(spans)
+
+    def __repr__(self):
+        return display_class(self,
+                             ['exporter', self.exporter.__class__.__name__,
+                              'open_requests', len(self.open_requests),
+                              'methods', '-----------------------',
+                              'attach', '(hooks)',
+                              'detach', '()',
+                              'batch', '(name,**attributes)'])
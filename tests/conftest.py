@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Shared helpers of the offline tests.
+
+The offline tests use the benchmark fixtures and pubmed.mock_server, so no
+network access is needed. test_api.py still runs against NCBI.
+"""
+
+#Standard Library
+import os
+import gzip
+import zlib
+
+#Third Party
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+ROOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')
+FIXTURES_PATH = os.path.join(ROOT_PATH,'benchmarks','fixtures')
+
+#The mock server doesn't limit the rate unless asked to
+RATE = 200
+
+IDS = [str(30000000 + i) for i in range(120)]
+
+def load_fixture(name:str)->bytes:
+    path = os.path.join(FIXTURES_PATH,name)
+    if name.endswith('.gz'):
+        with gzip.open(path,'rb') as f:
+            return f.read()
+    with open(path,'rb') as f:
+        return f.read()
+
+#A NCBI Bookshelf chapter, efetch returns these along with the articles
+BOOK_XML = b"""<PubmedBookArticle>
+<BookDocument>
+<PMID Version="1">20301295</PMID>
+<ArticleIdList><ArticleId IdType="bookaccession">NBK1116</ArticleId></ArticleIdList>
+<Book>
+<Publisher><PublisherName>University of Washington, Seattle</PublisherName>
+<PublisherLocation>Seattle (WA)</PublisherLocation></Publisher>
+<BookTitle book="gene">GeneReviews</BookTitle>
+<PubDate><Year>1993</Year></PubDate>
+<Isbn>0000000000</Isbn>
+</Book>
+<ArticleTitle book="gene" part="test">An example chapter</ArticleTitle>
+<Language>eng</Language>
+<AuthorList Type="authors">
+<Author ValidYN="Y"><LastName>Smith</LastName><ForeName>Jane</ForeName><Initials>J</Initials></Author>
+</AuthorList>
+</BookDocument>
+<PubmedBookData>
+<History><PubMedPubDate PubStatus="pubmed"><Year>2010</Year><Month>3</Month><Day>20</Day></PubMedPubDate></History>
+<PublicationStatus>ppublish</PublicationStatus>
+<ArticleIdList><ArticleId IdType="pubmed">20301295</ArticleId></ArticleIdList>
+</PubmedBookData>
+</PubmedBookArticle>"""
+
+def add_records(data:bytes, book=False, deleted=())->bytes:
+    """
+    Adds a book article and/or a DeleteCitation of the deleted PMIDs to the
+    end of an efetch response, as found in the update files
+    """
+    extra = BOOK_XML if book else b''
+    if deleted:
+        extra += b'<DeleteCitation>%s</DeleteCitation>' % b''.join(
+            b'<PMID Version="1">%s</PMID>' % x.encode() for x in deleted)
+    return data.replace(b'</PubmedArticleSet>',extra + b'</PubmedArticleSet>')
+
+def make_response(body,url='https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi',
+                  status=200,headers=None)->requests.Response:
+    """
+    Response as the handlers get it from API._make_request
+    """
+    response = requests.models.Response()
+    response.status_code = status
+    response._content = body.encode('utf-8') if isinstance(body,str) else body
+    response.url = url
+    response.encoding = 'utf-8'
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.request = requests.Request('POST',url).prepare()
+    return response
+
+def get_api(server, **kwargs):
+    from pubmed.api import API
+    return API(rate=RATE,**server.api_options,**kwargs)
+
+def get_requested_ids(server, endpoint)->int:
+    """
+    Total # of IDs sent to an endpoint of the mock server
+    """
+    return sum(x[3] for x in server.stats.log if x[1] == endpoint)
+
+def get_search_ids(term, count, first=0):
+    """
+    IDs that the mock server returns for a query, see MockServer._esearch
+    """
+    offset = 20000000 + 1000*(zlib.crc32(term.encode()) % 10000) + first
+    return [str(offset + i) for i in range(count)]
+
+@pytest.fixture(scope='module')
+def mock_server():
+    from pubmed.mock_server import MockServer
+    with MockServer(seed=1) as server:
+        yield server
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of pubmed.arrow_export
+"""
+
+#Standard Library
+import io
+import re
+
+#Third Party
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet as pq
+
+#Local
+from pubmed import models
+from pubmed.arrow_export import (ArticleTableBuilder, ParquetArticleWriter,
+                                 get_schema, iter_record_batches, to_table,
+                                 write_parquet)
+
+from conftest import add_records, load_fixture, make_response
+
+@pytest.fixture(scope='module')
+def efetch_data():
+    return load_fixture('efetch_100.xml.gz')
+
+@pytest.fixture(scope='module')
+def docs(efetch_data):
+    return models.PubmedArticleSet(None,make_response(efetch_data)).docs
+
+@pytest.fixture(scope='module')
+def table(docs):
+    return to_table(docs)
+
+def test_scalar_columns(docs,table):
+    assert table.schema == get_schema()
+    assert table.num_rows == 100
+    rows = table.to_pylist()
+    for row, doc in zip(rows,docs):
+        citation = doc.citation
+        assert row['pmid'] == citation.pmid
+        assert row['title'] == citation.article.title
+        assert row['journal_title'] == citation.article.journal.title
+        assert row['abstracts'] == (citation.article.abstracts or [])
+        assert row['date_revised'].year == int(citation.date_revised.year)
+        assert row['doi'] == (doc.pubmed_data.doi or citation.article.doi)
+
+def test_authors(docs,table):
+    for row, doc in zip(table.column('authors').to_pylist(),docs):
+        authors = doc.citation.article.authors
+        assert len(row) == len(authors)
+        for value, author in zip(row,authors):
+            assert value['last_name'] == author.last_name
+            assert value['fore_name'] == author.fore_name
+            assert value['is_valid'] == author.is_valid
+            assert value['identifiers'] == [{'source':x.source,'value':x.value}
+                                            for x in author.identifiers or ()]
+            assert value['affiliations'] == [x.value for x in author.affiliations or ()]
+
+def test_mesh_headings(docs,table):
+    for row, doc in zip(table.column('mesh_headings').to_pylist(),docs):
+        mesh_headings = doc.citation.mesh_headings
+        assert [x['ui'] for x in row] == [x.ui for x in mesh_headings]
+        for value, heading in zip(row,mesh_headings):
+            assert value['is_major'] == (heading.is_major == 'Y')
+            assert value['qualifiers'] == [
+                {'name':x.name,'ui':x.ui,'is_major':x.is_major == 'Y'}
+                for x in heading.qualifiers or ()]
+
+def test_keywords_and_grants(docs,table):
+    keywords = table.column('keywords').to_pylist()
+    grants = table.column('grants').to_pylist()
+    for doc, row_keywords, row_grants in zip(docs,keywords,grants):
+        citation = doc.citation
+        #Keyword lists are flattened, with the owner on each keyword
+        assert row_keywords == [{'value':x.value,'is_major':x.is_major,
+                                 'owner':keyword_list.owner}
+                                for keyword_list in citation.keyword_lists
+                                for x in keyword_list.keywords]
+        assert row_grants == [{'grant_id':x.grant_id,'acronym':x.acronym,
+                               'agency':x.agency,'country':x.country}
+                              for x in citation.article.grants]
+
+def test_references(docs,table):
+    for row, doc in zip(table.column('references').to_pylist(),docs):
+        references = [x for ref_list in doc.pubmed_data.ref_lists
+                      for x in ref_list.references]
+        assert [x['citation'] for x in row] == [x.citation for x in references]
+        for value, reference in zip(row,references):
+            assert value['article_ids'] == [{'type':x.type,'value':x.value}
+                                            for x in reference.article_ids]
+            pmids = [x.value for x in reference.article_ids if x.type == 'pubmed']
+            assert value['pmid'] == (pmids[0] if pmids else None)
+
+def test_missing_lists_are_empty(efetch_data):
+    data = re.sub(rb'<KeywordList.*?</KeywordList>',b'',efetch_data,flags=re.S)
+    data = re.sub(rb'<GrantList.*?</GrantList>',b'',data,flags=re.S)
+    table = to_table(models._iter_article_set(io.BytesIO(data)))
+    assert table.column('keywords').to_pylist() == [[]]*100
+    assert table.column('grants').to_pylist() == [[]]*100
+    assert table.column('keywords').null_count == 0
+
+def test_batches(docs,table):
+    batches = list(iter_record_batches(docs,batch_size=30))
+    assert [x.num_rows for x in batches] == [30,30,30,10]
+    assert pa.Table.from_batches(batches).equals(table)
+
+    #The builder is reusable after a flush
+    builder = ArticleTableBuilder()
+    builder.extend(docs[:5])
+    assert len(builder) == 5
+    first = builder.flush()
+    builder.extend(docs[5:10])
+    assert len(builder) == 5
+    assert builder.flush().equals(table.slice(5,5).to_batches()[0])
+    assert pa.Table.from_batches([first]).equals(table.slice(0,5))
+
+def test_books_and_deletions_are_skipped(efetch_data,table):
+    data = add_records(efetch_data,book=True,deleted=['1','2'])
+    records = list(models._iter_article_set(io.BytesIO(data)))
+    assert len(records) == 102
+    assert to_table(records).equals(table)
+    assert to_table(iter(records),batch_size=7).equals(table)
+
+def test_write_parquet(tmp_path,efetch_data,table):
+    path = str(tmp_path/'articles.parquet')
+    data = add_records(efetch_data,book=True,deleted=['1'])
+    n_rows = write_parquet(models._iter_article_set(io.BytesIO(data)),path,
+                           batch_size=40)
+    assert n_rows == 100
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.metadata.num_row_groups == 3
+    assert parquet_file.read().equals(table)
+
+def test_parquet_writer_is_incremental(tmp_path,efetch_data,docs,table):
+    path = str(tmp_path/'articles.parquet')
+    with ParquetArticleWriter(path,batch_size=25) as writer:
+        #Streamed records, a result set and a plain list, in 3 calls
+        writer.write(models._iter_article_set(io.BytesIO(
+            add_records(efetch_data,book=True))))
+        assert writer.n_rows == 100
+        writer.write(models.PubmedArticleSet(None,make_response(efetch_data)))
+        writer.write(docs[:10])
+        #The last 10 rows are waiting for the batch to fill
+        assert writer.n_rows == 200
+    assert writer.n_rows == 210
+
+    result = pq.read_table(path)
+    assert result.num_rows == 210
+    assert pq.ParquetFile(path).metadata.num_row_groups == 9
+    assert result.slice(0,100).equals(table)
+    assert result.slice(100,100).equals(table)
+    assert result.slice(200,10).equals(table.slice(0,10))
+    assert result.column('pmid').to_pylist()[-10:] == [x.citation.pmid for x in docs[:10]]
+
+def test_result_methods(tmp_path,efetch_data,table):
+    result = models.PubmedArticleSet(None,make_response(efetch_data))
+    assert result.to_arrow().equals(table)
+    path = str(tmp_path/'articles.parquet')
+    result.to_parquet(path)
+    assert pq.read_table(path).equals(table)
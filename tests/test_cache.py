@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+The on-disk response cache and the PMID keyed record cache
+"""
+
+#Standard Library
+import random
+
+#Local
+from pubmed.cache import ResponseCache
+from pubmed.record_cache import RecordCache
+
+from conftest import IDS, get_api, get_requested_ids, make_response
+
+URL = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/'
+
+def test_response_cache_hits(mock_server):
+    api = get_api(mock_server,cache=ResponseCache(':memory:'))
+    mock_server.reset_stats()
+    first = api.pubmed.summary(IDS[:10])
+    second = api.pubmed.summary(IDS[:10])
+    assert [x.uid for x in second.docs] == [x.uid for x in first.docs]
+    assert mock_server.stats.n_requests == 1
+    assert api.query_logger.cache_hits == 1
+    assert api.query_logger.cache_misses == 1
+
+def test_response_cache_persists(tmp_path,mock_server):
+    path = str(tmp_path/'responses.sqlite')
+    api = get_api(mock_server,cache=path)
+    api.pubmed.details(IDS[:5])
+    api.cache.close()
+
+    mock_server.reset_stats()
+    api = get_api(mock_server,cache=path)
+    result = api.pubmed.details(IDS[:5])
+    assert [x.citation.pmid for x in result.docs] == IDS[:5]
+    assert mock_server.stats.n_requests == 0
+
+def test_response_cache_skips_history(mock_server):
+    api = get_api(mock_server,cache=ResponseCache(':memory:'))
+    mock_server.reset_stats()
+    first = api.pubmed.post(IDS[:10])
+    second = api.pubmed.post(IDS[:10])
+    assert first.web_env != second.web_env
+    api.pubmed.search('bladder',use_history=True)
+    api.pubmed.search('bladder',use_history=True)
+    assert mock_server.stats.n_requests == 4
+    assert len(api.cache) == 0
+
+def test_history_ttl():
+    cache = ResponseCache(':memory:',history_ttl=60)
+    assert cache.get_ttl('esearch.fcgi',{'term':'x'}) == 60*60
+    assert cache.get_ttl('esearch.fcgi',{'term':'x','usehistory':'y'}) == 60
+    assert cache.get_ttl('epost.fcgi',{'id':'1'}) == 0
+
+    params = {'term':'x','usehistory':'y'}
+    cache.put('GET',URL + 'esearch.fcgi',params,make_response('{}',URL + 'esearch.fcgi'))
+    assert cache.get('GET',URL + 'esearch.fcgi',params) is not None
+
+def test_response_cache_ttl_and_size():
+    cache = ResponseCache(':memory:',ttls={'esummary.fcgi':-1})
+    cache.put('GET',URL + 'esummary.fcgi',{'id':'1'},make_response('{}',URL + 'esummary.fcgi'))
+    assert cache.get('GET',URL + 'esummary.fcgi',{'id':'1'}) is None
+
+    cache = ResponseCache(':memory:',max_size=2000)
+    for i in range(20):
+        #Doesn't compress
+        body = random.Random(i).randbytes(300)
+        cache.put('GET',URL + 'efetch.fcgi',{'id':str(i)},make_response(body))
+    assert cache.total_size <= 2000
+    #Least recently used entries went first
+    assert cache.get('GET',URL + 'efetch.fcgi',{'id':'0'}) is None
+    response = cache.get('GET',URL + 'efetch.fcgi',{'id':'19'})
+    assert response.content == random.Random(19).randbytes(300)
+
+    #Authentication parameters aren't part of the key
+    assert cache.get('GET',URL + 'efetch.fcgi',{'id':'19','api_key':'x'}) is not None
+
+def test_errors_are_not_cached():
+    cache = ResponseCache(':memory:')
+    cache.put('GET',URL + 'efetch.fcgi',{'id':'1'},make_response('',status=500))
+    assert len(cache) == 0
+
+#---- Record cache ---------------------------------------
+def test_record_cache_only_requests_missing(mock_server):
+    api = get_api(mock_server,record_cache=RecordCache())
+    api.pubmed.details(IDS[:30])
+    mock_server.reset_stats()
+    result = api.pubmed.details(IDS[10:60])
+    assert [x.citation.pmid for x in result.docs] == IDS[10:60]
+    assert get_requested_ids(mock_server,'efetch') == 30
+    assert api.record_cache.hits == 20
+
+    mock_server.reset_stats()
+    summaries = api.pubmed.summary(IDS[:5])
+    api.pubmed.summary(IDS[:5])
+    assert [x.uid for x in summaries.docs] == IDS[:5]
+    assert mock_server.stats.endpoint_counts == {'esummary':1}
+
+def test_record_cache_on_disk(tmp_path,mock_server):
+    path = str(tmp_path/'records.sqlite')
+    api = get_api(mock_server,record_cache=RecordCache(path=path))
+    titles = [x.citation.article.title for x in api.pubmed.details(IDS[:5]).docs]
+    api.record_cache.close()
+
+    mock_server.reset_stats()
+    api = get_api(mock_server,record_cache=RecordCache(path=path))
+    result = api.pubmed.details(IDS[:5])
+    assert [x.citation.article.title for x in result.docs] == titles
+    assert mock_server.stats.n_requests == 0
+
+def test_record_cache_limits(mock_server):
+    api = get_api(mock_server)
+    articles = api.pubmed.details(IDS[:10]).docs
+    summaries = api.pubmed.summary(IDS[:10]).docs
+
+    cache = RecordCache(max_items=5)
+    cache.put_articles(articles)
+    #Least recently used records are dropped from memory
+    assert cache.get('details',IDS[0]) is None
+    assert cache.get('details',IDS[9]) is articles[9]
+
+    cache = RecordCache(summary_ttl=-1)
+    cache.put_summaries(summaries)
+    assert cache.get('summary',IDS[0]) is None
+
+def test_record_cache_keeps_newest_revision(mock_server):
+    api = get_api(mock_server)
+    article = api.pubmed.details(IDS[:1]).docs[0]
+    cache = RecordCache()
+    cache.put_articles([article])
+    #An older revision doesn't replace the cached one
+    cache.invalidate(IDS[0],'1990/01/01')
+    assert cache.get('details',IDS[0]) is not None
+    cache.invalidate(IDS[0],'2100/01/01')
+    assert cache.get('details',IDS[0]) is None
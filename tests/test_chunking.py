@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Splitting of large ID lists into concurrent efetch/esummary requests
+"""
+
+#Third Party
+import pytest
+
+#Local
+from pubmed import errors
+from pubmed.mock_server import MockServer
+
+from conftest import IDS, get_api, get_requested_ids
+
+def test_chunks_are_merged_in_order(mock_server):
+    mock_server.reset_stats()
+    api = get_api(mock_server,chunk_size=25)
+    result = api.pubmed.details(IDS)
+    assert [x.citation.pmid for x in result.docs] == IDS
+    assert mock_server.stats.endpoint_counts['efetch'] == 5
+    assert get_requested_ids(mock_server,'efetch') == len(IDS)
+    assert result.chunk_errors == []
+
+    summaries = api.pubmed.summary(IDS)
+    assert summaries.ids == IDS
+    assert [x.uid for x in summaries.docs] == IDS
+
+def test_chunks_are_concurrent():
+    with MockServer(latency=0.2) as server:
+        api = get_api(server,chunk_size=10,max_workers=4)
+        result = api.pubmed.summary(IDS[:40])
+        assert len(result.docs) == 40
+        assert server.stats.max_concurrent > 1
+
+def test_small_requests_are_not_split(mock_server):
+    mock_server.reset_stats()
+    api = get_api(mock_server,chunk_size=25)
+    api.pubmed.details(IDS[:25])
+    assert mock_server.stats.endpoint_counts == {'efetch':1}
+
+def test_failed_chunks_are_reported():
+    with MockServer(error_rate=0.5,seed=1) as server:
+        api = get_api(server,chunk_size=10,retry=False)
+        result = api.pubmed.summary(IDS)
+        failed = [x for e in result.chunk_errors for x in e.ids]
+        assert len(failed) > 0
+        assert all(isinstance(x,errors.ChunkError) for x in result.chunk_errors)
+        assert sorted([x.uid for x in result.docs] + failed) == IDS
+        #Order of the chunks that worked is kept
+        assert [x.uid for x in result.docs] == [x for x in IDS if x not in failed]
+
+def test_all_chunks_failing_raises():
+    with MockServer(error_rate=1.0) as server:
+        api = get_api(server,chunk_size=10,retry=False)
+        with pytest.raises(Exception):
+            api.pubmed.summary(IDS)
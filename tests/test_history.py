@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+EPost and paging through results on the Entrez history server
+"""
+
+#Standard Library
+from types import SimpleNamespace
+
+#Third Party
+import pytest
+
+#Local
+from pubmed.epost_models import EPostResult
+
+from conftest import IDS, get_api, get_requested_ids, get_search_ids, make_response
+
+EPOST_XML = """<?xml version="1.0" encoding="UTF-8" ?>
+<!DOCTYPE ePostResult PUBLIC "-//NLM//DTD epost 20090526//EN" "https://eutils.ncbi.nlm.nih.gov/eutils/dtd/20090526/epost.dtd">
+<ePostResult>
+	<QueryKey>1</QueryKey>
+	<WebEnv>MCID_abc</WebEnv>
+</ePostResult>
+"""
+
+@pytest.mark.parametrize('parser',['bs4','lxml'])
+def test_epost_result(parser):
+    result = EPostResult(SimpleNamespace(parser=parser),make_response(EPOST_XML),
+                         {'count':3})
+    assert result.query_key == '1'
+    assert result.web_env == 'MCID_abc'
+    assert result.count == 3
+    assert result.error is None
+
+    xml = '<ePostResult><ERROR>Invalid uid 0</ERROR></ePostResult>'
+    result = EPostResult(SimpleNamespace(parser=parser),make_response(xml),
+                         {'count':1})
+    assert result.error == 'Invalid uid 0'
+    assert result.web_env is None
+
+def test_post_and_page(mock_server):
+    api = get_api(mock_server)
+    post = api.pubmed.post(IDS)
+    assert post.web_env is not None and post.query_key is not None
+    assert post.count == len(IDS)
+
+    mock_server.reset_stats()
+    pages = [api.pubmed.details(post,start=i,max=50) for i in range(0,len(IDS),50)]
+    assert [x.citation.pmid for page in pages for x in page.docs] == IDS
+    #IDs aren't uploaded again
+    assert get_requested_ids(mock_server,'efetch') == len(IDS)
+    assert 'epost' not in mock_server.stats.endpoint_counts
+
+def test_post_to_existing_session(mock_server):
+    api = get_api(mock_server)
+    first = api.pubmed.post(IDS[:10])
+    second = api.pubmed.post(IDS[10:15],web_env=first.web_env)
+    assert second.web_env == first.web_env
+    assert second.query_key != first.query_key
+
+    summaries = api.pubmed.summary(second,start=0,max=100)
+    assert [x.uid for x in summaries.docs] == IDS[10:15]
+
+def test_search_history_paging(mock_server):
+    api = get_api(mock_server)
+    result = api.pubmed.search('bladder',use_history=True)
+    assert result.web_env is not None
+    expected = get_search_ids('bladder',mock_server.search_count)
+
+    page = api.pubmed.summary(result,start=100,max=30)
+    assert [x.uid for x in page.docs] == expected[100:130]
+    page = api.pubmed.details(result,start=1200,max=100)
+    assert [x.citation.pmid for x in page.docs] == expected[1200:]
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of pubmed.ingest
+"""
+
+#Standard Library
+import os
+import gzip
+import json
+
+#Third Party
+import pytest
+
+#Local
+from pubmed import models
+from pubmed.ingest import (FileResult, IngestCheckpoint, _ingest_file,
+                           get_files, ingest)
+
+from conftest import add_records, load_fixture
+
+def get_types(path, records):
+    #Handlers run in the workers, so are at the module level
+    return [type(x).__name__ for x in records]
+
+def fail_on_books(path, records):
+    for record in records:
+        if isinstance(record,models.PubmedBookArticle):
+            raise ValueError('no books please')
+
+@pytest.fixture(scope='module')
+def efetch_data():
+    return load_fixture('efetch_100.xml.gz')
+
+@pytest.fixture
+def paths(tmp_path,efetch_data):
+    """
+    A baseline file with a book article and an update file that deletes 3
+    PMIDs
+    """
+    output = []
+    for name, data in [('pubmed24n0001.xml.gz',add_records(efetch_data,book=True)),
+                       ('pubmed24n0002.xml.gz',add_records(efetch_data,
+                                                           deleted=['1','2','3']))]:
+        path = str(tmp_path/name)
+        with gzip.open(path,'wb') as f:
+            f.write(data)
+        output.append(path)
+    return output
+
+def test_get_files(tmp_path,paths):
+    (tmp_path/'notes.txt').write_text('')
+    assert get_files(str(tmp_path)) == paths
+
+@pytest.mark.parametrize('parser',['lxml','bs4'])
+def test_ingest_file(paths,parser):
+    result = _ingest_file(paths[0],get_types,parser,False,False)
+    assert result.error is None
+    assert (result.n_articles,result.n_books,result.n_deleted) == (100,1,0)
+    assert result.output == ['PubmedArticle']*100 + ['PubmedBookArticle']
+    assert result.size == os.path.getsize(paths[0])
+    assert result.name == 'pubmed24n0001.xml.gz'
+
+    result = _ingest_file(paths[1],get_types,parser,False,False)
+    assert (result.n_articles,result.n_books,result.n_deleted) == (100,0,3)
+    assert result.n_records == 103
+    assert result.output[-1] == 'DeleteCitation'
+
+def test_ingest_file_options(paths):
+    def handler(path, records):
+        return [x for x in records if isinstance(x,models.PubmedArticle)][0]
+    article = _ingest_file(paths[0],handler,'lxml',True,True).output
+    assert isinstance(article,models.LazyPubmedArticle)
+    assert article.raw_xml.startswith(b'<PubmedArticle>')
+
+def test_ingest_skips_finished_files(tmp_path,paths):
+    checkpoint_path = str(tmp_path/'checkpoint.json')
+    report = ingest(paths,get_types,max_workers=2,checkpoint=checkpoint_path)
+    assert report.n_skipped == 0
+    assert report.n_failed == 0
+    assert sorted(x.name for x in report.files) == [os.path.basename(x) for x in paths]
+    assert report.n_records == 101 + 103
+
+    with open(checkpoint_path,encoding='utf-8') as f:
+        files = json.load(f)
+    assert files['pubmed24n0001.xml.gz']['n_books'] == 1
+    assert files['pubmed24n0002.xml.gz']['n_deleted'] == 3
+    assert all(x['done'] for x in files.values())
+
+    report = ingest(paths,get_types,max_workers=2,checkpoint=checkpoint_path)
+    assert report.n_skipped == 2
+    assert report.files == []
+
+    #A file that has been downloaded again is ingested again
+    with gzip.open(paths[1],'wb') as f:
+        f.write(add_records(load_fixture('efetch_100.xml.gz'),deleted=['4']))
+    report = ingest(paths,max_workers=1,checkpoint=IngestCheckpoint(checkpoint_path))
+    assert report.n_skipped == 1
+    assert [(x.name,x.n_deleted) for x in report.files] == [('pubmed24n0002.xml.gz',1)]
+
+def test_failed_files_are_retried(tmp_path,paths):
+    checkpoint = IngestCheckpoint(str(tmp_path/'checkpoint.json'))
+    report = ingest(paths,fail_on_books,max_workers=1,checkpoint=checkpoint)
+    assert report.n_failed == 1
+    failed = report.files[0]
+    assert 'ValueError: no books please' in failed.error
+    assert failed.output is None
+    #Counted up to the failure
+    assert (failed.n_articles,failed.n_books) == (100,1)
+    assert report.files[1].error is None
+
+    checkpoint = IngestCheckpoint(checkpoint.path)
+    assert checkpoint.files['pubmed24n0001.xml.gz']['done'] is False
+    assert not checkpoint.is_done(paths[0])
+    assert checkpoint.is_done(paths[1])
+    report = ingest(paths,get_types,max_workers=1,checkpoint=checkpoint)
+    assert report.n_skipped == 1
+    assert [x.name for x in report.files] == ['pubmed24n0001.xml.gz']
+    assert report.n_failed == 0
+
+def test_corrupt_file(tmp_path,paths):
+    path = str(tmp_path/'pubmed24n0003.xml.gz')
+    with open(paths[0],'rb') as f:
+        data = f.read()
+    with open(path,'wb') as f:
+        f.write(data[:len(data)//2])
+    report = ingest([path],max_workers=1)
+    assert report.n_failed == 1
+    assert report.files[0].error is not None
+    assert 0 < report.files[0].n_articles < 100
+
+def test_report(paths,capsys):
+    report = ingest(paths,max_workers=1,verbose=True)
+    assert report.elapsed_time > 0
+    assert report.records_per_s == report.n_records/report.elapsed_time
+    for result in report.files:
+        assert result.records_per_s == result.n_records/result.elapsed_time
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith('pubmed24n0001.xml.gz: 101 records in ')
+    assert lines[1].startswith('pubmed24n0002.xml.gz: 103 records in ')
+    assert lines[2].startswith('2 files, 204 records in ')
+    assert all(x.endswith('records/s)') for x in lines)
+
+    assert FileResult(paths[0]).records_per_s == 0
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Pubmed.iter_search and AsyncAPI's iter_search against the mock server
+"""
+
+#Standard Library
+import asyncio
+
+#Third Party
+import pytest
+
+#Local
+from pubmed.api import ESEARCH_MAX_RESULTS
+from pubmed.async_api import AsyncAPI
+from pubmed.mock_server import MockServer
+
+from conftest import RATE, get_api, get_search_ids
+
+def _record_searches(api):
+    #Wraps Pubmed.search to keep the (query,start,max) of each call
+    calls = []
+    search = api.pubmed.search
+    def wrapper(query,start=None,max=None,**kwargs):
+        calls.append((query,start,max))
+        return search(query,start=start,max=max,**kwargs)
+    api.pubmed.search = wrapper
+    return calls
+
+def test_iter_search_pages():
+    with MockServer(search_count=345) as server:
+        api = get_api(server)
+        calls = _record_searches(api)
+        ids = list(api.pubmed.iter_search('bladder',page_size=100))
+        assert ids == get_search_ids('bladder',345)
+        #The count, then 4 pages with the last one only asking for the rest
+        assert [(x[1],x[2]) for x in calls] == [(None,0),(0,100),(100,100),
+                                                (200,100),(300,45)]
+
+        docs = list(api.pubmed.iter_search('bladder',page_size=200,
+                                           return_type='summary'))
+        assert [x.uid for x in docs] == ids
+        docs = list(api.pubmed.iter_search('bladder',page_size=200,
+                                           return_type='details'))
+        assert [x.citation.pmid for x in docs] == ids
+
+def test_iter_search_is_lazy():
+    with MockServer(search_count=1000) as server:
+        api = get_api(server)
+        calls = _record_searches(api)
+        pages = api.pubmed.iter_search('bladder',page_size=100)
+        assert next(pages) == get_search_ids('bladder',1)[0]
+        pages.close()
+        #The count, the first page and at most one prefetched page
+        assert len(calls) <= 3
+
+def test_iter_search_bisects_dates():
+    with MockServer(search_count=25000,
+                    search_dates=('2000/01/01','2000/12/31')) as server:
+        api = get_api(server)
+        calls = _record_searches(api)
+        ids = list(api.pubmed.iter_search('bladder',page_size=5000,
+                                          min_date='1999/01/01',
+                                          max_date='2001/12/31'))
+        assert sorted(ids) == get_search_ids('bladder',25000)
+        #No page goes past what ESearch returns
+        pages = [x for x in calls if x[2] != 0]
+        assert all(start + max <= ESEARCH_MAX_RESULTS for query, start, max in pages)
+        assert all('[PDAT]' in query for query, start, max in pages)
+
+def test_iter_search_warns_for_a_full_day():
+    with MockServer(search_count=12000,
+                    search_dates=('2000/01/01','2000/01/01')) as server:
+        api = get_api(server)
+        with pytest.warns(UserWarning,match='only the first'):
+            ids = list(api.pubmed.iter_search('bladder',page_size=5000,
+                                              min_date='2000/01/01',
+                                              max_date='2000/01/02'))
+        assert ids == get_search_ids('bladder',ESEARCH_MAX_RESULTS)
+
+def test_async_iter_search_bisects_dates():
+    async def main(server):
+        async with AsyncAPI(rate=RATE,**server.api_options) as api:
+            ids = [x async for x in api.pubmed.iter_search('bladder',
+                                                           page_size=5000,
+                                                           min_date='1999/01/01',
+                                                           max_date='2001/12/31')]
+            #Stopping early cancels the prefetched page
+            pages = api.pubmed.iter_search('bladder',page_size=10)
+            first = await pages.__anext__()
+            await pages.aclose()
+            return ids, first
+
+    with MockServer(search_count=25000,
+                    search_dates=('2000/01/01','2000/12/31')) as server:
+        ids, first = asyncio.run(main(server))
+        expected = get_search_ids('bladder',25000)
+        assert sorted(ids) == expected
+        assert first == expected[0]
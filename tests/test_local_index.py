@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of pubmed.local_index
+"""
+
+#Standard Library
+import io
+import json
+import random
+
+#Third Party
+import pytest
+
+#Local
+from pubmed import models
+from pubmed.esearch_models import JSONSearchResult
+from pubmed.local_index import (ALL_TERM, SKIP_INTERVAL, IndexBuilder,
+                                LocalIndex, LocalSearch, Postings, build_index,
+                                decode_varints, encode_varints, get_date_value,
+                                normalize_phrase, tokenize)
+from pubmed.store import ArticleStore
+
+from conftest import load_fixture
+
+@pytest.fixture(scope='module')
+def articles():
+    data = load_fixture('efetch_100.xml.gz')
+    return list(models._iter_article_set(io.BytesIO(data),leave_raw=True))
+
+@pytest.fixture(scope='module')
+def pmids(articles):
+    return [int(x.citation.pmid) for x in articles]
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory,articles):
+    builder = IndexBuilder()
+    builder.add_articles(articles)
+    return builder.write(str(tmp_path_factory.mktemp('index')/'index.sqlite'))
+
+def test_tokenize():
+    assert tokenize('Bladder afferent signaling (i).') == ['bladder','afferent',
+                                                           'signaling','i']
+    assert tokenize(None) == []
+    assert normalize_phrase('Bladder, Neurogenic') == 'bladder neurogenic'
+
+def test_get_date_value():
+    assert get_date_value('2019','11','25') == 20191125
+    assert get_date_value('2019','Nov') == 20191100
+    assert get_date_value('2019') == 20190000
+    assert get_date_value(None,medline_date='1998 Dec-1999 Jan') == 19980000
+    assert get_date_value(None) is None
+
+#---- Postings ---------------------------------------
+def test_varints():
+    values = [1,127,128,300,2**21,2**28 + 5,2**32 - 1]
+    data = encode_varints(values)
+    #One byte per 7 bits of each delta
+    assert len(encode_varints([127])) == 1
+    assert len(encode_varints([128])) == 2
+    assert decode_varints(data) == values
+    assert decode_varints(data,n=3) == values[:3]
+    assert decode_varints(encode_varints(values[3:],values[2]),values[2]) == values[3:]
+    assert decode_varints(b'') == []
+
+@pytest.mark.parametrize('n',[0,1,SKIP_INTERVAL,SKIP_INTERVAL + 1,1000])
+def test_postings_round_trip(n):
+    rng = random.Random(n)
+    #Gaps of 1 to 2**20 need 1 to 3 bytes
+    pmids = []
+    value = 0
+    for i in range(n):
+        value += rng.choice([1,100,rng.randrange(1,2**20)])
+        pmids.append(value)
+
+    postings = Postings.from_pmids(pmids)
+    assert len(postings) == n
+    assert postings.to_list() == pmids
+    assert postings.n_blocks == -(-n//SKIP_INTERVAL)
+    blocks = [postings.decode_block(i) for i in range(postings.n_blocks)]
+    assert blocks == [pmids[i:i+SKIP_INTERVAL] for i in range(0,n,SKIP_INTERVAL)]
+    assert list(postings.skip_pmids) == [x[-1] for x in blocks]
+
+#---- Index ------------------------------------------
+def test_index_builder(articles,pmids):
+    builder = IndexBuilder()
+    builder.add_articles(articles)
+    terms = builder.terms
+    assert list(terms[ALL_TERM]) == pmids
+    assert list(terms['ti:bladder']) == pmids
+    #A word is added once per article
+    assert len(terms['ti:rat']) == 100
+    doc = articles[0]
+    author = doc.citation.article.authors[0]
+    name = normalize_phrase(author.last_name)
+    assert pmids[0] in terms['fa:' + name]
+    assert pmids[0] in terms['au:%s %s' % (name,author.initials.lower())]
+    heading = doc.citation.mesh_headings[0].name
+    assert pmids[0] in terms['mh:' + normalize_phrase(heading)]
+    assert builder.pub_dates[pmids[0]] // 10000 == 2019
+
+def test_index(index,pmids):
+    assert index.n_docs == 100
+    assert index.get_pmids('ti:bladder') == sorted(pmids)
+    assert index.get_count('ti:bladder') == 100
+    assert index.get_postings('ti:xyz') is None
+    assert index.get_pmids('ti:xyz') == []
+    assert index.get_count('ti:xyz') == 0
+    #Cached after the first lookup
+    assert index.get_postings('ti:rat') is index.get_postings('ti:rat')
+
+    terms = index.get_terms('ti:bladd')
+    assert terms == ['ti:bladder']
+    assert index.get_terms('ti:') == sorted(index.get_terms('ti:'))
+    assert all(x.startswith('ti:') for x in index.get_terms('ti:'))
+
+def test_index_cache_size(index):
+    small = LocalIndex(index.path,max_cached=2)
+    for term in ('ti:bladder','ti:rat','ti:afferent'):
+        small.get_postings(term)
+    assert list(small.cache) == ['ti:rat','ti:afferent']
+    small.close()
+
+def test_get_date_range(tmp_path):
+    builder = IndexBuilder()
+    dates = {10:20190000,11:20190315,12:20190316,13:20191231,14:20200101,
+             9:20181231}
+    for pmid, date in dates.items():
+        builder._add_article_row(pmid,'x',None,(),date)
+    index = builder.write(str(tmp_path/'index.sqlite'))
+    assert index.get_date_range(20190000,20191231) == [10,11,12,13]
+    assert index.get_date_range(20190315,20190315) == [11]
+    assert index.get_date_range(20190317,20191230) == []
+    assert index.get_date_range(0,99999999) == sorted(dates)
+    assert index.get_date_range(0,99999999,name='other') == []
+
+def test_build_index_from_store(tmp_path,articles,index):
+    store = ArticleStore(str(tmp_path/'store.sqlite'))
+    store.put_articles(articles)
+    from_store = build_index(store,str(tmp_path/'index.sqlite'))
+    store.close()
+    assert from_store.n_docs == index.n_docs
+    for prefix in ('ti:','ab:','mh:','kw:','au:','fa:','ta:'):
+        terms = index.get_terms(prefix)
+        assert from_store.get_terms(prefix) == terms
+        for term in terms[:20]:
+            assert from_store.get_pmids(term) == index.get_pmids(term)
+    assert from_store.get_date_range(0,99999999) == index.get_date_range(0,99999999)
+
+#---- Search -----------------------------------------
+def test_search(index,pmids):
+    search = LocalSearch(index)
+    result = search.search('bladder rat',max=5)
+    assert isinstance(result,JSONSearchResult)
+    assert result.count == 100
+    #Most recent first, as with esearch
+    assert result.ids == [str(x) for x in sorted(pmids)[::-1][:5]]
+    assert search.search('bladder',start=98,return_type='ids') == \
+        [str(x) for x in sorted(pmids)[1::-1]]
+    assert search.search('bladder xyz',return_type='ids') == []
+
+    data = search.search('bladder',max=2,return_type='json')
+    assert data['esearchresult']['count'] == '100'
+    assert data['esearchresult']['retmax'] == '2'
+    assert json.loads(search.search('bladder',max=2,return_type='text-json')) == data
+    with pytest.raises(ValueError):
+        search.search('bladder',return_type='xml')
+
+def test_search_from_path(index):
+    search = LocalSearch(index.path)
+    assert search.index.n_docs == 100
+    search.index.close()
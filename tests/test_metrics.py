@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of pubmed.metrics
+"""
+
+#Standard Library
+import re
+import json
+import logging
+import threading
+
+#Third Party
+import requests
+
+#Local
+from pubmed.cache import ResponseCache
+from pubmed.metrics import Histogram, Metrics, NullMetrics, get_metrics
+from pubmed.mock_server import MockServer
+from pubmed.retry import RetryPolicy
+
+from conftest import IDS, get_api, make_response
+
+URL = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/'
+
+#name{labels} value
+_SAMPLE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? \S+$')
+
+def test_histogram():
+    h = Histogram(buckets=(0.1,1.0))
+    for value in (0.05,0.1,0.5,2.0):
+        h.observe(value)
+    assert h.counts == [2,1,1]
+    assert h.count == 4
+    assert h.sum == 2.65
+    assert h.max == 2.0
+    assert h.get_quantile(0.5) == 0.1
+    assert h.get_quantile(0.75) == 1.0
+    assert h.get_quantile(1.0) == 2.0
+    assert Histogram().get_quantile(0.5) == 0.0
+
+def test_snapshot():
+    metrics = Metrics()
+    response = make_response(b'x'*100,url=URL + 'efetch.fcgi')
+    metrics.observe_request(URL + 'efetch.fcgi',0.2,response)
+    metrics.observe_request(URL + 'efetch.fcgi',0.3,make_response('',status=429))
+    metrics.observe_request(URL + 'esummary.fcgi',1.0,
+                            error=requests.ConnectionError())
+    metrics.observe_wait(URL + 'efetch.fcgi',0.5)
+    metrics.observe_parse(URL + 'efetch.fcgi',0.01)
+    metrics.observe_parse(URL + 'efetch.fcgi',0.02,error=ValueError())
+    metrics.observe_cache(URL + 'efetch.fcgi',True)
+    metrics.observe_cache(URL + 'efetch.fcgi',False)
+    metrics.observe_retry(URL + 'efetch.fcgi')
+
+    snapshot = metrics.snapshot()
+    #JSON serializable
+    snapshot = json.loads(json.dumps(snapshot))
+    efetch = snapshot['endpoints']['efetch']
+    assert efetch['requests'] == {'200':1,'429':1}
+    assert efetch['n_requests'] == 2
+    assert efetch['network_seconds']['count'] == 2
+    assert efetch['network_seconds']['sum'] == 0.5
+    assert efetch['wait_seconds']['max'] == 0.5
+    assert efetch['parse_seconds']['count'] == 2
+    assert efetch['bytes_received'] == 100
+    assert efetch['bytes_sent'] > 0
+    assert (efetch['cache_hits'],efetch['cache_misses'],efetch['retries']) == (1,1,1)
+    assert efetch['errors'] == {'ValueError':1}
+    assert snapshot['endpoints']['esummary']['requests'] == {'error':1}
+    assert snapshot['endpoints']['esummary']['errors'] == {'ConnectionError':1}
+
+    metrics.reset()
+    assert metrics.snapshot()['endpoints'] == {}
+
+def test_prometheus():
+    metrics = Metrics(buckets=(0.1,1.0))
+    for elapsed_time in (0.05,0.5,5):
+        metrics.observe_request(URL + 'efetch.fcgi',elapsed_time,make_response(''))
+    metrics.observe_parse(URL + 'esummary.fcgi',0.01,error=ValueError())
+    text = metrics.to_prometheus()
+
+    lines = text.splitlines()
+    assert text.endswith('\n')
+    for line in lines:
+        assert line.startswith('# HELP ') or line.startswith('# TYPE ') or \
+            _SAMPLE.match(line), line
+    assert 'pubmed_requests_total{endpoint="efetch",status="200"} 3' in lines
+    #Buckets are cumulative
+    assert 'pubmed_network_seconds_bucket{endpoint="efetch",le="0.1"} 1' in lines
+    assert 'pubmed_network_seconds_bucket{endpoint="efetch",le="1"} 2' in lines
+    assert 'pubmed_network_seconds_bucket{endpoint="efetch",le="+Inf"} 3' in lines
+    assert 'pubmed_network_seconds_count{endpoint="efetch"} 3' in lines
+    assert 'pubmed_errors_total{endpoint="esummary",error="ValueError"} 1' in lines
+    assert '# TYPE pubmed_parse_seconds histogram' in lines
+    #One header per metric
+    assert len([x for x in lines if x.startswith('# TYPE pubmed_requests_total')]) == 1
+
+    assert metrics.to_prometheus(prefix='x').startswith('# HELP x_requests_total')
+
+def test_log_lines(caplog):
+    metrics = Metrics()
+    metrics.observe_request(URL + 'efetch.fcgi',0.1,make_response(''))
+    lines = metrics.to_log_lines()
+    entry = json.loads(lines[0])
+    assert entry['endpoint'] == 'efetch'
+    assert entry['n_requests'] == 1
+    assert entry['network_seconds_count'] == 1
+
+    with caplog.at_level(logging.INFO,logger='pubmed.metrics'):
+        metrics.log()
+    assert [x.message for x in caplog.records] == lines
+
+def test_threads():
+    metrics = Metrics()
+    def run():
+        for i in range(1000):
+            metrics.observe_request(URL + 'efetch.fcgi',0.01,make_response(''))
+            metrics.observe_retry(URL + 'efetch.fcgi')
+    threads = [threading.Thread(target=run) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    efetch = metrics.snapshot()['endpoints']['efetch']
+    assert efetch['requests'] == {'200':4000}
+    assert efetch['retries'] == 4000
+
+def test_api_metrics(mock_server):
+    api = get_api(mock_server,cache=ResponseCache(':memory:'))
+    api.pubmed.details(IDS[:5])
+    api.pubmed.details(IDS[:5])
+    api.pubmed.summary(IDS[:5])
+
+    endpoints = api.metrics.snapshot()['endpoints']
+    assert endpoints['efetch']['requests'] == {'200':1}
+    assert endpoints['efetch']['cache_hits'] == 1
+    assert endpoints['efetch']['cache_misses'] == 1
+    assert endpoints['efetch']['parse_seconds']['count'] == 2
+    assert endpoints['efetch']['wait_seconds']['count'] == 1
+    assert endpoints['efetch']['bytes_received'] > 0
+    assert endpoints['esummary']['requests'] == {'200':1}
+
+def test_api_metrics_retries():
+    with MockServer(error_rate=1.0,server_errors=(503,)) as server:
+        api = get_api(server,retry=RetryPolicy(backoff=0.01,max_attempts=3))
+        try:
+            api.pubmed.summary(IDS[:1])
+        except Exception:
+            pass
+    esummary = api.metrics.snapshot()['endpoints']['esummary']
+    assert esummary['requests'] == {'503':3}
+    assert esummary['retries'] == 2
+
+def test_null_metrics(mock_server):
+    assert isinstance(get_metrics(None),Metrics)
+    metrics = Metrics()
+    assert get_metrics(metrics) is metrics
+
+    api = get_api(mock_server,metrics=False)
+    assert isinstance(api.metrics,NullMetrics)
+    assert not api.metrics.enabled
+    result = api.pubmed.details(IDS[:5])
+    assert len(result.docs) == 5
+    assert api.metrics.snapshot()['endpoints'] == {}
+    assert api.metrics.to_prometheus() == ''
+    assert api.metrics.to_log_lines() == []
+    #Nothing can be stored on it
+    assert not hasattr(api.metrics,'__dict__')
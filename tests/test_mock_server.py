@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of pubmed.mock_server itself
+"""
+
+#Third Party
+import requests
+
+#Local
+from pubmed.mock_server import MockServer
+
+from conftest import get_search_ids
+
+def _esearch(server, **params):
+    params.setdefault('db','pubmed')
+    params.setdefault('retmode','json')
+    response = requests.get(server.base_url + 'esearch.fcgi',params=params)
+    return response
+
+def test_bad_parameters_get_a_response(mock_server):
+    response = _esearch(mock_server,term='bladder',retstart='abc')
+    assert response.status_code == 400
+    assert 'Invalid parameter' in response.text
+
+    response = requests.get(mock_server.base_url + 'unknown.fcgi')
+    assert response.status_code == 404
+
+def test_errors_of_the_mock_get_a_500():
+    with MockServer() as server:
+        def fail(params):
+            raise RuntimeError('broken fixture')
+        server._esearch = fail
+        response = _esearch(server,term='bladder')
+        assert response.status_code == 500
+        assert 'broken fixture' in response.text
+        assert server.stats.n_5xx == 1
+        #The connection is still usable
+        assert requests.get(server.base_url + 'einfo.fcgi').status_code == 200
+
+def test_search_results():
+    with MockServer(search_count=30) as server:
+        data = _esearch(server,term='bladder',retstart=10,retmax=15).json()
+        result = data['esearchresult']
+        assert result['count'] == '30'
+        assert result['idlist'] == get_search_ids('bladder',30)[10:25]
+        assert _esearch(server,term='rat').json()['esearchresult']['idlist'] != \
+            result['idlist']
+
+def test_search_dates():
+    with MockServer(search_count=1000,
+                    search_dates=('2000/01/01','2000/12/31')) as server:
+        counts = []
+        ids = []
+        for min_date, max_date in [('1999/01/01','2000/03/15'),
+                                   ('2000/03/16','2000/03/16'),
+                                   ('2000/03/17','2003/01/01')]:
+            term = '(bladder) AND ("%s"[PDAT] : "%s"[PDAT])' % (min_date,max_date)
+            result = _esearch(server,term=term,retmax=1000).json()['esearchresult']
+            counts.append(int(result['count']))
+            ids.extend(result['idlist'])
+        #The ranges cover every result exactly once
+        assert sum(counts) == 1000
+        assert ids == get_search_ids('bladder',1000)
+        assert counts[1] in (2,3)
+
+def test_max_rate():
+    with MockServer(max_rate=5) as server:
+        statuses = [_esearch(server,term='x').status_code for i in range(10)]
+        assert statuses[:5] == [200]*5
+        assert 429 in statuses[5:]
+        assert server.stats.n_429 == statuses.count(429)
+
+def test_history():
+    with MockServer() as server:
+        response = requests.post(server.base_url + 'epost.fcgi',
+                                 data={'db':'pubmed','id':'1,2,3'})
+        web_env = response.text.split('<WebEnv>')[1].split('</WebEnv>')[0]
+        response = requests.post(server.base_url + 'esummary.fcgi',
+                                 data={'db':'pubmed','retmode':'json',
+                                       'WebEnv':web_env,'query_key':'1'})
+        assert response.json()['result']['uids'] == ['1','2','3']
+        assert server.stats.endpoint_counts == {'epost':1,'esummary':1}
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Offline tests of the response handlers, using the benchmark fixtures
+"""
+
+#Standard Library
+import io
+from types import SimpleNamespace
+
+#Third Party
+import pytest
+from bs4 import NavigableString
+
+#Local
+from pubmed import models
+from pubmed.lxml_helpers import make_document
+from pubmed.model_helpers import _make_soup
+
+from conftest import add_records, load_fixture, make_response
+
+def _get_names(obj, skipped=()):
+    names = set()
+    for cls in type(obj).__mro__:
+        slots = getattr(cls,'__slots__',[])
+        names.update([slots] if isinstance(slots,str) else slots)
+    names.update(getattr(obj,'__dict__',{}))
+    return sorted(x for x in names if x not in skipped)
+
+def _iter_values(obj):
+    """
+    Yields all values reachable from a parsed object
+    """
+    yield obj
+    if isinstance(obj,(str,bytes,int,float,bool,type(None))):
+        return
+    elif isinstance(obj,(list,tuple)):
+        for x in obj:
+            yield from _iter_values(x)
+    elif isinstance(obj,dict):
+        for x in obj.values():
+            yield from _iter_values(x)
+    else:
+        for name in _get_names(obj,('soup',)):
+            yield from _iter_values(getattr(obj,name,None))
+
+#Attributes that hold the parse tree or the raw data, compared separately
+SKIPPED_ATTRIBUTES = ('soup','raw_xml','elem','raw','_raw_source')
+
+def _compare(a,b,path='root'):
+    """
+    Returns the paths at which two parsed objects differ
+    """
+    if isinstance(a,(str,int,float,bool,type(None))):
+        if a != b or (a is None) != (b is None):
+            return [path]
+        return []
+    elif isinstance(a,(list,tuple)):
+        if len(a) != len(b):
+            return [path]
+        output = []
+        for i, (x, y) in enumerate(zip(a,b)):
+            output.extend(_compare(x,y,'%s[%d]' % (path,i)))
+        return output
+    elif isinstance(a,dict):
+        if set(a) != set(b):
+            return [path]
+        output = []
+        for key in a:
+            output.extend(_compare(a[key],b[key],'%s.%s' % (path,key)))
+        return output
+    elif type(a) is not type(b):
+        return [path]
+
+    output = []
+    for name in _get_names(a,SKIPPED_ATTRIBUTES):
+        output.extend(_compare(getattr(a,name,None),getattr(b,name,None),
+                               '%s.%s' % (path,name)))
+    return output
+
+#---- efetch XML ------------------------------------------
+@pytest.fixture(scope='module')
+def efetch_data():
+    return load_fixture('efetch_100.xml.gz')
+
+def _assert_released(docs):
+    for doc in docs:
+        assert doc.soup is None
+        assert doc.pubmed_data.soup is None
+        for value in _iter_values(doc):
+            #Strings that still point into the tree would keep it alive
+            if isinstance(value,NavigableString):
+                assert getattr(value,'parent',None) is None
+
+def test_soup_is_released(efetch_data):
+    result = models.PubmedArticleSet(None,make_response(efetch_data))
+    assert len(result.docs) == 100
+    _assert_released(result.docs)
+    #Values are still there
+    assert result.docs[0].citation.article.title.startswith('Bladder')
+    assert result.docs[0].raw_xml is None
+
+def test_soup_is_released_streaming(efetch_data):
+    docs = list(models._iter_article_set(io.BytesIO(efetch_data)))
+    _assert_released(docs)
+
+def test_keep_soup(efetch_data):
+    result = models.PubmedArticleSet(None,make_response(efetch_data),
+                                     {'keep_soup':True})
+    assert result.docs[0].soup.find('PMID').text == result.docs[0].citation.pmid
+
+@pytest.mark.parametrize('parser',['bs4','lxml'])
+def test_leave_raw(efetch_data,parser):
+    result = models.PubmedArticleSet(SimpleNamespace(parser=parser),
+                                     make_response(efetch_data),{'leave_raw':True})
+    docs = list(models._iter_article_set(io.BytesIO(efetch_data),leave_raw=True,
+                                         parser=parser))
+    for doc in result.docs + docs:
+        assert isinstance(doc.raw_xml,bytes)
+        assert doc.raw_xml.startswith(b'<PubmedArticle>')
+        assert b'<PMID Version="1">%s</PMID>' % doc.citation.pmid.encode() in doc.raw_xml
+        assert doc.soup is None
+
+#---- lxml parser ------------------------------------------
+def test_lxml_matches_bs4(efetch_data):
+    response = make_response(efetch_data)
+    bs4_result = models.PubmedArticleSet(SimpleNamespace(parser='bs4'),response)
+    lxml_result = models.PubmedArticleSet(SimpleNamespace(parser='lxml'),response)
+    assert len(bs4_result.docs) == 100
+    assert _compare(bs4_result.docs,lxml_result.docs) == []
+
+def test_lxml_matches_bs4_streaming(efetch_data):
+    bs4_docs = list(models._iter_article_set(io.BytesIO(efetch_data),parser='bs4'))
+    lxml_docs = list(models._iter_article_set(io.BytesIO(efetch_data),parser='lxml'))
+    assert len(bs4_docs) == 100
+    assert _compare(bs4_docs,lxml_docs) == []
+
+def test_streaming_matches_article_set(efetch_data):
+    result = models.PubmedArticleSet(None,make_response(efetch_data))
+    docs = list(models._iter_article_set(io.BytesIO(efetch_data)))
+    assert _compare(result.docs,docs) == []
+
+def test_stream_only_yields_articles(efetch_data):
+    data = add_records(efetch_data,book=True,deleted=['1','2'])
+    response = make_response(data)
+    response.raw = io.BytesIO(data)
+    docs = list(models.iter_pubmed_articles(None,response))
+    assert len(docs) == 100
+    assert all(type(x) is models.PubmedArticle for x in docs)
+    #All records when reading a file
+    records = list(models._iter_article_set(io.BytesIO(data)))
+    assert [type(x) for x in records[-2:]] == [models.PubmedBookArticle,
+                                               models.DeleteCitation]
+    assert records[-2].pmid == '20301295'
+    assert records[-1].pmids == ['1','2']
+
+NESTED_XML = """<A>
+<B><C>nested</C><D>1</D></B>
+<C>child</C>
+<D>2</D>
+<E x="1">text<F/>tail</E>
+</A>"""
+
+def test_lxml_tag_matches_bs4_tag():
+    soup = _make_soup(NESTED_XML).A
+    tag = make_document(NESTED_XML).A
+    #The first match in document order, even if a child comes later
+    assert tag.C.string == soup.C.string == 'nested'
+    assert tag.D.string == soup.D.string == '1'
+    assert tag.find('C',recursive=False).string == \
+        soup.find('C',recursive=False).string == 'child'
+    assert [x.string for x in tag.find_all('C')] == \
+        [x.string for x in soup.find_all('C')]
+    assert tag.Z is None and soup.Z is None
+
+    assert tag.E.attrs == soup.E.attrs == {'x':'1'}
+    assert tag.E['x'] == '1'
+    assert tag.E.string is None and soup.E.string is None
+    assert [x.name for x in tag.E.contents] == [x.name for x in soup.E.contents]
+    assert [str(x) for x in tag.E.contents if x.name is None] == ['text','tail']
+
+def test_lxml_attrs_are_copies(efetch_data):
+    doc = next(models._iter_article_set(io.BytesIO(efetch_data),
+                                        parser='lxml',keep_soup=True))
+    attrs = doc.soup.find('PMID').attrs
+    attrs['Version'] = '99'
+    assert doc.soup.find('PMID').attrs['Version'] == '1'
+
+#---- MEDLINE -----------------------------------------
+MEDLINE = """
+PMID- 1
+TI  - A title that is
+      wrapped
+AU  - Smith J
+AU  - Jones K
+
+PMID- 2
+TI  - Second
+AB  - Last field of the last record
+
+"""
+
+def test_medline_records():
+    records = models.get_medline(None,make_response(MEDLINE))
+    assert records == [
+        {'PMID':['1'],'TI':['A title that is wrapped'],'AU':['Smith J','Jones K']},
+        {'PMID':['2'],'TI':['Second'],'AB':['Last field of the last record']}]
+
+def test_medline_fields():
+    #The skipped field (AU) must not take the place of the last kept one
+    records = models.get_medline(None,make_response(MEDLINE),
+                                 {'fields':['PMID','TI']})
+    assert records == [{'PMID':['1'],'TI':['A title that is wrapped']},
+                       {'PMID':['2'],'TI':['Second']}]
+
+def test_medline_without_blank_lines():
+    lines = MEDLINE.strip().splitlines()
+    records = list(models._iter_medline_records(lines))
+    assert len(records) == 2
+    assert records[1]['AB'] == ['Last field of the last record']
+    assert list(models._iter_medline_records([])) == []
+    assert list(models._iter_medline_records(['',''])) == []
+
+def test_medline_fixture():
+    records = models.get_medline(None,make_response(load_fixture('medline_100.txt')))
+    assert len(records) == 100
+    assert len(set(x['PMID'][0] for x in records)) == 100
+    assert all(len(x['PMID']) == 1 for x in records)
+
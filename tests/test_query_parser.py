@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of pubmed.query_parser and searching the local index with it
+"""
+
+#Standard Library
+import io
+import random
+
+#Third Party
+import pytest
+
+#Local
+from pubmed import models
+from pubmed import query_parser as qp
+from pubmed.errors import QueryError
+from pubmed.local_index import IndexBuilder, LocalSearch, Postings
+
+from conftest import load_fixture
+
+def _get_pmids(docs):
+    return [int(x.citation.pmid) for x in docs]
+
+@pytest.fixture(scope='module')
+def articles():
+    data = load_fixture('efetch_100.xml.gz')
+    return list(models._iter_article_set(io.BytesIO(data)))
+
+def test_parse():
+    parser = qp.QueryParser()
+    node = parser.parse('bladder[ti] AND (rat OR "urinary bladder"[mh]) NOT smith ja[au]')
+    assert node.to_string() == ('bladder[Title] AND (rat[All Fields] OR '
+                                '"urinary bladder"[MeSH Terms]) NOT smith ja[Author]')
+    assert parser.parse('blad*[TIAB]').to_string() == 'blad*[Title/Abstract]'
+
+@pytest.mark.parametrize('query,expected',[
+    ('"2019"[dp]','"2019/01/01"[Date - Publication] : "2019/12/31"[Date - Publication]'),
+    ('"2019/02"[dp]','"2019/02/01"[Date - Publication] : "2019/02/28"[Date - Publication]'),
+    ('"2020/02"[dp]','"2020/02/01"[Date - Publication] : "2020/02/29"[Date - Publication]'),
+    ('"2020/02/29"[dp]','"2020/02/29"[Date - Publication] : "2020/02/29"[Date - Publication]'),
+    ('"2018/03/04"[PDAT] : "2019"[PDAT]',
+     '"2018/03/04"[Date - Publication] : "2019/12/31"[Date - Publication]'),
+])
+def test_date_range_to_string(query,expected):
+    node = qp.QueryParser().parse(query)
+    assert isinstance(node,qp.DateRange)
+    assert node.to_string() == expected
+
+@pytest.mark.parametrize('query,position',[
+    ('(bladder',8),
+    ('bladder)',7),
+    ('"bladder',0),
+    ('bladder[xyz]',7),
+    ('bladder AND',11),
+    ('bladder[ti',7),
+    ('NOT x',0),
+    ('x[au] : y[au]',0),
+    #Month and day must exist
+    ('"2012/13"[dp]',0),
+    ('"2012/00"[dp]',0),
+    ('"2019/02/30"[dp]',0),
+    ('"2019/02/29"[dp]',0),
+    ('"2019/04/31"[dp]',0),
+    ('bladder AND "2019/01/00"[dp]',12),
+    ('"2018/01/01"[dp] : "2019/13/01"[dp]',19),
+])
+def test_parse_errors(query,position):
+    with pytest.raises(QueryError) as info:
+        qp.QueryParser().parse(query)
+    assert info.value.query == query
+    assert info.value.position == position
+
+#---- Set operations ---------------------------------
+def test_set_operations():
+    rng = random.Random(1)
+    for i in range(100):
+        a = sorted(set(rng.randrange(1,10**6) for _ in range(rng.randrange(0,3000))))
+        b = sorted(set(rng.randrange(1,10**6) for _ in range(rng.randrange(0,50))))
+        postings = Postings.from_pmids(a)
+        assert postings.to_list() == a
+        assert qp.intersect(postings,b) == sorted(set(a) & set(b))
+        assert qp.intersect(b,postings) == sorted(set(a) & set(b))
+        assert qp.union(postings,b) == sorted(set(a) | set(b))
+        assert qp.difference(postings,b) == sorted(set(a) - set(b))
+        assert qp.difference(b,postings) == sorted(set(b) - set(a))
+
+def test_union_all():
+    rng = random.Random(2)
+    lists = [sorted(set(rng.randrange(1,1000) for _ in range(rng.randrange(0,200))))
+             for i in range(20)]
+    expected = sorted(set().union(*lists))
+    assert qp.union_all(lists) == expected
+    assert qp.union_all([Postings.from_pmids(x) for x in lists]) == expected
+    assert qp.union_all([]) == []
+
+#---- Evaluation --------------------------------------
+@pytest.fixture(scope='module')
+def search(tmp_path_factory,articles):
+    builder = IndexBuilder()
+    builder.add_articles(articles)
+    path = str(tmp_path_factory.mktemp('index')/'index.sqlite')
+    return LocalSearch(builder.write(path))
+
+def test_evaluate(search,articles):
+    pmids = _get_pmids(articles)
+    #Titles are 'Bladder afferent signaling in the rat (i).'
+    assert search.evaluate('bladder rat')[0] == pmids
+    assert search.evaluate('bladder[ti] AND 7[ti]')[0] == [pmids[7]]
+    assert search.evaluate('7[ti] OR 8[ti] OR x')[0] == pmids[7:9]
+    assert search.evaluate('bladder NOT (7[ti] OR 8[ti])')[0] == pmids[:7] + pmids[9:]
+    assert search.evaluate('x')[0] == []
+    assert search.evaluate('%s[pmid]' % pmids[3])[0] == [pmids[3]]
+    assert search.evaluate('blad*[ti]')[0] == pmids
+    assert search.evaluate('"2019"[dp]')[0] == pmids
+    assert search.evaluate('"2019/02"[dp]')[0] == []
+
+def test_evaluate_translation(search):
+    pmids, stack, translation = search.evaluate('bladder[ti] OR x')
+    assert translation == 'bladder[Title] OR x[All Fields]'
+    assert [x if isinstance(x,str) else x['count'] for x in stack] == ['100','0','OR']
+
+def test_search(search,articles):
+    result = search.search('bladder[ti] AND "2019"[dp]',max=3)
+    assert result.count == 100
+    #Most recent first, as with esearch
+    assert result.ids == [str(x) for x in sorted(_get_pmids(articles))[:-4:-1]]
+    assert result.query_translation == ('bladder[Title] AND "2019/01/01"[Date - Publication]'
+                                        ' : "2019/12/31"[Date - Publication]')
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of pubmed.rate_limiters and the adaptive rate
+"""
+
+#Standard Library
+import time
+import threading
+import multiprocessing
+
+#Third Party
+import pytest
+
+#Local
+from pubmed import rate_limiters
+from pubmed.api import API, _get_latency_key
+from pubmed.mock_server import MockServer
+from pubmed.rate_limiters import (TokenBucketLimiter, FileLockLimiter,
+                                  AdaptiveLimiter, AdaptiveRateController,
+                                  get_limiter)
+from pubmed.retry import RetryPolicy
+
+from conftest import IDS
+
+class FakeClock(object):
+
+    """
+    Stand-in for the time module, time only moves on sleep()
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiters,'time',clock)
+    return clock
+
+@pytest.fixture(params=['thread','process'])
+def make_limiter(request,tmp_path):
+    def make(rate,burst=1):
+        if request.param == 'thread':
+            return TokenBucketLimiter(rate,burst=burst)
+        return FileLockLimiter(rate,burst=burst,path=str(tmp_path/'rate.lock'))
+    return make
+
+def test_burst(clock,make_limiter):
+    limiter = make_limiter(10,burst=3)
+    assert [limiter.reserve() for i in range(3)] == [0,0,0]
+    #Later tokens are reserved one after another
+    assert [limiter.reserve() for i in range(3)] == pytest.approx([0.1,0.2,0.3])
+
+def test_refill(clock,make_limiter):
+    limiter = make_limiter(10,burst=3)
+    for i in range(3):
+        limiter.reserve()
+    clock.sleep(0.2)
+    assert [limiter.reserve() for i in range(3)] == pytest.approx([0,0,0.1])
+
+    #Tokens don't accumulate past the burst
+    clock.sleep(10)
+    assert [limiter.reserve() for i in range(4)] == pytest.approx([0,0,0,0.1])
+
+def test_acquire_waits(clock,make_limiter):
+    limiter = make_limiter(4)
+    waits = [limiter.acquire() for i in range(5)]
+    assert waits == pytest.approx([0,0.25,0.25,0.25,0.25])
+    assert clock.now == pytest.approx(1001.0)
+
+def test_penalize(clock,make_limiter):
+    limiter = make_limiter(10,burst=5)
+    limiter.penalize(2)
+    assert limiter.reserve() == pytest.approx(2.1)
+    #Penalties don't add to an existing wait
+    limiter.penalize(1)
+    assert limiter.reserve() == pytest.approx(2.2)
+
+def test_set_rate(clock,make_limiter):
+    limiter = make_limiter(10)
+    limiter.reserve()
+    limiter.set_rate(2)
+    assert limiter.reserve() == pytest.approx(0.5)
+
+def test_threads_share_the_budget():
+    limiter = TokenBucketLimiter(50)
+    times = []
+    def run():
+        for i in range(4):
+            limiter.acquire()
+            times.append(time.monotonic())
+    threads = [threading.Thread(target=run) for i in range(5)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    #20 requests, the first is free
+    assert len(times) == 20
+    assert max(times) - start >= 19/50 - 0.02
+
+def _acquire_in_process(path,n):
+    limiter = FileLockLimiter(20,path=path)
+    output = []
+    for i in range(n):
+        limiter.acquire()
+        output.append(time.time())
+    return output
+
+def test_processes_share_the_budget(tmp_path):
+    path = str(tmp_path/'rate.lock')
+    start = time.time()
+    with multiprocessing.get_context('spawn').Pool(2) as pool:
+        results = pool.starmap(_acquire_in_process,[(path,6),(path,6)])
+    times = sorted(x for result in results for x in result)
+    assert len(times) == 12
+    #Together the processes stay at 20 per second
+    assert times[-1] - times[0] >= 11/20 - 0.05
+    assert times[0] >= start
+
+def test_get_limiter():
+    a = get_limiter(None,10,key='limiter-test')
+    assert isinstance(a,TokenBucketLimiter)
+    assert get_limiter('thread',10,key='limiter-test') is a
+    assert get_limiter('thread',10,key='other-key') is not a
+    #The rate goes with the most recent caller
+    assert get_limiter('thread',3,key='limiter-test').rate == 3
+
+    assert isinstance(get_limiter('process',10,key='limiter-test'),FileLockLimiter)
+    custom = TokenBucketLimiter(1)
+    assert get_limiter(custom,10) is custom
+    with pytest.raises(ValueError):
+        get_limiter('bad',10)
+
+#---- Adaptive rate --------------------------------------
+def test_aimd_decrease_and_recovery():
+    limiter = TokenBucketLimiter(10)
+    controller = AdaptiveRateController(limiter,10,cooldown=60)
+    controller.on_response(0.1,429)
+    assert controller.rate == limiter.rate == 5
+    #Within the cooldown
+    controller.on_response(0.1,503)
+    assert controller.rate == 5
+    assert controller.last_decrease_reason == 'rate_limited'
+
+    for i in range(200):
+        controller.on_response(0.1,200)
+    assert controller.rate == 10
+    assert controller.n_increases > 0
+
+def test_aimd_latency_is_per_key():
+    controller = AdaptiveRateController(TokenBucketLimiter(10),10,cooldown=0)
+    for i in range(20):
+        controller.on_response(0.05,200,key='esearch.fcgi/0')
+    #Large requests being slower isn't congestion
+    for i in range(10):
+        controller.on_response(1.5,200,key='efetch.fcgi/9')
+    assert controller.n_decreases == 0
+
+    for i in range(10):
+        controller.on_response(0.6,200,key='esearch.fcgi/0')
+    assert controller.n_decreases > 0
+    assert controller.last_decrease_reason == 'latency'
+
+def test_latency_key():
+    url = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi'
+    assert _get_latency_key(url,{'id':'1'}) == 'efetch.fcgi/1'
+    assert _get_latency_key(url,{'id':','.join(['1']*300)}) == 'efetch.fcgi/9'
+    assert _get_latency_key(url,{'WebEnv':'x','retmax':500}) == 'efetch.fcgi/9'
+    assert _get_latency_key(url,None) == 'efetch.fcgi/0'
+
+def test_adaptive_limiter(clock):
+    shared = TokenBucketLimiter(10)
+    limiter = AdaptiveLimiter(shared,10)
+    limiter.set_rate(2)
+    assert shared.rate == 10
+    assert [limiter.reserve() for i in range(3)] == pytest.approx([0,0.5,1.0])
+    #Penalties are for everyone
+    limiter.penalize(5)
+    assert shared.reserve() == pytest.approx(5.1)
+
+def test_adaptive_rate_is_not_reset_by_other_apis():
+    api = API(adaptive_rate=True,rate=10,api_key='adaptive-test')
+    api.authentication.rate_controller.on_response(0.1,429)
+    assert api.authentication.limiter.rate == 5
+
+    other = API(rate=10,api_key='adaptive-test')
+    assert other.authentication.limiter is api.authentication.limiter.shared
+    assert api.authentication.limiter.rate == 5
+    assert other.authentication.limiter.rate == 10
+
+def test_adaptive_rate_backs_off_when_throttled():
+    with MockServer(max_rate=10) as server:
+        api = API(rate=40,adaptive_rate=True,api_key='throttle-test',
+                  retry=RetryPolicy(backoff=0.01,max_attempts=10,seed=1),
+                  chunk_size=1,**server.api_options)
+        result = api.pubmed.summary(IDS[:40])
+        assert len(result.docs) == 40
+        controller = api.authentication.rate_controller
+        assert server.stats.n_429 > 0
+        assert controller.n_decreases > 0
+        assert controller.rate < 40
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Retrying of failed requests
+"""
+
+#Standard Library
+import email.utils
+import time
+
+#Third Party
+import pytest
+import requests
+
+#Local
+from pubmed import errors
+from pubmed.mock_server import MockServer
+from pubmed.retry import RetryPolicy, get_retry_after, get_retry_policy
+
+from conftest import IDS, get_api, make_response
+
+EFETCH_URL = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi'
+EPOST_URL = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/epost.fcgi'
+
+def test_backoff():
+    policy = RetryPolicy(backoff=1,max_backoff=5,jitter=0)
+    assert [policy.get_delay(i,None) for i in range(1,6)] == [1,2,4,5,5]
+
+    policy = RetryPolicy(backoff=1,jitter=0.5,seed=1)
+    delays = [policy.get_delay(3,None) for i in range(100)]
+    assert all(2 <= x <= 4 for x in delays)
+    assert len(set(delays)) > 1
+
+def test_retry_after_sets_the_delay():
+    policy = RetryPolicy(backoff=0.01,jitter=0,max_retry_after=30)
+    response = make_response('',status=429,headers={'Retry-After':'2'})
+    assert policy.get_delay(1,response) == 2
+    assert policy.should_penalize(response)
+    assert not policy.should_penalize(make_response('',status=500))
+    assert policy.get_delay(1,make_response('',status=500)) == 0.01
+
+    response = make_response('',status=503,headers={'Retry-After':'1000'})
+    assert policy.get_delay(1,response) == 30
+
+def test_retry_after_formats():
+    assert get_retry_after(make_response('')) is None
+    assert get_retry_after(make_response('',headers={'Retry-After':'1.5'})) == 1.5
+    assert get_retry_after(make_response('',headers={'Retry-After':'soon'})) is None
+    date = email.utils.formatdate(time.time() + 10,usegmt=True)
+    wait = get_retry_after(make_response('',headers={'Retry-After':date}))
+    assert 8 < wait <= 10
+    date = email.utils.formatdate(time.time() - 10,usegmt=True)
+    assert get_retry_after(make_response('',headers={'Retry-After':date})) == 0
+
+def test_is_retryable():
+    policy = RetryPolicy()
+    for status, expected in [(200,False),(400,False),(429,True),(500,True),
+                             (503,True)]:
+        assert policy.is_retryable('GET',EFETCH_URL,make_response('',status=status),
+                                   None) == expected
+    assert policy.is_retryable('GET',EFETCH_URL,None,requests.ConnectionError())
+    assert not policy.is_retryable('GET',EFETCH_URL,None,ValueError())
+
+    #EPost may have been processed
+    assert not policy.is_retryable('POST',EPOST_URL,make_response('',status=500),None)
+    assert policy.is_retryable('POST',EPOST_URL,make_response('',status=429),None)
+    assert not policy.is_retryable('POST',EPOST_URL,None,requests.ReadTimeout())
+    assert policy.is_retryable('POST',EPOST_URL,None,requests.ConnectTimeout())
+    assert policy.get_max_attempts(EPOST_URL) == 3
+
+def test_get_retry_policy():
+    assert isinstance(get_retry_policy(None),RetryPolicy)
+    assert get_retry_policy(False) is None
+    policy = RetryPolicy()
+    assert get_retry_policy(policy) is policy
+
+def test_retries_recover_from_faults():
+    with MockServer(error_rate=0.2,rate_limit_rate=0.2,retry_after=0.05,
+                    seed=3) as server:
+        api = get_api(server,chunk_size=20,
+                      retry=RetryPolicy(backoff=0.01,max_attempts=10,seed=1))
+        result = api.pubmed.details(IDS)
+        assert [x.citation.pmid for x in result.docs] == IDS
+        assert api.query_logger.retry_count > 0
+        #Each 429 waited for at least Retry-After
+        assert api.query_logger.retry_wait >= 0.05*server.stats.n_429
+
+def test_retries_give_up():
+    with MockServer(error_rate=1.0) as server:
+        api = get_api(server,retry=RetryPolicy(backoff=0.01,max_attempts=3))
+        with pytest.raises(errors.RetryError) as info:
+            api.pubmed.summary(IDS[:1])
+        assert info.value.attempts == 3
+        assert server.stats.n_requests == 3
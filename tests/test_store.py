@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of pubmed.store
+"""
+
+#Standard Library
+import io
+
+#Third Party
+import pytest
+
+#Local
+from pubmed import models
+from pubmed.ingest import ingest
+from pubmed.store import ArticleStore
+
+from conftest import IDS, add_records, get_api, get_requested_ids, load_fixture
+
+def _parse(data:bytes):
+    return list(models._iter_article_set(io.BytesIO(data),leave_raw=True))
+
+@pytest.fixture(scope='module')
+def efetch_data():
+    return load_fixture('efetch_100.xml.gz')
+
+@pytest.fixture(scope='module')
+def articles(efetch_data):
+    return _parse(efetch_data)
+
+def _get_revised(efetch_data,index):
+    """
+    Returns the article at index with a later DateRevised and title
+    """
+    doc = _parse(efetch_data)[index]
+    xml = doc.raw_xml.replace(b'<DateRevised>\n            <Year>2019</Year>',
+                              b'<DateRevised>\n            <Year>2020</Year>',1)
+    xml = xml.replace(b'<ArticleTitle>',b'<ArticleTitle>Revised: ',1)
+    assert xml.count(b'2020') == 1
+    return _parse(b'<PubmedArticleSet>%s</PubmedArticleSet>' % xml)[0]
+
+def test_put_articles(tmp_path,articles):
+    store = ArticleStore(str(tmp_path/'store.sqlite'))
+    assert store.put_articles(articles) == 100
+    #Same revisions are skipped
+    assert store.put_articles(articles) == 0
+    assert len(store) == 100
+
+    pmid = articles[3].citation.pmid
+    doc = store.get(pmid,leave_raw=True)
+    assert doc.citation.article.title == articles[3].citation.article.title
+    assert doc.raw_xml == articles[3].raw_xml
+    assert store.get('1') is None
+    assert store.get_revisions([pmid]) == {pmid:'20191125'}
+    store.close()
+
+def test_newer_revision_replaces(tmp_path,efetch_data,articles):
+    store = ArticleStore(str(tmp_path/'store.sqlite'))
+    store.put_articles(articles)
+    pmid = articles[0].citation.pmid
+    n_authors = store.db.execute('SELECT COUNT(*) FROM authors').fetchone()[0]
+
+    revised = _get_revised(efetch_data,0)
+    assert store.put_articles([revised]) == 1
+    assert store.get(pmid).citation.article.title.startswith('Revised: ')
+    assert store.get_revisions([pmid]) == {pmid:'20201125'}
+    #Rows of the old revision are replaced, not added to
+    assert store.db.execute('SELECT COUNT(*) FROM authors').fetchone()[0] == n_authors
+
+    #Older revisions don't replace newer ones
+    assert store.put_articles(articles[:1]) == 0
+    assert store.get(pmid).citation.article.title.startswith('Revised: ')
+    store.close()
+
+def test_duplicates_keep_latest(tmp_path,efetch_data,articles):
+    store = ArticleStore(str(tmp_path/'store.sqlite'))
+    revised = _get_revised(efetch_data,1)
+    assert store.put_articles([revised,articles[1]]) == 1
+    assert store.get(revised.citation.pmid).citation.article.title.startswith('Revised: ')
+    store.close()
+
+def test_delete_leaves_tombstone(tmp_path,articles):
+    store = ArticleStore(str(tmp_path/'store.sqlite'))
+    store.put_articles(articles)
+    pmid = articles[0].citation.pmid
+    store.delete([pmid])
+    assert pmid not in store
+    assert len(store) == 99
+    for name in ('authors','mesh','article_ids'):
+        assert store.db.execute('SELECT COUNT(*) FROM %s WHERE pmid = ?' % name,
+                                (pmid,)).fetchone()[0] == 0
+    #Deleted PMIDs are not added back
+    assert store.put_articles(articles[:2]) == 0
+    assert pmid not in store
+    store.close()
+
+def test_apply_update_file(tmp_path,efetch_data,articles):
+    store = ArticleStore(str(tmp_path/'store.sqlite'),batch_size=30)
+    store.put_articles(articles[:50])
+
+    pmids = [x.citation.pmid for x in articles[:2]]
+    data = add_records(efetch_data,book=True,deleted=pmids)
+    result = store.apply(models._iter_article_set(io.BytesIO(data),leave_raw=True))
+    assert result.n_written == 50
+    assert result.n_skipped == 50
+    assert result.n_deleted == 2
+    assert result.n_books == 1
+    assert len(store) == 98
+    assert not any(x in store for x in pmids)
+    store.close()
+
+def test_mesh_is_major(tmp_path,articles):
+    store = ArticleStore(str(tmp_path/'store.sqlite'))
+    store.put_articles(articles[:5])
+    for name in ('mesh','mesh_qualifiers'):
+        values = set(x for x, in store.db.execute('SELECT is_major FROM %s' % name))
+        assert values and values <= {0,1}
+    store.close()
+
+def test_get_many(tmp_path,articles):
+    store = ArticleStore(str(tmp_path/'store.sqlite'))
+    store.put_articles(articles)
+    pmids = [x.citation.pmid for x in articles]
+    docs = store.get_many(pmids[::-1] + ['1'] + pmids[:3])
+    assert sorted(docs) == sorted(pmids)
+    assert all(docs[x].raw_xml is None and docs[x].soup is None for x in docs)
+    assert [docs[x.citation.pmid].citation.article.title for x in articles] == \
+        [x.citation.article.title for x in articles]
+    store.close()
+
+def test_ingest_handler(tmp_path,efetch_data,articles):
+    paths = []
+    for i, data in enumerate([add_records(efetch_data,book=True),
+                              add_records(efetch_data,deleted=['1'])]):
+        path = str(tmp_path/('pubmed24n%04d.xml' % (i + 1)))
+        with open(path,'wb') as f:
+            f.write(data)
+        paths.append(path)
+    store = ArticleStore(str(tmp_path/'store.sqlite'))
+    report = ingest(paths,store.get_ingest_handler(),max_workers=1,leave_raw=True)
+    assert report.n_failed == 0
+    updates = [x.output for x in report.files]
+    assert [(x.n_written,x.n_skipped,x.n_books,x.n_deleted) for x in updates] == \
+        [(100,0,1,0),(0,100,0,1)]
+    assert len(store) == 100
+    assert store.get(articles[0].citation.pmid) is not None
+    store.close()
+
+def test_api_store(tmp_path,mock_server):
+    path = str(tmp_path/'store.sqlite')
+    api = get_api(mock_server,store=path)
+    first = api.pubmed.details(IDS[:10])
+    assert len(api.store) == 10
+    #The XML is only kept if asked for
+    assert first.docs[0].raw_xml is None
+
+    mock_server.reset_stats()
+    result = api.pubmed.details(IDS[5:15])
+    assert [x.citation.pmid for x in result.docs] == IDS[5:15]
+    assert mock_server.stats.endpoint_counts == {'efetch':1}
+    assert get_requested_ids(mock_server,'efetch') == 5
+    assert len(api.store) == 15
+    api.store.close()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the esummary models
+"""
+
+#Standard Library
+from types import SimpleNamespace
+
+#Third Party
+import pytest
+
+#Local
+from pubmed import esummary_models
+from pubmed.json_backend import (JSONBackend, get_available_backends,
+                                 get_json_backend)
+
+from conftest import IDS, get_api, load_fixture, make_response
+from test_parsing import _compare
+
+@pytest.fixture(scope='module')
+def esummary_response():
+    return make_response(load_fixture('esummary_100.json'),
+            url='https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi')
+
+#---- SummaryTable ------------------------------------
+def test_summary_table_round_trip(esummary_response):
+    result = esummary_models.PubmedSummaryResult(None,esummary_response)
+    table = esummary_models.SummaryTable(None,esummary_response)
+    assert len(table) == 100
+    assert table.ids == result.ids
+    for row, doc in zip(table,result.docs):
+        assert row.to_dict() == doc.raw
+        assert row.title == doc.title
+        assert row.sort_pub_date == doc.sort_pub_date
+        assert [x.name for x in row.authors] == [x.name for x in doc.authors]
+        assert [(x.id_type,x.value) for x in row.article_ids] == \
+            [(x.id_type,x.value) for x in doc.article_ids]
+    assert table.get_column('title') == [x.title for x in result.docs]
+
+def test_summary_table_indexing(esummary_response):
+    table = esummary_models.SummaryTable(None,esummary_response)
+    assert table[-1].uid == table.ids[-1]
+    assert [x.uid for x in table.docs] == table.ids
+    with pytest.raises(IndexError):
+        table[100]
+    with pytest.raises(IndexError):
+        table[-101]
+
+def test_summary_table_merge(esummary_response):
+    table = esummary_models.SummaryTable(None,esummary_response)
+    merged = esummary_models.SummaryTable.merge([table,table])
+    assert len(merged) == 200
+    assert merged.ids == table.ids*2
+    #Values are interned across the merged tables
+    assert len(merged.values) == len(table.values)
+    assert merged[150].to_dict() == table[50].to_dict()
+    assert merged.get_column('title') == table.get_column('title')*2
+
+def test_summary_table_from_api(mock_server):
+    api = get_api(mock_server,chunk_size=20)
+    table = api.pubmed.summary(IDS[:50],return_type='table')
+    result = api.pubmed.summary(IDS[:50])
+    assert isinstance(table,esummary_models.SummaryTable)
+    #Merged from 3 requests
+    assert table.ids == result.ids == IDS[:50]
+    assert [x.to_dict() for x in table] == [x.raw for x in result.docs]
+
+#---- JSON backends ------------------------------------
+@pytest.mark.parametrize('backend',['json','msgspec','orjson'])
+def test_summary_backends_match(esummary_response,backend):
+    expected = esummary_models.PubmedSummaryResult(
+        SimpleNamespace(json_backend=JSONBackend('json')),esummary_response)
+    result = esummary_models.PubmedSummaryResult(
+        SimpleNamespace(json_backend=JSONBackend(backend)),esummary_response)
+
+    assert result.ids == expected.ids
+    assert len(result.docs) == 100
+    #raw is rebuilt from the msgspec structs on access
+    assert result.raw == expected.raw
+    for doc, expected_doc in zip(result.docs,expected.docs):
+        assert doc.raw == expected_doc.raw
+        assert _compare(doc,expected_doc) == []
+
+def test_default_backend_decodes_summaries_with_msgspec(esummary_response):
+    pytest.importorskip('msgspec')
+    backend = get_json_backend(None)
+    assert backend.name == get_available_backends()[0]
+    assert backend.typed_summaries
+    assert not get_json_backend('orjson').typed_summaries
+    assert get_json_backend('msgspec').typed_summaries
+    assert JSONBackend('orjson',typed_summaries=True).typed_summaries
+
+    result = esummary_models.PubmedSummaryResult(None,esummary_response)
+    #Decoded into structs
+    assert not isinstance(result._raw_source,dict)
+    assert result.docs[0].raw == esummary_response.json()['result'][result.ids[0]]
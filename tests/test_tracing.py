@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the request hooks and the spans built from them
+"""
+
+#Standard Library
+import json
+
+#Third Party
+import pytest
+
+#Local
+from pubmed.cache import ResponseCache
+from pubmed.hooks import Hooks, get_n_records, get_params_size
+from pubmed.mock_server import MockServer
+from pubmed.retry import RetryPolicy
+from pubmed.tracing import SpanAdapter, InMemoryExporter, JSONLinesExporter
+
+from conftest import IDS, get_api
+
+def _record(api):
+    events = []
+    for name in ('pre_request','rate_limit_wait','post_response','pre_parse',
+                 'post_parse'):
+        api.hooks.add(name,events.append)
+    return events
+
+def test_event_order(mock_server):
+    api = get_api(mock_server)
+    events = _record(api)
+    api.pubmed.details(IDS[:5])
+    assert [x.name for x in events] == ['pre_request','rate_limit_wait',
+                                        'post_response','pre_parse','post_parse']
+    assert len(set(x.request_id for x in events)) == 1
+    assert all(x.endpoint == 'efetch' for x in events)
+    times = [x.time for x in events]
+    assert times == sorted(times)
+
+    pre_request, wait, response, pre_parse, post_parse = events
+    assert pre_request.params_size > 0
+    assert wait.attempt == 1 and wait.wait_time >= 0
+    assert response.status == 200 and response.n_bytes > 0
+    assert response.cache_hit is None
+    assert post_parse.n_records == 5
+    assert post_parse.error is None
+
+    #A new id for each request
+    api.pubmed.details(IDS[5:10])
+    assert events[-1].request_id != events[0].request_id
+
+def test_event_order_with_retries_and_cache():
+    with MockServer(error_rate=1.0,server_errors=(503,)) as server:
+        api = get_api(server,retry=RetryPolicy(backoff=0.01,max_attempts=2),
+                      cache=ResponseCache(':memory:'))
+        events = _record(api)
+        with pytest.raises(Exception):
+            api.pubmed.summary(IDS[:1])
+    #Cache miss, then one wait and response per attempt, no parsing
+    assert [x.name for x in events] == ['pre_request','post_response',
+                                        'rate_limit_wait','post_response',
+                                        'rate_limit_wait','post_response',
+                                        'post_parse']
+    assert events[1].cache_hit is False
+    assert [x.attempt for x in events if x.name == 'post_response'] == [None,1,2]
+    assert events[3].status == 503
+    assert events[-1].error is not None
+
+def test_cache_hit_events(mock_server):
+    api = get_api(mock_server,cache=ResponseCache(':memory:'))
+    api.pubmed.summary(IDS[:3])
+    events = _record(api)
+    api.pubmed.summary(IDS[:3])
+    assert [x.name for x in events] == ['pre_request','post_response',
+                                        'pre_parse','post_parse']
+    assert events[1].cache_hit is True
+
+def test_callback_errors_are_logged(mock_server,caplog):
+    api = get_api(mock_server)
+    def fail(event):
+        raise ValueError('bad callback')
+    api.hooks.add('post_parse',fail)
+    result = api.pubmed.details(IDS[:2])
+    assert len(result.docs) == 2
+    assert 'bad callback' in caplog.text
+
+def test_hooks_registry():
+    hooks = Hooks()
+    assert not hooks
+    fh = lambda event: None
+    hooks.add('pre_parse',fh)
+    assert hooks
+    hooks.remove('pre_parse',fh)
+    assert not hooks
+    with pytest.raises(ValueError):
+        hooks.add('bad',fh)
+
+    assert get_params_size(None) == 0
+    assert get_params_size({'id':'1,2','x':None}) == len('id') + len('1,2') + 2
+    assert get_n_records([1,2,3]) == 3
+    assert get_n_records('x') is None
+
+#---- Spans ------------------------------------------
+def test_spans(mock_server):
+    api = get_api(mock_server)
+    exporter = InMemoryExporter()
+    tracer = SpanAdapter(exporter).attach(api.hooks)
+    with tracer.batch('details',n_ids=10):
+        api.pubmed.details(IDS[:5])
+        api.pubmed.details(IDS[5:10])
+    api.pubmed.summary(IDS[:1])
+    tracer.detach()
+    assert not api.hooks
+
+    names = [x['name'] for x in exporter.spans]
+    #Children are exported before their request, the batch last
+    assert names == ['rate_limit_wait','http POST','parse','pubmed.efetch',
+                     'rate_limit_wait','http POST','parse','pubmed.efetch',
+                     'details',
+                     'rate_limit_wait','http POST','parse','pubmed.esummary']
+    spans = exporter.spans
+    batch = spans[8]
+    assert batch['parent_id'] is None
+    assert batch['attributes'] == {'n_ids':10}
+    for request in (spans[3],spans[7]):
+        assert request['parent_id'] == batch['context']['span_id']
+        assert request['context']['trace_id'] == batch['context']['trace_id']
+        assert request['attributes']['pubmed.n_records'] == 5
+        assert request['attributes']['pubmed.attempts'] == 1
+    for child in spans[:3]:
+        assert child['parent_id'] == spans[3]['context']['span_id']
+    assert spans[1]['kind'] == 'SpanKind.CLIENT'
+    assert spans[1]['attributes']['http.response.status_code'] == 200
+    assert spans[1]['status'] == {'status_code':'UNSET'}
+    #Outside the batch, a new trace
+    assert spans[-1]['parent_id'] is None
+    assert spans[-1]['context']['trace_id'] != batch['context']['trace_id']
+
+def test_spans_with_errors():
+    with MockServer(error_rate=1.0,server_errors=(503,)) as server:
+        api = get_api(server,retry=RetryPolicy(backoff=0.01,max_attempts=2))
+        exporter = InMemoryExporter()
+        SpanAdapter(exporter).attach(api.hooks)
+        with pytest.raises(Exception):
+            api.pubmed.summary(IDS[:1])
+    spans = {x['name']:x for x in exporter.spans}
+    assert [x['name'] for x in exporter.spans].count('http POST') == 2
+    assert spans['http POST']['status'] == {'status_code':'ERROR',
+                                           'description':'HTTP 503'}
+    assert spans['pubmed.esummary']['status']['status_code'] == 'ERROR'
+    assert spans['pubmed.esummary']['attributes']['pubmed.attempts'] == 2
+    assert 'parse' not in spans
+
+def test_json_lines_exporter(tmp_path,mock_server):
+    path = str(tmp_path/'spans.jsonl')
+    exporter = JSONLinesExporter(path)
+    api = get_api(mock_server)
+    SpanAdapter(exporter).attach(api.hooks)
+    api.pubmed.details(IDS[:3])
+    api.pubmed.summary(IDS[:3])
+    exporter.close()
+
+    with open(path,encoding='utf-8') as f:
+        spans = [json.loads(line) for line in f]
+    assert len(spans) == exporter.n_spans == 8
+    assert [x['name'] for x in spans if x['name'].startswith('pubmed.')] == \
+        ['pubmed.efetch','pubmed.esummary']
+    for span in spans:
+        assert set(span) == {'name','context','kind','parent_id','start_time',
+                             'end_time','status','attributes','events','links',
+                             'resource'}
+        assert span['start_time'] <= span['end_time']
+        assert span['start_time'].endswith('Z')
+        assert len(span['context']['trace_id']) == 34
+        assert len(span['context']['span_id']) == 18
+    efetch = spans[3]
+    assert efetch['attributes']['http.request.method'] == 'POST'
+    assert efetch['attributes']['url.full'].endswith('/efetch.cgi')
+
+    #Appends by default
+    exporter = JSONLinesExporter(path)
+    exporter.export([spans[0]])
+    exporter.close()
+    with open(path,encoding='utf-8') as f:
+        assert len(f.readlines()) == 9